@@ -6,11 +6,18 @@
 from azure.cli.core import AzCommandsLoader
 
 from knack.events import (
-    EVENT_INVOKER_CMD_TBL_LOADED
+    EVENT_INVOKER_CMD_TBL_LOADED,
+    EVENT_INVOKER_FILTER_RESULT
 )
 
 from azext_ai_did_you_mean_this._help import helps  # pylint: disable=unused-import
 from azext_ai_did_you_mean_this._cmd_table import on_command_table_loaded
+from azext_ai_did_you_mean_this._const import (
+    CONFIG_SECTION,
+    DEFAULT_SERVICE_TIMEOUT,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_USE_LOCAL_INDEX
+)
 
 
 def inject_functions_into_core():
@@ -22,6 +29,15 @@ def inject_functions_into_core():
 # pylint: disable=too-few-public-methods
 class GlobalConfig():
     ENABLE_STYLING = False
+    SERVICE_TIMEOUT = DEFAULT_SERVICE_TIMEOUT
+    CACHE_TTL = DEFAULT_CACHE_TTL
+    USE_LOCAL_INDEX = DEFAULT_USE_LOCAL_INDEX
+
+    @classmethod
+    def load(cls, config):
+        cls.SERVICE_TIMEOUT = config.getfloat(CONFIG_SECTION, 'service_timeout', fallback=DEFAULT_SERVICE_TIMEOUT)
+        cls.CACHE_TTL = config.getint(CONFIG_SECTION, 'cache_ttl', fallback=DEFAULT_CACHE_TTL)
+        cls.USE_LOCAL_INDEX = config.getboolean(CONFIG_SECTION, 'use_local_index', fallback=DEFAULT_USE_LOCAL_INDEX)
 
 
 class AiDidYouMeanThisCommandsLoader(AzCommandsLoader):
@@ -39,6 +55,13 @@ class AiDidYouMeanThisCommandsLoader(AzCommandsLoader):
             GlobalConfig.ENABLE_STYLING = cli_ctx.enable_color
         except AttributeError:
             pass
+        try:
+            GlobalConfig.load(self.cli_ctx.config)
+        except ValueError:
+            pass
+        if GlobalConfig.USE_LOCAL_INDEX:
+            from azext_ai_did_you_mean_this._suggestion_index import on_command_succeeded
+            self.cli_ctx.register_event(EVENT_INVOKER_FILTER_RESULT, on_command_succeeded)
 
     def load_command_table(self, args):
         from azext_ai_did_you_mean_this.commands import load_command_table
@@ -0,0 +1,94 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+import time
+import tempfile
+
+from knack.log import get_logger
+
+from azext_ai_did_you_mean_this._const import (
+    EXTENSION_DATA_DIR_NAME,
+    RECOMMENDATION_CACHE_FILE_NAME,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_CACHE_SIZE
+)
+
+logger = get_logger(__name__)
+
+
+def get_data_file_path(file_name):
+    from azure.cli.core._environment import get_config_dir
+    return os.path.join(get_config_dir(), EXTENSION_DATA_DIR_NAME, file_name)
+
+
+def load_json_file(path, default):
+    try:
+        with open(path, 'r') as data_file:
+            return json.load(data_file)
+    except (OSError, ValueError) as ex:
+        logger.debug('Unable to read "%s": %s', path, ex)
+        return default
+
+
+def save_json_file(path, data):
+    # written aside and moved in place, so concurrent CLI invocations never read half a file.
+    try:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as data_file:
+            json.dump(data, data_file)
+        os.replace(temp_path, path)
+    except OSError as ex:
+        logger.debug('Unable to write "%s": %s', path, ex)
+
+
+class RecommendationCache():
+    """
+    Recommendations received from the service, persisted between CLI invocations.
+
+    Entries are keyed by command, normalized parameters and CLI version. They expire after `ttl` seconds
+    and the oldest entries are evicted once there are more than `max_size` of them.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_CACHE_TTL, max_size=DEFAULT_CACHE_SIZE, clock=time.time):
+        self.path = path or get_data_file_path(RECOMMENDATION_CACHE_FILE_NAME)
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = None
+
+    @staticmethod
+    def get_key(command, parameters, version):
+        return json.dumps([command, parameters, version])
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            entries = load_json_file(self.path, {})
+            self._entries = entries if isinstance(entries, dict) else {}
+        return self._entries
+
+    def get(self, command, parameters, version):
+        """ the recommendations cached for a failure, or None if there are no fresh ones. """
+        entry = self.entries.get(self.get_key(command, parameters, version))
+        if not entry:
+            return None
+        stored, recommendations = entry
+        if self._clock() - stored > self.ttl:
+            return None
+        return recommendations
+
+    def put(self, command, parameters, version, recommendations):
+        now = self._clock()
+        entries = {key: entry for key, entry in self.entries.items() if now - entry[0] <= self.ttl}
+        entries[self.get_key(command, parameters, version)] = [now, recommendations]
+        if len(entries) > self.max_size:
+            newest = sorted(entries.items(), key=lambda item: item[1][0])[-self.max_size:]
+            entries = dict(newest)
+        self._entries = entries
+        save_json_file(self.path, entries)
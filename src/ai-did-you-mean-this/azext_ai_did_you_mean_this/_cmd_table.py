@@ -3,10 +3,98 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+from bisect import bisect_left
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+# TODO: Avoid setting rules for global parameters manually.
+GLOBAL_PARAMETER_RULES = {
+    '-h': '--help',
+    '-o': '--output',
+    '--only-show-errors': None,
+    '--help': None,
+    '--output': None,
+    '--query': None,
+    '--debug': None,
+    '--verbose': None
+}
+
+# special global parameters that would typically be removed by the CLI
+BLOCKLISTED_PARAMETERS = frozenset({'--debug', '--verbose'})
+
+
+def build_parameter_rules(parameter_table):
+    """
+    Maps every option of a command's parameters to its standard form, the longest option of the parameter,
+    or to None for options already in standard form. Global parameters are included.
+    """
+    from knack.deprecation import Deprecated
+
+    rules = dict(GLOBAL_PARAMETER_RULES)
+
+    for argument in (parameter_table or {}).values():
+        options = argument.type.settings['options_list']
+        # remove deprecated arguments.
+        options = (option for option in options if not isinstance(option, Deprecated))
+
+        # attempt to create a rule for each potential parameter.
+        try:
+            # sort parameters by decreasing length.
+            sorted_options = sorted(options, key=len, reverse=True)
+            # select the longest parameter as the standard form
+            standard_form = sorted_options[0]
+
+            for option in sorted_options[1:]:
+                rules[option] = standard_form
+
+            # don't apply any rules for the parameter's standard form.
+            rules[standard_form] = None
+        except TypeError:
+            # ignore cases in which one of the option objects is of an unsupported type.
+            logger.debug('[Thoth]: Unexpected argument options `%s` of type `%s`.', options, type(options).__name__)
+
+    return rules
+
 
 class CommandTable():  # pylint: disable=too-few-public-methods
     CMD_TBL = None
 
+    # lookups built from a command table, reused for the rest of the session.
+    _INDEXED_TBL = None
+    _COMMAND_NAMES = []
+    _PARAMETER_RULES = {}
+
+    @classmethod
+    def _index(cls, cmd_tbl):
+        # command tables only grow while loading, so a size change means the lookups are stale.
+        if cmd_tbl is not cls._INDEXED_TBL or len(cmd_tbl) != len(cls._COMMAND_NAMES):
+            cls._INDEXED_TBL = cmd_tbl
+            cls._COMMAND_NAMES = sorted(cmd_tbl)
+            cls._PARAMETER_RULES = {}
+
+    @classmethod
+    def get_parameter_rules(cls, cmd_tbl, command):
+        """ the memoized normalization rules of a command's parameters, see build_parameter_rules. """
+        cls._index(cmd_tbl)
+        parameter_table = cmd_tbl[command].arguments
+        # arguments are loaded lazily, only for the command that is run
+        entry = cls._PARAMETER_RULES.get(command)
+        size = len(parameter_table or ())
+        if entry is None or entry[0] is not parameter_table or entry[1] != size:
+            entry = (parameter_table, size, build_parameter_rules(parameter_table))
+            cls._PARAMETER_RULES[command] = entry
+        return entry[2]
+
+    @classmethod
+    def has_command_prefix(cls, cmd_tbl, prefix):
+        """ whether the name of any command in the table starts with prefix. """
+        cls._index(cmd_tbl)
+        names = cls._COMMAND_NAMES
+        position = bisect_left(names, prefix)
+        return position < len(names) and names[position].startswith(prefix)
+
 
 def on_command_table_loaded(_, **kwargs):
     cmd_tbl = kwargs.pop('cmd_tbl', None)
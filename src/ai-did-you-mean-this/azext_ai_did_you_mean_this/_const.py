@@ -36,3 +36,22 @@ TELEMETRY_MISSING_CORRELATION_ID_STR = (
 UNABLE_TO_CALL_SERVICE_STR = (
     'Either the subscription ID or correlation ID was not set. Aborting operation.'
 )
+
+SERVICE_URL = 'https://app.aladdin.microsoft.com/api/v1.0/suggestions'
+
+# configuration, read from the [ai_did_you_mean_this] section of the CLI config file
+# or from AZURE_AI_DID_YOU_MEAN_THIS_<OPTION> environment variables.
+CONFIG_SECTION = 'ai_did_you_mean_this'
+# the longest time in seconds that a failed command waits on the service for recommendations.
+DEFAULT_SERVICE_TIMEOUT = 2.0
+# how long in seconds recommendations received from the service are reused.
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+DEFAULT_CACHE_SIZE = 1000
+# whether recommendations are looked up in a local index of the commands that succeeded recently.
+DEFAULT_USE_LOCAL_INDEX = False
+COMMAND_HISTORY_SIZE = 500
+MAX_LOCAL_RECOMMENDATIONS = 5
+
+EXTENSION_DATA_DIR_NAME = 'ai_did_you_mean_this'
+RECOMMENDATION_CACHE_FILE_NAME = 'recommendations.json'
+COMMAND_HISTORY_FILE_NAME = 'history.json'
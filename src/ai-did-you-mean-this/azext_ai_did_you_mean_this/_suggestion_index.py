@@ -0,0 +1,98 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+from collections import Counter
+
+from knack.log import get_logger
+
+from azext_ai_did_you_mean_this._cache import get_data_file_path, load_json_file, save_json_file
+from azext_ai_did_you_mean_this._cmd_table import CommandTable
+from azext_ai_did_you_mean_this._const import (
+    COMMAND_HISTORY_FILE_NAME,
+    COMMAND_HISTORY_SIZE,
+    MAX_LOCAL_RECOMMENDATIONS
+)
+
+logger = get_logger(__name__)
+
+
+class CommandHistory():
+    """ The most recent successful commands and the normalized parameters they were run with. """
+
+    def __init__(self, path=None, max_size=COMMAND_HISTORY_SIZE):
+        self.path = path or get_data_file_path(COMMAND_HISTORY_FILE_NAME)
+        self.max_size = max_size
+
+    def load(self):
+        entries = load_json_file(self.path, [])
+        return [tuple(entry) for entry in entries if isinstance(entry, list) and len(entry) == 2]
+
+    def record(self, command, parameters):
+        entries = self.load()
+        entries.append((command, parameters))
+        save_json_file(self.path, entries[-self.max_size:])
+
+
+def on_command_succeeded(cli_ctx, **_):
+    from azext_ai_did_you_mean_this.custom import normalize_and_sort_parameters
+
+    command = cli_ctx.data.get('command')
+    if not command or not CommandTable.CMD_TBL or command not in CommandTable.CMD_TBL:
+        return
+    command, parameters = normalize_and_sort_parameters(CommandTable.CMD_TBL, command,
+                                                        cli_ctx.data.get('safe_params') or [])
+    CommandHistory().record(command, parameters)
+
+
+def _get_placeholder(parameter):
+    return ''.join(word.capitalize() for word in parameter.lstrip('-').split('-'))
+
+
+def _make_recommendation(command, parameters):
+    parameters = [parameter for parameter in parameters.split(',') if parameter]
+    return {
+        'SuccessCommand': command,
+        'SuccessCommand_Parameters': ','.join(parameters),
+        'SuccessCommand_ArgumentPlaceholders': ','.join(_get_placeholder(parameter) for parameter in parameters)
+    }
+
+
+class SuggestionIndex():
+    """
+    Recommendations for a failed command that need no network access, in the format of the service's response.
+
+    They come from the commands that succeeded recently or, failing that, from the loaded command table.
+    """
+
+    def __init__(self, cmd_tbl, history=None, max_recommendations=MAX_LOCAL_RECOMMENDATIONS):
+        self.cmd_tbl = cmd_tbl or {}
+        self.history = history or CommandHistory()
+        self.max_recommendations = max_recommendations
+
+    def suggest_from_history(self, command, parameters):
+        """ the ways the command, or the commands of the group it names, recently succeeded, most frequent first. """
+        prefix = command + ' '
+        counts = Counter(entry for entry in self.history.load()
+                         if entry[0] == command or entry[0].startswith(prefix))
+        # the failed invocation itself is not a way to succeed
+        counts.pop((command, parameters), None)
+        return [_make_recommendation(*entry) for entry, _ in counts.most_common(self.max_recommendations)]
+
+    def suggest_from_command_table(self, command):
+        """ the command with its required parameters, or the commands directly in the group it names. """
+        az_cli_command = self.cmd_tbl.get(command)
+        if az_cli_command:
+            required = []
+            for argument in (az_cli_command.arguments or {}).values():
+                settings = argument.type.settings
+                options = [option for option in settings.get('options_list') or [] if isinstance(option, str)]
+                if settings.get('required') and options:
+                    required.append(max(options, key=len))
+            return [_make_recommendation(command, ','.join(sorted(required)))]
+
+        prefix = command + ' '
+        depth = len(command.split()) + 1
+        subcommands = sorted(cmd for cmd in self.cmd_tbl if cmd.startswith(prefix) and len(cmd.split()) == depth)
+        return [_make_recommendation(cmd, '') for cmd in subcommands[:self.max_recommendations]]
@@ -4,6 +4,7 @@
 # --------------------------------------------------------------------------------------------
 
 import json
+import threading
 from http import HTTPStatus
 
 import requests
@@ -14,6 +15,7 @@ import azure.cli.core.telemetry as telemetry
 from knack.log import get_logger
 from knack.util import CLIError  # pylint: disable=unused-import
 
+from azext_ai_did_you_mean_this import GlobalConfig
 from azext_ai_did_you_mean_this.failure_recovery_recommendation import FailureRecoveryRecommendation
 from azext_ai_did_you_mean_this._style import style_message
 from azext_ai_did_you_mean_this._const import (
@@ -22,9 +24,11 @@ from azext_ai_did_you_mean_this._const import (
     TELEMETRY_IS_DISABLED_STR,
     TELEMETRY_IS_ENABLED_STR,
     TELEMETRY_MISSING_SUBSCRIPTION_ID_STR,
-    TELEMETRY_MISSING_CORRELATION_ID_STR
+    TELEMETRY_MISSING_CORRELATION_ID_STR,
+    SERVICE_URL
 )
-from azext_ai_did_you_mean_this._cmd_table import CommandTable
+from azext_ai_did_you_mean_this._cmd_table import CommandTable, GLOBAL_PARAMETER_RULES, BLOCKLISTED_PARAMETERS
+from azext_ai_did_you_mean_this._cache import RecommendationCache
 
 logger = get_logger(__name__)
 
@@ -32,7 +36,7 @@ logger = get_logger(__name__)
 # Commands
 # note: at least one command is required in order for the CLI to load the extension.
 def show_extension_version():
-    print('Current version: 0.2.1')
+    print('Current version: 0.3.0')
 
 
 def _log_debug(msg, *args, **kwargs):
@@ -58,48 +62,16 @@ def get_parameter_table(cmd_table, command, recurse=True):
 
 
 def normalize_and_sort_parameters(cmd_table, command, parameters):
-    from knack.deprecation import Deprecated
     _log_debug('normalize_and_sort_parameters: command: "%s", parameters: "%s"', command, parameters)
 
     parameter_set = set()
     parameter_table, command = get_parameter_table(cmd_table, command)
 
     if parameters:
-        # TODO: Avoid setting rules for global parameters manually.
-        rules = {
-            '-h': '--help',
-            '-o': '--output',
-            '--only-show-errors': None,
-            '--help': None,
-            '--output': None,
-            '--query': None,
-            '--debug': None,
-            '--verbose': None
-        }
-
-        blocklisted = {'--debug', '--verbose'}
-
-        if parameter_table:
-            for argument in parameter_table.values():
-                options = argument.type.settings['options_list']
-                # remove deprecated arguments.
-                options = (option for option in options if not isinstance(option, Deprecated))
-
-                # attempt to create a rule for each potential parameter.
-                try:
-                    # sort parameters by decreasing length.
-                    sorted_options = sorted(options, key=len, reverse=True)
-                    # select the longest parameter as the standard form
-                    standard_form = sorted_options[0]
-
-                    for option in sorted_options[1:]:
-                        rules[option] = standard_form
-
-                    # don't apply any rules for the parameter's standard form.
-                    rules[standard_form] = None
-                except TypeError:
-                    # ignore cases in which one of the option objects is of an unsupported type.
-                    _log_debug('Unexpected argument options `%s` of type `%s`.', options, type(options).__name__)
+        if parameter_table is not None:
+            rules = CommandTable.get_parameter_rules(cmd_table, command)
+        else:
+            rules = GLOBAL_PARAMETER_RULES
 
         for parameter in parameters:
             if parameter in rules:
@@ -112,7 +84,7 @@ def normalize_and_sort_parameters(cmd_table, command, parameters):
                 _log_debug('"%s" is an invalid parameter for command "%s".', parameter, command)
 
         # remove any special global parameters that would typically be removed by the CLI
-        parameter_set.difference_update(blocklisted)
+        parameter_set.difference_update(BLOCKLISTED_PARAMETERS)
 
     # get the list of parameters as a comma-separated list
     return command, ','.join(sorted(parameter_set))
@@ -159,21 +131,17 @@ def recommend_recovery_options(version, command, parameters, extension):
 
     # perform some rudimentary parsing to extract the parameters and command in a standard form
     command, parameters = normalize_and_sort_parameters(cmd_tbl, command, parameters)
-    response = call_aladdin_service(command, parameters, version)
-
-    # only show recommendations when we can contact the service.
-    if response and response.status_code == HTTPStatus.OK:
-        recommendations = get_recommendations_from_http_response(response)
+    recommendations = get_recommendations(cmd_tbl, command, parameters, version)
 
+    # only show recommendations when some are known or we can contact the service.
+    if recommendations is not None:
         if recommendations:
             show_recommendation_header(command)
 
             for recommendation in recommendations:
                 append(f"\t{recommendation}")
         # only prompt user to use "az find" for valid CLI commands
-        # note: pylint has trouble resolving statically initialized variables, which is why
-        # we need to disable the unsupported membership test rule
-        elif any(cmd.startswith(command) for cmd in cmd_tbl.keys()):  # pylint: disable=unsupported-membership-test
+        elif CommandTable.has_command_prefix(cmd_tbl, command):
             unable_to_help(command)
 
     elapsed_time = timer() - start_time
@@ -182,21 +150,93 @@ def recommend_recovery_options(version, command, parameters, extension):
     return result
 
 
+def get_recommendations(cmd_tbl, command, parameters, version):
+    """
+    Returns the recommendations for recovering from the failure, or None if the service could not be reached
+    and nothing is known locally. They are looked up, in order, in the cache of the service's responses,
+    in the commands that succeeded recently if the local index is enabled, and from the service itself.
+    """
+    cache = RecommendationCache(ttl=GlobalConfig.CACHE_TTL)
+    suggestions = cache.get(command, parameters, version)
+    if suggestions is not None:
+        _log_debug('Using cached recommendations.')
+        return _to_recommendations(suggestions)
+
+    index = None
+    if GlobalConfig.USE_LOCAL_INDEX:
+        from azext_ai_did_you_mean_this._suggestion_index import SuggestionIndex
+        index = SuggestionIndex(cmd_tbl)
+        suggestions = index.suggest_from_history(command, parameters)
+        if suggestions:
+            _log_debug('Using recommendations from recently successful commands.')
+            return _to_recommendations(suggestions)
+
+    response = call_aladdin_service(command, parameters, version, timeout=GlobalConfig.SERVICE_TIMEOUT)
+    if response is not None and response.status_code == HTTPStatus.OK:
+        try:
+            suggestions = response.json()
+        except ValueError as ex:
+            _log_debug('Invalid response from the service: %s', ex)
+        else:
+            cache.put(command, parameters, version, suggestions)
+            return _to_recommendations(suggestions)
+
+    if index is not None:
+        _log_debug('Using recommendations from the command table.')
+        return _to_recommendations(index.suggest_from_command_table(command))
+    return None
+
+
+def _to_recommendations(suggestions):
+    return [FailureRecoveryRecommendation(dict(suggestion)) for suggestion in suggestions]
+
+
 def get_recommendations_from_http_response(response):
-    recommendations = []
+    return _to_recommendations(response.json())
+
+
+class _Session():  # pylint: disable=too-few-public-methods
+    SESSION = None
+
 
-    for suggestion in response.json():
-        recommendations.append(FailureRecoveryRecommendation(suggestion))
+def get_session():
+    """ The session the service is called with, so that connections are reused between failures. """
+    if _Session.SESSION is None:
+        from requests.adapters import HTTPAdapter
 
-    return recommendations
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0))
+        _Session.SESSION = session
+    return _Session.SESSION
 
 
-def call_aladdin_service(command, parameters, version):
+def _call_within(budget, func, *args, **kwargs):
+    """
+    Returns the result of func, or None if it takes longer than budget seconds. func keeps running in a daemon
+    thread in that case, which never holds up the CLI's exit; the socket timeouts alone would not bound name
+    resolution or a response that trickles in.
+    """
+    outcome = {}
+
+    def _run():
+        try:
+            outcome['result'] = func(*args, **kwargs)
+        except RequestException as ex:
+            _log_debug('requests.get() exception: %s', ex)
+
+    thread = threading.Thread(target=_run)
+    thread.daemon = True
+    thread.start()
+    thread.join(budget)
+    if thread.is_alive():
+        _log_debug('The service did not respond within %.2fs.', budget)
+    return outcome.get('result', None)
+
+
+def call_aladdin_service(command, parameters, version, timeout=None):
     _log_debug('call_aladdin_service: version: "%s", command: "%s", parameters: "%s"',
                version, command, parameters)
 
-    response = None
-
     correlation_id = telemetry._session.correlation_id  # pylint: disable=protected-access
     subscription_id = telemetry._get_azure_subscription_id()  # pylint: disable=protected-access
     is_telemetry_enabled = telemetry.is_telemetry_enabled()
@@ -228,19 +268,20 @@ def call_aladdin_service(command, parameters, version):
         "parameters": parameters
     }
 
-    api_url = 'https://app.aladdin.microsoft.com/api/v1.0/suggestions'
     headers = {'Content-Type': 'application/json'}
 
-    try:
-        response = requests.get(
-            api_url,
-            params={
-                'query': json.dumps(query),
-                'clientType': 'AzureCli',
-                'context': json.dumps(context)
-            },
-            headers=headers)
-    except RequestException as ex:
-        _log_debug('requests.get() exception: %s', ex)
+    timeout = GlobalConfig.SERVICE_TIMEOUT if timeout is None else timeout
+
+    response = _call_within(
+        timeout,
+        get_session().get,
+        SERVICE_URL,
+        params={
+            'query': json.dumps(query),
+            'clientType': 'AzureCli',
+            'context': json.dumps(context)
+        },
+        headers=headers,
+        timeout=timeout)
 
     return response
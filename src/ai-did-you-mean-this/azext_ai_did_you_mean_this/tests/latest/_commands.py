@@ -130,3 +130,43 @@ class AzCommandType(Enum):
 
 def get_commands():
     return list({command_type.command for command_type in AzCommandType})
+
+
+def load_command_table(commands=None):
+    """ loads the command table of every module, with the arguments of the given commands. """
+    from knack.events import EVENT_INVOKER_POST_CMD_TBL_CREATE
+    from azure.cli.core.mock import DummyCli
+    from azure.cli.core.commands.events import EVENT_INVOKER_PRE_LOAD_ARGUMENTS, EVENT_INVOKER_POST_LOAD_ARGUMENTS
+    from azure.cli.core.commands.arm import register_global_subscription_argument, register_ids_argument
+
+    # setup a dummy CLI with a valid invocation object.
+    cli = DummyCli()
+    cli_ctx = cli.commands_loader.cli_ctx
+    cli.invocation = cli_ctx.invocation_cls(cli_ctx=cli_ctx,
+                                            parser_cls=cli_ctx.parser_cls,
+                                            commands_loader_cls=cli_ctx.commands_loader_cls,
+                                            help_cls=cli_ctx.help_cls)
+    # load command table for every module
+    cmd_loader = cli.invocation.commands_loader
+    cmd_loader.load_command_table(None)
+
+    # Note: Both of the below events rely on EVENT_INVOKER_POST_CMD_TBL_CREATE.
+    # register handler for adding subscription argument
+    register_global_subscription_argument(cli_ctx)
+    # register handler for adding ids argument.
+    register_ids_argument(cli_ctx)
+
+    cli_ctx.raise_event(EVENT_INVOKER_PRE_LOAD_ARGUMENTS, commands_loader=cmd_loader)
+
+    # load arguments for each command
+    for cmd in get_commands() if commands is None else commands:
+        # simulate command invocation by filling in required metadata.
+        cmd_loader.command_name = cmd
+        cli_ctx.invocation.data['command_string'] = cmd
+        # load argument info for the given command.
+        cmd_loader.load_arguments(cmd)
+
+    cli_ctx.raise_event(EVENT_INVOKER_POST_LOAD_ARGUMENTS, commands_loader=cmd_loader)
+    cli_ctx.raise_event(EVENT_INVOKER_POST_CMD_TBL_CREATE, commands_loader=cmd_loader)
+
+    return cmd_loader.command_table
@@ -99,5 +99,5 @@ def mock_aladdin_service_call(command):
     handlers = {}
     handler = handlers.get(command, MockRecommendationModel.create_mock_aladdin_service_http_response)
 
-    with mock.patch('requests.get', return_value=handler(command)):
+    with mock.patch('requests.Session.get', return_value=handler(command)):
         yield None
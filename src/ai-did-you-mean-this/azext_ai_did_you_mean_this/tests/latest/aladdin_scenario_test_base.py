@@ -3,8 +3,11 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import os
 import re
+import shutil
 import logging
+import tempfile
 import unittest.mock as mock
 
 from azure.cli.testsdk.patches import mock_in_unit_test
@@ -56,6 +59,19 @@ def patch_telemetry(unit_test):
                       lambda: True)
 
 
+def patch_data_dir(unit_test):
+    data_dir = tempfile.mkdtemp()
+    unit_test.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+
+    def _get_data_file_path(file_name):
+        return os.path.join(data_dir, file_name)
+
+    for module in ('_cache', '_suggestion_index'):
+        mock_in_unit_test(unit_test,
+                          f'azext_ai_did_you_mean_this.{module}.get_data_file_path',
+                          _get_data_file_path)
+
+
 class AladdinScenarioTest(ScenarioTest):
     def __init__(self, method_name, **kwargs):
         super().__init__(method_name, **kwargs)
@@ -63,7 +79,8 @@ class AladdinScenarioTest(ScenarioTest):
         default_telemetry_patches = {
             patch_ids,
             patch_version,
-            patch_telemetry
+            patch_telemetry,
+            patch_data_dir
         }
 
         self._exception = None
@@ -0,0 +1,65 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import timeit
+import unittest
+import unittest.mock as mock
+
+from azext_ai_did_you_mean_this._cmd_table import CommandTable
+from azext_ai_did_you_mean_this.custom import recommend_recovery_options
+from azext_ai_did_you_mean_this.tests.latest._commands import AzCommandType, get_commands, load_command_table
+from azext_ai_did_you_mean_this.tests.latest._mock import MOCK_VERSION
+
+# the benchmarks time real work with the full CLI command table, so they only run when asked for
+RUN_BENCHMARKS = os.environ.get('AZURE_AI_DID_YOU_MEAN_THIS_BENCHMARKS', '').lower() in ('1', 'true', 'yes')
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'set AZURE_AI_DID_YOU_MEAN_THIS_BENCHMARKS=1 to run the benchmarks')
+class FailurePathBenchmark(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cmd_tbl = load_command_table()
+
+    def setUp(self):
+        if len(self.cmd_tbl) < 1000:
+            self.skipTest('the full CLI command table is not available')
+
+        patchers = [
+            mock.patch.object(CommandTable, 'CMD_TBL', self.cmd_tbl),
+            # the service has no recommendations, so every failure also checks for a matching command
+            mock.patch('azext_ai_did_you_mean_this.custom.get_recommendations', return_value=[])
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _time_failures(self, repeat):
+        failures = [(cmd.command, cmd.parameters) for cmd in AzCommandType]
+        start = timeit.default_timer()
+        for _ in range(repeat):
+            for command, parameters in failures:
+                recommend_recovery_options(MOCK_VERSION, command, parameters, None)
+        return (timeit.default_timer() - start) / (repeat * len(failures))
+
+    def test_failure_path_overhead(self):
+        first = self._time_failures(1)
+        memoized = self._time_failures(100)
+
+        def _linear_scan():
+            for command in get_commands():
+                any(cmd.startswith(command) for cmd in self.cmd_tbl)
+        linear = timeit.timeit(_linear_scan, number=10) / (10 * len(get_commands()))
+
+        timings = '{} commands: first failure {:.3f} ms, later failures {:.3f} ms, linear prefix scan {:.3f} ms'.format(
+            len(self.cmd_tbl), first * 1000, memoized * 1000, linear * 1000)
+        # generous bounds so the benchmark flags regressions without being flaky
+        self.assertLess(memoized, first, timings)
+        self.assertLess(memoized, 0.005, timings)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import unittest.mock as mock
+from http import HTTPStatus
+
+import requests
+
+from azext_ai_did_you_mean_this import GlobalConfig
+from azext_ai_did_you_mean_this._cache import RecommendationCache
+from azext_ai_did_you_mean_this._suggestion_index import CommandHistory, SuggestionIndex
+from azext_ai_did_you_mean_this.custom import call_aladdin_service, get_recommendations
+
+MOCK_VERSION = '2.4.0'
+ACCOUNT_SET = {
+    'SuccessCommand': 'account set',
+    'SuccessCommand_Parameters': '--subscription',
+    'SuccessCommand_ArgumentPlaceholders': 'Subscription'
+}
+
+
+class MockClock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _mock_command(arguments=None):
+    command = mock.Mock()
+    command.arguments = {}
+    for name, (options, required) in (arguments or {}).items():
+        argument = mock.Mock()
+        argument.type.settings = {'options_list': options, 'required': required}
+        command.arguments[name] = argument
+    return command
+
+
+def _mock_response(suggestions):
+    response = requests.Response()
+    response.status_code = HTTPStatus.OK.value
+    response._content = bytes(json.dumps(suggestions), 'utf-8')  # pylint: disable=protected-access
+    return response
+
+
+class TestLocalRecommendations(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        for module in ('_cache', '_suggestion_index'):
+            patcher = mock.patch(f'azext_ai_did_you_mean_this.{module}.get_data_file_path',
+                                 lambda file_name: os.path.join(self.data_dir, file_name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for patcher in (mock.patch('azure.cli.core.telemetry._get_azure_subscription_id', return_value=None),
+                        mock.patch('azure.cli.core.telemetry.is_telemetry_enabled', return_value=False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cmd_tbl = {
+            'account set': _mock_command({'subscription': (['--subscription', '-s'], True)}),
+            'account show': _mock_command(),
+            'account list': _mock_command(),
+            'account lock create': _mock_command()
+        }
+
+    def test_cache_expires_and_evicts_oldest(self):
+        clock = MockClock()
+        cache = RecommendationCache(ttl=60, max_size=2, clock=clock)
+        cache.put('account', '', MOCK_VERSION, [ACCOUNT_SET])
+        self.assertEqual(RecommendationCache(clock=clock).get('account', '', MOCK_VERSION), [ACCOUNT_SET])
+        self.assertIsNone(cache.get('account', '', '2.5.0'))
+
+        clock.now += 1
+        cache.put('account set', '', MOCK_VERSION, [])
+        clock.now += 1
+        cache.put('account show', '', MOCK_VERSION, [])
+        self.assertIsNone(cache.get('account', '', MOCK_VERSION))
+        self.assertEqual(cache.get('account set', '', MOCK_VERSION), [])
+
+        clock.now += 61
+        self.assertIsNone(cache.get('account show', '', MOCK_VERSION))
+
+    def test_service_responses_are_cached(self):
+        with mock.patch('requests.Session.get', return_value=_mock_response([ACCOUNT_SET])) as session_get:
+            first = get_recommendations(self.cmd_tbl, 'account', '', MOCK_VERSION)
+            second = get_recommendations(self.cmd_tbl, 'account', '', MOCK_VERSION)
+        session_get.assert_called_once()
+        self.assertEqual([str(recommendation) for recommendation in first],
+                         [str(recommendation) for recommendation in second])
+        self.assertEqual(str(first[0]), 'az account set --subscription Subscription')
+
+    def test_service_call_is_bounded_by_timeout(self):
+        released = threading.Event()
+        self.addCleanup(released.set)
+
+        def _slow_get(*_, **__):
+            released.wait(5)
+            return _mock_response([])
+
+        with mock.patch('requests.Session.get', side_effect=_slow_get):
+            start = time.time()
+            response = call_aladdin_service('account', '', MOCK_VERSION, timeout=0.1)
+        self.assertIsNone(response)
+        self.assertLess(time.time() - start, 2)
+
+    def test_local_index(self):
+        history = CommandHistory()
+        for command, parameters in (('account show', ''), ('account set', '--subscription'),
+                                    ('account set', '--subscription'), ('group list', '')):
+            history.record(command, parameters)
+
+        index = SuggestionIndex(self.cmd_tbl, history)
+        self.assertEqual([suggestion['SuccessCommand'] for suggestion in index.suggest_from_history('account', '')],
+                         ['account set', 'account show'])
+        self.assertEqual(index.suggest_from_history('account set', '--subscription'), [])
+        self.assertEqual(index.suggest_from_command_table('account set'), [ACCOUNT_SET])
+        self.assertEqual([suggestion['SuccessCommand'] for suggestion in index.suggest_from_command_table('account')],
+                         ['account list', 'account set', 'account show'])
+
+    def test_local_index_answers_without_the_network(self):
+        CommandHistory().record('account set', '--subscription')
+        with mock.patch.object(GlobalConfig, 'USE_LOCAL_INDEX', True), \
+                mock.patch('requests.Session.get', side_effect=requests.ConnectionError) as session_get:
+            recommendations = get_recommendations(self.cmd_tbl, 'account', '', MOCK_VERSION)
+            self.assertEqual([str(recommendation) for recommendation in recommendations],
+                             ['az account set --subscription Subscription'])
+            session_get.assert_not_called()
+
+            # offline, the command table is the fallback
+            recommendations = get_recommendations(self.cmd_tbl, 'account show', '', MOCK_VERSION)
+            session_get.assert_called_once()
+            self.assertEqual([recommendation.command for recommendation in recommendations], ['account show'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,13 +4,12 @@
 # --------------------------------------------------------------------------------------------
 
 import unittest
+import unittest.mock as mock
 from enum import Enum, auto
 
-from azure.cli.core.mock import DummyCli
-from azure.cli.core import MainCommandsLoader
-
+from azext_ai_did_you_mean_this._cmd_table import CommandTable, build_parameter_rules
 from azext_ai_did_you_mean_this.custom import normalize_and_sort_parameters
-from azext_ai_did_you_mean_this.tests.latest._commands import get_commands, AzCommandType
+from azext_ai_did_you_mean_this.tests.latest._commands import AzCommandType, load_command_table
 
 
 class TestNormalizeAndSortParameters(unittest.TestCase):
@@ -18,41 +17,7 @@ class TestNormalizeAndSortParameters(unittest.TestCase):
     def setUpClass(cls):
         super(TestNormalizeAndSortParameters, cls).setUpClass()
 
-        from knack.events import EVENT_INVOKER_POST_CMD_TBL_CREATE
-        from azure.cli.core.commands.events import EVENT_INVOKER_PRE_LOAD_ARGUMENTS, EVENT_INVOKER_POST_LOAD_ARGUMENTS
-        from azure.cli.core.commands.arm import register_global_subscription_argument, register_ids_argument
-
-        # setup a dummy CLI with a valid invocation object.
-        cls.cli = DummyCli()
-        cli_ctx = cls.cli.commands_loader.cli_ctx
-        cls.cli.invocation = cli_ctx.invocation_cls(cli_ctx=cli_ctx,
-                                                    parser_cls=cli_ctx.parser_cls,
-                                                    commands_loader_cls=cli_ctx.commands_loader_cls,
-                                                    help_cls=cli_ctx.help_cls)
-        # load command table for every module
-        cmd_loader = cls.cli.invocation.commands_loader
-        cmd_loader.load_command_table(None)
-
-        # Note: Both of the below events rely on EVENT_INVOKER_POST_CMD_TBL_CREATE.
-        # register handler for adding subscription argument
-        register_global_subscription_argument(cli_ctx)
-        # register handler for adding ids argument.
-        register_ids_argument(cli_ctx)
-
-        cli_ctx.raise_event(EVENT_INVOKER_PRE_LOAD_ARGUMENTS, commands_loader=cmd_loader)
-
-        # load arguments for each command
-        for cmd in get_commands():
-            # simulate command invocation by filling in required metadata.
-            cmd_loader.command_name = cmd
-            cli_ctx.invocation.data['command_string'] = cmd
-            # load argument info for the given command.
-            cmd_loader.load_arguments(cmd)
-
-        cli_ctx.raise_event(EVENT_INVOKER_POST_LOAD_ARGUMENTS, commands_loader=cmd_loader)
-        cli_ctx.raise_event(EVENT_INVOKER_POST_CMD_TBL_CREATE, commands_loader=cmd_loader)
-
-        cls.cmd_tbl = cmd_loader.command_table
+        cls.cmd_tbl = load_command_table()
 
     def test_custom_normalize_and_sort_parameters(self):
         for cmd in AzCommandType:
@@ -79,3 +44,38 @@ class TestNormalizeAndSortParameters(unittest.TestCase):
         self.assertEqual(parameters, '')
         # verify that recursive parsing removes the last invalid whitespace delimited token.
         self.assertEqual(command, 'Lorem')
+
+
+class TestCommandTableLookups(unittest.TestCase):
+    def setUp(self):
+        self.cmd_tbl = {}
+        for command in ('account set', 'account show', 'vm create'):
+            argument = mock.Mock()
+            argument.type.settings = {'options_list': ['--name', '-n']}
+            self.cmd_tbl[command] = mock.Mock(arguments={'name': argument})
+
+    def test_parameter_rules_are_memoized(self):
+        with mock.patch('azext_ai_did_you_mean_this._cmd_table.build_parameter_rules',
+                        wraps=build_parameter_rules) as build_rules:
+            for _ in range(3):
+                command, parameters = normalize_and_sort_parameters(self.cmd_tbl, 'vm create', ['-n', '-o', '--debug'])
+                self.assertEqual((command, parameters), ('vm create', '--name,--output'))
+            self.assertEqual(build_rules.call_count, 1)
+
+            # arguments loaded later are picked up
+            argument = mock.Mock()
+            argument.type.settings = {'options_list': ['--location', '-l']}
+            self.cmd_tbl['vm create'].arguments['location'] = argument
+            _, parameters = normalize_and_sort_parameters(self.cmd_tbl, 'vm create', ['-n', '-l'])
+            self.assertEqual(parameters, '--location,--name')
+            self.assertEqual(build_rules.call_count, 2)
+
+    def test_command_prefix(self):
+        self.assertTrue(CommandTable.has_command_prefix(self.cmd_tbl, 'account'))
+        self.assertTrue(CommandTable.has_command_prefix(self.cmd_tbl, 'acc'))
+        self.assertTrue(CommandTable.has_command_prefix(self.cmd_tbl, 'vm create'))
+        self.assertFalse(CommandTable.has_command_prefix(self.cmd_tbl, 'vm list'))
+        self.assertFalse(CommandTable.has_command_prefix(self.cmd_tbl, 'webapp'))
+
+        self.cmd_tbl['webapp create'] = mock.Mock(arguments={})
+        self.assertTrue(CommandTable.has_command_prefix(self.cmd_tbl, 'webapp'))
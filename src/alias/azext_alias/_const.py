@@ -13,11 +13,16 @@ ALIAS_HASH_FILE_NAME = 'alias.sha1'
 COLLIDED_ALIAS_FILE_NAME = 'collided_alias'
 ALIAS_TAB_COMP_TABLE_FILE_NAME = 'alias_tab_completion'
 GLOBAL_ALIAS_TAB_COMP_TABLE_PATH = os.path.join(GLOBAL_CONFIG_DIR, ALIAS_TAB_COMP_TABLE_FILE_NAME)
+ALIAS_COMMAND_INDEX_FILE_NAME = 'alias_command_index'
+GLOBAL_ALIAS_COMMAND_INDEX_PATH = os.path.join(GLOBAL_CONFIG_DIR, ALIAS_COMMAND_INDEX_FILE_NAME)
+GLOBAL_ALIAS_COMMAND_INDEX_LOCK_PATH = GLOBAL_ALIAS_COMMAND_INDEX_PATH + '.lock'
+COMMAND_INDEX_REBUILD_TIMEOUT = 300
 COLLISION_CHECK_LEVEL_DEPTH = 5
 
 INSUFFICIENT_POS_ARG_ERROR = 'alias: "{}" takes exactly {} positional argument{} ({} given)'
 CONFIG_PARSING_ERROR = 'alias: Please ensure you have a valid alias configuration file. Error detail: %s'
 DEBUG_MSG = 'Alias Manager: Transforming "%s" to "%s"'
+COMMAND_INDEX_REBUILD_MSG = 'Alias Manager: Rebuilding the command index in the background for %s'
 DEBUG_MSG_WITH_TIMING = 'Alias Manager: Transformed args to %s in %.3fms'
 POS_ARG_DEBUG_MSG = 'Alias Manager: Transforming "%s" to "%s", with the following positional arguments: %s'
 DUPLICATED_PLACEHOLDER_ERROR = 'alias: Duplicated placeholders found when transforming "{}"'
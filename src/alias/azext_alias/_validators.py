@@ -9,10 +9,10 @@ import shlex
 
 from knack.util import CLIError
 
-import azext_alias
 from azext_alias.argument import get_placeholders
 from azext_alias.util import (
     get_config_parser,
+    get_command_index,
     is_url,
     reduce_alias_table,
     filter_alias_create_namespace,
@@ -117,9 +117,8 @@ def _validate_alias_command(alias_command):
 
     # Extract possible CLI commands and validate
     command_to_validate = ' '.join(split_command[:boundary_index]).lower()
-    for command in azext_alias.cached_reserved_commands:
-        if re.match(r'([a-z\-]*\s)*{}($|\s)'.format(command_to_validate), command):
-            return
+    if get_command_index().is_reserved(command_to_validate):
+        return
 
     _validate_positional_arguments(shlex.split(alias_command))
 
@@ -231,7 +230,7 @@ def _validate_positional_arguments(args):
     while nouns:
         search = ' '.join(nouns)
         # Since the command name may be immediately followed by a positional arg, strip those off
-        if not next((x for x in azext_alias.cached_reserved_commands if x.endswith(search)), False):
+        if not get_command_index().is_suffix(search):
             del nouns[-1]
         else:
             return
@@ -4,7 +4,6 @@
 # --------------------------------------------------------------------------------------------
 
 import os
-import re
 import json
 import shlex
 import hashlib
@@ -12,7 +11,6 @@ from collections import defaultdict
 
 from knack.log import get_logger
 
-import azext_alias
 from azext_alias import telemetry
 from azext_alias._const import (
     GLOBAL_CONFIG_DIR,
@@ -21,6 +19,7 @@ from azext_alias._const import (
     COLLIDED_ALIAS_FILE_NAME,
     CONFIG_PARSING_ERROR,
     DEBUG_MSG,
+    COMMAND_INDEX_REBUILD_MSG,
     COLLISION_CHECK_LEVEL_DEPTH,
     POS_ARG_DEBUG_MSG
 )
@@ -28,6 +27,10 @@ from azext_alias.argument import build_pos_args_table, render_template
 from azext_alias.util import (
     is_alias_command,
     cache_reserved_commands,
+    get_command_index,
+    get_reserved_command_versions,
+    get_command_index_versions,
+    rebuild_command_index_in_background,
     get_config_parser,
     build_tab_completion_table
 )
@@ -48,6 +51,7 @@ class AliasManager(object):
         self.collided_alias = defaultdict(list)
         self.alias_config_str = ''
         self.alias_config_hash = ''
+        self.alias_config_changed = True
         self.load_alias_table()
         self.load_alias_hash()
 
@@ -123,9 +127,10 @@ class AliasManager(object):
             AliasManager.write_alias_config_hash(empty_hash=True)
             return args
 
-        # Only load the entire command table if it detects changes in the alias config
-        if self.detect_alias_config_change():
-            self.load_full_command_table()
+        self.alias_config_changed = self.detect_alias_config_change()
+        self.refresh_command_index()
+        if self.alias_config_changed:
+            # Checking the aliases against the command index is a handful of lookups per alias
             self.collided_alias = AliasManager.build_collision_table(self.alias_table.sections())
             build_tab_completion_table(self.alias_table)
         else:
@@ -182,6 +187,24 @@ class AliasManager(object):
 
         return next((section for section in self.alias_table.sections() if section.split()[0] == query), '')
 
+    def refresh_command_index(self):
+        """
+        Make sure there is a command index to check aliases against.
+
+        Only the first check of an alias configuration waits for the entire command table to load.
+        Once the CLI core or an extension is installed, updated or removed, the command index is
+        rebuilt in the background and the aliases are checked against it again.
+        """
+        versions = get_reserved_command_versions()
+        index_versions = get_command_index_versions()
+        if index_versions == versions:
+            return
+        if index_versions is None and self.alias_config_changed:
+            self.load_full_command_table()
+        else:
+            logger.debug(COMMAND_INDEX_REBUILD_MSG, versions)
+            rebuild_command_index_in_background()
+
     def load_full_command_table(self):
         """
         Perform a full load of the command table to get all the reserved command words.
@@ -208,8 +231,10 @@ class AliasManager(object):
             else:
                 post_transform_commands.append(os.path.expandvars(arg))
 
-        AliasManager.write_alias_config_hash(self.alias_config_hash)
-        AliasManager.write_collided_alias(self.collided_alias)
+        # Nothing has to be written unless the alias configuration has changed
+        if self.alias_config_changed:
+            AliasManager.write_alias_config_hash(self.alias_config_hash)
+            AliasManager.write_collided_alias(self.collided_alias)
 
         return post_transform_commands
 
@@ -245,15 +270,14 @@ class AliasManager(object):
         Args:
             levels: the amount of levels we tranverse through the command table tree.
         """
+        command_index = get_command_index()
         collided_alias = defaultdict(list)
         for alias in aliases:
             # Only care about the first word in the alias because alias
             # cannot have spaces (unless they have positional arguments)
             word = alias.split()[0]
-            for level in range(1, levels + 1):
-                collision_regex = r'^{}{}($|\s)'.format(r'([a-z\-]*\s)' * (level - 1), word.lower())
-                if list(filter(re.compile(collision_regex).match, azext_alias.cached_reserved_commands)) \
-                        and level not in collided_alias[word]:
+            for level in command_index.get_collision_levels(word, levels):
+                if level not in collided_alias[word]:
                     collided_alias[word].append(level)
 
         telemetry.set_collided_aliases(list(collided_alias.keys()))
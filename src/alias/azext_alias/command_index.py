@@ -0,0 +1,150 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+from collections import OrderedDict
+
+
+class CommandIndex(object):
+    """
+    Indexes of the reserved command names, so that alias collision and tab completion checks are lookups.
+
+    level_words maps a level of the command tree to the words at that level, and segments maps every run of
+    consecutive words in a command to the words preceding it. For the command 'storage account create':
+    {
+        1: ['storage'], 2: ['account'], 3: ['create']
+    }
+    {
+        'storage': [''], 'storage account': [''], 'storage account create': [''],
+        'account': ['storage'], 'account create': ['storage'], 'create': ['storage account']
+    }
+    suffixes holds the runs of words that end a command, and versions the versions of the CLI core
+    and of the extensions the commands came from.
+    """
+
+    def __init__(self, level_words=None, segments=None, suffixes=None, versions=None):
+        self.level_words = level_words or {}
+        self.segments = segments or {}
+        self.suffixes = suffixes or set()
+        self.versions = versions
+
+    @classmethod
+    def from_commands(cls, commands, versions=None):
+        """
+        Build the indexes from the reserved command names.
+
+        Args:
+            commands: The names of all the commands in the command table.
+            versions: The versions the command table was loaded from.
+
+        Returns:
+            A CommandIndex of the commands.
+        """
+        level_words = {}
+        segments = OrderedDict()
+        suffixes = set()
+        for command in commands:
+            words = command.lower().split()
+            for level, word in enumerate(words, 1):
+                level_words.setdefault(level, set()).add(word)
+            for start in range(len(words)):
+                parent = ' '.join(words[:start])
+                for end in range(start + 1, len(words) + 1):
+                    parents = segments.setdefault(' '.join(words[start:end]), OrderedDict())
+                    parents[parent] = None
+                suffixes.add(' '.join(words[start:]))
+        return cls(level_words, OrderedDict((segment, list(parents)) for segment, parents in segments.items()),
+                   suffixes, versions)
+
+    def get_collision_levels(self, word, levels):
+        """
+        Get the levels of the command tree at which a word is a reserved command.
+
+        Args:
+            word: The word to check.
+            levels: The number of levels to check, starting at level 1.
+
+        Returns:
+            The levels at which the word is reserved, in ascending order.
+        """
+        word = word.lower()
+        return [level for level in range(1, levels + 1) if word in self.level_words.get(level, ())]
+
+    def get_parent_commands(self, command):
+        """
+        Get the commands preceding a command wherever it appears in the command table.
+
+        Returns:
+            The parent commands, with '' if a reserved command starts with the command.
+        """
+        return self.segments.get(command.lower(), [])
+
+    def is_reserved(self, command):
+        """
+        Check if a command appears in the command table, possibly preceded by parent commands.
+        """
+        return command.lower() in self.segments
+
+    def is_suffix(self, command):
+        """
+        Check if a reserved command ends with a command.
+        """
+        return command.lower() in self.suffixes
+
+    def to_dict(self):
+        return {
+            'levels': {str(level): sorted(words) for level, words in self.level_words.items()},
+            'segments': self.segments,
+            'suffixes': sorted(self.suffixes)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({int(level): set(words) for level, words in data['levels'].items()},
+                   OrderedDict(data['segments']), set(data['suffixes']))
+
+    def save(self, path):
+        """
+        Write the versions and the indexes into a file, the versions on a line of their own
+        so that they can be checked without reading the indexes.
+        """
+        # written aside and moved in place, so a concurrent reader never sees half an index
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'w') as index_file:
+            index_file.write(json.dumps(self.versions) + '\n')
+            index_file.write(json.dumps(self.to_dict()))
+        getattr(os, 'replace', os.rename)(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read the indexes from a file.
+
+        Returns:
+            The CommandIndex in the file, or None if there is no valid index in it.
+        """
+        try:
+            with open(path, 'r') as index_file:
+                versions = json.loads(index_file.readline())
+                index = cls.from_dict(json.loads(index_file.read()))
+        except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        index.versions = versions
+        return index
+
+    @staticmethod
+    def load_versions(path):
+        """
+        Read only the versions of the indexes in a file.
+
+        Returns:
+            The versions the indexes were built from, or None if there is no index in the file.
+        """
+        try:
+            with open(path, 'r') as index_file:
+                return json.loads(index_file.readline())
+        except (IOError, OSError, ValueError):
+            return None
@@ -14,6 +14,8 @@ from azext_alias.util import (
     is_alias_command,
     cache_reserved_commands,
     get_alias_table,
+    get_command_index_versions,
+    get_reserved_command_versions,
     filter_aliases
 )
 from azext_alias._const import DEBUG_MSG_WITH_TIMING, GLOBAL_ALIAS_TAB_COMP_TABLE_PATH
@@ -36,7 +38,9 @@ def alias_event_handler(_, **kwargs):
         # [:] will keep the reference of the original args
         args[:] = alias_manager.transform(args)
 
-        if is_alias_command(['create', 'import'], args):
+        # The aliases to create are validated against the persisted command index while it is up to date
+        if is_alias_command(['create', 'import'], args) and \
+                get_command_index_versions() != get_reserved_command_versions():
             load_cmd_tbl_func = kwargs.get('load_cmd_tbl_func', lambda _: {})
             cache_reserved_commands(load_cmd_tbl_func)
 
@@ -220,6 +220,9 @@ class MockAliasManager(azext_alias.alias.AliasManager):
     def load_collided_alias(self):
         pass
 
+    def refresh_command_index(self):
+        pass
+
 
 # Inject data-driven tests into TestAlias class
 for test_type, test_cases in TEST_DATA.items():
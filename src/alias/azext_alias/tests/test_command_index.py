@@ -0,0 +1,113 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+# pylint: disable=line-too-long
+
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+
+from azext_alias.alias import AliasManager
+from azext_alias.command_index import CommandIndex
+from azext_alias.util import get_command_index, cache_reserved_commands, rebuild_command_index_in_background
+from azext_alias._const import ALIAS_COMMAND_INDEX_FILE_NAME
+from azext_alias.tests._const import TEST_RESERVED_COMMANDS
+
+TEST_VERSIONS = {'core': '2.10.0', 'extensions': {'alias': '0.5.3'}}
+
+
+class TestCommandIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_config_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.mock_config_dir, ALIAS_COMMAND_INDEX_FILE_NAME)
+        self.patchers = []
+        self.patchers.append(mock.patch('azext_alias.util.GLOBAL_ALIAS_COMMAND_INDEX_PATH', self.index_path))
+        self.patchers.append(mock.patch('azext_alias.util.GLOBAL_ALIAS_COMMAND_INDEX_LOCK_PATH', self.index_path + '.lock'))
+        self.patchers.append(mock.patch('azext_alias.util.get_reserved_command_versions', lambda: TEST_VERSIONS))
+        self.patchers.append(mock.patch('azext_alias.alias.get_reserved_command_versions', lambda: TEST_VERSIONS))
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        shutil.rmtree(self.mock_config_dir)
+
+    def test_collision_levels(self):
+        index = CommandIndex.from_commands(TEST_RESERVED_COMMANDS)
+        self.assertEqual([1, 2], index.get_collision_levels('account', 5))
+        self.assertEqual([1], index.get_collision_levels('account', 1))
+        self.assertEqual([3], index.get_collision_levels('CREATE', 5))
+        self.assertEqual([], index.get_collision_levels('list', 5))
+
+    def test_parent_commands(self):
+        index = CommandIndex.from_commands(TEST_RESERVED_COMMANDS)
+        self.assertEqual(['', 'storage'], index.get_parent_commands('account'))
+        self.assertEqual(['storage'], index.get_parent_commands('account create'))
+        self.assertEqual([], index.get_parent_commands('account show'))
+        self.assertTrue(index.is_reserved('dns'))
+        self.assertFalse(index.is_reserved('dn'))
+        self.assertTrue(index.is_suffix('account create'))
+        self.assertFalse(index.is_suffix('storage account'))
+
+    def test_save_and_load(self):
+        index = CommandIndex.from_commands(TEST_RESERVED_COMMANDS)
+        index.save(self.index_path)
+        loaded_index = CommandIndex.load(self.index_path)
+        self.assertEqual(index.level_words, loaded_index.level_words)
+        self.assertEqual(index.segments, loaded_index.segments)
+        self.assertEqual(index.suffixes, loaded_index.suffixes)
+
+    def test_load_invalid_index(self):
+        self.assertIsNone(CommandIndex.load(self.index_path))
+        with open(self.index_path, 'w') as index_file:
+            index_file.write('{"levels": ')
+        self.assertIsNone(CommandIndex.load(self.index_path))
+
+    def test_index_persisted_by_full_load(self):
+        with mock.patch('azext_alias.cached_reserved_commands', []):
+            cache_reserved_commands(lambda _: {command: None for command in TEST_RESERVED_COMMANDS})
+            self.assertTrue(get_command_index().is_reserved('storage account'))
+
+        # without the command table loaded, the persisted index is used
+        with mock.patch('azext_alias.cached_reserved_commands', []):
+            self.assertEqual(['', 'storage'], get_command_index().get_parent_commands('account'))
+            self.assertEqual(TEST_VERSIONS, get_command_index().versions)
+
+    @mock.patch('azext_alias.alias.rebuild_command_index_in_background')
+    def test_refresh_command_index(self, rebuild_in_background):
+        alias_manager = mock.Mock(alias_config_changed=True)
+
+        # the first check of an alias configuration waits for the command table
+        AliasManager.refresh_command_index(alias_manager)
+        alias_manager.load_full_command_table.assert_called_once_with()
+        rebuild_in_background.assert_not_called()
+
+        # an up to date index is used as is
+        alias_manager.reset_mock()
+        CommandIndex.from_commands(TEST_RESERVED_COMMANDS, TEST_VERSIONS).save(self.index_path)
+        AliasManager.refresh_command_index(alias_manager)
+        alias_manager.load_full_command_table.assert_not_called()
+        rebuild_in_background.assert_not_called()
+
+        # an extension was installed since the index was built
+        CommandIndex.from_commands(TEST_RESERVED_COMMANDS, {'core': '2.10.0', 'extensions': {}}).save(self.index_path)
+        AliasManager.refresh_command_index(alias_manager)
+        alias_manager.load_full_command_table.assert_not_called()
+        rebuild_in_background.assert_called_once_with()
+
+    @mock.patch('subprocess.Popen')
+    def test_one_rebuild_at_a_time(self, popen):
+        rebuild_command_index_in_background()
+        rebuild_command_index_in_background()
+        self.assertEqual(1, popen.call_count)
+        self.assertIn('rebuild_command_index()', popen.call_args[0][0][-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
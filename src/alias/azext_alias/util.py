@@ -5,6 +5,7 @@
 
 # pylint: disable=wrong-import-order,import-error,relative-import
 
+import os
 import re
 import sys
 import json
@@ -17,7 +18,18 @@ from six.moves.urllib.request import urlretrieve
 from knack.util import CLIError
 
 import azext_alias
-from azext_alias._const import COLLISION_CHECK_LEVEL_DEPTH, GLOBAL_ALIAS_TAB_COMP_TABLE_PATH, ALIAS_FILE_URL_ERROR
+from azext_alias._const import (
+    COLLISION_CHECK_LEVEL_DEPTH,
+    GLOBAL_ALIAS_TAB_COMP_TABLE_PATH,
+    GLOBAL_ALIAS_COMMAND_INDEX_PATH,
+    GLOBAL_ALIAS_COMMAND_INDEX_LOCK_PATH,
+    COMMAND_INDEX_REBUILD_TIMEOUT,
+    ALIAS_FILE_URL_ERROR
+)
+from azext_alias.command_index import CommandIndex
+
+# The index of azext_alias.cached_reserved_commands, along with the list it was built from
+_command_index = (None, None)
 
 
 def get_config_parser():
@@ -75,8 +87,112 @@ def cache_reserved_commands(load_cmd_tbl_func):
     Args:
         load_cmd_tbl_func: The function to load the entire command table.
     """
+    global _command_index  # pylint: disable=global-statement
     if not azext_alias.cached_reserved_commands:
+        versions = get_reserved_command_versions()
         azext_alias.cached_reserved_commands = list(load_cmd_tbl_func([]).keys())
+        command_index = CommandIndex.from_commands(azext_alias.cached_reserved_commands, versions)
+        _command_index = (azext_alias.cached_reserved_commands, command_index)
+        command_index.save(GLOBAL_ALIAS_COMMAND_INDEX_PATH)
+
+
+def get_reserved_command_versions():
+    """
+    Get the versions the reserved commands come from.
+
+    Returns:
+        A dictionary with the version of the CLI core and the version of each installed extension.
+    """
+    from azure.cli.core import __version__ as core_version
+    from azure.cli.core.extension import get_extensions
+
+    return {
+        'core': core_version,
+        'extensions': {extension.name: extension.version for extension in get_extensions()}
+    }
+
+
+def get_command_index_versions():
+    """
+    Get the versions the persisted command index was built from, reading only the versions line of the index file.
+
+    Returns:
+        The versions in the format of get_reserved_command_versions, or None if there is no persisted command index.
+    """
+    return CommandIndex.load_versions(GLOBAL_ALIAS_COMMAND_INDEX_PATH)
+
+
+def rebuild_command_index_in_background():
+    """
+    Rebuild the persisted command index in a detached process, so that the current command does not
+    wait for the entire command table to load. Only one rebuild runs at a time.
+    """
+    import time
+    import subprocess
+
+    try:
+        if time.time() - os.path.getmtime(GLOBAL_ALIAS_COMMAND_INDEX_LOCK_PATH) < COMMAND_INDEX_REBUILD_TIMEOUT:
+            return
+    except OSError:
+        pass
+    with open(GLOBAL_ALIAS_COMMAND_INDEX_LOCK_PATH, 'w') as lock_file:
+        lock_file.write(str(os.getpid()))
+
+    # The extension directory is not on the path of a new interpreter
+    extension_dir = os.path.dirname(os.path.dirname(os.path.abspath(azext_alias.__file__)))
+    code = 'import sys; sys.path.insert(0, {!r}); from azext_alias.util import rebuild_command_index; ' \
+           'rebuild_command_index()'.format(extension_dir)
+    kwargs = {}
+    if sys.platform == 'win32':
+        # DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP
+        kwargs['creationflags'] = 0x00000008 | 0x00000200
+    else:
+        kwargs['preexec_fn'] = os.setsid
+    with open(os.devnull, 'r+') as devnull:
+        subprocess.Popen([sys.executable, '-c', code], stdin=devnull, stdout=devnull, stderr=devnull,
+                         close_fds=True, **kwargs)
+
+
+def rebuild_command_index():
+    """
+    Load the entire command table into a new command index, then recompute the collided aliases and the
+    tab completion table against it. This is what rebuild_command_index_in_background runs.
+    """
+    from azure.cli.core import get_default_cli
+    from azext_alias.alias import AliasManager
+
+    try:
+        cli_ctx = get_default_cli()
+        commands_loader = cli_ctx.commands_loader_cls(cli_ctx=cli_ctx)
+        cache_reserved_commands(commands_loader.load_command_table)
+
+        alias_table = get_alias_table()
+        AliasManager.write_collided_alias(AliasManager.build_collision_table(alias_table.sections()))
+        build_tab_completion_table(alias_table)
+    finally:
+        try:
+            os.remove(GLOBAL_ALIAS_COMMAND_INDEX_LOCK_PATH)
+        except OSError:
+            pass
+
+
+def get_command_index():
+    """
+    Get the index of the reserved commands, built once per list of reserved commands.
+    Without a list of reserved commands loaded, the index persisted by the last full load is used.
+
+    Returns:
+        A CommandIndex of the reserved commands.
+    """
+    global _command_index  # pylint: disable=global-statement
+    reserved_commands, index = _command_index
+    if reserved_commands is not azext_alias.cached_reserved_commands or index is None:
+        if azext_alias.cached_reserved_commands:
+            index = CommandIndex.from_commands(azext_alias.cached_reserved_commands)
+        else:
+            index = CommandIndex.load(GLOBAL_ALIAS_COMMAND_INDEX_PATH) or CommandIndex()
+        _command_index = (azext_alias.cached_reserved_commands, index)
+    return index
 
 
 def remove_pos_arg_placeholders(alias_command):
@@ -134,20 +250,12 @@ def build_tab_completion_table(alias_table):
     Returns:
         The tab completion table.
     """
-    alias_commands = [t[1] for t in filter_aliases(alias_table)]
+    command_index = get_command_index()
     tab_completion_table = defaultdict(list)
-    for alias_command in alias_commands:
-        for reserved_command in azext_alias.cached_reserved_commands:
-            # Check if alias_command has no parent command
-            if reserved_command == alias_command or reserved_command.startswith(alias_command + ' ') \
-                    and '' not in tab_completion_table[alias_command]:
-                tab_completion_table[alias_command].append('')
-            elif ' {} '.format(alias_command) in reserved_command or reserved_command.endswith(' ' + alias_command):
-                # Extract parent commands
-                index = reserved_command.index(alias_command)
-                parent_command = reserved_command[:index - 1]
-                if parent_command not in tab_completion_table[alias_command]:
-                    tab_completion_table[alias_command].append(parent_command)
+    for _, alias_command in filter_aliases(alias_table):
+        for parent_command in command_index.get_parent_commands(alias_command):
+            if parent_command not in tab_completion_table[alias_command]:
+                tab_completion_table[alias_command].append(parent_command)
 
     with open(GLOBAL_ALIAS_TAB_COMP_TABLE_PATH, 'w') as f:
         f.write(json.dumps(tab_completion_table))
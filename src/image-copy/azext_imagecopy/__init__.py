@@ -55,6 +55,16 @@ class ImageCopyCommandsLoader(AzCommandsLoader):
             c.argument('export_as_snapshot', options_list=['--export-as-snapshot'], action='store_true', default=False,
                        help='Include this switch to export the copies as snapshots instead of images.')
             c.argument('tags', tags_type)
+            c.argument('retry_failed', options_list=['--retry-failed'], action='store_true', default=False,
+                       help='Include this switch to copy only to the target locations where the last copy of the '
+                       'source to the target resource group did not succeed.')
+            c.argument('reuse', options_list=['--reuse'], action='store_true', default=False,
+                       help='Include this switch to reuse what previous copies left: the locations whose target '
+                       'image or snapshot was copied from the same source image are skipped, the source and target '
+                       'snapshots copied from it and the storage accounts of the temporary resource group are used '
+                       'again. A snapshot source is always used as it is. An image is recognized by its id and the id '
+                       'and creation time of its OS disk or snapshot, but an image backed by a VHD blob only by the '
+                       'URI of the blob: do not reuse its copies after the blob is written again.')
 
 
 COMMAND_LOADER_CLS = ImageCopyCommandsLoader
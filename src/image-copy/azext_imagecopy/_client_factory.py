@@ -0,0 +1,45 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import threading
+
+from azure.cli.core.profiles import ResourceType
+
+
+class ImageCopyClients(object):
+    """ The management clients of the source and target subscriptions, created once per subscription """
+
+    def __init__(self, cli_ctx, target_subscription=None):
+        from azure.cli.core._profile import Profile
+        self.cli_ctx = cli_ctx
+        profile = Profile(cli_ctx=cli_ctx)
+        self.source_subscription_id = profile.get_subscription()['id']
+        self.target_subscription_id = profile.get_subscription(target_subscription)['id'] \
+            if target_subscription else self.source_subscription_id
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get_client(self, resource_type, subscription_id):
+        from azure.cli.core.commands.client_factory import get_mgmt_service_client
+        key = (resource_type, subscription_id or self.source_subscription_id)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = get_mgmt_service_client(self.cli_ctx, resource_type, subscription_id=key[1])
+            return self._clients[key]
+
+    def compute(self, subscription_id=None):
+        return self._get_client(ResourceType.MGMT_COMPUTE, subscription_id)
+
+    def storage(self, subscription_id=None):
+        return self._get_client(ResourceType.MGMT_STORAGE, subscription_id)
+
+    def resource(self, subscription_id=None):
+        return self._get_client(ResourceType.MGMT_RESOURCE_RESOURCES, subscription_id)
+
+    def blob_service(self, account_name, account_key):
+        from azure.cli.core.profiles import get_sdk
+        block_blob_service = get_sdk(self.cli_ctx, ResourceType.DATA_STORAGE, 'blob#BlockBlobService')
+        return block_blob_service(account_name=account_name, account_key=account_key,
+                                  endpoint_suffix=self.cli_ctx.cloud.suffixes.storage_endpoint)
@@ -18,4 +18,12 @@ helps['image copy'] = """
           text: >
             az image copy --source-resource-group mySources-rg --source-object-name myVm \\
                 --source-type vm --target-location uksouth northeurope --target-resource-group "images-repo-rg"
+        - name: Copy again an image to the regions where its last copy failed.
+          text: >
+            az image copy --source-resource-group mySources-rg --source-object-name myImage \\
+                --target-location uksouth northeurope westus --target-resource-group "images-repo-rg" --retry-failed
+        - name: Copy a golden image again to the regions where it is not up to date, reusing the temporary resources.
+          text: >
+            az image copy --source-resource-group mySources-rg --source-object-name myGoldenImage \\
+                --target-location uksouth northeurope westus --target-resource-group "images-repo-rg" --reuse
 """
@@ -3,75 +3,48 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
-import sys
-import json
-
-from subprocess import check_output, STDOUT, CalledProcessError
-from knack.util import CLIError
-
 from knack.log import get_logger
 logger = get_logger(__name__)
 
 EXTENSION_TAG_STRING = 'created_by=image-copy-extension'
+EXTENSION_TAGS = {'created_by': 'image-copy-extension'}
+# the tag of the copies with the fingerprint of their source
+FINGERPRINT_TAG = 'image_copy_source'
 
 
-# pylint: disable=inconsistent-return-statements
-def run_cli_command(cmd, return_as_json=False):
-    try:
-        cmd_output = check_output(cmd, stderr=STDOUT, universal_newlines=True)
-        logger.debug('command: %s ended with output: %s', cmd, cmd_output)
-
-        if return_as_json:
-            if cmd_output:
-                # cleanup to resolve invalid JSON in underlying azure cli  - issue #979
-                # Related to: https://github.com/Azure/azure-cli/issues/10687
-                json_start_chars = {"{", "["}
-                json_start_at = next((i for i, ch in enumerate(str(cmd_output)) if ch in json_start_chars), -1)
-                logger.debug('json output starts at position: %i ', json_start_at)
-                if json_start_at > 0:
-                    logger.debug("json output did not start at position 0, stripping the prefix.")
-                    cmd_output = str(cmd_output)[json_start_at:]
-                    logger.debug("json output after fix:")
-                    logger.debug(cmd_output)
-
-                json_output = json.loads(cmd_output)
-                return json_output
-
-            raise CLIError("Command returned an unexpected empty string.")
-        return cmd_output
-    except CalledProcessError as ex:
-        logger.error('command failed: %s', cmd)
-        logger.error('output: %s', ex.output)
-        raise ex
-    except:
-        logger.error('command ended with an error: %s', cmd)
-        raise
+def get_tags(tags=None):
+    """ the tags of the resources created, which are tagged as created by the extension """
+    result = dict(EXTENSION_TAGS)
+    result.update(tags or {})
+    return result
 
 
-def prepare_cli_command(cmd, output_as_json=True, tags=None, subscription=None):
-    full_cmd = [sys.executable, '-m', 'azure.cli'] + cmd
+def get_source_fingerprint(source_id, os_disk_id, os_disk_time_created=None):
+    """ identifies the content of an image, its os disk and the time the os disk was created when it is known """
+    import hashlib
+    import json
+    key = [source_id.lower(), os_disk_id.lower(), str(os_disk_time_created) if os_disk_time_created else None]
+    return hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
 
-    if output_as_json:
-        full_cmd += ['--output', 'json']
-    else:
-        full_cmd += ['--output', 'tsv']
 
-    # override the default subscription if needed
-    if subscription is not None:
-        full_cmd += ['--subscription', subscription]
+def has_fingerprint(resource, fingerprint):
+    return resource is not None and (resource.tags or {}).get(FINGERPRINT_TAG) == fingerprint
 
-    # tag newly created resources, containers don't have tags
-    if 'create' in cmd and ('container' not in cmd):
-        full_cmd += ['--tags', EXTENSION_TAG_STRING]
 
-        if tags is not None:
-            for k, v in tags.items():
-                if v == '':
-                    full_cmd.append(k)
-                else:
-                    full_cmd.append(k + '=' + v)
+def get_resource_or_none(getter, *args):
+    """ the resource, None if it doesn't exist """
+    from msrestazure.azure_exceptions import CloudError
+    try:
+        return getter(*args)
+    except CloudError as ex:
+        if ex.status_code == 404:
+            return None
+        raise
+
 
-    return full_cmd
+def get_enum_value(value):
+    """ the string of an enum of the SDK models, which older API versions return as a string """
+    return getattr(value, 'value', value)
 
 
 def get_storage_account_id_from_blob_path(cmd, blob_path, resource_group, subscription_id=None):
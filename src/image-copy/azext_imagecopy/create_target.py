@@ -4,12 +4,12 @@
 # --------------------------------------------------------------------------------------------
 
 import datetime
-import time
 
 from knack.util import CLIError
 from knack.log import get_logger
 
-from azext_imagecopy.cli_utils import run_cli_command, prepare_cli_command, get_storage_account_id_from_blob_path
+from azext_imagecopy.cli_utils import (get_storage_account_id_from_blob_path, get_tags, get_resource_or_none,
+                                       has_fingerprint, FINGERPRINT_TAG)
 
 logger = get_logger(__name__)
 
@@ -18,179 +18,145 @@ STORAGE_ACCOUNT_NAME_LENGTH = 24
 
 # pylint: disable=too-many-statements
 # pylint: disable=too-many-locals
-def create_target_image(cmd, location, transient_resource_group_name, source_type, source_object_name,
+def create_target_image(cmd, clients, task, location, transient_resource_group_name, source_type, source_object_name,
                         source_os_disk_snapshot_name, source_os_disk_snapshot_url, source_os_type,
-                        target_resource_group_name, azure_pool_frequency, tags, target_name, target_subscription,
-                        export_as_snapshot, timeout):
-
-    random_string = get_random_string(
-        STORAGE_ACCOUNT_NAME_LENGTH - len(location))
-
-    # create the target storage account. storage account name must be lowercase.
-    logger.warning(
-        "%s - Creating target storage account (can be slow sometimes)", location)
-    target_storage_account_name = location.lower() + random_string
-    cli_cmd = prepare_cli_command(['storage', 'account', 'create',
-                                   '--name', target_storage_account_name,
-                                   '--resource-group', transient_resource_group_name,
-                                   '--location', location,
-                                   '--sku', 'Standard_LRS'],
-                                  subscription=target_subscription)
-
-    json_output = run_cli_command(cli_cmd, return_as_json=True)
-    target_blob_endpoint = json_output['primaryEndpoints']['blob']
-
-    # Setup the target storage account
-    cli_cmd = prepare_cli_command(['storage', 'account', 'keys', 'list',
-                                   '--account-name', target_storage_account_name,
-                                   '--resource-group', transient_resource_group_name],
-                                  subscription=target_subscription)
-
-    json_output = run_cli_command(cli_cmd, return_as_json=True)
-
-    target_storage_account_key = json_output[0]['value']
-    logger.debug("storage account key: %s", target_storage_account_key)
-
-    expiry_format = "%Y-%m-%dT%H:%MZ"
-    expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=timeout)
-    logger.debug(
-        "create target storage sas using timeout seconds: %d", timeout)
-
-    cli_cmd = prepare_cli_command(['storage', 'account', 'generate-sas',
-                                   '--account-name', target_storage_account_name,
-                                   '--account-key', target_storage_account_key,
-                                   '--expiry', expiry.strftime(expiry_format),
-                                   '--permissions', 'aclrpuw', '--resource-types',
-                                   'sco', '--services', 'b', '--https-only'],
-                                  output_as_json=False,
-                                  subscription=target_subscription)
-
-    sas_token = run_cli_command(cli_cmd)
-    sas_token = sas_token.rstrip("\n\r")  # STRANGE
-    logger.debug("sas token: %s", sas_token)
-
-    # create a container in the target blob storage account
-    logger.warning(
-        "%s - Creating container in the target storage account", location)
-    target_container_name = 'snapshots'
-    cli_cmd = prepare_cli_command(['storage', 'container', 'create',
-                                   '--name', target_container_name,
-                                   '--account-name', target_storage_account_name],
-                                  subscription=target_subscription)
-
-    run_cli_command(cli_cmd)
-
-    # Copy the snapshot to the target region using the SAS URL
-    blob_name = source_os_disk_snapshot_name + '.vhd'
-    logger.warning(
-        "%s - Copying blob to target storage account", location)
-    cli_cmd = prepare_cli_command(['storage', 'blob', 'copy', 'start',
-                                   '--source-uri', source_os_disk_snapshot_url,
-                                   '--destination-blob', blob_name,
-                                   '--destination-container', target_container_name,
-                                   '--account-name', target_storage_account_name,
-                                   '--sas-token', sas_token],
-                                  subscription=target_subscription)
-
-    run_cli_command(cli_cmd)
-
-    # Wait for the copy to complete
-    start_datetime = datetime.datetime.now()
-    wait_for_blob_copy_operation(blob_name, target_container_name, target_storage_account_name,
-                                 azure_pool_frequency, location, target_subscription)
-    msg = "{0} - Copy time: {1}".format(
-        location, datetime.datetime.now() - start_datetime)
-    logger.warning(msg)
-
-    # Create the snapshot in the target region from the copied blob
-    logger.warning(
-        "%s - Creating snapshot in target region from the copied blob", location)
-    target_blob_path = target_blob_endpoint + \
-        target_container_name + '/' + blob_name
+                        target_resource_group_name, tags, target_name, export_as_snapshot,
+                        fingerprint=None, reuse=False, storage_account_name=None):
+    """
+    the pipeline of a location, reporting its stages and waiting for its blob copy through the task.
+
+    The target snapshot and image are tagged with the fingerprint of the source. With reuse, a location whose
+    target already has the fingerprint is skipped, a transient snapshot with it is used instead of copying the
+    source again, and the existing storage_account_name is used instead of a new storage account.
+    """
+    from azure.cli.core.profiles import ResourceType
+
+    subscription_id = clients.target_subscription_id
+    compute_client = clients.compute(subscription_id)
+    storage_client = clients.storage(subscription_id)
+
     target_snapshot_name = source_os_disk_snapshot_name + '-' + location
     if export_as_snapshot:
         snapshot_resource_group_name = target_resource_group_name
     else:
         snapshot_resource_group_name = transient_resource_group_name
-
-    source_storage_account_id = get_storage_account_id_from_blob_path(cmd,
-                                                                      target_blob_path,
-                                                                      transient_resource_group_name,
-                                                                      target_subscription)
-
-    cli_cmd = prepare_cli_command(['snapshot', 'create',
-                                   '--resource-group', snapshot_resource_group_name,
-                                   '--name', target_snapshot_name,
-                                   '--location', location,
-                                   '--source', target_blob_path,
-                                   '--source-storage-account-id', source_storage_account_id],
-                                  subscription=target_subscription)
-
-    json_output = run_cli_command(cli_cmd, return_as_json=True)
-    target_snapshot_id = json_output['id']
-
-    # Optionally create the final image
-    if export_as_snapshot:
-        logger.warning("%s - Skipping image creation", location)
+    if target_name is None:
+        target_image_name = source_object_name
+        if source_type != 'image':
+            target_image_name += '-image'
+        target_image_name += '-' + location
     else:
-        logger.warning("%s - Creating final image", location)
-        if target_name is None:
-            target_image_name = source_object_name
-            if source_type != 'image':
-                target_image_name += '-image'
-            target_image_name += '-' + location
+        target_image_name = target_name
+    fingerprint_tags = {FINGERPRINT_TAG: fingerprint} if fingerprint else {}
+
+    target_snapshot = None
+    if reuse and fingerprint:
+        if export_as_snapshot:
+            target = get_resource_or_none(compute_client.snapshots.get, snapshot_resource_group_name,
+                                          target_snapshot_name)
         else:
-            target_image_name = target_name
-
-        cli_cmd = prepare_cli_command(['image', 'create',
-                                       '--resource-group', target_resource_group_name,
-                                       '--name', target_image_name,
-                                       '--location', location,
-                                       '--os-type', source_os_type,
-                                       '--source', target_snapshot_id],
-                                      tags=tags,
-                                      subscription=target_subscription)
-
-        run_cli_command(cli_cmd)
-
-
-def wait_for_blob_copy_operation(blob_name, target_container_name, target_storage_account_name,
-                                 azure_pool_frequency, location, subscription):
-    copy_status = "pending"
-    prev_progress = -1
-    while copy_status == "pending":
-        cli_cmd = prepare_cli_command(['storage', 'blob', 'show',
-                                       '--name', blob_name,
-                                       '--container-name', target_container_name,
-                                       '--account-name', target_storage_account_name],
-                                      subscription=subscription)
-
-        json_output = run_cli_command(cli_cmd, return_as_json=True)
-        copy_status = json_output["properties"]["copy"]["status"]
-        copy_progress_1, copy_progress_2 = json_output["properties"]["copy"]["progress"].split(
-            "/")
-        current_progress = int(
-            int(copy_progress_1) / int(copy_progress_2) * 100)
-
-        if current_progress != prev_progress:
-            msg = "{0} - Copy progress: {1}%"\
-                .format(location, str(current_progress))
-            logger.warning(msg)
-
-        prev_progress = current_progress
-
-        try:
-            time.sleep(azure_pool_frequency)
-        except KeyboardInterrupt:
+            target = get_resource_or_none(compute_client.images.get, target_resource_group_name, target_image_name)
+        if has_fingerprint(target, fingerprint):
+            logger.warning("%s - The target is already a copy of the source, skipping", location)
+            task.skip()
             return
+        target_snapshot = get_resource_or_none(compute_client.snapshots.get, snapshot_resource_group_name,
+                                               target_snapshot_name)
+        if has_fingerprint(target_snapshot, fingerprint):
+            logger.warning("%s - Reusing the snapshot copied before", location)
+        else:
+            target_snapshot = None
+
+    if target_snapshot is None:
+        random_string = get_random_string(
+            STORAGE_ACCOUNT_NAME_LENGTH - len(location))
+
+        with task.stage('storage'):
+            if storage_account_name:
+                logger.info("%s - Reusing target storage account %s", location, storage_account_name)
+                target_storage_account_name = storage_account_name
+                storage_account = storage_client.storage_accounts.get_properties(transient_resource_group_name,
+                                                                                 target_storage_account_name)
+            else:
+                # create the target storage account. storage account name must be lowercase.
+                logger.info(
+                    "%s - Creating target storage account (can be slow sometimes)", location)
+                target_storage_account_name = location.lower() + random_string
+                StorageAccountCreateParameters, Sku = cmd.get_models('StorageAccountCreateParameters', 'Sku',
+                                                                     resource_type=ResourceType.MGMT_STORAGE)
+                storage_account = storage_client.storage_accounts.create(
+                    transient_resource_group_name, target_storage_account_name,
+                    StorageAccountCreateParameters(sku=Sku(name='Standard_LRS'), kind='StorageV2', location=location,
+                                                   tags=get_tags())).result()
+            target_blob_endpoint = storage_account.primary_endpoints.blob
+
+            # Setup the target storage account
+            keys = storage_client.storage_accounts.list_keys(transient_resource_group_name,
+                                                             target_storage_account_name).keys
+            blob_service = clients.blob_service(target_storage_account_name, keys[0].value)
+
+            # create a container in the target blob storage account
+            logger.info(
+                "%s - Creating container in the target storage account", location)
+            target_container_name = 'snapshots'
+            blob_service.create_container(target_container_name)
+
+        with task.stage('copy'):
+            # Copy the snapshot to the target region using the SAS URL
+            blob_name = source_os_disk_snapshot_name + '.vhd'
+            logger.info(
+                "%s - Copying blob to target storage account", location)
+            blob_service.copy_blob(target_container_name, blob_name, source_os_disk_snapshot_url)
+
+            # Wait for the copy to complete
+            start_datetime = datetime.datetime.now()
+            copy = task.wait_for_copy(blob_service, target_container_name, blob_name)
+            if copy.status != 'success':
+                logger.error(
+                    "%s - The copy operation didn't succeed. Last status: %s", location, copy.status)
+                logger.error("Status description: %s", copy.status_description)
+                raise CLIError('Blob copy failed')
+            msg = "{0} - Copy time: {1}".format(
+                location, datetime.datetime.now() - start_datetime)
+            logger.info(msg)
+
+        # Create the snapshot in the target region from the copied blob
+        logger.info(
+            "%s - Creating snapshot in target region from the copied blob", location)
+        target_blob_path = target_blob_endpoint + \
+            target_container_name + '/' + blob_name
+
+        source_storage_account_id = get_storage_account_id_from_blob_path(cmd,
+                                                                          target_blob_path,
+                                                                          transient_resource_group_name,
+                                                                          subscription_id)
+
+        Snapshot, CreationData = cmd.get_models('Snapshot', 'CreationData', resource_type=ResourceType.MGMT_COMPUTE)
+        with task.stage('snapshot'):
+            target_snapshot = compute_client.snapshots.create_or_update(
+                snapshot_resource_group_name, target_snapshot_name,
+                Snapshot(location=location, tags=get_tags(fingerprint_tags),
+                         creation_data=CreationData(create_option='Import', source_uri=target_blob_path,
+                                                    storage_account_id=source_storage_account_id))).result()
+    target_snapshot_id = target_snapshot.id
 
-    if copy_status != 'success':
-        logger.error(
-            "The copy operation didn't succeed. Last status: %s", copy_status)
-        logger.error("Command run: %s", cli_cmd)
-        logger.error("Command output: %s", json_output)
-
-        raise CLIError('Blob copy failed')
+    # Optionally create the final image
+    if export_as_snapshot:
+        logger.info("%s - Skipping image creation", location)
+    else:
+        logger.info("%s - Creating final image", location)
+        image_tags = dict(tags or {})
+        image_tags.update(fingerprint_tags)
+
+        Image, ImageStorageProfile, ImageOSDisk, SubResource = cmd.get_models(
+            'Image', 'ImageStorageProfile', 'ImageOSDisk', 'SubResource', resource_type=ResourceType.MGMT_COMPUTE)
+        with task.stage('image'):
+            compute_client.images.create_or_update(
+                target_resource_group_name, target_image_name,
+                Image(location=location, tags=get_tags(image_tags),
+                      storage_profile=ImageStorageProfile(
+                          os_disk=ImageOSDisk(os_type=source_os_type, os_state='Generalized',
+                                              snapshot=SubResource(id=target_snapshot_id))))).result()
 
 
 def get_random_string(length):
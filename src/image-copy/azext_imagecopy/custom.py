@@ -3,13 +3,15 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
-from multiprocessing import Pool
-
 from knack.util import CLIError
 from knack.log import get_logger
 
-from azext_imagecopy.cli_utils import run_cli_command, prepare_cli_command, get_storage_account_id_from_blob_path
+from azext_imagecopy._client_factory import ImageCopyClients
+from azext_imagecopy.cli_utils import (get_storage_account_id_from_blob_path, get_tags, get_enum_value,
+                                       get_source_fingerprint, get_resource_or_none, has_fingerprint,
+                                       EXTENSION_TAGS, FINGERPRINT_TAG)
 from azext_imagecopy.create_target import create_target_image
+from azext_imagecopy.scheduler import CopyScheduler, CopyState
 
 logger = get_logger(__name__)
 
@@ -20,87 +22,107 @@ logger = get_logger(__name__)
 def imagecopy(cmd, source_resource_group_name, source_object_name, target_location,
               target_resource_group_name, temporary_resource_group_name='image-copy-rg',
               source_type='image', cleanup=False, parallel_degree=-1, tags=None, target_name=None,
-              target_subscription=None, export_as_snapshot='false', timeout=3600):
+              target_subscription=None, export_as_snapshot='false', timeout=3600, retry_failed=False,
+              reuse=False):
+    from azure.cli.core.profiles import ResourceType
+
+    clients = ImageCopyClients(cmd.cli_ctx, target_subscription)
+    compute_client = clients.compute()
+
+    target_location = [location.strip() for location in target_location]
+    state = CopyState([clients.source_subscription_id, source_resource_group_name, source_object_name,
+                       clients.target_subscription_id, target_resource_group_name])
+    if retry_failed:
+        if state.locations is None:
+            raise CLIError('No previous copy of {} to {} to retry'.format(
+                source_object_name, target_resource_group_name))
+        target_location = state.failed_locations(target_location)
+        if not target_location:
+            logger.warning("The copy succeeded in every location, nothing to retry")
+            return [state.locations[location] for location in sorted(state.locations)]
+        logger.warning("Retrying the copy to: %s", ', '.join(target_location))
+
     if cleanup:
         # If --cleanup is set, forbid using an existing temporary resource group name.
         # It is dangerous to clean up an existing resource group.
-        cli_cmd = prepare_cli_command(['group', 'exists', '-n', temporary_resource_group_name],
-                                      output_as_json=False)
-        cmd_output = run_cli_command(cli_cmd)
-        if 'true' in cmd_output:
+        if clients.resource(clients.target_subscription_id).resource_groups.check_existence(
+                temporary_resource_group_name):
             raise CLIError('Don\'t specify an existing resource group in --temporary-resource-group-name '
                            'when --cleanup is set')
 
     # get the os disk id from source vm/image
     logger.warning("Getting OS disk ID of the source VM/image")
-    cli_cmd = prepare_cli_command([source_type, 'show',
-                                   '--name', source_object_name,
-                                   '--resource-group', source_resource_group_name])
-
-    json_cmd_output = run_cli_command(cli_cmd, return_as_json=True)
+    if source_type == 'vm':
+        source = compute_client.virtual_machines.get(source_resource_group_name, source_object_name)
+    else:
+        source = compute_client.images.get(source_resource_group_name, source_object_name)
 
-    if json_cmd_output['storageProfile']['dataDisks']:
+    if source.storage_profile.data_disks:
         logger.warning(
             "Data disks in the source detected, but are ignored by this extension!")
 
-    source_os_disk_id = None
-    source_os_disk_type = None
-
-    try:
-        source_os_disk_id = json_cmd_output['storageProfile']['osDisk']['managedDisk']['id']
-        if source_os_disk_id is None:
-            raise TypeError
-        source_os_disk_type = "DISK"
-        logger.debug("found %s: %s", source_os_disk_type, source_os_disk_id)
-    except TypeError:
-        try:
-            source_os_disk_id = json_cmd_output['storageProfile']['osDisk']['blobUri']
-            if source_os_disk_id is None:
-                raise TypeError
-            source_os_disk_type = "BLOB"
-            logger.debug("found %s: %s", source_os_disk_type,
-                         source_os_disk_id)
-        except TypeError:
-            try:  # images created by e.g. image-copy extension
-                source_os_disk_id = json_cmd_output['storageProfile']['osDisk']['snapshot']['id']
-                if source_os_disk_id is None:
-                    raise TypeError
-                source_os_disk_type = "SNAPSHOT"
-                logger.debug("found %s: %s", source_os_disk_type,
-                             source_os_disk_id)
-            except TypeError:
-                pass
+    source_os_disk = source.storage_profile.os_disk
+    source_os_disk_id, source_os_disk_type = get_os_disk_source(source_os_disk)
 
     if source_os_disk_type is None or source_os_disk_id is None:
         logger.error(
             'Unable to locate a supported OS disk type in the provided source object')
         raise CLIError('Invalid OS Disk Source Type')
 
-    source_os_type = json_cmd_output['storageProfile']['osDisk']['osType']
+    source_os_type = get_enum_value(source_os_disk.os_type)
     logger.debug("source_os_disk_type: %s. source_os_disk_id: %s. source_os_type: %s",
                  source_os_disk_type, source_os_disk_id, source_os_type)
 
-    # create source snapshots
-    # TODO: skip creating another snapshot when the source is a snapshot
-    logger.warning("Creating source snapshot")
-    source_os_disk_snapshot_name = source_object_name + '_os_disk_snapshot'
-
-    if source_os_disk_type == "BLOB":
-        source_storage_account_id = get_storage_account_id_from_blob_path(cmd,
-                                                                          source_os_disk_id,
-                                                                          source_resource_group_name)
-        cli_cmd = prepare_cli_command(['snapshot', 'create',
-                                       '--name', source_os_disk_snapshot_name,
-                                       '--resource-group', source_resource_group_name,
-                                       '--source', source_os_disk_id,
-                                       '--source-storage-account-id', source_storage_account_id])
+    source_snapshot_resource_group_name = source_resource_group_name
+    source_snapshot_client = compute_client
+    # the content of an image doesn't change, while the disk of a vm does
+    fingerprint = None
+    if source_os_disk_type == "SNAPSHOT":
+        # the snapshot is copied as it is
+        from msrestazure.tools import parse_resource_id
+        snapshot_id = parse_resource_id(source_os_disk_id)
+        source_snapshot_resource_group_name = snapshot_id['resource_group']
+        source_os_disk_snapshot_name = snapshot_id['name']
+        source_snapshot_client = clients.compute(snapshot_id['subscription'])
+        logger.warning("Using the source snapshot %s", source_os_disk_snapshot_name)
+        source_snapshot = source_snapshot_client.snapshots.get(source_snapshot_resource_group_name,
+                                                               source_os_disk_snapshot_name)
+        if source_type == 'image':
+            fingerprint = get_source_fingerprint(source.id, source_os_disk_id, source_snapshot.time_created)
     else:
-        cli_cmd = prepare_cli_command(['snapshot', 'create',
-                                       '--name', source_os_disk_snapshot_name,
-                                       '--resource-group', source_resource_group_name,
-                                       '--source', source_os_disk_id])
+        source_os_disk_snapshot_name = source_object_name + '_os_disk_snapshot'
+        if source_type == 'image' and source_os_disk_type == "DISK":
+            # a disk created again under the same name has another creation time
+            from msrestazure.tools import parse_resource_id
+            disk_id = parse_resource_id(source_os_disk_id)
+            source_disk = clients.compute(disk_id['subscription']).disks.get(disk_id['resource_group'],
+                                                                             disk_id['name'])
+            fingerprint = get_source_fingerprint(source.id, source_os_disk_id, source_disk.time_created)
+        elif source_type == 'image':
+            # nothing tells a blob written again apart, see the help of --reuse
+            fingerprint = get_source_fingerprint(source.id, source_os_disk_id)
+        source_snapshot = get_resource_or_none(compute_client.snapshots.get, source_resource_group_name,
+                                               source_os_disk_snapshot_name) if reuse and fingerprint else None
+        if has_fingerprint(source_snapshot, fingerprint):
+            logger.warning("Reusing the source snapshot %s", source_os_disk_snapshot_name)
+        else:
+            # create source snapshots
+            logger.warning("Creating source snapshot")
+            Snapshot, CreationData = cmd.get_models('Snapshot', 'CreationData',
+                                                    resource_type=ResourceType.MGMT_COMPUTE)
+            if source_os_disk_type == "BLOB":
+                source_storage_account_id = get_storage_account_id_from_blob_path(cmd,
+                                                                                  source_os_disk_id,
+                                                                                  source_resource_group_name)
+                creation_data = CreationData(create_option='Import', source_uri=source_os_disk_id,
+                                             storage_account_id=source_storage_account_id)
+            else:
+                creation_data = CreationData(create_option='Copy', source_resource_id=source_os_disk_id)
 
-    run_cli_command(cli_cmd)
+            snapshot_tags = {FINGERPRINT_TAG: fingerprint} if fingerprint else None
+            compute_client.snapshots.create_or_update(
+                source_resource_group_name, source_os_disk_snapshot_name,
+                Snapshot(location=source.location, tags=get_tags(snapshot_tags), creation_data=creation_data)).result()
 
     # Get SAS URL for the snapshotName
     logger.warning(
@@ -109,14 +131,10 @@ def imagecopy(cmd, source_resource_group_name, source_object_name, target_locati
         logger.error("Timeout should be greater than 3600 seconds")
         raise CLIError('Invalid Timeout')
 
-    cli_cmd = prepare_cli_command(['snapshot', 'grant-access',
-                                   '--name', source_os_disk_snapshot_name,
-                                   '--resource-group', source_resource_group_name,
-                                   '--duration-in-seconds', str(timeout)])
-
-    json_output = run_cli_command(cli_cmd, return_as_json=True)
+    access = source_snapshot_client.snapshots.grant_access(source_snapshot_resource_group_name,
+                                                           source_os_disk_snapshot_name, 'Read', timeout).result()
 
-    source_os_disk_snapshot_url = json_output['accessSas']
+    source_os_disk_snapshot_url = access.access_sas
     logger.debug("source os disk snapshot url: %s",
                  source_os_disk_snapshot_url)
 
@@ -124,107 +142,117 @@ def imagecopy(cmd, source_resource_group_name, source_object_name, target_locati
 
     transient_resource_group_name = temporary_resource_group_name
     # pick the first location for the temp group
-    transient_resource_group_location = target_location[0].strip()
-    create_resource_group(transient_resource_group_name,
-                          transient_resource_group_location,
-                          target_subscription)
+    transient_resource_group_location = target_location[0]
+    create_resource_group(clients,
+                          transient_resource_group_name,
+                          transient_resource_group_location)
 
     target_locations_count = len(target_location)
     logger.warning("Target location count: %s", target_locations_count)
 
-    create_resource_group(target_resource_group_name,
-                          target_location[0].strip(),
-                          target_subscription)
-
-    try:
-
-        # try to get a handle on arm's 409s
-        azure_pool_frequency = 5
-        if target_locations_count >= 5:
-            azure_pool_frequency = 15
-        elif target_locations_count >= 3:
-            azure_pool_frequency = 10
-
-        if (target_locations_count == 1) or (parallel_degree == 1):
-            # Going to copy to targets one-by-one
-            logger.debug("Starting sync process for all locations")
-            for location in target_location:
-                location = location.strip()
-                create_target_image(cmd, location, transient_resource_group_name, source_type,
-                                    source_object_name, source_os_disk_snapshot_name, source_os_disk_snapshot_url,
-                                    source_os_type, target_resource_group_name, azure_pool_frequency,
-                                    tags, target_name, target_subscription, export_as_snapshot, timeout)
-        else:
-            if parallel_degree == -1:
-                pool = Pool(target_locations_count)
-            else:
-                pool = Pool(min(parallel_degree, target_locations_count))
+    create_resource_group(clients,
+                          target_resource_group_name,
+                          target_location[0])
 
-            tasks = []
-            for location in target_location:
-                location = location.strip()
-                tasks.append((location, transient_resource_group_name, source_type,
-                              source_object_name, source_os_disk_snapshot_name, source_os_disk_snapshot_url,
-                              source_os_type, target_resource_group_name, azure_pool_frequency,
-                              tags, target_name, target_subscription, export_as_snapshot, timeout))
+    storage_accounts = find_storage_accounts(clients, transient_resource_group_name) if reuse else {}
 
-            logger.warning("Starting async process for all locations")
+    # the initial interval of the polls of the blob copies
+    azure_pool_frequency = 5
+    if target_locations_count >= 5:
+        azure_pool_frequency = 15
+    elif target_locations_count >= 3:
+        azure_pool_frequency = 10
 
-            for task in tasks:
-                pool.apply_async(create_target_image, task)
+    # all the locations are copied by one process, sharing the clients and their connections
+    scheduler = CopyScheduler(target_location,
+                              max_parallel=None if parallel_degree == -1 else parallel_degree,
+                              poll_interval=azure_pool_frequency)
 
-            pool.close()
-            pool.join()
+    def _copy_to_location(task, location):
+        create_target_image(cmd, clients, task, location, transient_resource_group_name, source_type,
+                            source_object_name, source_os_disk_snapshot_name, source_os_disk_snapshot_url,
+                            source_os_type, target_resource_group_name, tags, target_name, export_as_snapshot,
+                            fingerprint=fingerprint, reuse=reuse,
+                            storage_account_name=storage_accounts.get(normalize_location(location)))
 
+    try:
+        logger.warning("Starting the copy to all locations")
+        results = scheduler.run(_copy_to_location)
     except KeyboardInterrupt:
         logger.warning('User cancelled the operation')
         if cleanup:
             logger.warning('To cleanup temporary resources look for ones tagged with "image-copy-extension". \n'
                            'You can use the following command: az resource list --tag created_by=image-copy-extension')
-        pool.terminate()
-        return
+        return None
+    finally:
+        state.save(scheduler.results)
 
     # Cleanup
     if cleanup:
         logger.warning('Deleting transient resources')
 
         # Delete resource group
-        cli_cmd = prepare_cli_command(['group', 'delete', '--no-wait', '--yes',
-                                       '--name', transient_resource_group_name],
-                                      subscription=target_subscription)
-        run_cli_command(cli_cmd)
+        clients.resource(clients.target_subscription_id).resource_groups.delete(transient_resource_group_name)
 
         # Revoke sas for source snapshot
-        cli_cmd = prepare_cli_command(['snapshot', 'revoke-access',
-                                       '--name', source_os_disk_snapshot_name,
-                                       '--resource-group', source_resource_group_name])
-        run_cli_command(cli_cmd)
-
-        # Delete source snapshot
-        # TODO: skip this if source is snapshot and not creating a new one
-        cli_cmd = prepare_cli_command(['snapshot', 'delete',
-                                       '--name', source_os_disk_snapshot_name,
-                                       '--resource-group', source_resource_group_name])
-        run_cli_command(cli_cmd)
-
-
-def create_resource_group(resource_group_name, location, subscription=None):
+        source_snapshot_client.snapshots.revoke_access(source_snapshot_resource_group_name,
+                                                       source_os_disk_snapshot_name).result()
+
+        # Delete source snapshot, unless it is the source
+        if source_os_disk_type != "SNAPSHOT":
+            compute_client.snapshots.delete(source_resource_group_name, source_os_disk_snapshot_name).result()
+
+    failed = scheduler.failed
+    if failed:
+        for result in failed:
+            logger.error("%s - the copy failed in stage %s: %s", result.location, result.stage, result.error)
+        raise CLIError('The copy failed in {} of {} locations: {}. Run the command again with --retry-failed to '
+                       'copy only to these locations.'.format(
+                           len(failed), len(results), ' '.join(result.location for result in failed)))
+    return [result.to_dict() for result in results]
+
+
+def get_os_disk_source(os_disk):
+    """ the id and the type of the managed disk, blob or snapshot of the os disk of an image or a vm """
+    managed_disk = getattr(os_disk, 'managed_disk', None)
+    if managed_disk is not None and managed_disk.id:
+        logger.debug("found %s: %s", "DISK", managed_disk.id)
+        return managed_disk.id, "DISK"
+    blob_uri = getattr(os_disk, 'blob_uri', None)
+    if blob_uri:
+        logger.debug("found %s: %s", "BLOB", blob_uri)
+        return blob_uri, "BLOB"
+    # images created by e.g. image-copy extension
+    snapshot = getattr(os_disk, 'snapshot', None)
+    if snapshot is not None and snapshot.id:
+        logger.debug("found %s: %s", "SNAPSHOT", snapshot.id)
+        return snapshot.id, "SNAPSHOT"
+    return None, None
+
+
+def normalize_location(location):
+    return location.lower().replace(' ', '')
+
+
+def find_storage_accounts(clients, resource_group_name):
+    """ the storage accounts created by the extension in the resource group, by location """
+    storage_client = clients.storage(clients.target_subscription_id)
+    storage_accounts = {}
+    for storage_account in storage_client.storage_accounts.list_by_resource_group(resource_group_name):
+        tags = storage_account.tags or {}
+        if all(tags.get(key) == value for key, value in EXTENSION_TAGS.items()) and \
+                get_enum_value(storage_account.provisioning_state) == 'Succeeded':
+            storage_accounts.setdefault(normalize_location(storage_account.location), storage_account.name)
+    return storage_accounts
+
+
+def create_resource_group(clients, resource_group_name, location):
     # check if target resource group exists
-    cli_cmd = prepare_cli_command(['group', 'exists',
-                                   '--name', resource_group_name],
-                                  output_as_json=False,
-                                  subscription=subscription)
-
-    cmd_output = run_cli_command(cli_cmd)
-
-    if 'true' in cmd_output:
+    resource_client = clients.resource(clients.target_subscription_id)
+    if resource_client.resource_groups.check_existence(resource_group_name):
         return
 
     # create the target resource group
     logger.warning("Creating resource group: %s", resource_group_name)
-    cli_cmd = prepare_cli_command(['group', 'create',
-                                   '--name', resource_group_name,
-                                   '--location', location],
-                                  subscription=subscription)
-
-    run_cli_command(cli_cmd)
+    resource_client.resource_groups.create_or_update(resource_group_name,
+                                                     {'location': location, 'tags': get_tags()})
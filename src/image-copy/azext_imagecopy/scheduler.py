@@ -0,0 +1,267 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+Runs the copy to every target location as a task of one process. The stages writing to ARM are limited to a few
+locations at a time, the blob copies in flight are polled together by a single loop, and the progress of every
+location is shown in one table.
+"""
+
+import os
+import json
+import time
+import hashlib
+import datetime
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+# the locations in each stage at a time, to stay under the ARM write limits (409/429)
+STAGE_LIMITS = {'storage': 3, 'snapshot': 3, 'image': 3}
+MIN_POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 60
+# the progress table is shown at most this often, unless a location ends
+TABLE_INTERVAL = 30
+STATE_DIR_NAME = 'image-copy'
+
+PENDING = 'Pending'
+RUNNING = 'Running'
+SUCCEEDED = 'Succeeded'
+SKIPPED = 'Skipped'
+FAILED = 'Failed'
+
+
+class RegionResult(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, location):
+        self.location = location
+        self.status = PENDING
+        self.stage = None
+        self.progress = None
+        self.error = None
+        self.started = None
+        self.ended = None
+
+    def elapsed(self):
+        if self.started is None:
+            return None
+        return datetime.timedelta(seconds=int((self.ended or time.time()) - self.started))
+
+    def to_dict(self):
+        elapsed = self.elapsed()
+        return {'location': self.location, 'status': self.status, 'stage': self.stage,
+                'error': str(self.error) if self.error else None,
+                'elapsed': str(elapsed) if elapsed is not None else None}
+
+
+class BlobCopyPoller(object):
+    """
+    Polls the blob copies in flight in a single loop. The loop polls every MIN_POLL_INTERVAL seconds while the copies
+    progress, and backs off up to MAX_POLL_INTERVAL while none of them does. A new copy is polled at once.
+    """
+
+    def __init__(self, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._copies = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+
+    def wait(self, blob_service, container_name, blob_name, progress_callback=None):
+        """ waits until the copy to the blob ends, returns its copy properties """
+        entry = {'blob_service': blob_service, 'container_name': container_name, 'blob_name': blob_name,
+                 'progress_callback': progress_callback, 'progress': None, 'copy': None, 'error': None,
+                 'done': threading.Event()}
+        with self._lock:
+            self._copies.append(entry)
+            self._wakeup.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='image-copy-poller')
+                self._thread.daemon = True
+                self._thread.start()
+        entry['done'].wait()
+        if entry['error']:
+            raise entry['error']
+        return entry['copy']
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _poll(self, entry):
+        """ polls a copy, returns whether it progressed """
+        try:
+            properties = entry['blob_service'].get_blob_properties(entry['container_name'], entry['blob_name'])
+            copy = properties.properties.copy
+        except Exception as ex:  # pylint: disable=broad-except
+            entry['error'] = ex
+            entry['done'].set()
+            return True
+        copied, total = copy.progress.split('/') if copy.progress else (0, 0)
+        progress = int(int(copied) * 100 / int(total)) if int(total) else 0
+        progressed = progress != entry['progress']
+        entry['progress'] = progress
+        if entry['progress_callback']:
+            entry['progress_callback'](progress)
+        if copy.status != 'pending':
+            entry['copy'] = copy
+            entry['done'].set()
+            return True
+        return progressed
+
+    def _run(self):
+        interval = self.min_interval
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            with self._lock:
+                copies = [entry for entry in self._copies if not entry['done'].is_set()]
+                self._copies = copies
+                if not copies:
+                    self._thread = None
+                    return
+            progressed = [self._poll(entry) for entry in copies]
+            interval = self.min_interval if any(progressed) else min(interval * 2, self.max_interval)
+            self._wakeup.wait(interval)
+
+
+class RegionTask(object):
+    """ what the pipeline of a location reports to the scheduler """
+
+    def __init__(self, scheduler, result):
+        self.scheduler = scheduler
+        self.result = result
+        self.skipped = False
+
+    def skip(self):
+        """ the location already has a copy of the source """
+        self.skipped = True
+
+    @contextmanager
+    def stage(self, name):
+        self.result.stage = name
+        self.result.progress = None
+        semaphore = self.scheduler.stage_semaphores.get(name)
+        if semaphore:
+            semaphore.acquire()
+        try:
+            self.scheduler.render()
+            yield
+        finally:
+            if semaphore:
+                semaphore.release()
+
+    def wait_for_copy(self, blob_service, container_name, blob_name):
+        def _progress(progress):
+            self.result.progress = progress
+            self.scheduler.render()
+        return self.scheduler.poller.wait(blob_service, container_name, blob_name, _progress)
+
+
+class CopyScheduler(object):
+    """
+    Runs pipeline(task, location) for every location, at most max_parallel at a time, and collects the
+    results of the locations instead of stopping at the first error.
+    """
+
+    def __init__(self, locations, max_parallel=None, poll_interval=MIN_POLL_INTERVAL, stage_limits=None):
+        self.results = [RegionResult(location) for location in locations]
+        self.max_parallel = max_parallel or len(locations)
+        self.poller = BlobCopyPoller(min_interval=poll_interval)
+        self.stage_semaphores = {stage: threading.BoundedSemaphore(limit)
+                                 for stage, limit in (stage_limits or STAGE_LIMITS).items()}
+        self._render_lock = threading.Lock()
+        self._last_table = None
+        self._last_render = 0
+
+    def _run_region(self, pipeline, result):
+        result.status = RUNNING
+        result.started = time.time()
+        try:
+            task = RegionTask(self, result)
+            pipeline(task, result.location)
+            result.status = SKIPPED if task.skipped else SUCCEEDED
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.debug("%s - copy failed", result.location, exc_info=True)
+            result.status = FAILED
+            result.error = ex
+        finally:
+            result.ended = time.time()
+            self.render(force=True)
+
+    def run(self, pipeline):
+        executor = ThreadPoolExecutor(max_workers=self.max_parallel)
+        futures = [executor.submit(self._run_region, pipeline, result) for result in self.results]
+        try:
+            for future in futures:
+                future.result()
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            self.poller.stop()
+            executor.shutdown(wait=False)
+            raise
+        executor.shutdown()
+        return self.results
+
+    @property
+    def failed(self):
+        return [result for result in self.results if result.status == FAILED]
+
+    def format_table(self):
+        rows = [('Location', 'Status', 'Stage', 'Progress', 'Elapsed')]
+        for result in self.results:
+            elapsed = result.elapsed()
+            rows.append((result.location, result.status, result.stage or '',
+                         '{}%'.format(result.progress) if result.progress is not None else '',
+                         str(elapsed) if elapsed is not None else ''))
+        widths = [max(len(row[index]) for row in rows) for index in range(len(rows[0]))]
+        return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+    def render(self, force=False):
+        """ shows the progress table when it changed, at most every TABLE_INTERVAL seconds unless forced """
+        with self._render_lock:
+            table = self.format_table()
+            key = [(r.status, r.stage, r.progress) for r in self.results]
+            if key == self._last_table or (not force and time.time() - self._last_render < TABLE_INTERVAL):
+                return
+            self._last_table = key
+            self._last_render = time.time()
+            logger.warning('\n%s', table)
+
+
+class CopyState(object):
+    """ the status of every location of the last copy of a source to a target resource group """
+
+    def __init__(self, key, state_dir=None):
+        if state_dir is None:
+            from azure.cli.core._environment import get_config_dir
+            state_dir = os.path.join(get_config_dir(), STATE_DIR_NAME)
+        name = hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+        self.path = os.path.join(state_dir, name + '.json')
+        try:
+            with open(self.path, 'r') as f:
+                self.locations = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.locations = None
+
+    def failed_locations(self, locations):
+        """ the locations which didn't succeed in the last copy """
+        return [location for location in locations
+                if (self.locations or {}).get(location, {}).get('status') not in (SUCCEEDED, SKIPPED)]
+
+    def save(self, results):
+        self.locations = dict(self.locations or {})
+        self.locations.update((result.location, result.to_dict()) for result in results)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w') as f:
+                json.dump(self.locations, f)
+        except (IOError, OSError) as ex:
+            logger.debug("Failed to save the copy state: %s", ex)
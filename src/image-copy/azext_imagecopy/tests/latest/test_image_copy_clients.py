@@ -0,0 +1,220 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from knack.util import CLIError
+from msrestazure.azure_exceptions import CloudError
+
+from azext_imagecopy.custom import imagecopy
+from azext_imagecopy.scheduler import CopyState
+
+
+def _not_found(*args):
+    error = CloudError.__new__(CloudError)
+    error.status_code = 404
+    raise error
+
+
+class ImageCopyClientsStub(object):
+    """ management clients answering like the service, keeping the snapshots and images created """
+
+    source_subscription_id = 'source-subscription'
+    target_subscription_id = 'target-subscription'
+
+    def __init__(self, copy_status='success'):
+        self.created = []
+        self.resources = {}
+        self.compute_client = mock.MagicMock()
+        image = self.source_image = mock.MagicMock()
+        image.id = '/subscriptions/source-subscription/resourceGroups/source-rg/images/golden'
+        image.location = 'westus'
+        image.storage_profile.data_disks = []
+        image.storage_profile.os_disk.managed_disk.id = '/subscriptions/source-subscription/resourceGroups/' \
+                                                        'disks-rg/providers/Microsoft.Compute/disks/osdisk'
+        image.storage_profile.os_disk.os_type = 'Linux'
+        self.compute_client.snapshots.grant_access.return_value.result.return_value.access_sas = 'https://src/sas'
+        self.compute_client.snapshots.create_or_update.side_effect = self._create('snapshots')
+        self.compute_client.snapshots.get.side_effect = self._get('snapshots')
+        self.compute_client.disks.get.side_effect = lambda resource_group, name: self.os_disk
+        self.os_disk = SimpleNamespace(time_created='2020-08-01T00:00:00Z')
+        self.compute_client.images.create_or_update.side_effect = self._create('images')
+        self.compute_client.images.get.side_effect = lambda resource_group, name: \
+            self.source_image if resource_group == 'source-rg' else self._get('images')(resource_group, name)
+
+        self.storage_client = mock.MagicMock()
+        self.storage_client.storage_accounts.create.side_effect = lambda resource_group, name, parameters: \
+            mock.MagicMock(**{'result.return_value.primary_endpoints.blob': 'https://{}.blob/'.format(name)})
+        self.storage_client.storage_accounts.list_keys.return_value.keys = [SimpleNamespace(value='key')]
+
+        self.resource_client = mock.MagicMock()
+        self.resource_client.resource_groups.check_existence.return_value = False
+
+        self.blob_services = []
+        self.copy_status = copy_status
+
+    def _create(self, kind):
+        def _create_or_update(resource_group, name, resource):
+            self.resources[(kind, resource_group, name)] = SimpleNamespace(id=name, tags=resource.tags)
+            return mock.MagicMock(**{'result.return_value.id': name})
+        return _create_or_update
+
+    def _get(self, kind):
+        return lambda resource_group, name: self.resources.get((kind, resource_group, name)) or _not_found()
+
+    def compute(self, subscription_id=None):
+        self.created.append(('compute', subscription_id))
+        return self.compute_client
+
+    def storage(self, subscription_id=None):
+        self.created.append(('storage', subscription_id))
+        return self.storage_client
+
+    def resource(self, subscription_id=None):
+        self.created.append(('resource', subscription_id))
+        return self.resource_client
+
+    def blob_service(self, account_name, account_key):
+        blob_service = mock.MagicMock(account_name=account_name)
+        blob_service.get_blob_properties.return_value.properties.copy = SimpleNamespace(
+            status=self.copy_status, progress='512/512', status_description=None)
+        self.blob_services.append(blob_service)
+        return blob_service
+
+
+class TestImageCopyClients(unittest.TestCase):
+    def setUp(self):
+        self.cmd = mock.MagicMock()
+        self.cmd.get_models.side_effect = lambda *names, **kwargs: [SimpleNamespace] * len(names)
+        self.state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_dir, ignore_errors=True)
+        patches = [mock.patch('azext_imagecopy.custom.CopyState',
+                              side_effect=lambda key: CopyState(key, state_dir=self.state_dir)),
+                   mock.patch('subprocess.Popen', side_effect=AssertionError('no process is started')),
+                   mock.patch('subprocess.check_output', side_effect=AssertionError('no process is started'))]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def copy(self, clients, locations, **kwargs):
+        with mock.patch('azext_imagecopy.custom.ImageCopyClients', return_value=clients):
+            return imagecopy(self.cmd, 'source-rg', 'golden', locations, 'target-rg', export_as_snapshot=False, **kwargs)
+
+    def test_copy_to_several_locations(self):
+        clients = ImageCopyClientsStub()
+
+        results = self.copy(clients, ['eastus', 'westeurope', 'japaneast'], tags={'team': 'infra'}, cleanup=True)
+
+        self.assertEqual([(result['location'], result['status']) for result in results],
+                         [('eastus', 'Succeeded'), ('westeurope', 'Succeeded'), ('japaneast', 'Succeeded')])
+
+        images = clients.compute_client.images.create_or_update.call_args_list
+        self.assertEqual(sorted(call[0][1] for call in images),
+                         ['golden-eastus', 'golden-japaneast', 'golden-westeurope'])
+        image = images[0][0][2]
+        self.assertEqual(image.tags['created_by'], 'image-copy-extension')
+        self.assertEqual(image.tags['team'], 'infra')
+        # the fingerprint of the source image
+        self.assertEqual(len(image.tags['image_copy_source']), 40)
+        self.assertEqual(image.storage_profile.os_disk.snapshot.id,
+                         'golden_os_disk_snapshot-' + image.location)
+        for blob_service in clients.blob_services:
+            blob_service.copy_blob.assert_called_once_with('snapshots', 'golden_os_disk_snapshot.vhd',
+                                                           'https://src/sas')
+        # the target resources are in the target subscription, the os disk is read in the source one
+        self.assertEqual({subscription for kind, subscription in clients.created if kind != 'compute' or
+                          subscription not in (None, 'source-subscription')}, {'target-subscription'})
+        clients.resource_client.resource_groups.delete.assert_called_once_with('image-copy-rg')
+        clients.compute_client.snapshots.delete.assert_called_once_with('source-rg', 'golden_os_disk_snapshot')
+
+    def test_failed_locations_are_retried(self):
+        clients = ImageCopyClientsStub()
+        clients.storage_client.storage_accounts.create.side_effect = lambda resource_group, name, parameters: \
+            mock.MagicMock(**{'result.return_value.primary_endpoints.blob': 'https://{}.blob/'.format(name)}) \
+            if not name.startswith('westeurope') else mock.MagicMock(**{'result.side_effect': IOError('429')})
+
+        with self.assertRaisesRegex(CLIError, 'The copy failed in 1 of 2 locations: westeurope'):
+            self.copy(clients, ['eastus', 'westeurope'])
+
+        clients = ImageCopyClientsStub()
+        results = self.copy(clients, ['eastus', 'westeurope'], retry_failed=True)
+        self.assertEqual([result['location'] for result in results], ['westeurope'])
+        self.assertEqual(clients.compute_client.images.create_or_update.call_count, 1)
+
+        self.copy(clients, ['eastus', 'westeurope'], retry_failed=True)
+        self.assertEqual(clients.compute_client.images.create_or_update.call_count, 1)
+
+    def test_reuse(self):
+        clients = ImageCopyClientsStub()
+        clients.storage_client.storage_accounts.list_by_resource_group.return_value = [SimpleNamespace(
+            name='eastusaccount', location='eastus', tags={'created_by': 'image-copy-extension'},
+            provisioning_state='Succeeded')]
+
+        self.copy(clients, ['eastus', 'westeurope'], reuse=True)
+
+        # the storage account of eastus is used again
+        self.assertEqual([call[0][1] for call in clients.storage_client.storage_accounts.create.call_args_list],
+                         [clients.blob_services[1].account_name])
+        self.assertEqual(clients.blob_services[0].account_name, 'eastusaccount')
+        self.assertEqual(clients.compute_client.snapshots.create_or_update.call_count, 3)
+
+        results = self.copy(clients, ['eastus', 'westeurope'], reuse=True)
+
+        self.assertEqual([result['status'] for result in results], ['Skipped', 'Skipped'])
+        self.assertEqual(len(clients.blob_services), 2)
+        # nor is the source snapshot created again
+        self.assertEqual(clients.compute_client.snapshots.create_or_update.call_count, 3)
+
+        del clients.resources[('images', 'target-rg', 'golden-eastus')]
+        results = self.copy(clients, ['eastus', 'westeurope'], reuse=True)
+
+        self.assertEqual([result['status'] for result in results], ['Succeeded', 'Skipped'])
+        # the image is created from the snapshot copied before
+        self.assertEqual(len(clients.blob_services), 2)
+        self.assertEqual(clients.compute_client.images.create_or_update.call_count, 3)
+
+    def test_reuse_after_the_os_disk_is_created_again(self):
+        clients = ImageCopyClientsStub()
+        self.copy(clients, ['eastus'], reuse=True)
+        clients.compute_client.disks.get.assert_called_once_with('disks-rg', 'osdisk')
+
+        clients.os_disk = SimpleNamespace(time_created='2020-09-01T00:00:00Z')
+        results = self.copy(clients, ['eastus'], reuse=True)
+
+        self.assertEqual([result['status'] for result in results], ['Succeeded'])
+        # the source and target snapshots are copied again
+        self.assertEqual(clients.compute_client.snapshots.create_or_update.call_count, 4)
+        self.assertEqual(clients.compute_client.images.create_or_update.call_count, 2)
+
+    def test_snapshot_sources_are_used_as_they_are(self):
+        clients = ImageCopyClientsStub()
+        os_disk = clients.source_image.storage_profile.os_disk
+        os_disk.managed_disk = None
+        os_disk.blob_uri = None
+        os_disk.snapshot.id = '/subscriptions/source-subscription/resourceGroups/snapshots-rg/providers/' \
+                              'Microsoft.Compute/snapshots/golden-snapshot'
+        clients.resources[('snapshots', 'snapshots-rg', 'golden-snapshot')] = SimpleNamespace(
+            id=os_disk.snapshot.id, tags={}, time_created='2020-08-01T00:00:00Z')
+
+        self.copy(clients, ['eastus'], cleanup=True)
+
+        clients.compute_client.snapshots.grant_access.assert_called_once_with('snapshots-rg', 'golden-snapshot',
+                                                                              'Read', 3600)
+        self.assertEqual([call[0][:2] for call in clients.compute_client.snapshots.create_or_update.call_args_list],
+                         [('image-copy-rg', 'golden-snapshot-eastus')])
+        clients.compute_client.snapshots.revoke_access.assert_called_once_with('snapshots-rg', 'golden-snapshot')
+        clients.compute_client.snapshots.delete.assert_not_called()
+
+    def test_failed_copies_raise(self):
+        with self.assertRaisesRegex(CLIError, 'The copy failed in 2 of 2 locations'):
+            self.copy(ImageCopyClientsStub(copy_status='failed'), ['eastus', 'westeurope'])
+
+
+if __name__ == '__main__':
+    unittest.main()
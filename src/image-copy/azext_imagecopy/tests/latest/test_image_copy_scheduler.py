@@ -0,0 +1,92 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from azext_imagecopy.scheduler import BlobCopyPoller, CopyScheduler
+
+
+class BlobServiceStub(object):
+    """ a blob copied in the given number of polls """
+
+    def __init__(self, polls, status='success'):
+        self.polls = polls
+        self.status = status
+        self.calls = 0
+
+    def get_blob_properties(self, container_name, blob_name):
+        self.calls += 1
+        done = self.calls >= self.polls
+        copy = SimpleNamespace(status=self.status if done else 'pending',
+                               progress='{}/{}'.format(min(self.calls, self.polls), self.polls))
+        return SimpleNamespace(properties=SimpleNamespace(copy=copy))
+
+
+class TestBlobCopyPoller(unittest.TestCase):
+    def test_copies_are_polled_together(self):
+        poller = BlobCopyPoller(min_interval=0.01, max_interval=0.05)
+        blob_services = [BlobServiceStub(polls) for polls in (1, 3, 5)]
+        threads = [threading.Thread(target=poller.wait, args=(blob_service, 'snapshots', 'os.vhd'))
+                   for blob_service in blob_services]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual([blob_service.calls for blob_service in blob_services], [1, 3, 5])
+
+    def test_polls_back_off_without_progress(self):
+        poller = BlobCopyPoller(min_interval=1, max_interval=8)
+        blob_service = BlobServiceStub(6)
+        blob_service.get_blob_properties = mock.MagicMock(side_effect=[
+            blob_service.get_blob_properties('c', 'b') for _ in range(2)] + [
+                SimpleNamespace(properties=SimpleNamespace(copy=SimpleNamespace(status='pending', progress='2/6')))
+                for _ in range(4)] + [SimpleNamespace(properties=SimpleNamespace(copy=SimpleNamespace(
+                    status='success', progress='6/6')))])
+        waits = []
+        with mock.patch.object(poller._wakeup, 'wait', side_effect=waits.append):
+            copy = poller.wait(blob_service, 'snapshots', 'os.vhd')
+
+        self.assertEqual(copy.status, 'success')
+        self.assertEqual(waits[:6], [1, 1, 2, 4, 8, 8])
+
+
+class TestCopyScheduler(unittest.TestCase):
+    def test_stages_are_limited_and_errors_collected(self):
+        running = {'snapshot': 0}
+        peak = {'snapshot': 0}
+        lock = threading.Lock()
+
+        def _pipeline(task, location):
+            with task.stage('snapshot'):
+                with lock:
+                    running['snapshot'] += 1
+                    peak['snapshot'] = max(peak['snapshot'], running['snapshot'])
+                time.sleep(0.02)
+                with lock:
+                    running['snapshot'] -= 1
+            if location == 'westus':
+                raise IOError('Conflict')
+
+        scheduler = CopyScheduler(['eastus', 'westus', 'japaneast', 'uksouth', 'brazilsouth'],
+                                  stage_limits={'snapshot': 2})
+        results = scheduler.run(_pipeline)
+
+        self.assertEqual(peak['snapshot'], 2)
+        self.assertEqual([result.location for result in scheduler.failed], ['westus'])
+        self.assertEqual(results[1].to_dict()['stage'], 'snapshot')
+        self.assertEqual(results[1].to_dict()['error'], 'Conflict')
+        self.assertEqual({result.status for result in results}, {'Succeeded', 'Failed'})
+        table = scheduler.format_table().splitlines()
+        self.assertEqual(table[0].split(), ['Location', 'Status', 'Stage', 'Progress', 'Elapsed'])
+        self.assertEqual(table[2].split()[:3], ['westus', 'Failed', 'snapshot'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+compact, memory-mapped on-disk format of the interactive command table
+
+layout of the file:
+    header  -- magic, format version, offset and length of the index
+    strings -- utf-8 text of every distinct description and example
+    index   -- json of the command tree and, per command, references into the strings
+a reference is an [offset, length] pair, so no text has to be decoded until it is shown
+the index itself stays json, gathering walks every command of it at launch anyway
+the index also records what the cache was built from, so a refresh can reload only what changed
+
+every write goes to a new numbered generation of the file, so a shell that still has an older
+generation mapped keeps reading it, and Windows never has to replace a mapped file
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from knack.log import get_logger
+
+
+logger = get_logger(__name__)
+
+CACHE_MAGIC = b'AZSHCMD\x00'
+CACHE_VERSION = 2
+_HEADER = struct.Struct('<8sIQQ')
+SUPPRESS_TAG = '==SUPPRESS=='
+_WRITE_ATTEMPTS = 5
+
+
+def _text_default(value):
+    """ mirrors the fallback the json help dump used for non-string help """
+    return getattr(value, 'target', None) or ''
+
+
+def _as_text(value, default=_text_default):
+    if value is None or isinstance(value, str):
+        return value
+    return default(value)
+
+
+def build_index(data, add_string, default=_text_default, fingerprint=None, sources=None, overrides=None):
+    """
+    builds the command index from the help dump dictionary
+    add_string turns a piece of text into the reference stored in the index
+    fingerprint is what the command table was loaded from, sources maps commands to their extension
+    and overrides lists the extension commands that replace a command module's command
+    """
+    tree = {}
+    commands = {}
+    for command_name, command_data in data.items():
+        branch = tree
+        for word in command_name.split():
+            branch = branch.setdefault(word, {})
+
+        entry = {'help': add_string(_as_text(command_data.get('help'), default))}
+        if 'examples' in command_data:
+            entry['examples'] = [[add_string(_as_text(example[0], default)),
+                                  add_string(_as_text(example[1], default))]
+                                 for example in command_data['examples'] or []]
+
+        parameters = []
+        for param in (command_data.get('parameters') or {}).values():
+            param_help = _as_text(param['help'], default) or ''
+            if SUPPRESS_TAG in param_help:
+                continue
+            parameters.append([list(param['name']), param['required'], add_string(param_help)])
+        entry['parameters'] = parameters
+        commands[command_name] = entry
+    return {
+        'tree': tree,
+        'commands': commands,
+        'fingerprint': fingerprint,
+        'sources': sources or {},
+        'overrides': sorted(overrides or [])
+    }
+
+
+def write_command_cache(path, data, default=_text_default, **kwargs):
+    """ writes the help dump dictionary into the binary cache at path, kwargs are passed to build_index """
+    blob = bytearray()
+    offsets = {}
+
+    def _add_string(text):
+        if text is None:
+            return None
+        if text not in offsets:
+            encoded = text.encode('utf-8')
+            offsets[text] = [_HEADER.size + len(blob), len(encoded)]
+            blob.extend(encoded)
+        return offsets[text]
+
+    index = json.dumps(build_index(data, _add_string, default=default, **kwargs),
+                       separators=(',', ':')).encode('utf-8')
+    index_offset = _HEADER.size + len(blob)
+
+    generations = _get_generations(path)
+    directory = os.path.dirname(path) or '.'
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path), suffix='.tmp')
+    with os.fdopen(handle, 'wb') as cache_file:
+        cache_file.write(_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, index_offset, len(index)))
+        cache_file.write(blob)
+        cache_file.write(index)
+    newest = generations[0] if generations else 0
+    for generation in range(newest + 1, newest + 1 + _WRITE_ATTEMPTS):
+        try:
+            os.replace(temp_path, _generation_path(path, generation))
+            break
+        except OSError as ex:
+            # another shell wrote and mapped this generation first (Windows)
+            logger.debug('Unable to write command cache generation %s: %s', generation, ex)
+    else:
+        os.remove(temp_path)
+        return
+
+    for old_generation in generations:
+        try:
+            os.remove(_generation_path(path, old_generation))
+        except OSError as ex:
+            # still mapped by a running shell (Windows), removed by a later write
+            logger.debug('Unable to remove command cache generation %s: %s', old_generation, ex)
+
+
+def _generation_path(path, generation):
+    return '{}.{}'.format(path, generation)
+
+
+def _get_generations(path):
+    """ the generations of the cache written at path, newest first """
+    directory, name = os.path.split(path)
+    prefix = name + '.'
+    try:
+        entries = os.listdir(directory or '.')
+    except OSError:
+        return []
+    return sorted((int(entry[len(prefix):]) for entry in entries
+                   if entry.startswith(prefix) and entry[len(prefix):].isdigit()), reverse=True)
+
+
+class CommandCache(object):
+    """ read access to a command index and the text it references """
+
+    def __init__(self, index, read):
+        self.tree = index['tree']
+        self.commands = index['commands']
+        self.fingerprint = index.get('fingerprint')
+        self.sources = index.get('sources', {})
+        self.overrides = set(index.get('overrides', []))
+        self._read = read
+
+    def read(self, ref):
+        """ returns the text behind a reference of the index """
+        if ref is None:
+            return None
+        return self._read(ref)
+
+    def to_help_dump(self, commands=None):
+        """ the help dump dictionary of the given commands, or of all of them """
+        data = {}
+        for command_name in self.commands if commands is None else commands:
+            entry = self.commands[command_name]
+            command_data = {
+                'help': self.read(entry['help']),
+                'parameters': {aliases[0]: {'name': aliases, 'required': required, 'help': self.read(ref)}
+                               for aliases, required, ref in entry['parameters'] if aliases}
+            }
+            if 'examples' in entry:
+                command_data['examples'] = [[self.read(name), self.read(text)] for name, text in entry['examples']]
+            data[command_name] = command_data
+        return data
+
+    def close(self):
+        pass
+
+    @classmethod
+    def open(cls, path):
+        """
+        maps the newest generation of the binary cache written at path
+        raises IOError if there is none and ValueError if it is not in the current format
+        """
+        for generation in _get_generations(path):
+            try:
+                cache_file = open(_generation_path(path, generation), 'rb')
+            except IOError:
+                # removed by a newer write in the meantime
+                continue
+            with cache_file:
+                return cls._map(cache_file)
+        raise IOError('no command cache at {}'.format(path))
+
+    @classmethod
+    def _map(cls, cache_file):
+        mapped = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(mapped) < _HEADER.size:
+                raise ValueError('command cache is truncated')
+            magic, version, index_offset, index_length = _HEADER.unpack_from(mapped, 0)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                raise ValueError('command cache format {} is not supported'.format(version))
+            index = json.loads(mapped[index_offset:index_offset + index_length].decode('utf-8'))
+        except Exception:
+            mapped.close()
+            raise
+        return MappedCommandCache(index, mapped)
+
+    @classmethod
+    def from_json(cls, path):
+        """ indexes a json help dump, the references are the strings themselves """
+        with open(path, 'r') as help_file:
+            data = json.load(help_file)
+        return cls(build_index(data, lambda text: text), lambda text: text)
+
+
+class MappedCommandCache(CommandCache):
+    """ a command cache whose text stays in the memory-mapped file """
+
+    def __init__(self, index, mapped):
+        super(MappedCommandCache, self).__init__(index, self._read_mapped)
+        self._mapped = mapped
+
+    def _read_mapped(self, ref):
+        offset, length = ref
+        return self._mapped[offset:offset + length].decode('utf-8')
+
+    def close(self):
+        self._mapped.close()
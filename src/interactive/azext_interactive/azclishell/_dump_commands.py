@@ -3,7 +3,6 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
-import json
 import os
 import yaml  # pylint: disable=import-error
 
@@ -13,6 +12,7 @@ from knack.help import REQUIRED_TAG
 from knack.help_files import helps
 from knack.log import get_logger
 
+from ._command_cache import CommandCache, write_command_cache
 
 logger = get_logger(__name__)
 
@@ -29,6 +29,33 @@ class AzInteractiveCommandsLoader(MainCommandsLoader):  # pylint: disable=too-fe
             loader.command_table = self.command_table
             loader._update_command_definitions()  # pylint: disable=protected-access
 
+    def load_extension_command_table(self, extension_names):
+        """ loads the command tables of the given installed extensions only """
+        import sys
+        from azure.cli.core.commands import _load_extension_command_loader, ExtensionCommandSource
+        from azure.cli.core.extension import get_extensions, get_extension_path, get_extension_modname
+
+        self.command_table.clear()
+        self.command_group_table.clear()
+        for ext in get_extensions():
+            if ext.name not in extension_names:
+                continue
+            ext_dir = ext.path or get_extension_path(ext.name)
+            if ext_dir not in sys.path:
+                sys.path.append(ext_dir)
+            try:
+                ext_mod = get_extension_modname(ext.name, ext_dir=ext_dir)
+                command_table, group_table = _load_extension_command_loader(self, None, ext_mod)
+            except Exception as ex:  # pylint: disable=broad-except
+                logger.warning("Unable to load extension '%s': %s", ext.name, ex)
+                continue
+
+            for cmd in command_table.values():
+                cmd.command_source = ExtensionCommandSource(extension_name=ext.name)
+            self.command_table.update(command_table)
+            self.command_group_table.update(group_table)
+        return self.command_table
+
     def load_arguments(self, _):
         from azure.cli.core.commands.parameters import resource_group_name_type, get_location_type, deployment_name_type
         from azure.cli.core import ArgumentsContext
@@ -63,6 +90,79 @@ class AzInteractiveCommandsLoader(MainCommandsLoader):  # pylint: disable=too-fe
                 loader._update_command_definitions()  # pylint: disable=protected-access
 
 
+def get_cache_fingerprint():
+    """ what the command table is loaded from: the CLI core version and each installed extension's version """
+    from azure.cli.core import __version__ as core_version
+    from azure.cli.core.extension import get_extensions
+
+    return {
+        'core': core_version,
+        'extensions': {ext.name: ext.version for ext in get_extensions()}
+    }
+
+
+def get_changed_extensions(old_fingerprint, new_fingerprint):
+    """ names of the extensions installed, removed or updated between two fingerprints """
+    old_extensions = old_fingerprint['extensions']
+    new_extensions = new_fingerprint['extensions']
+    return set(name for name in set(old_extensions) | set(new_extensions)
+               if old_extensions.get(name) != new_extensions.get(name))
+
+
+def get_command_table_data(cmd_table):
+    """
+    the help dump dictionary of a command table, the extension each command came from
+    and the extension commands that override a command module's command
+    """
+    cmd_table_data = {}
+    sources = {}
+    overrides = []
+    for command_name, cmd in cmd_table.items():
+
+        try:
+            command_description = cmd.description
+            if callable(command_description):
+                command_description = command_description()
+
+            # checking all the parameters for a single command
+            parameter_metadata = {}
+            for arg in cmd.arguments.values():
+                options = {
+                    'name': [name for name in arg.options_list],
+                    'required': REQUIRED_TAG if arg.type.settings.get('required') else '',
+                    'help': arg.type.settings.get('help') or ''
+                }
+                # the key is the first alias option
+                if arg.options_list:
+                    parameter_metadata[arg.options_list[0]] = options
+
+            cmd_table_data[command_name] = {
+                'parameters': parameter_metadata,
+                'help': command_description,
+                'examples': ''
+            }
+        except (ImportError, ValueError):
+            continue
+
+        command_source = getattr(cmd, 'command_source', None)
+        extension_name = getattr(command_source, 'extension_name', None)
+        if extension_name:
+            sources[command_name] = extension_name
+            if getattr(command_source, 'overrides_command', False):
+                overrides.append(command_name)
+
+    load_help_files(cmd_table_data)
+    return cmd_table_data, sources, overrides
+
+
+def _get_groups(commands):
+    """ every group the commands are nested in """
+    for command in commands:
+        words = command.split()
+        for depth in range(1, len(words)):
+            yield ' '.join(words[:depth])
+
+
 # pylint: disable=too-few-public-methods
 class FreshTable(object):
     """
@@ -74,60 +174,95 @@ class FreshTable(object):
     def __init__(self, shell_ctx):
         self.shell_ctx = shell_ctx
 
-    def dump_command_table(self, shell_ctx=None):
-        """ dumps the command table """
+    def load_command_loader(self, shell_ctx=None, extensions=None):
+        """ loads the command table with its arguments, only for the given extensions if any """
         from azure.cli.core.commands.arm import register_global_subscription_argument, register_ids_argument
         from knack import events
-        import timeit
 
-        start_time = timeit.default_timer()
         shell_ctx = shell_ctx or self.shell_ctx
         main_loader = AzInteractiveCommandsLoader(shell_ctx.cli_ctx)
 
-        main_loader.load_command_table(None)
+        if extensions is None:
+            main_loader.load_command_table(None)
+        else:
+            main_loader.load_extension_command_table(extensions)
         main_loader.load_arguments(None)
         register_global_subscription_argument(shell_ctx.cli_ctx)
         register_ids_argument(shell_ctx.cli_ctx)
         shell_ctx.cli_ctx.raise_event(events.EVENT_INVOKER_POST_CMD_TBL_CREATE, commands_loader=main_loader)
-        cmd_table = main_loader.command_table
+        if extensions is None:
+            FreshTable.loader = main_loader
+        return main_loader
+
+    def dump_command_table(self, shell_ctx=None):
+        """
+        dumps the command table, reloading only the extensions that changed since the cache was written
+        returns whether the cache was rewritten
+        """
+        import timeit
 
-        cmd_table_data = {}
-        for command_name, cmd in cmd_table.items():
+        start_time = timeit.default_timer()
+        shell_ctx = shell_ctx or self.shell_ctx
+        cache_path = os.path.join(get_cache_dir(shell_ctx), shell_ctx.config.get_command_cache())
+        fingerprint = get_cache_fingerprint()
 
-            try:
-                command_description = cmd.description
-                if callable(command_description):
-                    command_description = command_description()
-
-                # checking all the parameters for a single command
-                parameter_metadata = {}
-                for arg in cmd.arguments.values():
-                    options = {
-                        'name': [name for name in arg.options_list],
-                        'required': REQUIRED_TAG if arg.type.settings.get('required') else '',
-                        'help': arg.type.settings.get('help') or ''
-                    }
-                    # the key is the first alias option
-                    if arg.options_list:
-                        parameter_metadata[arg.options_list[0]] = options
-
-                cmd_table_data[command_name] = {
-                    'parameters': parameter_metadata,
-                    'help': command_description,
-                    'examples': ''
-                }
-            except (ImportError, ValueError):
-                pass
+        try:
+            cache = CommandCache.open(cache_path)
+        except (IOError, ValueError) as ex:
+            logger.debug('Reloading the whole command table: %s', ex)
+            cache = None
+
+        try:
+            if cache and cache.fingerprint == fingerprint:
+                logger.debug('Command table cache is up to date')
+                return False
+
+            changed = None
+            if cache and cache.fingerprint and cache.fingerprint['core'] == fingerprint['core']:
+                changed = get_changed_extensions(cache.fingerprint, fingerprint)
+                # dropping a command that overrode a module's command needs the module's version back
+                if any(cache.sources[command] in changed for command in cache.overrides):
+                    changed = None
+
+            if changed is None:
+                cmd_table_data, sources, overrides = get_command_table_data(
+                    self.load_command_loader(shell_ctx).command_table)
+            else:
+                cmd_table_data, sources, overrides = self._merge_changed_extensions(shell_ctx, cache, changed)
+        finally:
+            if cache:
+                cache.close()
 
-        load_help_files(cmd_table_data)
         elapsed = timeit.default_timer() - start_time
         logger.debug('Command table dumped: %s sec', elapsed)
-        FreshTable.loader = main_loader
 
         # dump into the cache file
-        command_file = shell_ctx.config.get_help_files()
-        with open(os.path.join(get_cache_dir(shell_ctx), command_file), 'w') as help_file:
-            json.dump(cmd_table_data, help_file, default=lambda x: x.target or '', skipkeys=True)
+        write_command_cache(cache_path, cmd_table_data, fingerprint=fingerprint, sources=sources, overrides=overrides)
+        return True
+
+    def _merge_changed_extensions(self, shell_ctx, cache, changed):
+        """ loads the changed extensions and merges them into the cached command table """
+        logger.debug('Reloading changed extensions: %s', ', '.join(sorted(changed)))
+        stale = set(command for command, extension in cache.sources.items() if extension in changed)
+        kept = [command for command in cache.commands if command not in stale]
+        cmd_table_data = cache.to_help_dump(kept)
+        sources = {command: cache.sources[command] for command in kept if command in cache.sources}
+        overrides = [command for command in cache.overrides if command not in stale]
+
+        # groups that only held commands of the changed extensions go as well
+        stale_groups = set(_get_groups(stale))
+        live_groups = set(_get_groups(command for command in cmd_table_data if command not in stale_groups))
+        for group in stale_groups - live_groups:
+            cmd_table_data.pop(group, None)
+
+        loader = self.load_command_loader(shell_ctx, extensions=changed)
+        extension_data, extension_sources, extension_overrides = get_command_table_data(loader.command_table)
+        # without the command modules loaded, an override shows as a command already in the cache
+        overrides.extend(command for command in extension_sources if command in extension_overrides or
+                         (command in cmd_table_data and command not in sources))
+        cmd_table_data.update(extension_data)
+        sources.update(extension_sources)
+        return cmd_table_data, sources, overrides
 
 
 def load_help_files(data):
@@ -155,6 +155,21 @@ class AzInteractiveShell(object):
             self._cli = self.create_interface()
         return self._cli
 
+    def refresh_completions(self, text):
+        """ shows completions that finished loading in the background, unless the input changed since """
+        cli = self._cli
+        if cli is None:
+            return
+
+        def _refresh():
+            buffer = cli.current_buffer
+            if buffer.text != text or (buffer.complete_state and buffer.complete_state.current_completion):
+                return
+            buffer.complete_state = None
+            cli.start_completion(select_first=False)
+
+        cli.eventloop.call_from_executor(_refresh)
+
     def handle_cd(self, cmd):
         """changes dir """
         if len(cmd) != 2:
@@ -203,6 +218,9 @@ class AzInteractiveShell(object):
         self.completer.initialize_command_table_attributes()
         if not self.lexer:
             self.lexer = get_az_lexer(command_info)
+        if self.completer.command_description is not command_info.descrip:
+            # the completer keeps what it was started with, so the cache just opened is not used
+            command_info.close()
         self._cli = None
 
     def _space_examples(self, list_examples, rows, section_value):
@@ -7,6 +7,7 @@ import argparse
 
 from argcomplete import CompletionFinder
 from argcomplete.compat import USING_PYTHON2, ensure_bytes
+from azure.cli.core.parser import AzCliCommandParser
 
 
 class ArgsFinder(CompletionFinder):  # pylint: disable=too-few-public-methods
@@ -34,3 +35,67 @@ class ArgsFinder(CompletionFinder):  # pylint: disable=too-few-public-methods
 
         self.completing = False
         return parsed_args
+
+
+class QuietCommandParser(AzCliCommandParser):
+    """ a parser for partial input, errors neither log, exit nor stop the parse """
+
+    def error(self, message):
+        return
+
+    def _check_value(self, action, value):
+        if action.choices is not None and value not in action.choices:
+            raise argparse.ArgumentError(action, 'invalid choice: {}'.format(value))
+
+
+class CommandArgsFinder(object):
+    """
+    gets the parsed args of a command from a parser holding only that command, built on first use
+    the args of the finished words are kept, so typing within the last word parses nothing again
+    """
+    def __init__(self, global_parser, command_table=None):
+        self.global_parser = global_parser
+        self.command_table = command_table or {}
+        self._finders = {}
+        self._last = None
+
+    def load_command_table(self, command_table):
+        """ swaps in a new command table, the parsers of the old one are dropped """
+        self.command_table = command_table
+        self._finders = {}
+        self._last = None
+
+    def _get_finder(self, command):
+        finder = self._finders.get(command)
+        if finder is None:
+            finder = ArgsFinder(self._build_parser(command))
+            self._finders[command] = finder
+        return finder
+
+    def _build_parser(self, command):
+        """ the parser of a single command, the way AzCliCommandParser.load_command_table builds it """
+        metadata = self.command_table[command]
+        parser = QuietCommandParser(prog='az ' + command, parents=[self.global_parser], add_help=False)
+        argument_groups = {}
+        for arg in metadata.arguments.values():
+            deprecate_info = arg.type.settings.get('deprecate_info', None)
+            if deprecate_info and deprecate_info.expired():
+                continue
+            if arg.arg_group:
+                group = argument_groups.get(arg.arg_group)
+                if group is None:
+                    group = parser.add_argument_group(arg.arg_group, '{} Arguments'.format(arg.arg_group))
+                    argument_groups[arg.arg_group] = group
+                param = AzCliCommandParser._add_argument(group, arg)  # pylint: disable=protected-access
+            else:
+                param = AzCliCommandParser._add_argument(parser, arg)  # pylint: disable=protected-access
+            param.completer = arg.completer
+        parser.set_defaults(func=metadata, command=command, _cmd=metadata)
+        return parser
+
+    def get_parsed_args(self, command, words):
+        """ the parsed args of the words typed after the command """
+        key = (command, tuple(words))
+        if self._last is None or self._last[0] != key:
+            self._last = (key, self._get_finder(command).get_parsed_args(words))
+        return self._last[1]
@@ -16,36 +16,28 @@ from azure.cli.core.commands.events import (
 from prompt_toolkit.completion import Completer, Completion  # pylint: disable=import-error
 
 from . import configuration
-from .argfinder import ArgsFinder
+from .argfinder import CommandArgsFinder
+from .completion_trie import CompletionTrie
+from .completion_worker import CompletionWorker, hash_parsed_args, resolve_completer_call
+from .threads import LoadCommandLoaderThread
 from .util import parse_quotes
 
 SELECT_SYMBOL = configuration.SELECT_SYMBOL
 
 
-def error_pass(_, message):  # pylint: disable=unused-argument
-    return
-
+def rank_completion(text, display_meta=None):
+    """ weights the completions with required things first the lexicographically"""
+    from knack.help import REQUIRED_TAG
 
-def _check_value_muted(_, action, value):
-    # patch for AzCliCommandParser that does no logging
-    if action.choices is not None and value not in action.choices:
-        import argparse
-        msg = 'invalid choice: {}'.format(value)
-        raise argparse.ArgumentError(action, msg)
+    priority = ''
+    if display_meta and display_meta.startswith(REQUIRED_TAG):
+        priority = ' '  # a space has the lowest ordinance
+    return priority + text
 
 
 def sort_completions(completions_gen):
     """ sorts the completions """
-    from knack.help import REQUIRED_TAG
-
-    def _get_weight(val):
-        """ weights the completions with required things first the lexicographically"""
-        priority = ''
-        if val.display_meta and val.display_meta.startswith(REQUIRED_TAG):
-            priority = ' '  # a space has the lowest ordinance
-        return priority + val.text
-
-    return sorted(completions_gen, key=_get_weight)
+    return sorted(completions_gen, key=lambda val: rank_completion(val.text, val.display_meta))
 
 
 # pylint: disable=too-many-instance-attributes
@@ -65,10 +57,14 @@ class AzCompleter(Completer):
         # a dictionary of parameter (which is command + " " + parameter name)
         # to a description of what it does
         self.param_description = None
+        # the 'command parameter' keys of required parameters
+        self.required_param = set()
         # a dictionary of command to examples of how to use it
         self.command_examples = None
         # a dictionary of commands with parameters with multiple names (e.g. {'vm create':{-n: --name}})
         self.command_param_info = {}
+        # a dictionary of command to a ranked trie of its parameters, built on first use
+        self.param_tries = {}
 
         # information about what completions to generate
         self.current_command = ''
@@ -84,9 +80,15 @@ class AzCompleter(Completer):
 
         self.global_parser = AzCliCommandParser(add_help=False)
         self.global_parser.add_argument_group('global', 'Global Arguments')
-        self.parser = AzCliCommandParser(parents=[self.global_parser])
-        self.argsfinder = ArgsFinder(self.parser)
+        # parsers are built per command once its args are first parsed
+        self.args_finder = CommandArgsFinder(self.global_parser)
         self.cmdtab = {}
+        self.loader_thread = None
+        # dynamic completers run in the background, the call format of each is resolved once
+        self.completion_worker = CompletionWorker()
+        self.completer_calls = {}
+        self.subscription_id = None
+        self.document_text = ''
 
         if commands:
             self.start(commands, global_params=global_params)
@@ -100,8 +102,10 @@ class AzCompleter(Completer):
         self.completable_param = commands.completable_param
         self.command_tree = commands.command_tree
         self.param_description = commands.param_descript
+        self.required_param = commands.required_param
         self.command_examples = commands.command_example
         self.command_param_info = commands.command_param_info or self.command_param_info
+        self.param_tries = {}
 
         if global_params:
             self.global_param = commands.global_param
@@ -114,8 +118,18 @@ class AzCompleter(Completer):
         loader = FreshTable(self.shell_ctx).loader
         if loader and loader.command_table:
             self.cmdtab = loader.command_table
-            self.parser.load_command_table(loader)
-            self.argsfinder = ArgsFinder(self.parser)
+            self.args_finder.load_command_table(self.cmdtab)
+
+    def load_command_table_in_background(self):
+        """
+        an up to date command cache is not reloaded at launch, so the command loader
+        is loaded once dynamic completions are first asked for
+        """
+        refresh = getattr(self.shell_ctx, 'command_table_thread', None)
+        if self.loader_thread or not refresh or refresh.is_alive():
+            return
+        self.loader_thread = LoadCommandLoaderThread(self.initialize_command_table_attributes, self.shell_ctx)
+        self.loader_thread.start()
 
     def validate_param_completion(self, param, leftover_args):
         """ validates that a param should be completed """
@@ -138,6 +152,17 @@ class AzCompleter(Completer):
 
         return completes and no_doubles and any((full_param, char_param, new_param))
 
+    def get_param_trie(self, command):
+        """ the parameters of a command in a prefix trie ranked required first """
+        trie = self.param_tries.get(command)
+        if trie is None:
+            # ranked from the required flags, so no description has to be loaded
+            trie = CompletionTrie(
+                (param, (command + " " + param not in self.required_param, param))
+                for param in self.command_param_info.get(command, []))
+            self.param_tries[command] = trie
+        return trie
+
     def validate_completion(self, completion):
         return completion.lower().startswith(self.unfinished_word.lower())
 
@@ -153,6 +178,7 @@ class AzCompleter(Completer):
         if not self.started:
             return
 
+        self.document_text = document.text
         text = self.reformat_cmd(document.text_before_cursor)
         event_payload = {
             'text': text
@@ -171,15 +197,19 @@ class AzCompleter(Completer):
         self.shell_ctx.cli_ctx.raise_event(EVENT_INTERACTIVE_POST_SUB_TREE_CREATE, subtree=self.subtree)
         self.complete_command = not self.subtree.children
 
-        for comp in sort_completions(self.gen_cmd_and_param_completions()):
+        # command and parameter completions come out of the tries already ranked
+        for comp in self.gen_cmd_and_param_completions():
             yield comp
 
         for comp in sort_completions(self.gen_global_params_and_arg_completions()):
             yield comp
 
-        if self.complete_command and self.cmdtab and self.leftover_args and self.leftover_args[-1].startswith('-'):
-            for comp in sort_completions(self.gen_dynamic_completions(text)):
-                yield comp
+        if self.complete_command and self.leftover_args and self.leftover_args[-1].startswith('-'):
+            if not self.cmdtab:
+                self.load_command_table_in_background()
+            else:
+                for comp in sort_completions(self.gen_dynamic_completions(text)):
+                    yield comp
 
     def gen_enum_completions(self, arg_name):
         """ generates dynamic enumeration completions """
@@ -201,29 +231,44 @@ class AzCompleter(Completer):
                         return arg
         return None
 
-    # pylint: disable=protected-access
-    def mute_parse_args(self, text):
-        """ mutes the parser error when parsing, then puts it back """
-        error = AzCliCommandParser.error
-        _check_value = AzCliCommandParser._check_value
-
-        AzCliCommandParser.error = error_pass
-        AzCliCommandParser._check_value = _check_value_muted
-
-        # No exception is expected. However, we add this try-catch block, as this may have far-reaching effects.
+    def get_parsed_args(self, text):
+        """ parses the args typed after the current command, leaving out the word still being typed """
+        words = parse_quotes(text, quotes=False, string=False)
+        if words and not text[-1].isspace():
+            words = words[:-1]
+        _, _, args = self.command_tree.get_sub_tree(words)
+        return self.args_finder.get_parsed_args(self.current_command, args)
+
+    def get_subscription_id(self, parsed_args):
+        """ the subscription dynamic completions are looked up in, the default one is read once per session """
+        subscription = getattr(parsed_args, '_subscription', None)
+        if subscription:
+            return subscription
+        if self.subscription_id is None:
+            try:
+                from azure.cli.core._profile import Profile
+                self.subscription_id = Profile(cli_ctx=self.shell_ctx.cli_ctx).get_subscription_id()
+            except Exception:  # pylint: disable=broad-except
+                self.subscription_id = ''
+        return self.subscription_id
+
+    def get_completer_call(self, completer):
+        """ resolves once which of the 3 formats for completers the cli uses this completer takes """
         try:
-            parse_args = self.argsfinder.get_parsed_args(parse_quotes(text, quotes=False, string=False))
-        except Exception:  # pylint: disable=broad-except
-            pass
-
-        AzCliCommandParser.error = error
-        AzCliCommandParser._check_value = _check_value
-        return parse_args
+            call = self.completer_calls.get(completer)
+        except TypeError:  # not hashable
+            return resolve_completer_call(completer)
+        if call is None:
+            call = resolve_completer_call(completer)
+            self.completer_calls[completer] = call
+        return call
 
-    # pylint: disable=too-many-branches
     def gen_dynamic_completions(self, text):
-        """ generates the dynamic values, like the names of resource groups """
-        try:  # pylint: disable=too-many-nested-blocks
+        """
+        generates the dynamic values, like the names of resource groups
+        completers run in the background, until their results are cached nothing is generated
+        """
+        try:
             param = self.leftover_args[-1]
 
             # command table specific name
@@ -232,26 +277,22 @@ class AzCompleter(Completer):
             for comp in self.gen_enum_completions(arg_name):
                 yield comp
 
-            parsed_args = self.mute_parse_args(text)
-
-            # there are 3 formats for completers the cli uses
-            # this try catches which format it is
-            if self.cmdtab[self.current_command].arguments[arg_name].completer:
-                completions = []
-                try:
-                    completions = self.cmdtab[self.current_command].arguments[arg_name].completer(
-                        prefix=self.unfinished_word, action=None, parsed_args=parsed_args)
-                except TypeError:
-                    try:
-                        completions = self.cmdtab[self.current_command].arguments[arg_name].completer(
-                            prefix=self.unfinished_word)
-                    except TypeError:
-                        try:
-                            completions = self.cmdtab[self.current_command].arguments[arg_name].completer()
-                        except TypeError:
-                            pass  # other completion method used
-
-                for comp in completions:
+            completer = self.cmdtab[self.current_command].arguments[arg_name].completer
+            if completer:
+                parsed_args = self.get_parsed_args(text)
+                # completers are called with the directory typed so far, path completers list it and the
+                # completions cached for it are filtered by the rest of the word as it is typed
+                prefix = self.unfinished_word
+                prefix_scope = prefix[:max(prefix.rfind('/'), prefix.rfind('\\')) + 1]
+                key = (self.get_subscription_id(parsed_args), self.current_command, arg_name, prefix_scope,
+                       hash_parsed_args(parsed_args, skip=arg_name))
+                call = self.get_completer_call(completer)
+                document_text = self.document_text
+                completions = self.completion_worker.request(
+                    key, lambda: call(completer, prefix_scope, parsed_args),
+                    on_done=lambda: self.shell_ctx.refresh_completions(document_text))
+
+                for comp in completions or []:
                     for completion in self.process_dynamic_completion(comp):
                         yield completion
 
@@ -267,13 +308,12 @@ class AzCompleter(Completer):
     def gen_cmd_and_param_completions(self):
         """ generates command and parameter completions """
         if self.complete_command:
-            for param in self.command_param_info.get(self.current_command, []):
+            for param in self.get_param_trie(self.current_command).find(self.unfinished_word):
                 if self.validate_param_completion(param, self.leftover_args):
                     yield self.yield_param_completion(param, self.unfinished_word)
         elif not self.leftover_args:
-            for child_command in self.subtree.children:
-                if self.validate_completion(child_command):
-                    yield Completion(child_command, -len(self.unfinished_word))
+            for child_command in self.subtree.get_children_trie().find(self.unfinished_word):
+                yield Completion(child_command, -len(self.unfinished_word))
 
     def gen_global_params_and_arg_completions(self):
         # global parameters
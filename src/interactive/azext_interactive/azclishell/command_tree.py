@@ -3,6 +3,46 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+from .completion_trie import CompletionTrie
+
+
+class _Children(dict):
+    """ the children of a branch by name, which drops the trie of their names whenever they change """
+    def __init__(self, *args, **kwargs):
+        super(_Children, self).__init__(*args, **kwargs)
+        self.trie = None
+
+    def _changed(self):
+        self.trie = None
+
+    def __setitem__(self, key, value):
+        self._changed()
+        super(_Children, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._changed()
+        super(_Children, self).__delitem__(key)
+
+    def pop(self, *args):
+        self._changed()
+        return super(_Children, self).pop(*args)
+
+    def popitem(self):
+        self._changed()
+        return super(_Children, self).popitem()
+
+    def setdefault(self, key, default=None):
+        self._changed()
+        return super(_Children, self).setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self._changed()
+        super(_Children, self).update(*args, **kwargs)
+
+    def clear(self):
+        self._changed()
+        super(_Children, self).clear()
+
 
 class CommandTree(object):
     """ a command tree """
@@ -13,6 +53,14 @@ class CommandTree(object):
         else:
             self.children = children
 
+    @property
+    def children(self):
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        self._children = _Children(children)
+
     def get_child(self, child_name):  # pylint: disable=no-self-use
         """ returns the object with the name supplied """
         child = self.children.get(child_name, None)
@@ -25,6 +73,12 @@ class CommandTree(object):
         # TODO allow adding child_name
         self.children[child.data] = child
 
+    def get_children_trie(self):
+        """ the names of the children in a prefix trie, built on first use after they change """
+        if self.children.trie is None:
+            self.children.trie = CompletionTrie((name, name) for name in self.children)
+        return self.children.trie
+
     def has_child(self, name):
         """ whether this has a child """
         return self.children.get(name, None) is not None
@@ -0,0 +1,47 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+
+class _TrieNode(object):  # pylint: disable=too-few-public-methods
+    """ a node of the trie, holding every completion below it in ranked order """
+    __slots__ = ('children', 'matches')
+
+    def __init__(self):
+        self.children = {}
+        self.matches = []
+
+
+class CompletionTrie(object):
+    """ a case-folded prefix trie of completions """
+    def __init__(self, entries=()):
+        """ entries are (completion, rank key) pairs """
+        self._root = _TrieNode()
+        self._last = None
+
+        for text, _ in sorted(entries, key=lambda entry: entry[1]):
+            node = self._root
+            node.matches.append(text)
+            for char in text.lower():
+                node = node.children.setdefault(char, _TrieNode())
+                node.matches.append(text)
+
+    def __len__(self):
+        return len(self._root.matches)
+
+    def find(self, prefix):
+        """ the completions starting with the prefix, ignoring case, in ranked order """
+        prefix = prefix.lower()
+        node = self._root
+        consumed = 0
+        # when characters were only appended, continue walking from where the last lookup ended
+        if self._last is not None and prefix.startswith(self._last[0]):
+            consumed, node = len(self._last[0]), self._last[1]
+
+        for char in prefix[consumed:]:
+            if node is None:
+                break
+            node = node.children.get(char)
+        self._last = (prefix, node)
+        return node.matches if node is not None else []
@@ -0,0 +1,178 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from six.moves import queue
+
+from knack.log import get_logger
+
+
+logger = get_logger(__name__)
+
+COMPLETION_WORKERS = 4
+COMPLETION_CACHE_SIZE = 256
+COMPLETION_CACHE_TTL = 60
+
+
+def _call_with_parsed_args(completer, prefix, parsed_args):
+    return completer(prefix=prefix, action=None, parsed_args=parsed_args)
+
+
+def _call_with_prefix(completer, prefix, _):
+    return completer(prefix=prefix)
+
+
+def _call_without_args(completer, *_):
+    return completer()
+
+
+def resolve_completer_call(completer):
+    """ which of the 3 formats for completers the cli uses this completer takes """
+    import inspect
+
+    try:
+        params = inspect.signature(completer).parameters
+    except (TypeError, ValueError):
+        return _call_with_parsed_args
+
+    if any(param.kind == param.VAR_KEYWORD for param in params.values()) or \
+            all(name in params for name in ('prefix', 'action', 'parsed_args')):
+        return _call_with_parsed_args
+    if 'prefix' in params:
+        return _call_with_prefix
+    return _call_without_args
+
+
+def hash_parsed_args(parsed_args, skip=None):
+    """ the plain values of the parsed arguments in a hashable form """
+    values = []
+    for name, value in sorted(vars(parsed_args).items()):
+        if name == skip:
+            continue
+        if isinstance(value, list):
+            value = tuple(value)
+        if value is None or isinstance(value, (str, int, float, bool, tuple)):
+            values.append((name, value))
+    return tuple(values)
+
+
+class CompletionCache(object):
+    """ completer results by key, expiring after a time to live and evicting the least recently used """
+    def __init__(self, max_size=COMPLETION_CACHE_SIZE, ttl=COMPLETION_CACHE_TTL, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ the fresh results stored for the key, or None """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored, results = entry
+            if self._clock() - stored > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return results
+
+    def put(self, key, results):
+        with self._lock:
+            self._entries[key] = (self._clock(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CompletionWorker(object):
+    """
+    runs dynamic completers off the prompt thread, so keystrokes never wait on them
+    the worker threads are daemons, a completer stuck on the network never keeps the shell from exiting
+    """
+    def __init__(self, max_workers=COMPLETION_WORKERS, cache=None):
+        self.cache = cache or CompletionCache()
+        self._max_workers = max_workers
+        self._queue = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _start_workers(self):
+        self._queue = queue.Queue()
+        for _ in range(self._max_workers):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+
+    def _work(self):
+        while True:
+            future, func = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(list(func() or []))
+            except Exception as ex:  # pylint: disable=broad-except
+                future.set_exception(ex)
+
+    def request(self, key, func, on_done=None):
+        """
+        returns the cached results for the key, otherwise starts computing them with func
+        in the background and returns None; on_done is called once they are cached
+        requests for any other key that have not started yet are cancelled
+        """
+        results = self.cache.get(key)
+        if results is not None:
+            return results
+
+        with self._lock:
+            stale = [future for other_key, future in self._pending.items() if other_key != key]
+            running = self._pending.get(key)
+            if running is None:
+                if self._queue is None:
+                    self._start_workers()
+                running = Future()
+                self._pending[key] = running
+                self._queue.put((running, func))
+                new_request = True
+            else:
+                new_request = False
+        # cancelling runs the done callbacks right away, which take the lock, so it happens outside of it
+        for future in stale:
+            future.cancel()
+        if new_request:
+            running.add_done_callback(lambda done: self._finish(key, done, on_done))
+        return None
+
+    def _finish(self, key, future, on_done):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+        if future.cancelled():
+            return
+        try:
+            results = future.result()
+        except Exception as ex:  # pylint: disable=broad-except
+            # e.g. the user isn't logged in, remember that there is nothing to complete for a while
+            logger.debug('Dynamic completer failed: %s', ex)
+            results = []
+        self.cache.put(key, results)
+        if on_done:
+            on_done()
+
+    def cancel(self):
+        """ cancels every request that has not started yet """
+        with self._lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            future.cancel()
@@ -65,6 +65,7 @@ class Configuration(object):
         self.config.add_section('Help Files')
         self.config.add_section('Layout')
         self.config.set('Help Files', 'command', 'help_dump.json')
+        self.config.set('Help Files', 'command_cache', 'command_cache.bin')
         self.config.set('Help Files', 'history', 'history.txt')
         self.config.set('Help Files', 'frequency', 'frequency.json')
         self.config.set('Layout', 'command_description', 'yes')
@@ -93,6 +94,10 @@ class Configuration(object):
         """ returns where the command table is cached """
         return self.config.get('Help Files', 'command')
 
+    def get_command_cache(self):
+        """ returns where the binary command cache is stored """
+        return self.config.get('Help Files', 'command_cache')
+
     def get_frequency(self):
         """ returns the name of the frequency file """
         return self.config.get('Help Files', 'frequency')
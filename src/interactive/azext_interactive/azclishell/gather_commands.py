@@ -5,9 +5,12 @@
 
 import math
 import os
-import json
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
 from knack.log import get_logger
 
+from ._command_cache import CommandCache
 from .command_tree import CommandBranch, CommandHead
 from .util import get_window_dim
 
@@ -68,21 +71,64 @@ def add_new_lines(long_phrase, line_min=None, tolerance=TOLERANCE):
     return long_phrase + "\n"
 
 
+class LazyDescriptions(MutableMapping):
+    """ maps to text from the command cache that is only read and line-wrapped when looked up """
+    def __init__(self, load):
+        self._load = load
+        self._refs = {}
+        self._values = {}
+
+    def set_ref(self, key, ref):
+        """ stores a cache reference to be loaded on first lookup """
+        self._refs[key] = ref
+        self._values.pop(key, None)
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            value = self._load(self._refs[key])
+            self._values[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        self._refs[key] = None
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        del self._refs[key]
+        self._values.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._refs
+
+    def __iter__(self):
+        return iter(self._refs)
+
+    def __len__(self):
+        return len(self._refs)
+
+
 # pylint: disable=too-many-instance-attributes
 class GatherCommands(object):
     """ grabs all the cached commands from files """
     def __init__(self, config):
-        # everything that is completable
-        self.completable = []
+        # everything that is completable, an ordered set
+        self.completable = OrderedDict()
         # a completable to the description of what is does
-        self.descrip = {}
+        self.descrip = LazyDescriptions(self._load_description)
         # from a command to a list of parameters
         self.command_param = {}
 
-        self.completable_param = []
-        self.command_example = {}
+        # every parameter name, an ordered set
+        self.completable_param = OrderedDict()
+        self.command_example = LazyDescriptions(self._load_examples)
         self.command_tree = CommandHead()
-        self.param_descript = {}
+        self.param_descript = LazyDescriptions(self._load_param_description)
+        # the 'command parameter' keys of required parameters
+        self.required_param = set()
+        self.line_min = None
+        self._cache = None
         self.completer = None
         self.command_param_info = {}
 
@@ -98,8 +144,8 @@ class GatherCommands(object):
 
     def add_exit(self):
         """ adds the exits from the application """
-        self.completable.append("quit")
-        self.completable.append("exit")
+        self.completable["quit"] = None
+        self.completable["exit"] = None
 
         self.descrip["quit"] = "Exits the program"
         self.descrip["exit"] = "Exits the program"
@@ -110,64 +156,71 @@ class GatherCommands(object):
         self.command_param["quit"] = ""
         self.command_param["exit"] = ""
 
-    def _gather_from_files(self, config):
-        """ gathers from the files in a way that is convienent to use """
-        command_file = config.get_help_files()
+    def _open_cache(self, config):
+        """ maps the binary command cache, falling back to the json help dump """
         cache_path = os.path.join(config.get_config_dir(), 'cache')
-        cols = _get_window_columns()
+        try:
+            return CommandCache.open(os.path.join(cache_path, config.get_command_cache()))
+        except (IOError, ValueError) as ex:
+            logger.debug('Command cache unavailable, reading help dump: %s', ex)
+        return CommandCache.from_json(os.path.join(cache_path, config.get_help_files()))
+
+    def close(self):
+        """ releases the command cache, nothing more is read from it afterwards """
+        if self._cache:
+            self._cache.close()
+
+    def _load_description(self, ref):
+        return add_new_lines(self._cache.read(ref), line_min=self.line_min)
+
+    def _load_param_description(self, ref):
+        required, param_help = ref
+        return add_new_lines(required + " " + self._cache.read(param_help), line_min=self.line_min)
+
+    def _load_examples(self, refs):
+        return [[self._load_description(name), self._load_description(text)] for name, text in refs]
+
+    def _add_branches(self, branch, words):
+        """ builds the command tree from the prefix index of the cache """
+        for word, sub_words in words.items():
+            self.completable[word] = None
+            if not branch.has_child(word):
+                branch.add_child(CommandBranch(word))
+            self._add_branches(branch.get_child(word), sub_words)
 
-        with open(os.path.join(cache_path, command_file), 'r') as help_file:
-            data = json.load(help_file)
+    def _gather_from_files(self, config):
+        """ gathers from the files in a way that is convienent to use """
+        self.line_min = int(_get_window_columns()) - 2 * TOLERANCE
+        self._cache = self._open_cache(config)
         self.add_exit()
-        commands = data.keys()
+        self._add_branches(self.command_tree, self._cache.tree)
 
-        for command in commands:
-            branch = self.command_tree
-            for word in command.split():
-                if word not in self.completable:
-                    self.completable.append(word)
-                if not branch.has_child(word):
-                    branch.add_child(CommandBranch(word))
-                branch = branch.get_child(word)
-
-            description = data[command]['help']
-            self.descrip[command] = add_new_lines(description, line_min=int(cols) - 2 * TOLERANCE)
-
-            if 'examples' in data[command]:
-                examples = []
-                for example in data[command]['examples']:
-                    examples.append([
-                        add_new_lines(example[0], line_min=int(cols) - 2 * TOLERANCE),
-                        add_new_lines(example[1], line_min=int(cols) - 2 * TOLERANCE)])
-                self.command_example[command] = examples
-
-            command_params = data[command].get('parameters', {})
-            for param in command_params:
-                if '==SUPPRESS==' not in command_params[param]['help']:
-                    param_aliases = set()
-
-                    for par in command_params[param]['name']:
-                        param_aliases.add(par)
-
-                        self.param_descript[command + " " + par] = \
-                            add_new_lines(
-                                command_params[param]['required'] +
-                                " " + command_params[param]['help'],
-                                line_min=int(cols) - 2 * TOLERANCE)
-                        if par not in self.completable_param:
-                            self.completable_param.append(par)
-
-                    param_doubles = self.command_param_info.get(command, {})
-                    for alias in param_aliases:
-                        param_doubles[alias] = param_aliases
-                    self.command_param_info[command] = param_doubles
+        for command, entry in self._cache.commands.items():
+            self.descrip.set_ref(command, entry['help'])
+
+            if 'examples' in entry:
+                self.command_example.set_ref(command, entry['examples'])
+
+            for param_aliases, required, param_help in entry['parameters']:
+                for par in param_aliases:
+                    self.param_descript.set_ref(command + " " + par, (required, param_help))
+                    if required:
+                        self.required_param.add(command + " " + par)
+                    self.completable_param[par] = None
+
+                param_doubles = self.command_param_info.get(command, {})
+                alias_set = set(param_aliases)
+                for alias in param_aliases:
+                    param_doubles[alias] = alias_set
+                self.command_param_info[command] = param_doubles
 
     def get_all_subcommands(self):
         """ returns all the subcommands """
-        subcommands = []
+        top_level = self.command_tree.children
+        subcommands = OrderedDict()
         for command in self.descrip:
             for word in command.split():
-                for kid in self.command_tree.children:
-                    if word != kid and word not in subcommands:
-                        subcommands.append(word)
-        return subcommands
+                # any word differing from some top level command
+                if len(top_level) > 1 or (top_level and word not in top_level):
+                    subcommands[word] = None
+        return list(subcommands)
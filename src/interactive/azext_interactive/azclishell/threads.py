@@ -7,7 +7,7 @@ import threading
 
 
 class LoadCommandTableThread(threading.Thread):
-    """ a thread that loads the command table """
+    """ a thread that refreshes the cached command table """
     def __init__(self, target, shell):
         super(LoadCommandTableThread, self).__init__()
         self.initialize_function = target
@@ -18,7 +18,25 @@ class LoadCommandTableThread(threading.Thread):
         from ._dump_commands import FreshTable
 
         try:
-            FreshTable(self.shell).dump_command_table(self.shell)
+            if FreshTable(self.shell).dump_command_table(self.shell):
+                self.initialize_function()
+        except KeyboardInterrupt:
+            pass
+
+
+class LoadCommandLoaderThread(threading.Thread):
+    """ a thread that loads the command loader the dynamic completions need """
+    def __init__(self, target, shell):
+        super(LoadCommandLoaderThread, self).__init__()
+        self.initialize_function = target
+        self.shell = shell
+        self.daemon = True
+
+    def run(self):
+        from ._dump_commands import FreshTable
+
+        try:
+            FreshTable(self.shell).load_command_loader(self.shell)
             self.initialize_function()
         except KeyboardInterrupt:
             pass
@@ -0,0 +1,63 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import unittest
+
+import mock
+
+from azure.cli.core import AzCommandsLoader
+from azure.cli.core.commands import AzCliCommand
+from azure.cli.core.mock import DummyCli
+from azure.cli.core.parser import AzCliCommandParser
+from knack.arguments import CLICommandArgument
+from azext_interactive.azclishell.argfinder import CommandArgsFinder
+
+
+def _handler(resource_group_name, name, sku=None):  # pylint: disable=unused-argument
+    pass
+
+
+class ArgsFinderTest(unittest.TestCase):
+
+    def setUp(self):
+        loader = AzCommandsLoader(DummyCli())
+        self.command_table = {}
+        for command_name in ('vm create', 'vm delete'):
+            command = AzCliCommand(loader, command_name, _handler)
+            command.arguments = {
+                'resource_group_name': CLICommandArgument(
+                    'resource_group_name', options_list=['--resource-group', '-g'], required=True),
+                'name': CLICommandArgument('name', options_list=['--name', '-n'], required=True),
+                'sku': CLICommandArgument('sku', options_list=['--sku'], choices=['Standard', 'Premium'])
+            }
+            self.command_table[command_name] = command
+        self.finder = CommandArgsFinder(AzCliCommandParser(add_help=False), self.command_table)
+
+    def test_parsed_args(self):
+        parsed_args = self.finder.get_parsed_args('vm create', ['-g', 'rg', '--sku', 'Premium', '-n'])
+        self.assertEqual(parsed_args.resource_group_name, 'rg')
+        self.assertEqual(parsed_args.sku, 'Premium')
+        self.assertEqual(parsed_args.command, 'vm create')
+
+    def test_errors_are_quiet(self):
+        with mock.patch('azure.cli.core.parser.logger') as logger:
+            parsed_args = self.finder.get_parsed_args('vm create', ['-g', 'rg', '--sku', 'Basic', '--unknown'])
+        self.assertEqual(parsed_args.resource_group_name, 'rg')
+        logger.error.assert_not_called()
+
+    def test_parsers_are_built_per_command_and_reused(self):
+        with mock.patch.object(self.finder, '_build_parser', wraps=self.finder._build_parser) \
+                as build_parser:
+            first = self.finder.get_parsed_args('vm create', ['-g', 'rg'])
+            self.assertIs(self.finder.get_parsed_args('vm create', ['-g', 'rg']), first)
+            self.finder.get_parsed_args('vm create', ['-g', 'other'])
+        build_parser.assert_called_once_with('vm create')
+
+        self.finder.load_command_table({'vm delete': self.command_table['vm delete']})
+        self.assertEqual(self.finder.get_parsed_args('vm delete', ['-n', 'vm1']).name, 'vm1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import timeit
+import unittest
+
+import mock
+
+from azure.cli.core.mock import DummyCli
+from azext_interactive.azclishell._command_cache import write_command_cache
+from azext_interactive.azclishell.az_completer import AzCompleter
+from azext_interactive.azclishell.gather_commands import GatherCommands
+
+from prompt_toolkit.document import Document
+
+
+# the benchmarks time real work, so they only run when asked for
+RUN_BENCHMARKS = os.environ.get('AZURE_INTERACTIVE_BENCHMARKS', '').lower() in ('1', 'true', 'yes')
+
+# what a user typed, replayed one keystroke at a time
+RECORDED_INPUT = [
+    'group7 sub3 command5 --resource-group MyGroup --na',
+    'group12 sub9 command1 --PARAM-1',
+    'group49 sub0 command9 -',
+    'group3 sub5 ',
+    'gro',
+]
+
+
+def make_help_dump(num_commands, params_per_command=20):
+    """ a synthetic help dump of groups of 10 sub groups of 10 commands """
+    data = {}
+    for index in range(num_commands):
+        group, sub_group, command = index // 100, index // 10 % 10, index % 10
+        parameters = {
+            '--resource-group': {'name': ['--resource-group', '-g'], 'required': '[Required]',
+                                 'help': 'Name of resource group.'},
+            '--name': {'name': ['--name', '-n'], 'required': '[Required]', 'help': 'Name of the resource.'}
+        }
+        for param in range(params_per_command):
+            parameters['--param-{}'.format(param)] = {
+                'name': ['--param-{}'.format(param)], 'required': '',
+                'help': 'Parameter {} of command {}.'.format(param, index)}
+        data['group{} sub{} command{}'.format(group, sub_group, command)] = {
+            'help': 'Does thing {} to the resource.'.format(index),
+            'parameters': parameters,
+            'examples': [['Do thing {}'.format(index), 'az group{} sub{} command{} -g rg -n name'.format(
+                group, sub_group, command)]]
+        }
+        data['group{} sub{}'.format(group, sub_group)] = {'help': 'Sub group {}.'.format(sub_group)}
+        data['group{}'.format(group)] = {'help': 'Group {}.'.format(group)}
+    return data
+
+
+def make_distinct_help_dump(num_commands, params_per_command=5):
+    """ a synthetic help dump where every command has its own name and option, so the indexes grow with it """
+    data = {}
+    for index in range(num_commands):
+        group, sub_group = index // 100, index // 10 % 10
+        parameters = {
+            '--resource-group': {'name': ['--resource-group', '-g'], 'required': '[Required]',
+                                 'help': 'Name of resource group.'},
+            '--name': {'name': ['--name', '-n'], 'required': '[Required]', 'help': 'Name of the resource.'},
+            '--setting-{}'.format(index): {'name': ['--setting-{}'.format(index)], 'required': '',
+                                           'help': 'Setting of command {}.'.format(index)}
+        }
+        for param in range(params_per_command):
+            parameters['--param-{}'.format(param)] = {
+                'name': ['--param-{}'.format(param)], 'required': '', 'help': 'Parameter {}.'.format(param)}
+        data['group{} sub{} command{}'.format(group, sub_group, index)] = {
+            'help': 'Does thing {} to the resource.'.format(index),
+            'parameters': parameters
+        }
+        data['group{} sub{}'.format(group, sub_group)] = {'help': 'Sub group {}.'.format(sub_group)}
+        data['group{}'.format(group)] = {'help': 'Group {}.'.format(group)}
+    return data
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'set AZURE_INTERACTIVE_BENCHMARKS=1 to run the benchmarks')
+class BenchmarkBase(unittest.TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.config_dir)
+        os.makedirs(os.path.join(self.config_dir, 'cache'))
+
+    def write_cache(self, data):
+        write_command_cache(os.path.join(self.config_dir, 'cache', 'command_cache.bin'), data)
+
+    def gather(self):
+        config = mock.MagicMock()
+        config.get_config_dir.return_value = self.config_dir
+        config.get_command_cache.return_value = 'command_cache.bin'
+        return GatherCommands(config)
+
+
+class CompletionBenchmark(BenchmarkBase):
+
+    def test_keystroke_latency(self):
+        shell_ctx = mock.MagicMock(cli_ctx=DummyCli(), default_command='')
+        self.write_cache(make_help_dump(5000))
+        completer = AzCompleter(shell_ctx, self.gather())
+
+        latencies = []
+        for line in RECORDED_INPUT:
+            for end in range(1, len(line) + 1):
+                document = Document(line[:end])
+                start = timeit.default_timer()
+                list(completer.get_completions(document, None))
+                latencies.append(timeit.default_timer() - start)
+
+        document = Document('group3 sub5 command')
+        self.assertEqual([completion.text for completion in completer.get_completions(document, None)],
+                         ['command{}'.format(command) for command in range(10)])
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * .95)]
+        # generous bound so the benchmark flags regressions without being flaky
+        self.assertLess(p95, 0.05, 'p95 keystroke latency of {:.3f} ms'.format(p95 * 1000))
+
+
+class GatherBenchmark(BenchmarkBase):
+
+    def test_gather_scaling(self):
+        timings = {}
+        for num_commands in (1000, 5000, 20000):
+            self.write_cache(make_distinct_help_dump(num_commands))
+            start = timeit.default_timer()
+            commands = self.gather()
+            subcommands = commands.get_all_subcommands()
+            timings[num_commands] = timeit.default_timer() - start
+            commands.close()
+
+            self.assertEqual(len(commands.completable_param), num_commands + 5 + 4)
+            self.assertIn('command{}'.format(num_commands - 1), subcommands)
+
+        # linear gathering grows about 20x, a quadratic one would grow 400x
+        self.assertLess(timings[20000], timings[1000] * 100, 'gathering took {}'.format(timings))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import argparse
 import os
 import unittest
 import mock
@@ -104,6 +105,12 @@ class CompletionTest(unittest.TestCase):
         not_expected = set(['-n', '-h', '-g'])
         self.verify_completions(gen, expected, 0, all_completions_expected=False, unexpected_completions=not_expected)
 
+        # required params come first, ranked without loading any description
+        with mock.patch.object(self.completer.param_description, '_load') as load:
+            params = self.completer.get_param_trie('storage account create').find('--')
+        self.assertEqual(params[:3], ['--name', '--resource-group', '--access-tier'])
+        load.assert_not_called()
+
         # test single dash aliased params
         doc = Document(u'storage account create -')
         gen = self.completer.get_completions(doc, None)
@@ -142,6 +149,43 @@ class CompletionTest(unittest.TestCase):
         self.assertEqual(completion.text, '-g')
         self.assertIn('Name of resource group', completion._display_meta)
 
+    def test_dynamic_completion_filters_cached_completions(self):
+        class SyncWorker(object):
+            def __init__(self):
+                self.cache = {}
+
+            def request(self, key, func, on_done=None):  # pylint: disable=unused-argument
+                if key not in self.cache:
+                    self.cache[key] = func()
+                return self.cache[key]
+
+        calls = []
+
+        def completer(prefix, action, parsed_args):  # pylint: disable=unused-argument
+            # filters by prefix like argcomplete's FilesCompleter
+            calls.append(prefix)
+            return [path for path in ['foo/a1', 'foo/a2', 'foo/b1', 'bar'] if path.startswith(prefix)]
+
+        argument = mock.MagicMock(completer=completer, choices=None)
+        self.completer.cmdtab = {'storage blob upload': mock.MagicMock(arguments={'file_path': argument})}
+        self.completer.completion_worker = SyncWorker()
+
+        def complete(text):
+            self.completer.current_command = 'storage blob upload'
+            self.completer.leftover_args = ['--file']
+            self.completer.unfinished_word = text.split()[-1]
+            self.completer.document_text = text
+            with mock.patch.object(self.completer, 'get_arg_name', return_value='file_path'), \
+                    mock.patch.object(self.completer, 'get_parsed_args', return_value=argparse.Namespace()), \
+                    mock.patch.object(self.completer, 'get_subscription_id', return_value='sub'):
+                return [completion.text for completion in self.completer.gen_dynamic_completions(text)]
+
+        self.assertEqual(complete('storage blob upload --file foo/a'), ['foo/a1', 'foo/a2'])
+        self.assertEqual(complete('storage blob upload --file foo/b'), ['foo/b1'])
+        self.assertEqual(complete('storage blob upload --file b'), ['bar'])
+        # the directory is listed once for every prefix under it
+        self.assertEqual(calls, ['foo/', ''])
+
 
 if __name__ == '__main__':
     unittest.main()
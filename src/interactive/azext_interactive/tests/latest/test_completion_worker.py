@@ -0,0 +1,109 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import argparse
+import threading
+import unittest
+
+from azext_interactive.azclishell.completion_worker import (
+    CompletionCache, CompletionWorker, hash_parsed_args, resolve_completer_call)
+
+
+class CompletionWorkerTest(unittest.TestCase):
+
+    def test_cache_expires_and_evicts(self):
+        now = [0]
+        cache = CompletionCache(max_size=2, ttl=10, clock=lambda: now[0])
+        cache.put('a', ['a1'])
+        cache.put('b', ['b1'])
+        self.assertEqual(cache.get('a'), ['a1'])
+
+        # 'b' is the least recently used
+        cache.put('c', ['c1'])
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), ['a1'])
+
+        now[0] = 11
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('c'))
+
+    def test_resolve_completer_call(self):
+        def full(prefix, action, parsed_args):  # pylint: disable=unused-argument
+            return ['full']
+
+        def keywords(**kwargs):  # pylint: disable=unused-argument
+            return ['keywords']
+
+        def prefix_only(prefix):  # pylint: disable=unused-argument
+            return ['prefix']
+
+        def no_args():
+            return ['none']
+
+        self.assertEqual(resolve_completer_call(full)(full, 'pre', None), ['full'])
+        self.assertEqual(resolve_completer_call(keywords)(keywords, 'pre', None), ['keywords'])
+        self.assertEqual(resolve_completer_call(prefix_only)(prefix_only, 'pre', None), ['prefix'])
+        self.assertEqual(resolve_completer_call(no_args)(no_args, 'pre', None), ['none'])
+
+    def test_hash_parsed_args(self):
+        parsed_args = argparse.Namespace(resource_group_name='rg', name='vm', tags=['a'], func=object())
+        self.assertEqual(hash_parsed_args(parsed_args, skip='name'),
+                         (('resource_group_name', 'rg'), ('tags', ('a',))))
+
+    def test_request_runs_in_background(self):
+        release = threading.Event()
+        done = threading.Event()
+        calls = []
+
+        def completer():
+            release.wait(5)
+            calls.append(1)
+            return ['rg1', 'rg2']
+
+        worker = CompletionWorker(max_workers=1)
+        self.assertIsNone(worker.request('key', completer, on_done=done.set))
+        # asking again while it runs does not start another call
+        self.assertIsNone(worker.request('key', completer, on_done=done.set))
+        release.set()
+        self.assertTrue(done.wait(5))
+        self.assertEqual(worker.request('key', completer), ['rg1', 'rg2'])
+        self.assertEqual(calls, [1])
+
+    def test_worker_threads_are_daemons(self):
+        worker = CompletionWorker(max_workers=2)
+        before = set(threading.enumerate())
+        done = threading.Event()
+        worker.request('key', lambda: [], on_done=done.set)
+        self.assertTrue(done.wait(5))
+        started = [thread for thread in threading.enumerate() if thread not in before]
+        self.assertEqual(len(started), 2)
+        self.assertTrue(all(thread.daemon for thread in started))
+
+    def test_stale_requests_are_cancelled(self):
+        release = threading.Event()
+        running = threading.Event()
+        started = []
+
+        def slow():
+            started.append('slow')
+            running.set()
+            release.wait(5)
+            return []
+
+        worker = CompletionWorker(max_workers=1)
+        worker.request('first', slow)
+        self.assertTrue(running.wait(5))
+        worker.request('second', lambda: started.append('second') or [])
+        # the input changed again before 'second' could start
+        done = threading.Event()
+        worker.request('third', lambda: ['third'], on_done=done.set)
+        release.set()
+        self.assertTrue(done.wait(5))
+        self.assertEqual(started, ['slow'])
+        self.assertEqual(worker.request('third', None), ['third'])
+
+
+if __name__ == '__main__':
+    unittest.main()
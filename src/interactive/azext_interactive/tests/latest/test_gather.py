@@ -3,8 +3,20 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import json
+import os
+import shutil
+import tempfile
 import unittest
-from azext_interactive.azclishell.gather_commands import add_new_lines as nl
+
+import mock
+
+from azext_interactive.azclishell import _dump_commands
+from azext_interactive.azclishell._command_cache import CommandCache, write_command_cache
+from azext_interactive.azclishell.gather_commands import add_new_lines as nl, GatherCommands
+
+
+TEST_DIR = os.path.abspath(os.path.join(os.path.abspath(__file__), '..'))
 
 
 class GatherTest(unittest.TestCase):
@@ -55,6 +67,146 @@ class GatherTest(unittest.TestCase):
             nl(phrase3, 1, tolerance=6)
         )
 
+    def test_binary_command_cache(self):
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        os.makedirs(os.path.join(config_dir, 'cache'))
+        with open(os.path.join(TEST_DIR, 'cache', 'help_dump_test.json'), 'r') as help_file:
+            data = json.load(help_file)
+        write_command_cache(os.path.join(config_dir, 'cache', 'command_cache.bin'), data)
+
+        cache = CommandCache.open(os.path.join(config_dir, 'cache', 'command_cache.bin'))
+        self.addCleanup(cache.close)
+        self.assertIn('create', cache.tree['storage']['account'])
+        self.assertEqual(cache.read(cache.commands['vm create']['help']), data['vm create']['help'])
+
+        def _config(directory, command_cache):
+            config = mock.MagicMock()
+            config.get_config_dir.return_value = directory
+            config.get_help_files.return_value = 'help_dump_test.json'
+            config.get_command_cache.return_value = command_cache
+            return config
+
+        from_json = GatherCommands(_config(TEST_DIR, 'missing.bin'))
+        from_binary = GatherCommands(_config(config_dir, 'command_cache.bin'))
+        self.addCleanup(from_binary.close)
+        self.assertIsInstance(from_binary._cache, type(cache))  # pylint: disable=protected-access
+
+        self.assertEqual(set(from_json.completable), set(from_binary.completable))
+        self.assertEqual(from_json.completable_param, from_binary.completable_param)
+        self.assertEqual(from_json.command_param_info, from_binary.command_param_info)
+        self.assertEqual(dict(from_json.descrip), dict(from_binary.descrip))
+        self.assertEqual(dict(from_json.param_descript), dict(from_binary.param_descript))
+        self.assertEqual(dict(from_json.command_example), dict(from_binary.command_example))
+        self.assertEqual(set(from_json.command_tree.children), set(from_binary.command_tree.children))
+
+    def test_cache_generations(self):
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        cache_path = os.path.join(config_dir, 'command_cache.bin')
+        with self.assertRaises(IOError):
+            CommandCache.open(cache_path)
+
+        write_command_cache(cache_path, {'vm': {'help': 'Old help.'}})
+        old_cache = CommandCache.open(cache_path)
+        self.addCleanup(old_cache.close)
+
+        # a shell that has the old generation mapped keeps reading it
+        write_command_cache(cache_path, {'vm': {'help': 'New help.'}})
+        self.assertEqual(old_cache.read(old_cache.commands['vm']['help']), 'Old help.')
+        new_cache = CommandCache.open(cache_path)
+        self.addCleanup(new_cache.close)
+        self.assertEqual(new_cache.read(new_cache.commands['vm']['help']), 'New help.')
+
+        write_command_cache(cache_path, {'vm': {'help': 'Newest help.'}})
+        self.assertEqual(os.listdir(config_dir), ['command_cache.bin.3'])
+
+    def test_incremental_refresh(self):
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        shell_ctx = mock.MagicMock()
+        shell_ctx.config.get_config_dir.return_value = config_dir
+        shell_ctx.config.get_command_cache.return_value = 'command_cache.bin'
+        cache_path = os.path.join(config_dir, 'cache', 'command_cache.bin')
+
+        def _command(help_text):
+            return {'help': help_text, 'examples': '', 'parameters': {
+                '--name': {'name': ['--name', '-n'], 'required': '[Required]', 'help': 'The name.'}}}
+
+        full_table = {
+            'vm': {'help': 'Manage VMs.'},
+            'vm create': _command('Create a VM.'),
+            'vm repair': {'help': 'Repair VMs.'},
+            'vm repair create': _command('Create a repair VM.'),
+        }
+        fingerprint = {'core': '2.10.0', 'extensions': {'vm-repair': '0.3.0'}}
+        table = _dump_commands.FreshTable(shell_ctx)
+
+        with mock.patch.object(_dump_commands, 'get_cache_fingerprint', lambda: fingerprint), \
+                mock.patch.object(_dump_commands.FreshTable, 'load_command_loader') as load_command_loader, \
+                mock.patch.object(_dump_commands, 'get_command_table_data') as get_command_table_data:
+            get_command_table_data.return_value = (full_table, {'vm repair create': 'vm-repair'}, [])
+            self.assertTrue(table.dump_command_table())
+            load_command_loader.assert_called_once_with(shell_ctx)
+
+            # nothing changed, nothing is loaded
+            load_command_loader.reset_mock()
+            self.assertFalse(table.dump_command_table())
+            load_command_loader.assert_not_called()
+
+            # only the removed extension is dropped and only the new one is loaded
+            fingerprint = {'core': '2.10.0', 'extensions': {'alias': '0.5.2'}}
+            get_command_table_data.return_value = ({'alias': {'help': 'Manage aliases.'},
+                                                    'alias list': _command('List aliases.')},
+                                                   {'alias list': 'alias'}, [])
+            self.assertTrue(table.dump_command_table())
+            load_command_loader.assert_called_once_with(shell_ctx, extensions=set(['vm-repair', 'alias']))
+
+        cache = CommandCache.open(cache_path)
+        self.addCleanup(cache.close)
+        self.assertEqual(cache.fingerprint, fingerprint)
+        self.assertEqual(set(cache.commands), set(['vm', 'vm create', 'alias', 'alias list']))
+        self.assertEqual(cache.sources, {'alias list': 'alias'})
+        self.assertEqual(cache.to_help_dump(['vm create'])['vm create']['parameters']['--name']['help'], 'The name.')
+
+    def test_removing_an_override_reloads_everything(self):
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        shell_ctx = mock.MagicMock()
+        shell_ctx.config.get_config_dir.return_value = config_dir
+        shell_ctx.config.get_command_cache.return_value = 'command_cache.bin'
+        cache_path = os.path.join(config_dir, 'cache', 'command_cache.bin')
+
+        overridden_table = {
+            'vm': {'help': 'Manage VMs.'},
+            'vm create': {'help': 'Create a VM, the extension way.'}
+        }
+        fingerprint = {'core': '2.10.0', 'extensions': {'vm-preview': '0.1.0'}}
+        table = _dump_commands.FreshTable(shell_ctx)
+
+        with mock.patch.object(_dump_commands, 'get_cache_fingerprint', lambda: fingerprint), \
+                mock.patch.object(_dump_commands.FreshTable, 'load_command_loader') as load_command_loader, \
+                mock.patch.object(_dump_commands, 'get_command_table_data') as get_command_table_data:
+            get_command_table_data.return_value = (overridden_table, {'vm create': 'vm-preview'}, ['vm create'])
+            self.assertTrue(table.dump_command_table())
+
+            cache = CommandCache.open(cache_path)
+            self.assertEqual(cache.overrides, set(['vm create']))
+            cache.close()
+
+            # the module's own 'vm create' has to come back, so the whole table is loaded again
+            load_command_loader.reset_mock()
+            fingerprint = {'core': '2.10.0', 'extensions': {}}
+            get_command_table_data.return_value = ({'vm': {'help': 'Manage VMs.'},
+                                                    'vm create': {'help': 'Create a VM.'}}, {}, [])
+            self.assertTrue(table.dump_command_table())
+            load_command_loader.assert_called_once_with(shell_ctx)
+
+        cache = CommandCache.open(cache_path)
+        self.addCleanup(cache.close)
+        self.assertEqual(cache.overrides, set())
+        self.assertEqual(cache.to_help_dump(['vm create'])['vm create']['help'], 'Create a VM.')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -11,6 +11,8 @@ import mock
 from azure.cli.core.mock import DummyCli
 from azext_interactive.azclishell.configuration import Configuration
 from azext_interactive.azclishell.app import AzInteractiveShell
+from azext_interactive.azclishell.command_tree import CommandBranch
+from azext_interactive.azclishell.completion_trie import CompletionTrie
 
 
 TEST_DIR = os.path.abspath(os.path.join(os.path.abspath(__file__), '..'))
@@ -71,6 +73,41 @@ class CommandTreeTest(unittest.TestCase):
         self.assertEqual(current_command, 'storage account create')
         self.assertEqual(leftover_args, ['--name', 'MyStorageAccount'])
 
+    def test_children_trie(self):
+        self.init_tree()
+
+        self.assertEqual(self.command_tree.get_children_trie().find('VM'), ['vm', 'vmss'])
+        self.assertEqual(self.command_tree.get_children_trie().find('vms'), ['vmss'])
+        self.assertEqual(self.command_tree.get_children_trie().find('vmx'), [])
+
+        # new children, e.g. aliases injected by other extensions, show up in the trie
+        self.command_tree.add_child(CommandBranch('vmalias'))
+        self.assertEqual(self.command_tree.get_children_trie().find('vm'), ['vm', 'vmalias', 'vmss'])
+
+        # so do children swapped in the dictionary directly
+        del self.command_tree.children['vmalias']
+        self.command_tree.children['vmother'] = CommandBranch('vmother')
+        self.assertEqual(self.command_tree.get_children_trie().find('vm'), ['vm', 'vmother', 'vmss'])
+
+        # the trie is built again only after the children change
+        trie = self.command_tree.get_children_trie()
+        self.assertIs(self.command_tree.get_children_trie(), trie)
+        self.command_tree.children.pop('vmother')
+        self.assertIsNot(self.command_tree.get_children_trie(), trie)
+        self.assertEqual(self.command_tree.get_children_trie().find('vm'), ['vm', 'vmss'])
+
+    def test_completion_trie(self):
+        trie = CompletionTrie([('--name', ' --name'), ('--nic', '--nic'), ('-n', ' -n'), ('--no-wait', '--no-wait')])
+
+        self.assertEqual(trie.find(''), ['--name', '-n', '--nic', '--no-wait'])
+        self.assertEqual(trie.find('--n'), ['--name', '--nic', '--no-wait'])
+        # appended characters continue from the previous lookup
+        self.assertEqual(trie.find('--NO'), ['--no-wait'])
+        self.assertEqual(trie.find('--nox'), [])
+        self.assertEqual(trie.find('--noxy'), [])
+        # a shorter prefix starts over
+        self.assertEqual(trie.find('--ni'), ['--nic'])
+
 
 if __name__ == '__main__':
     unittest.main()
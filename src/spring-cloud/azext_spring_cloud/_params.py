@@ -10,7 +10,8 @@ from azure.cli.core.commands.parameters import (name_type, get_location_type, re
 from ._validators import (validate_env, validate_cosmos_type, validate_resource_id, validate_location,
                           validate_name, validate_app_name, validate_deployment_name, validate_log_lines,
                           validate_log_limit, validate_log_since, validate_sku, validate_jvm_options,
-                          validate_vnet, validate_vnet_required_parameters, validate_node_resource_group)
+                          validate_vnet, validate_vnet_required_parameters, validate_node_resource_group,
+                          validate_upload_options)
 from ._utils import ApiType
 
 from .vendored_sdks.appplatform.models import RuntimeVersion, TestKeyType
@@ -132,6 +133,10 @@ def load_arguments(self, _):
                 'target_module', help='Child module to be deployed, required for multiple jar packages built from source code')
             c.argument(
                 'version', help='Deployment version, keep unchanged if not set.')
+            c.argument('upload_connections', type=int, validator=validate_upload_options, arg_group='Upload',
+                       help='Number of parallel connections to upload the jar or source code with, in the range [1,32]. Fewer are used while the file share throttles the upload. Default: 4.')
+            c.argument('upload_range_size', type=int, arg_group='Upload',
+                       help='Size in MB of each range uploaded, in the range [1,4]. Default: 4.')
 
     with self.argument_context('spring-cloud app deployment create') as c:
         c.argument('skip_clone_settings', help='Create staging deployment will automatically copy settings from production deployment.',
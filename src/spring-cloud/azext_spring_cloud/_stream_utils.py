@@ -7,18 +7,18 @@
 
 import time
 import colorama   # pylint: disable=import-error
-from io import BytesIO
 from random import uniform
 from knack.util import CLIError
 from knack.log import get_logger
 from msrestazure.azure_exceptions import CloudError
-from azure.multiapi.storage.v2018_11_09.blob import AppendBlobService
 from azure.common import AzureHttpError
 from ._utils import get_blob_info
 
 logger = get_logger(__name__)
 
-DEFAULT_CHUNK_SIZE = 1024 * 4
+# the range read when the log is followed, doubled while more of the log is waiting up to the largest range
+MIN_CHUNK_SIZE = 1024 * 4
+MAX_CHUNK_SIZE = 1024 * 1024 * 4
 DEFAULT_LOG_TIMEOUT_IN_SEC = 60 * 30  # 30 minutes
 
 
@@ -30,6 +30,7 @@ def stream_logs(client,
                 no_format=False,
                 raise_error_on_failure=True,
                 logger_level_func=logger.warning):
+    from azure.multiapi.storage.v2018_11_09.blob import AppendBlobService
     log_file_sas = None
     error_msg = "Could not get logs for Service: {}".format(service)
 
@@ -51,7 +52,7 @@ def stream_logs(client,
         log_file_sas)
 
     _stream_logs(no_format,
-                 DEFAULT_CHUNK_SIZE,
+                 MAX_CHUNK_SIZE,
                  DEFAULT_LOG_TIMEOUT_IN_SEC,
                  AppendBlobService(
                      account_name=account_name,
@@ -63,6 +64,83 @@ def stream_logs(client,
                  logger_level_func)
 
 
+class _RangeBuffer(object):
+    """ the file object the ranges of the log are read into, one at a time, reusing the same memory """
+
+    def __init__(self, size):
+        self.buffer = bytearray(size)
+        self._view = memoryview(self.buffer)
+        self.length = 0
+
+    def reset(self):
+        self.length = 0
+
+    def write(self, data):
+        end = self.length + len(data)
+        if end > len(self.buffer):
+            self._view.release()
+            self.buffer = self.buffer[:self.length] + bytearray(end - self.length)
+            self._view = memoryview(self.buffer)
+        self._view[self.length:end] = data
+        self.length = end
+
+    def tell(self):
+        return self.length
+
+    def seekable(self):  # pylint: disable=no-self-use
+        return False
+
+
+class _LogLineSplitter(object):
+    """
+    Emits the complete lines of the log as they are read, ending at a '\r' which may be followed by a '\n'.
+    The lines completed by a range are emitted together, the partial line after them is kept for the next range.
+    """
+
+    def __init__(self, emit):
+        self.emit = emit
+        self._pending = bytearray()
+        self._skip_newline = False
+
+    def feed(self, buffer, length):
+        if not length:
+            return
+        start = 1 if self._skip_newline and buffer[0] == ord('\n') else 0
+        self._skip_newline = False
+        end = buffer.rfind(b'\r', start, length)
+        view = memoryview(buffer)
+        try:
+            if end < 0:
+                self._pending += view[start:length]
+                return
+            if self._pending:
+                self._pending += view[start:end + 1]
+                self.flush()
+            else:
+                self.emit(str(view[start:end + 1], 'utf-8', 'ignore'))
+            end += 1
+            if end == length:
+                self._skip_newline = True
+            elif buffer[end] == ord('\n'):
+                end += 1
+            self._pending += view[end:length]
+        finally:
+            view.release()
+
+    def flush(self):
+        if self._pending:
+            self.emit(self._pending.decode('utf-8', errors='ignore'))
+            self._pending = bytearray()
+
+
+def _next_range_size(backlog, min_size, max_size):
+    """ the smallest range, doubling from min_size, that reads the backlog of the log at once, up to max_size """
+    size = min_size
+    while size < backlog and size < max_size:
+        size *= 2
+    return min(size, max_size)
+
+
 def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-statements, too-many-branches
                  byte_size,
                  timeout_in_seconds,
@@ -70,15 +148,20 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
                  container_name,
                  blob_name,
                  raise_error_on_failure,
-                 logger_level_func):
+                 logger_level_func,
+                 min_byte_size=MIN_CHUNK_SIZE):
+    """
+    Follows the log until it is complete. The log is read in ranges of min_byte_size to byte_size bytes,
+    the larger the more of the log is waiting to be read, into a buffer reused for every range.
+    """
 
     if not no_format:
         colorama.init()
 
-    stream = BytesIO()
+    buffer = _RangeBuffer(byte_size)
+    lines = _LogLineSplitter(logger_level_func)
     metadata = {}
     start = 0
-    end = byte_size - 1
     available = 0
     sleep_time = 1
     max_sleep_time = 15
@@ -104,43 +187,21 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
             consecutive_sleep_in_sec = 0
 
             try:
-                old_byte_size = len(stream.getvalue())
+                buffer.reset()
                 blob_service.get_blob_to_stream(
                     container_name=container_name,
                     blob_name=blob_name,
                     start_range=start,
-                    end_range=end,
-                    stream=stream)
-
-                curr_bytes = stream.getvalue()
-                new_byte_size = len(curr_bytes)
-                amount_read = new_byte_size - old_byte_size
-                start += amount_read
-                end = start + byte_size - 1
-
-                # Only scan what's newly read. If nothing is read, default to 0.
-                min_scan_range = max(new_byte_size - amount_read - 1, 0)
-                for i in range(new_byte_size - 1, min_scan_range, -1):
-                    if curr_bytes[i - 1:i + 1] == b'\r\n':
-                        flush = curr_bytes[:i]  # won't logger.warning \n
-                        stream = BytesIO()
-                        stream.write(curr_bytes[i + 1:])
-                        logger_level_func(flush.decode('utf-8', errors='ignore'))
-                        break
-                    if curr_bytes[i:i + 1] == b'\r':
-                        flush = curr_bytes[:i + 1]  # won't logger.warning \n
-                        stream = BytesIO()
-                        stream.write(curr_bytes[i + 1:])
-                        logger_level_func(flush.decode('utf-8', errors='ignore'))
-                        break
-
+                    end_range=start + _next_range_size(available - start, min_byte_size, byte_size) - 1,
+                    stream=buffer,
+                    max_connections=1)
+                start += buffer.length
+                lines.feed(buffer.buffer, buffer.length)
             except AzureHttpError as ae:
                 if ae.status_code != 404:
                     raise CLIError(ae)
             except KeyboardInterrupt:
-                curr_bytes = stream.getvalue()
-                if curr_bytes:
-                    logger_level_func(curr_bytes.decode('utf-8', errors='ignore'))
+                lines.flush()
                 return
 
         try:
@@ -152,8 +213,7 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
             if ae.status_code != 404:
                 raise CLIError(ae)
         except KeyboardInterrupt:
-            if curr_bytes:
-                logger_level_func(curr_bytes.decode('utf-8', errors='ignore'))
+            lines.flush()
             return
         except Exception as err:
             raise CLIError(err)
@@ -161,10 +221,7 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
         if consecutive_sleep_in_sec > timeout_in_seconds:
             # Flush anything remaining in the buffer - this would be the case
             # if the file has expired and we weren't able to detect any \r\n
-            curr_bytes = stream.getvalue()
-            if curr_bytes:
-                logger_level_func(curr_bytes.decode('utf-8', errors='ignore'))
-
+            lines.flush()
             return
 
         # If no new data available but not complete, sleep before trying to process additional data.
@@ -183,10 +240,7 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
     # One final check to see if there's anything in the buffer to flush
     # E.g., metadata has been set and start == available, but the log file
     # didn't end in \r\n, so we were unable to flush out the final contents.
-    curr_bytes = stream.getvalue()
-
-    if curr_bytes:
-        logger_level_func(curr_bytes.decode('utf-8', errors='ignore'))
+    lines.flush()
 
     build_status = _get_run_status(metadata).lower()
     logger_level_func("Log status was: '%s'", build_status)
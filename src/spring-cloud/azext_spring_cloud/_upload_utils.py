@@ -0,0 +1,314 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from knack.util import CLIError
+from knack.log import get_logger
+from ._utils import _pack_source_code
+
+logger = get_logger(__name__)
+
+# the largest range the file service accepts in a single request
+MAX_RANGE_SIZE = 4 * 1024 * 1024
+DEFAULT_MAX_CONNECTIONS = 4
+# the file is grown ahead of the ranges written, by this much at a time
+GROW_SIZE = 64 * 1024 * 1024
+# the service is busy, or the share is over its request rate
+THROTTLED_STATUS_CODES = (500, 503)
+MAX_THROTTLED_RETRIES = 5
+# seconds before the first retry of a throttled range, doubled at each retry
+THROTTLED_RETRY_DELAY = 1
+MB = 1024 * 1024
+DEPLOY_CACHE_FILE_NAME = os.path.join('spring-cloud', 'deploy_cache.json')
+# the artifacts remembered for each service, the most recently deployed first
+MAX_CACHED_ARTIFACTS = 20
+COPY_TIMEOUT = 300
+
+
+class AdaptiveConcurrency(object):
+    """
+    Bounds the requests in flight, like TCP congestion control: the limit is halved when the service throttles
+    a request, and grows by one again after as many successful requests as the limit, up to max_connections.
+    """
+
+    def __init__(self, max_connections):
+        self.max_connections = max_connections
+        self.limit = max_connections
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+                logger.info("The file service is throttling the upload, using %d connections", self.limit)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_connections:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+def _is_throttled(ex):
+    return getattr(ex, 'status_code', None) in THROTTLED_STATUS_CODES
+
+
+class FileRangeWriter(object):  # pylint: disable=too-many-instance-attributes
+    """
+    A write-only file object that uploads what is written to it to an Azure file in ranges sent in parallel.
+    A file of unknown size is created empty and grown as the data comes. close() waits for the ranges and
+    sets the final size of the file.
+
+    progress_callback is called with the bytes uploaded so far and the size of the file, None if unknown.
+    """
+
+    def __init__(self, file_service, share_name, directory_name, file_name, size=None, range_size=MAX_RANGE_SIZE,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, progress_callback=None):
+        self.file_service = file_service
+        self.share_name = share_name
+        self.directory_name = directory_name
+        self.file_name = file_name
+        self.range_size = range_size
+        self.max_connections = max_connections
+        self.progress_callback = progress_callback
+        self.expected_size = size
+        self.size = 0
+        self.uploaded = 0
+        self.concurrency = AdaptiveConcurrency(max_connections)
+        self._allocated = size or 0
+        self._buffer = bytearray()
+        self._executor = ThreadPoolExecutor(max_workers=max_connections)
+        # bounds the ranges held in memory while they wait for a connection
+        self._slots = threading.BoundedSemaphore(max_connections * 2)
+        self._lock = threading.Lock()
+        self._futures = []
+        self._closed = False
+        self.file_service.create_file(share_name, directory_name, file_name, self._allocated)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            for future in self._futures:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+
+    def _upload_range(self, data, start):
+        try:
+            for attempt in range(MAX_THROTTLED_RETRIES + 1):
+                self.concurrency.acquire()
+                try:
+                    self.file_service.update_range(self.share_name, self.directory_name, self.file_name, data,
+                                                   start, start + len(data) - 1)
+                except Exception as ex:  # pylint: disable=broad-except
+                    throttled = _is_throttled(ex)
+                    self.concurrency.release(throttled=throttled)
+                    if not throttled or attempt == MAX_THROTTLED_RETRIES:
+                        raise
+                    time.sleep(min(THROTTLED_RETRY_DELAY * 2 ** attempt, 30))
+                    continue
+                self.concurrency.release()
+                break
+            with self._lock:
+                self.uploaded += len(data)
+                uploaded = self.uploaded
+            if self.progress_callback:
+                self.progress_callback(uploaded, self.expected_size)
+        finally:
+            self._slots.release()
+
+    def _submit(self, data):
+        start = self.size
+        self.size += len(data)
+        if self.size > self._allocated:
+            self._allocated = self.size + GROW_SIZE
+            self.file_service.resize_file(self.share_name, self.directory_name, self.file_name, self._allocated)
+        self._raise_failures()
+        self._slots.acquire()
+        self._futures.append(self._executor.submit(self._upload_range, data, start))
+
+    def _raise_failures(self):
+        done = [future for future in self._futures if future.done()]
+        for future in done:
+            future.result()
+        self._futures = [future for future in self._futures if not future.done()]
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.range_size:
+            self._submit(bytes(self._buffer[:self.range_size]))
+            del self._buffer[:self.range_size]
+        return len(data)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._executor.shutdown(wait=True)
+        if self.size != self._allocated:
+            self.file_service.resize_file(self.share_name, self.directory_name, self.file_name, self.size)
+
+
+class UploadProgress(object):
+    """ reports the progress of an upload with its throughput """
+
+    def __init__(self, cli_ctx):
+        self.controller = cli_ctx.get_progress_controller(det=True)
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def __call__(self, uploaded, total):
+        elapsed = max(time.time() - self.started, 1e-6)
+        message = '{:.1f} MB at {:.1f} MB/s'.format(uploaded / MB, uploaded / MB / elapsed)
+        with self._lock:
+            self.controller.add(message=message, value=uploaded, total_val=total or uploaded)
+
+    def end(self):
+        self.controller.end()
+
+
+def upload_file(file_service, share_name, file_name, path, max_connections=None, range_size=None,
+                progress_callback=None):
+    """ uploads a local file in ranges sent in parallel """
+    range_size = range_size or MAX_RANGE_SIZE
+    with FileRangeWriter(file_service, share_name, None, file_name, size=os.path.getsize(path),
+                         range_size=range_size, max_connections=max_connections or DEFAULT_MAX_CONNECTIONS,
+                         progress_callback=progress_callback) as writer:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(range_size), b''):
+                writer.write(chunk)
+
+
+def upload_source_code(file_service, share_name, file_name, source_location=None, max_connections=None,
+                       range_size=None, progress_callback=None):
+    """ packs the source code and uploads the archive as it is compressed, without a local copy """
+    with FileRangeWriter(file_service, share_name, None, file_name, range_size=range_size or MAX_RANGE_SIZE,
+                         max_connections=max_connections or DEFAULT_MAX_CONNECTIONS,
+                         progress_callback=progress_callback) as writer:
+        _pack_source_code(source_location or os.getcwd(), writer)
+    logger.info("Uploaded %d bytes of source code archive", writer.size)
+
+
+def compute_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(MAX_RANGE_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class DeployCache(object):
+    """
+    The artifacts uploaded before for each service, by SHA-256: the storage account, share and relative path of
+    the uploaded file, so that an identical artifact can be copied from it on the service side.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            from azure.cli.core._environment import get_config_dir
+            path = os.path.join(get_config_dir(), DEPLOY_CACHE_FILE_NAME)
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                self.services = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.services = {}
+
+    def lookup(self, service_key, sha256):
+        return next((entry for entry in self.services.get(service_key, []) if entry['sha256'] == sha256), None)
+
+    def record(self, service_key, sha256, storage_name, share_name, relative_path):
+        entries = [entry for entry in self.services.get(service_key, []) if entry['sha256'] != sha256]
+        entries.insert(0, {'sha256': sha256, 'storageName': storage_name, 'shareName': share_name,
+                           'relativePath': relative_path})
+        self.services[service_key] = entries[:MAX_CACHED_ARTIFACTS]
+        self._save()
+
+    def forget(self, service_key, sha256):
+        self.services[service_key] = [entry for entry in self.services.get(service_key, [])
+                                      if entry['sha256'] != sha256]
+        self._save()
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self.services, f)
+            os.replace(temp_path, self.path)
+        except (IOError, OSError) as ex:
+            # the cache only saves uploads, a deployment doesn't fail because of it
+            logger.debug("Failed to save the deploy cache: %s", ex)
+
+
+def _copy_file(file_service, share_name, source_relative_path, relative_path, size):
+    source_url = file_service.make_file_url(share_name, None, source_relative_path,
+                                            sas_token=file_service.sas_token)
+    copy = file_service.copy_file(share_name, None, relative_path, source_url)
+    deadline = time.time() + COPY_TIMEOUT
+    while copy.status == 'pending':
+        if time.time() > deadline:
+            file_service.abort_copy_file(share_name, None, relative_path, copy.id)
+            raise CLIError("the copy took longer than {} seconds".format(COPY_TIMEOUT))
+        time.sleep(1)
+        copy = file_service.get_file_properties(share_name, None, relative_path).properties.copy
+    if copy.status != 'success':
+        raise CLIError("the copy ended with status '{}'".format(copy.status))
+    copied = file_service.get_file_properties(share_name, None, relative_path).properties.content_length
+    if copied != size:
+        raise CLIError("the copy has {} bytes instead of {}".format(copied, size))
+
+
+def upload_artifact(file_service, storage_name, share_name, relative_path, path, service_key, cache=None,
+                    **upload_options):
+    """
+    uploads a jar or an archive, unless an identical one was uploaded before to the same share, which is then
+    copied on the service side. The upload_options are those of upload_file.
+    """
+    cache = cache or DeployCache()
+    sha256 = compute_sha256(path)
+    entry = cache.lookup(service_key, sha256)
+    if entry and entry['storageName'] == storage_name and entry['shareName'] == share_name:
+        try:
+            _copy_file(file_service, share_name, entry['relativePath'], relative_path, os.path.getsize(path))
+            logger.info("Deploy cache hit: '%s' (sha256 %s) was uploaded before as '%s', copied it on the "
+                        "service side", path, sha256, entry['relativePath'])
+            cache.record(service_key, sha256, storage_name, share_name, relative_path)
+            return True
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.info("Deploy cache: failed to copy '%s' uploaded before (%s), uploading it again",
+                        entry['relativePath'], ex)
+            cache.forget(service_key, sha256)
+    else:
+        logger.info("Deploy cache miss: '%s' (sha256 %s) was not uploaded before", path, sha256)
+    upload_file(file_service, share_name, relative_path, path, **upload_options)
+    cache.record(service_key, sha256, storage_name, share_name, relative_path)
+    return False
@@ -5,12 +5,15 @@
 
 from enum import Enum
 import os
+import re
 import codecs
+import struct
 import tarfile
-import tempfile
-import uuid
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import open
-from re import (search, match)
+from re import search
 from json import dumps
 from knack.util import CLIError, todict
 from knack.log import get_logger
@@ -19,23 +22,25 @@ from ._client_factory import cf_resource_groups
 
 logger = get_logger(__name__)
 
+GZIP_BLOCK_SIZE = 1024 * 1024
+# the most a deflate back-reference can reach
+GZIP_DICTIONARY_SIZE = 32 * 1024
 
-def _get_upload_local_file(jar_path=None):
-    file_path = jar_path
-    file_type = "Jar"
 
-    if file_path is None:
-        file_type = "Source"
-        file_path = os.path.join(tempfile.gettempdir(
-        ), 'build_archive_{}.tar.gz'.format(uuid.uuid4().hex))
-        _pack_source_code(os.getcwd(), file_path)
-    return file_type, file_path
+def _get_upload_local_file(jar_path=None):
+    """ the type of the artifact to deploy and its path, None for the source code of the working directory,
+    which is packed while it is uploaded """
+    if jar_path is None:
+        return "Source", None
+    return "Jar", jar_path
 
 
-def _pack_source_code(source_location, tar_file_path):
+def _pack_source_code(source_location, fileobj, max_workers=None):
+    """ writes the source code, less the ignored files, as a tar.gz archive to fileobj """
     logger.info("Packing source code into tar to upload...")
 
     ignore_list, ignore_list_size = _load_gitignore_file(source_location)
+    matcher = IgnoreMatcher(ignore_list) if ignore_list else None
     common_vcs_ignore_list = {'.git', '.gitignore', 'bzrignore', '.hg',
                               '.hgignore', '.svn', '.circleci', 'target', 'docker'}
 
@@ -51,29 +56,135 @@ def _pack_source_code(source_location, tar_file_path):
             # eg, it will ignore the files under .git folder.
             return parent_ignored, parent_matching_rule_index
 
-        for index, item in enumerate(ignore_list):
-            # stop checking the remaining rules whose priorities are lower than the parent matching rule
-            # at this point, current item should just inherit from parent
-            if index >= parent_matching_rule_index:
-                break
-            if match(item.pattern, tarinfo.name):
-                logger.debug(".gitignore: rule '%s' matches '%s'.",
-                             item.rule, tarinfo.name)
-                return item.ignore, index
+        index = matcher.match(tarinfo.name) if matcher else None
+        # the rules whose priorities are lower than the parent matching rule don't apply,
+        # current item should just inherit from parent
+        if index is not None and index < parent_matching_rule_index:
+            logger.debug(".gitignore: rule '%s' matches '%s'.",
+                         ignore_list[index].rule, tarinfo.name)
+            return ignore_list[index].ignore, index
 
         logger.debug(".gitignore: no rule for '%s'. parent ignore '%s'",
                      tarinfo.name, parent_ignored)
         # inherit from parent
         return parent_ignored, parent_matching_rule_index
 
-    with tarfile.open(tar_file_path, "w:gz") as tar:
-        # need to set arcname to empty string as the archive root path
-        _archive_file_recursively(tar,
-                                  source_location,
-                                  arcname="",
-                                  parent_ignored=False,
-                                  parent_matching_rule_index=ignore_list_size,
-                                  ignore_check=_ignore_check)
+    def _prune_check(tarinfo, matching_rule_index):
+        # the children of an ignored dir can only be included again by a negation rule
+        # whose priority is higher than the rule that ignored the dir
+        return matcher is None or not matcher.can_include_below(tarinfo.name, matching_rule_index)
+
+    with ParallelGzipWriter(fileobj, max_workers=max_workers) as gz:
+        with tarfile.open(fileobj=gz, mode="w|") as tar:
+            # need to set arcname to empty string as the archive root path
+            _archive_file_recursively(tar,
+                                      source_location,
+                                      arcname="",
+                                      parent_ignored=False,
+                                      parent_matching_rule_index=ignore_list_size,
+                                      ignore_check=_ignore_check,
+                                      prune_check=_prune_check)
+
+
+class ParallelGzipWriter(object):
+    """
+    A write-only file object that gzip-compresses what is written to it on several threads, like pigz: the data
+    is cut in blocks that are deflated in parallel, each with the end of the previous block as dictionary, and
+    written to fileobj in order as a single gzip member.
+    """
+
+    def __init__(self, fileobj, max_workers=None, block_size=GZIP_BLOCK_SIZE, level=zlib.Z_DEFAULT_COMPRESSION):
+        self.fileobj = fileobj
+        self.block_size = block_size
+        self.level = level
+        self.max_workers = max_workers or min(os.cpu_count() or 1, 8)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._dictionary = None
+        self._crc = 0
+        self._size = 0
+        self._closed = False
+        # header: deflate, no flags, no modification time, unknown OS
+        self.fileobj.write(b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=False)
+
+    def _deflate(self, data, dictionary):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL,
+                                      zlib.Z_DEFAULT_STRATEGY, *([dictionary] if dictionary else []))
+        # a sync flush ends the block on a byte boundary, so that the next one can be appended
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def _submit(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._pending.append(self._executor.submit(self._deflate, data, self._dictionary))
+        self._dictionary = data[-GZIP_DICTIONARY_SIZE:]
+        # bounds the blocks in memory, and writes those that are done in order
+        while self._pending and (len(self._pending) > 2 * self.max_workers or self._pending[0].done()):
+            self.fileobj.write(self._pending.popleft().result())
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+        while self._pending:
+            self.fileobj.write(self._pending.popleft().result())
+        self._executor.shutdown()
+        # an empty final block ends the deflate stream
+        self.fileobj.write(zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS).flush(zlib.Z_FINISH))
+        self.fileobj.write(struct.pack('<II', self._crc, self._size & 0xffffffff))
+
+
+class IgnoreMatcher(object):  # pylint: disable=too-few-public-methods
+    """ The patterns of the ignore rules compiled into a single expression that finds the rule of highest priority
+    matching a path """
+
+    def __init__(self, ignore_list):
+        self.ignore_list = ignore_list
+        # the alternatives are tried in order, the first one that matches is the rule of highest priority
+        self.expression = re.compile('|'.join('(?P<r{}>{})'.format(index, item.pattern)
+                                              for index, item in enumerate(ignore_list)))
+        self.negations = [(index, None if item.token_patterns is None else [re.compile(token_pattern)
+                                                                            for token_pattern in item.token_patterns])
+                          for index, item in enumerate(ignore_list) if not item.ignore]
+
+    def match(self, name):
+        """ the index of the rule of highest priority that matches name, None if none does """
+        result = self.expression.match(name)
+        if result is None:
+            return None
+        return int(result.lastgroup[1:])
+
+    def can_include_below(self, directory, matching_rule_index):
+        """ whether a negation rule of higher priority than the given one can match a path below directory """
+        parts = directory.split('/')
+        for index, token_patterns in self.negations:
+            if index >= matching_rule_index:
+                break
+            if token_patterns is None:
+                return True
+            if len(token_patterns) > len(parts) and all(
+                    token_pattern.match(part) for token_pattern, part in zip(token_patterns, parts)):
+                return True
+        return False
 
 
 class IgnoreRule(object):  # pylint: disable=too-few-public-methods
@@ -94,14 +205,19 @@ class IgnoreRule(object):  # pylint: disable=too-few-public-methods
             if token == "**":
                 self.pattern += ".*"  # treat **/ as **
             else:
-                # * matches any sequence of non-seperator characters
-                # ? matches any single non-seperator character
-                # . matches dot character
-                self.pattern += token.replace(
-                    "*", "[^/]*").replace("?", "[^/]").replace(".", "\\.")
+                self.pattern += _token_pattern(token)
                 if index < token_length:
                     self.pattern += "/"  # add back / if it's not the last
         self.pattern += "$"
+        # the patterns of the path components, None if the rule matches paths of any depth
+        self.token_patterns = None if "**" in tokens else ["^" + _token_pattern(token) + "$" for token in tokens]
+
+
+def _token_pattern(token):
+    # * matches any sequence of non-seperator characters
+    # ? matches any single non-seperator character
+    # . matches dot character
+    return token.replace("*", "[^/]*").replace("?", "[^/]").replace(".", "\\.")
 
 
 def _load_gitignore_file(source_location):
@@ -130,7 +246,8 @@ def _load_gitignore_file(source_location):
     return ignore_list, len(ignore_list)
 
 
-def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matching_rule_index, ignore_check):
+def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matching_rule_index, ignore_check,
+                              prune_check=None):
     # create a TarInfo object from the file
     tarinfo = tar.gettarinfo(name, arcname)
 
@@ -149,12 +266,13 @@ def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matchin
         else:
             tar.addfile(tarinfo)
 
-    # even the dir is ignored, its child items can still be included, so continue to scan
-    if tarinfo.isdir():
+    # even the dir is ignored, its child items can still be included, so continue to scan,
+    # unless no rule can include them
+    if tarinfo.isdir() and not (ignored and prune_check and prune_check(tarinfo, matching_rule_index)):
         for f in os.listdir(name):
             _archive_file_recursively(tar, os.path.join(name, f), os.path.join(arcname, f),
                                       parent_ignored=ignored, parent_matching_rule_index=matching_rule_index,
-                                      ignore_check=ignore_check)
+                                      ignore_check=ignore_check, prune_check=prune_check)
 
 
 def get_blob_info(blob_sas_url):
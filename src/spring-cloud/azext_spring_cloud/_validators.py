@@ -111,6 +111,15 @@ def validate_log_limit(namespace):
     namespace.limit = temp_limit * 1024
 
 
+def validate_upload_options(namespace):
+    if namespace.upload_connections is not None and not 1 <= namespace.upload_connections <= 32:
+        raise CLIError('--upload-connections must be in the range [1,32]')
+    if namespace.upload_range_size is not None:
+        if not 1 <= namespace.upload_range_size <= 4:
+            raise CLIError('--upload-range-size must be in the range [1,4]')
+        namespace.upload_range_size = namespace.upload_range_size * 1024 * 1024
+
+
 def validate_log_lines(namespace):
     temp_lines = None
     try:
@@ -12,6 +12,7 @@ from ._stream_utils import stream_logs
 from msrestazure.azure_exceptions import CloudError
 from msrestazure.tools import parse_resource_id, is_valid_resource_id
 from ._utils import _get_upload_local_file, _get_persistent_disk_size
+from ._upload_utils import upload_source_code, upload_artifact, UploadProgress
 from knack.util import CLIError
 from .vendored_sdks.appplatform import models
 from knack.log import get_logger
@@ -398,7 +399,9 @@ def app_deploy(cmd, client, resource_group, service, name,
                runtime_version=None,
                jvm_options=None,
                env=None,
-               no_wait=False):
+               no_wait=False,
+               upload_connections=None,
+               upload_range_size=None):
     logger.warning(LOG_RUNNING_PROMPT)
     if not deployment:
         deployment = client.apps.get(
@@ -426,7 +429,10 @@ def app_deploy(cmd, client, resource_group, service, name,
                        target_module,
                        no_wait,
                        file_type,
-                       True)
+                       True,
+                       upload_connections=upload_connections,
+                       upload_range_size=upload_range_size,
+                       cli_ctx=cmd.cli_ctx)
 
 
 def app_scale(cmd, client, resource_group, service, name,
@@ -617,7 +623,9 @@ def deployment_create(cmd, client, resource_group, service, app, name,
                       memory=None,
                       instance_count=None,
                       env=None,
-                      no_wait=False):
+                      no_wait=False,
+                      upload_connections=None,
+                      upload_range_size=None):
     logger.warning(LOG_RUNNING_PROMPT)
     deployments = _get_all_deployments(client, resource_group, service, app)
     if name in deployments:
@@ -649,7 +657,10 @@ def deployment_create(cmd, client, resource_group, service, app, name,
                        env,
                        target_module,
                        no_wait,
-                       file_type)
+                       file_type,
+                       upload_connections=upload_connections,
+                       upload_range_size=upload_range_size,
+                       cli_ctx=cmd.cli_ctx)
 
 
 def deployment_list(cmd, client, resource_group, service, app):
@@ -1123,7 +1134,10 @@ def _app_deploy(client, resource_group, service, app, name, version, path, runti
                 target_module=None,
                 no_wait=False,
                 file_type="Jar",
-                update=False):
+                update=False,
+                upload_connections=None,
+                upload_range_size=None,
+                cli_ctx=None):
     upload_url = None
     relative_path = None
     logger.warning("[1/3] Requesting for upload URL")
@@ -1166,7 +1180,20 @@ def _app_deploy(client, resource_group, service, app, name, version, path, runti
     # upload file
     logger.warning("[2/3] Uploading package to blob")
     file_service = FileService(storage_name, sas_token=sas_token)
-    file_service.create_file_from_path(share_name, None, relative_path, path)
+    progress = UploadProgress(cli_ctx) if cli_ctx else None
+    upload_options = {'max_connections': upload_connections, 'range_size': upload_range_size,
+                      'progress_callback': progress}
+    try:
+        if path is None:
+            # the source code is packed while it is uploaded
+            upload_source_code(file_service, share_name, relative_path, **upload_options)
+        else:
+            service_key = '/'.join([client.config.subscription_id, resource_group, service]).lower()
+            upload_artifact(file_service, storage_name, share_name, relative_path, path, service_key,
+                            **upload_options)
+    finally:
+        if progress:
+            progress.end()
 
     if file_type == "Source" and not no_wait:
         def get_log_url():
@@ -0,0 +1,123 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+import os
+import time
+import unittest
+
+from knack.util import CLIError
+from ..._stream_utils import _stream_logs, _next_range_size, _LogLineSplitter
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+RUN_BENCHMARKS = os.environ.get('AZURE_SPRING_CLOUD_BENCHMARKS', '').lower() in ('1', 'true', 'yes')
+MB = 1024 * 1024
+
+
+class AppendBlobServiceStub(object):
+    """ a log blob appended a part at a time, each time its properties are read, and then completed """
+
+    def __init__(self, parts, status='Succeeded'):
+        self.parts = list(parts)
+        self.content = b''
+        self.status = status
+        self.ranges = []
+
+    def get_blob_properties(self, container_name, blob_name):
+        if self.parts:
+            self.content += self.parts.pop(0)
+        result = mock.MagicMock()
+        result.metadata = {} if self.parts else {'__complete_status': self.status}
+        result.properties.content_length = len(self.content)
+        return result
+
+    def get_blob_to_stream(self, container_name, blob_name, start_range, end_range, stream, max_connections):
+        self.ranges.append(end_range - start_range + 1)
+        stream.write(self.content[start_range:end_range + 1])
+
+
+def _stream(blob_service, byte_size=64, raise_error_on_failure=True):
+    lines = []
+    with mock.patch('time.sleep'):
+        _stream_logs(True, byte_size, 60, blob_service, 'logs', 'build.log', raise_error_on_failure,
+                     lambda message, *args: lines.append(message % args if args else message), min_byte_size=4)
+    return lines
+
+
+class TestStreamLogs(unittest.TestCase):
+    def test_complete_lines_are_emitted(self):
+        blob_service = AppendBlobServiceStub([b'Step 1\r\nSte', b'p 2\r\nStep 3\r', b'\nStep 4\rdone'])
+
+        lines = _stream(blob_service)
+
+        # a '\n' read after its '\r' doesn't start the next lines
+        self.assertEqual(lines, ['Step 1\r', 'Step 2\r\nStep 3\r', 'Step 4\r', 'done', "Log status was: 'succeeded'"])
+
+    def test_ranges_grow_with_the_backlog(self):
+        blob_service = AppendBlobServiceStub([b'a\r\n' * 100, b'b\r\n'])
+
+        lines = _stream(blob_service)
+
+        self.assertEqual(''.join(lines[:-1]).replace('\r\n', '\r'), 'a\r' * 100 + 'b\r')
+        # the 300 bytes waiting are read 64 bytes at a time, then the 3 bytes appended in a small range
+        self.assertEqual(blob_service.ranges, [64] * 5 + [4])
+
+    def test_failed_runs_raise(self):
+        with self.assertRaisesRegex(CLIError, 'Run failed'):
+            _stream(AppendBlobServiceStub([b'error\r\n'], status='Failed'))
+        self.assertEqual(_stream(AppendBlobServiceStub([b'error\r\n'], status='Failed'), raise_error_on_failure=False),
+                         ['error\r', "Log status was: 'failed'"])
+
+    def test_next_range_size(self):
+        self.assertEqual(_next_range_size(1, 4096, 4 * MB), 4096)
+        self.assertEqual(_next_range_size(5000, 4096, 4 * MB), 8192)
+        self.assertEqual(_next_range_size(100 * MB, 4096, 4 * MB), 4 * MB)
+
+    def test_split_characters_are_decoded(self):
+        lines = []
+        splitter = _LogLineSplitter(lines.append)
+        data = 'é\r\n'.encode('utf-8')
+        for index in range(len(data)):
+            splitter.feed(bytearray(data[index:index + 1]), 1)
+        splitter.flush()
+        self.assertEqual(lines, ['é\r'])
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'set AZURE_SPRING_CLOUD_BENCHMARKS=1 to run the benchmarks')
+class StreamLogsBenchmark(unittest.TestCase):
+    """ MB/s of following a build log of AZURE_SPRING_CLOUD_BENCHMARK_LOG_SIZE MB (256 by default) """
+
+    def test_stream_logs_throughput(self):
+        size = int(os.environ.get('AZURE_SPRING_CLOUD_BENCHMARK_LOG_SIZE', '256'))
+        line = b'[INFO] Downloaded from central: https://repo.maven.apache.org/maven2/org/example/lib.jar\r\n'
+        log = line * (size * MB // len(line))
+        for byte_size, min_byte_size in [(4 * MB, 4096), (4096, 4096)]:
+            blob_service = AppendBlobServiceStub([log])
+            emitted = []
+            start = time.time()
+            _stream_logs(True, byte_size, 60, blob_service, 'logs', 'build.log', False,
+                         lambda message, *args: emitted.append(message.count('\r')), min_byte_size=min_byte_size)
+            seconds = time.time() - start
+            self.assertEqual(sum(emitted[:-1]), len(log) // len(line),
+                             'follow of a {} MB log in ranges of up to {} KB: {:.0f} MB/s, {} requests'
+                             .format(size, byte_size // 1024, len(log) / MB / seconds, len(blob_service.ranges)))
+
+    def test_stream_logs_without_line_breaks(self):
+        # a progress bar redrawn with backspaces, the whole log is a single line
+        log = b'#\b' * (32 * MB)
+        blob_service = AppendBlobServiceStub([log])
+        emitted = []
+        start = time.time()
+        _stream_logs(True, 4 * MB, 60, blob_service, 'logs', 'build.log', False,
+                     lambda message, *args: emitted.append(len(message)))
+        seconds = time.time() - start
+        self.assertEqual(emitted[0], len(log))
+        self.assertLess(seconds, 5, 'follow of a {} MB log without line breaks: {:.2f}s'.format(len(log) // MB, seconds))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,352 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+import os
+import re
+import gzip
+import io
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import unittest
+
+from ..._utils import IgnoreMatcher, IgnoreRule, ParallelGzipWriter, _pack_source_code
+from ..._upload_utils import (FileRangeWriter, DeployCache, compute_sha256, upload_artifact, upload_file,
+                              upload_source_code)
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+RUN_BENCHMARKS = os.environ.get('AZURE_SPRING_CLOUD_BENCHMARKS', '').lower() in ('1', 'true', 'yes')
+MB = 1024 * 1024
+
+
+class FileServiceStub(object):
+    """ a file share whose files are byte arrays """
+
+    def __init__(self):
+        self.sas_token = 'sv=2019-02-02'
+        self.files = {}
+        self.requests = []
+
+    def create_file(self, share_name, directory_name, file_name, content_length):
+        self.requests.append('create_file')
+        self.files[file_name] = bytearray(content_length)
+
+    def resize_file(self, share_name, directory_name, file_name, content_length):
+        self.requests.append('resize_file')
+        content = self.files[file_name]
+        if content_length < len(content):
+            del content[content_length:]
+        else:
+            content.extend(bytearray(content_length - len(content)))
+
+    def update_range(self, share_name, directory_name, file_name, data, start_range, end_range):
+        self.requests.append('update_range')
+        content = self.files[file_name]
+        if end_range >= len(content):
+            raise ValueError('the range is beyond the end of the file')
+        content[start_range:end_range + 1] = data
+
+    def make_file_url(self, share_name, directory_name, file_name, sas_token=None):
+        return 'https://account.file.core.windows.net/{}/{}?{}'.format(share_name, file_name, sas_token)
+
+    def copy_file(self, share_name, directory_name, file_name, copy_source):
+        self.requests.append('copy_file')
+        source = copy_source.split('?')[0].split('/', 4)[-1]
+        if source not in self.files:
+            raise ValueError('The specified resource does not exist.')
+        self.files[file_name] = bytearray(self.files[source])
+        return mock.MagicMock(status='success')
+
+    def get_file_properties(self, share_name, directory_name, file_name):
+        result = mock.MagicMock()
+        result.properties.content_length = len(self.files[file_name])
+        return result
+
+
+class TestIgnoreMatcher(unittest.TestCase):
+    def test_matches_the_rule_of_highest_priority(self):
+        rules = ['*.log', '!keep.log', 'build/', 'docs/**/*.md', 'a?c', '**/tmp']
+        # the rule at the end has the highest priority
+        ignore_list = [IgnoreRule(rule) for rule in reversed(rules)]
+        matcher = IgnoreMatcher(ignore_list)
+
+        for name in ['x.log', 'keep.log', 'dir/x.log', 'build', 'docs/a/b/c.md', 'abc', 'a/c', 'tmp', 'x/tmp',
+                     'readme.md']:
+            expected = next((index for index, item in enumerate(ignore_list) if re.match(item.pattern, name)),
+                            None)
+            self.assertEqual(matcher.match(name), expected, name)
+
+    def test_can_include_below(self):
+        matcher = IgnoreMatcher([IgnoreRule(rule) for rule in reversed(['build', '!build/keep.txt', 'out'])])
+        self.assertTrue(matcher.can_include_below('build', matcher.match('build')))
+        self.assertFalse(matcher.can_include_below('out', matcher.match('out')))
+        self.assertFalse(matcher.can_include_below('src', matcher.match('build')))
+
+        matcher = IgnoreMatcher([IgnoreRule(rule) for rule in reversed(['out', '!**/keep.me'])])
+        self.assertTrue(matcher.can_include_below('out', matcher.match('out')))
+
+
+class TestPackSourceCode(unittest.TestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.source, ignore_errors=True)
+
+    def write(self, name, content=b'x'):
+        path = os.path.join(self.source, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def pack(self):
+        archive = io.BytesIO()
+        _pack_source_code(self.source, archive)
+        with tarfile.open(fileobj=io.BytesIO(archive.getvalue()), mode='r:gz') as tar:
+            return sorted(member.name for member in tar.getmembers() if member.isfile())
+
+    def test_pack_source_code(self):
+        for name in ['src/main.java', 'a.log', 'keep.log', 'node_modules/lib/index.js', '.git/HEAD', 'pom.xml']:
+            self.write(name)
+        self.write('.gitignore', b'*.log\n!keep.log\nnode_modules\n')
+
+        self.assertEqual(self.pack(), ['keep.log', 'pom.xml', 'src/main.java'])
+
+    def test_ignored_directories_are_not_scanned(self):
+        for name in ['src/main.java', 'node_modules/a/index.js', 'node_modules/b/index.js', '.git/objects/1']:
+            self.write(name)
+        self.write('.gitignore', b'node_modules\n')
+
+        with mock.patch('os.listdir', wraps=os.listdir) as listdir:
+            self.assertEqual(self.pack(), ['src/main.java'])
+        scanned = [os.path.relpath(call[0][0], self.source) for call in listdir.call_args_list]
+        self.assertEqual(sorted(scanned), ['.', 'src'])
+
+    def test_negations_keep_scanning_ignored_directories(self):
+        for name in ['build/a.txt', 'build/keep.txt']:
+            self.write(name)
+        self.write('.gitignore', b'build\n!build/keep.txt\n')
+
+        self.assertEqual(self.pack(), ['build/keep.txt'])
+
+
+class TestParallelGzipWriter(unittest.TestCase):
+    def test_output_is_a_gzip_stream(self):
+        data = b''.join(os.urandom(100) * 50 for _ in range(200))
+        output = io.BytesIO()
+        with ParallelGzipWriter(output, max_workers=4, block_size=64 * 1024) as writer:
+            for index in range(0, len(data), 10000):
+                writer.write(data[index:index + 10000])
+
+        self.assertEqual(gzip.decompress(output.getvalue()), data)
+        self.assertLess(len(output.getvalue()), len(data) // 10)
+
+    def test_empty_stream(self):
+        output = io.BytesIO()
+        ParallelGzipWriter(output).close()
+        self.assertEqual(gzip.decompress(output.getvalue()), b'')
+
+
+class TestFileRangeWriter(unittest.TestCase):
+    def test_uploads_in_ranges(self):
+        file_service = FileServiceStub()
+        data = os.urandom(10000)
+        with FileRangeWriter(file_service, 'share', None, 'file', range_size=1024, max_connections=3) as writer:
+            for index in range(0, len(data), 700):
+                writer.write(data[index:index + 700])
+
+        self.assertEqual(bytes(file_service.files['file']), data)
+        self.assertEqual(file_service.requests.count('update_range'), 10)
+        # created, grown once, then set to its size
+        self.assertEqual(file_service.requests.count('resize_file'), 2)
+
+    def test_upload_source_code(self):
+        source = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(source, 'pom.xml'), 'w') as f:
+                f.write('<project/>')
+            file_service = FileServiceStub()
+
+            upload_source_code(file_service, 'share', 'source.tar.gz', source)
+
+            with tarfile.open(fileobj=io.BytesIO(bytes(file_service.files['source.tar.gz'])), mode='r:gz') as tar:
+                self.assertEqual(tar.extractfile('pom.xml').read(), b'<project/>')
+        finally:
+            shutil.rmtree(source, ignore_errors=True)
+
+
+class ThrottledError(Exception):
+    status_code = 503
+
+
+class ThrottlingFileServiceStub(FileServiceStub):
+    """ throttles the ranges sent while more than max_concurrent are in flight """
+
+    def __init__(self, max_concurrent):
+        super(ThrottlingFileServiceStub, self).__init__()
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def update_range(self, share_name, directory_name, file_name, data, start_range, end_range):
+        with self._lock:
+            self.in_flight += 1
+            throttled = self.in_flight > self.max_concurrent
+            self.throttled += throttled
+        try:
+            if throttled:
+                raise ThrottledError('Server Busy')
+            time.sleep(0.01)
+            super(ThrottlingFileServiceStub, self).update_range(share_name, directory_name, file_name, data,
+                                                                start_range, end_range)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class TestUploadFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'app.jar')
+        self.data = os.urandom(20000)
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_files_of_known_size_are_not_resized(self):
+        file_service = FileServiceStub()
+        progress = []
+
+        upload_file(file_service, 'share', 'app.jar', self.path, max_connections=3, range_size=4096,
+                    progress_callback=lambda uploaded, total: progress.append((uploaded, total)))
+
+        self.assertEqual(bytes(file_service.files['app.jar']), self.data)
+        self.assertEqual(file_service.requests, ['create_file'] + ['update_range'] * 5)
+        self.assertEqual(sorted(progress)[-1], (20000, 20000))
+        self.assertEqual(len(progress), 5)
+
+    def test_throttling_reduces_the_connections(self):
+        file_service = ThrottlingFileServiceStub(max_concurrent=2)
+
+        with mock.patch('azext_spring_cloud._upload_utils.THROTTLED_RETRY_DELAY', 0.001):
+            with FileRangeWriter(file_service, 'share', None, 'app.jar', size=len(self.data), range_size=1000,
+                                 max_connections=8) as writer:
+                writer.write(self.data)
+
+        self.assertEqual(bytes(file_service.files['app.jar']), self.data)
+        self.assertGreater(file_service.throttled, 0)
+        self.assertLess(writer.concurrency.limit, 8)
+
+    def test_other_errors_are_not_retried(self):
+        file_service = FileServiceStub()
+        file_service.update_range = mock.MagicMock(side_effect=ValueError('The specified share does not exist.'))
+
+        with self.assertRaises(ValueError):
+            upload_file(file_service, 'share', 'app.jar', self.path, range_size=len(self.data))
+        self.assertEqual(file_service.update_range.call_count, 1)
+
+
+class TestUploadArtifact(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.jar = os.path.join(self.temp_dir, 'app.jar')
+        with open(self.jar, 'wb') as f:
+            f.write(os.urandom(1000))
+        self.cache = DeployCache(os.path.join(self.temp_dir, 'cache', 'deploy_cache.json'))
+        self.file_service = FileServiceStub()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def upload(self, relative_path, share_name='share', service_key='sub/rg/service'):
+        return upload_artifact(self.file_service, 'account', share_name, relative_path, self.jar, service_key,
+                               cache=DeployCache(self.cache.path))
+
+    def test_identical_artifacts_are_copied(self):
+        self.assertFalse(self.upload('resources/1'))
+        self.assertTrue(self.upload('resources/2'))
+        self.assertTrue(self.upload('resources/3'))
+
+        self.assertEqual(self.file_service.requests, ['create_file', 'update_range', 'copy_file', 'copy_file'])
+        self.assertEqual(self.file_service.files['resources/3'], self.file_service.files['resources/1'])
+        # copied from the most recent upload
+        self.assertEqual(DeployCache(self.cache.path).lookup('sub/rg/service', compute_sha256(self.jar))
+                         ['relativePath'], 'resources/3')
+
+    def test_other_services_and_shares_upload(self):
+        self.upload('resources/1')
+        self.assertFalse(self.upload('resources/2', service_key='sub/rg/other'))
+        self.assertFalse(self.upload('resources/3', share_name='other'))
+        self.assertNotIn('copy_file', self.file_service.requests)
+
+    def test_failed_copies_upload(self):
+        self.upload('resources/1')
+        del self.file_service.files['resources/1']
+
+        self.assertFalse(self.upload('resources/2'))
+        self.assertEqual(self.file_service.requests, ['create_file', 'update_range', 'copy_file', 'create_file',
+                                                      'update_range'])
+        self.assertTrue(self.upload('resources/3'))
+
+
+class ThroughputFileServiceStub(FileServiceStub):
+    """ a file share that keeps no data, answering each range after a latency and at a bandwidth per connection """
+
+    def __init__(self, latency=0.02, bandwidth=25 * MB):
+        super(ThroughputFileServiceStub, self).__init__()
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def create_file(self, share_name, directory_name, file_name, content_length):
+        self.requests.append('create_file')
+
+    def resize_file(self, share_name, directory_name, file_name, content_length):
+        self.requests.append('resize_file')
+
+    def update_range(self, share_name, directory_name, file_name, data, start_range, end_range):
+        time.sleep(self.latency + len(data) / float(self.bandwidth))
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'set AZURE_SPRING_CLOUD_BENCHMARKS=1 to run the benchmarks')
+class UploadBenchmark(unittest.TestCase):
+    """
+    MB/s of artifacts of AZURE_SPRING_CLOUD_BENCHMARK_SIZES MB (50,200 by default, up to 2048) against a file share
+    answering each range in 20ms at 25 MB/s per connection
+    """
+
+    def test_upload_throughput(self):
+        sizes = [int(size) for size in os.environ.get('AZURE_SPRING_CLOUD_BENCHMARK_SIZES', '50,200').split(',')]
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for size in sizes:
+                path = os.path.join(temp_dir, '{}.jar'.format(size))
+                with open(path, 'wb') as f:
+                    for _ in range(size):
+                        f.write(os.urandom(MB))
+
+                results = []
+                for max_connections, range_size in [(2, 4 * MB), (8, 4 * MB), (16, 4 * MB)]:
+                    start = time.time()
+                    upload_file(ThroughputFileServiceStub(), 'share', 'app.jar', path,
+                                max_connections=max_connections, range_size=range_size)
+                    results.append((max_connections, size / (time.time() - start)))
+                self.assertGreater(results[1][1], results[0][1] * 2, 'upload of {} MB: '.format(size) +
+                                   ', '.join('{:.0f} MB/s with {} connections'.format(rate, connections)
+                                             for connections, rate in results))
+                os.remove(path)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -94,6 +94,8 @@ helps['storage azcopy blob upload'] = """
           text: az storage azcopy blob upload -c MyContainer --account-name MyStorageAccount -s "path/to/directory" --recursive
         - name: Upload the contents of a directory to a container.
           text: az storage azcopy blob upload -c MyContainer --account-name MyStorageAccount -s "path/to/directory/*" --recursive
+        - name: Upload a directory to a container without AzCopy, resuming where an interrupted upload left off.
+          text: az storage azcopy blob upload -c MyContainer --account-name MyStorageAccount -s "path/to/directory" --recursive --engine native --max-connections 16
 """
 
 helps['storage azcopy blob download'] = """
@@ -106,6 +108,8 @@ helps['storage azcopy blob download'] = """
           text: az storage azcopy blob download -c MyContainer --account-name MyStorageAccount -s "path/to/virtual_directory" -d "download/path" --recursive
         - name: Download the contents of a container onto a local file system.
           text: az storage azcopy blob download -c MyContainer --account-name MyStorageAccount -s * -d "download/path" --recursive
+        - name: Download a virtual directory without AzCopy, resuming where an interrupted download left off.
+          text: az storage azcopy blob download -c MyContainer --account-name MyStorageAccount -s "path/to/virtual_directory" -d "download/path" --recursive --engine native
 """
 
 helps['storage azcopy blob delete'] = """
@@ -128,6 +132,10 @@ helps['storage azcopy blob sync'] = """
           text: az storage azcopy blob sync -c MyContainer --account-name MyStorageAccount -s "path/to/file" -d NewBlob
         - name: Sync a directory to a container.
           text: az storage azcopy blob sync -c MyContainer --account-name MyStorageAccount -s "path/to/directory"
+        - name: Show what an incremental sync of a directory would upload and delete.
+          text: az storage azcopy blob sync -c MyContainer --account-name MyStorageAccount -s "path/to/directory" --engine native --dry-run
+        - name: Sync a directory to a container, reading and uploading only the files modified since the last sync.
+          text: az storage azcopy blob sync -c MyContainer --account-name MyStorageAccount -s "path/to/directory" --engine native
 """
 
 helps['storage azcopy run-command'] = """
@@ -193,6 +201,8 @@ helps['storage blob directory access set'] = """
     examples:
         - name: Set the access control properties of a directory.
           text: az storage blob directory access set -a "user::rwx,group::r--,other::---" -d MyDirectoryPath -c MyContainer --account-name MyStorageAccount
+        - name: Set the access control properties of a directory and of everything below it.
+          text: az storage blob directory access set -a "user::rwx,group::r--,other::---,default:user::rwx" -d MyDirectoryPath -c MyContainer --account-name MyStorageAccount --recursive
 """
 
 helps['storage blob directory access show'] = """
@@ -213,6 +223,8 @@ helps['storage blob directory access update'] = """
           text: az storage blob directory access update --owner [entityId/UPN] -d MyDirectoryPath -c MyContainer --account-name MyStorageAccount
         - name: Update the owning group of a directory.
           text: az storage blob directory access update --group [entityId/UPN] -d MyDirectoryPath -c MyContainer --account-name MyStorageAccount
+        - name: Update the owning user of a directory and of everything below it, with 32 parallel requests.
+          text: az storage blob directory access update --owner [entityId/UPN] -d MyDirectoryPath -c MyContainer --account-name MyStorageAccount --recursive --max-connections 32
 """
 
 helps['storage blob directory create'] = """
@@ -236,6 +248,8 @@ helps['storage blob directory delete'] = """
     examples:
         - name: Delete a storage blob directory in a storage container.
           text: az storage blob directory delete -c MyContainer -d MyDirectoryPath --account-name MyStorageAccount
+        - name: Delete a large directory of an account without Hierarchical Namespace with parallel batch requests.
+          text: az storage blob directory delete -c MyContainer -d MyDirectoryPath --account-name MyStorageAccount --bulk --max-connections 16
 """
 
 helps['storage blob directory download'] = """
@@ -248,6 +262,8 @@ helps['storage blob directory download'] = """
           text: az storage blob directory download -c MyContainer --account-name MyStorageAccount -s SourceDirectoryPath -d "<local-path>" --recursive
         - name: Download an entire subdirectory of a storage blob directory.
           text: az storage blob directory download -c MyContainer --account-name MyStorageAccount -s "path/to/subdirectory" -d "<local-path>" --recursive
+        - name: Download the entire directory with parallel connections instead of AzCopy.
+          text: az storage blob directory download -c MyContainer --account-name MyStorageAccount -s SourceDirectoryPath -d "<local-path>" --recursive --engine native --max-connections 16
 """
 
 helps['storage blob directory exists'] = """
@@ -264,6 +280,10 @@ helps['storage blob directory list'] = """
     examples:
         - name: List blobs and blob subdirectories in a storage directory.
           text: az storage blob directory list -c MyContainer -d DestinationDirectoryPath --account-name MyStorageAccount
+        - name: Print all the blobs of a large directory while they are listed.
+          text: az storage blob directory list -c MyContainer -d DestinationDirectoryPath --account-name MyStorageAccount --num-results * --stream -o tsv
+        - name: List the blobs of a directory and of its direct subdirectories, and the subdirectories below them.
+          text: az storage blob directory list -c MyContainer -d DestinationDirectoryPath --account-name MyStorageAccount --max-depth 2
 """
 
 helps['storage blob directory metadata'] = """
@@ -320,4 +340,6 @@ helps['storage blob directory upload'] = """
           text: az storage blob directory upload -c MyContainer --account-name MyStorageAccount -s "path/to/directory" -d directory --recursive
         - name: Upload a set of files in a local directory to a storage blob directory.
           text: az storage blob directory upload -c MyContainer --account-name MyStorageAccount -s "path/to/file*" -d directory --recursive
+        - name: Upload a local directory with parallel connections instead of AzCopy.
+          text: az storage blob directory upload -c MyContainer --account-name MyStorageAccount -s "path/to/directory" -d directory --recursive --engine native --max-connections 16
 """
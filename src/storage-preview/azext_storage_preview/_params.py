@@ -51,6 +51,13 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
                                     '"[default:]user|group|other|mask:[entity id or UPN]:r|-w|-x|-,'
                                     '[default:]user|group|other|mask:[entity id or UPN]:r|-w|-x|-,...". '
                                     'e.g."user::rwx,user:john.doe@contoso:rwx,group::r--,other::---,mask::rwx".')
+    transfer_engine_type = CLIArgumentType(
+        options_list=['--engine'], arg_type=get_enum_type(['azcopy', 'native']), default='azcopy',
+        help='The engine that transfers the data. "native" transfers blocks in parallel over pooled connections '
+             'without AzCopy, and resumes an interrupted transfer when the same command is run again.')
+    max_connections_type = CLIArgumentType(
+        options_list=['--max-connections'], type=int,
+        help='The maximum number of parallel connections of the native engine. Default to 8.')
 
     with self.argument_context('storage') as c:
         c.argument('container_name', container_name_type)
@@ -178,6 +185,8 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
                    help='The source file path to upload from.')
         c.argument('recursive', options_list=['--recursive', '-r'], action='store_true',
                    help='Recursively upload blobs.')
+        c.argument('engine', transfer_engine_type)
+        c.argument('max_connections', max_connections_type)
         c.ignore('destination')
 
     with self.argument_context('storage azcopy blob download') as c:
@@ -190,6 +199,8 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
                    help='The destination file path to download to.')
         c.argument('recursive', options_list=['--recursive', '-r'], action='store_true',
                    help='Recursively download blobs.')
+        c.argument('engine', transfer_engine_type)
+        c.argument('max_connections', max_connections_type)
         c.ignore('source')
 
     with self.argument_context('storage azcopy blob delete') as c:
@@ -210,6 +221,14 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
                 help='The sync destination path.')
         c.argument('source', options_list=['--source', '-s'],
                    help='The source file path to sync from.')
+        c.argument('engine', transfer_engine_type,
+                   help='The engine that syncs the data. "native" keeps a manifest of the files synced before, '
+                        'so that only the files modified since are read again and compared with the MD5 of the '
+                        'blobs, and uploads the changed ones in parallel without AzCopy.')
+        c.argument('max_connections', max_connections_type)
+        c.argument('dry_run', action='store_true',
+                   help='With --engine native, list the blobs that would be uploaded and deleted without changing '
+                        'anything.')
         c.ignore('destination')
 
     with self.argument_context('storage azcopy run-command') as c:
@@ -253,6 +272,15 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
     with self.argument_context('storage blob directory access') as c:
         c.argument('path', directory_path_type)
 
+    for item in ['set', 'update']:
+        with self.argument_context('storage blob directory access {}'.format(item)) as c:
+            c.argument('recursive', options_list=['--recursive', '-r'], action='store_true',
+                       help='Apply to the directory and to every directory and blob below it. The paths are updated '
+                            'in parallel a page at a time. An interrupted or partially failed run continues where '
+                            'it left off when the same command is run again.')
+            c.argument('max_connections', max_connections_type,
+                       help='The maximum number of parallel requests with --recursive. Default to 8.')
+
     with self.argument_context('storage blob directory access set') as c:
         c.argument('acl', acl_type, required=True)
         c.ignore('owner', 'group', 'permissions')
@@ -277,6 +305,16 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
                         'is supported here.')
         c.argument('directory_path', directory_path_type, validator=validate_directory_name)
 
+    with self.argument_context('storage blob directory delete') as c:
+        c.argument('bulk', action='store_true',
+                   help='For accounts without Hierarchical Namespace. List the directory once and delete its blobs '
+                        'in parallel batch requests, then the directory markers from the deepest up. An '
+                        'interrupted delete keeps the directories of the remaining blobs, run the same command '
+                        'again to finish it.')
+        c.argument('max_connections', max_connections_type,
+                   help='The maximum number of parallel requests with --bulk. Default to 8.')
+        c.ignore('marker')
+
     with self.argument_context('storage blob directory download') as c:
         c.extra('source_container', options_list=['--container', '-c'], required=True,
                 help='The download source container.')
@@ -288,6 +326,8 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.argument('recursive', options_list=['--recursive', '-r'], action='store_true',
                    help='Recursively download blobs. If enabled, all the blobs including the blobs in subdirectories '
                         'will be downloaded.')
+        c.argument('engine', transfer_engine_type)
+        c.argument('max_connections', max_connections_type)
         c.ignore('source')
 
     with self.argument_context('storage blob directory exists') as c:
@@ -296,6 +336,14 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
     with self.argument_context('storage blob directory list') as c:
         c.argument('include', validator=validate_included_datasets, default='mc')
         c.argument('num_results', arg_type=num_results_type)
+        c.argument('max_depth', type=int,
+                   help='List the directory one level at a time, down to the given number of levels. The '
+                        'subdirectories at the last level are listed in place of their contents.')
+        c.argument('stream', action='store_true',
+                   help='Print the blobs while following the continuation markers, instead of collecting them '
+                        'all first. Memory stays bounded whatever the number of blobs. --query is not supported.')
+        c.argument('prefetch', arg_type=get_three_state_flag(), default=True,
+                   help='With --stream, request the next page of blobs while the current one is printed.')
 
     with self.argument_context('storage blob directory metadata') as c:
         c.argument('blob_name', directory_path_type)
@@ -346,4 +394,6 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.argument('recursive', options_list=['--recursive', '-r'], action='store_true',
                    help='Recursively upload blobs. If enabled, all the blobs including the blobs in subdirectories will'
                         ' be uploaded.')
+        c.argument('engine', transfer_engine_type)
+        c.argument('max_connections', max_connections_type)
         c.ignore('destination')
@@ -0,0 +1,105 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+Writes the rows of a list command while they are listed, in the output format of the invocation, instead of
+returning them all at once to the CLI.
+"""
+
+import re
+import sys
+import errno
+
+from knack.util import CLIError, CommandResultItem
+
+STREAM_BATCH_SIZE = 1000
+
+
+class StreamingOutput(object):
+    """
+    Prints rows in batches. JSON rows are written as the items of a single array, YAML rows as the items of a
+    single list, and table rows under one header.
+    """
+
+    def __init__(self, cli_ctx, table_transformer=None, out_file=None):
+        data = cli_ctx.invocation.data if cli_ctx.invocation else {}
+        if data.get('query_active'):
+            raise CLIError('usage error: --query is not supported with --stream, the rows are printed as they are '
+                           'listed.')
+        self.output_format = data.get('output') or 'json'
+        self.table_transformer = table_transformer
+        self.out_file = out_file or sys.stdout
+        self.count = 0
+        self.closed = False
+        self._batch = []
+        self._columns = None
+
+    def _print(self, text):
+        try:
+            self.out_file.write(text)
+            self.out_file.flush()
+        except IOError as ex:
+            # the reader went away, e.g. the output was piped to head
+            if ex.errno != errno.EPIPE:
+                raise
+            self.closed = True
+
+    def write(self, row):
+        """ adds a row, returns False once nobody reads the output anymore """
+        self._batch.append(row)
+        if len(self._batch) >= STREAM_BATCH_SIZE:
+            self.flush()
+        return not self.closed
+
+    def flush(self):
+        batch, self._batch = self._batch, []
+        if not batch or self.closed:
+            return
+        from knack.output import format_json, format_table, format_tsv, format_yaml
+        first = self.count == 0
+        self.count += len(batch)
+
+        if self.output_format in ('json', 'jsonc'):
+            rows = ['  ' + format_json(CommandResultItem(row)).rstrip('\n').replace('\n', '\n  ') for row in batch]
+            self._print(('[\n' if first else ',\n') + ',\n'.join(rows))
+        elif self.output_format in ('yaml', 'yamlc'):
+            self._print(format_yaml(CommandResultItem(batch)))
+        elif self.output_format == 'table':
+            table = format_table(CommandResultItem(batch, table_transformer=self.table_transformer))
+            _, underline, rows = table.split('\n', 2)
+            columns = _column_spans(underline)
+            if first:
+                # the header and its underline are printed once, the rows of later batches are padded to them
+                self._columns = columns
+                self._print(table)
+            else:
+                self._print(_align_rows(rows, columns, self._columns))
+        elif self.output_format == 'tsv':
+            self._print(format_tsv(CommandResultItem(batch)))
+
+    def close(self):
+        self.flush()
+        if self.output_format in ('json', 'jsonc'):
+            self._print('\n]\n' if self.count else '[]\n')
+
+
+def _column_spans(underline):
+    """ the (start, end) of each column of a table, from the dashes under its header """
+    return [match.span() for match in re.finditer('-+', underline)]
+
+
+def _align_rows(rows, columns, header_columns):
+    """
+    Moves the cells of rows formatted in the given columns to the columns of the header. A value wider than its
+    header column still pushes the rest of its row to the right, the header is already printed.
+    """
+    if len(columns) != len(header_columns):
+        return rows
+    widths = [end - start for start, end in header_columns]
+    lines = []
+    for line in rows.split('\n'):
+        cells = [line[start:end].rstrip().ljust(width) for (start, end), width in zip(columns, widths)]
+        lines.append('  '.join(cells).rstrip())
+    return '\n'.join(lines)
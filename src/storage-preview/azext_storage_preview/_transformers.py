@@ -116,6 +116,9 @@ def create_boolean_result_output_transformer(property_name):
 
 
 def transform_storage_list_output(result):
+    if result is None:
+        # streamed rows are printed by the command
+        return None
     if getattr(result, 'next_marker', None):
         logger.warning('Next Marker:')
         logger.warning(result.next_marker)
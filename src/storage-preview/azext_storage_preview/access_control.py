@@ -0,0 +1,175 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+Applies access control to every path of a directory tree. The tree is listed a page at a time, the paths of a
+page are updated in parallel, and a checkpoint written after each page lets an interrupted run go on from
+the last page that was done.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 8
+MAX_RECORDED_FAILURES = 100
+CHECKPOINT_DIR_NAME = os.path.join('storage-preview', 'access-control')
+
+
+def get_default_checkpoint_dir():
+    from azure.cli.core._environment import get_config_dir
+    return os.path.join(get_config_dir(), CHECKPOINT_DIR_NAME)
+
+
+def strip_default_entries(acl):
+    """ the access entries of an ACL, files have no default ACL """
+    if not acl:
+        return acl
+    return ','.join(entry for entry in acl.split(',') if not entry.strip().startswith('default:'))
+
+
+class AccessControlCheckpoint(object):
+    """ The continuation marker of the next page to update, and the paths that failed so far. """
+
+    def __init__(self, checkpoint_dir, job):
+        self.job = job
+        key = json.dumps(job, sort_keys=True).encode('utf-8')
+        self.path = os.path.join(checkpoint_dir, hashlib.sha1(key).hexdigest() + '.json')
+        self.marker = None
+        self.failed_paths = []
+        self.counters = {'directoriesSuccessful': 0, 'filesSuccessful': 0, 'failureCount': 0}
+        self.exists = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as checkpoint_file:
+                data = json.load(checkpoint_file)
+        except (IOError, OSError, ValueError):
+            return False
+        if data.get('job') != self.job:
+            return False
+        self.marker = data.get('marker')
+        self.failed_paths = data.get('failedPaths', [])
+        self.counters.update(data.get('counters', {}))
+        return True
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as checkpoint_file:
+            json.dump({'job': self.job, 'marker': self.marker, 'failedPaths': self.failed_paths,
+                       'counters': self.counters}, checkpoint_file)
+        os.replace(temp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class RecursiveAccessControlJob(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Sets the owner, group, permissions or ACL of a directory and of everything below it.
+
+    At most max_connections requests run at once. A path that fails does not stop the job, it is recorded
+    and tried again by the next run of the same job.
+    """
+
+    def __init__(self, client, container_name, directory_path, owner=None, group=None, permissions=None,
+                 acl=None, max_connections=DEFAULT_MAX_CONNECTIONS, checkpoint_dir=None, progress_callback=None,
+                 timeout=None):
+        self.client = client
+        self.container_name = container_name
+        self.directory_path = directory_path.strip('/')
+        self.owner = owner
+        self.group = group
+        self.permissions = permissions
+        self.acl = acl
+        self.max_connections = max_connections
+        self.progress_callback = progress_callback
+        self.timeout = timeout
+        self.failures = []
+        self.checkpoint = AccessControlCheckpoint(checkpoint_dir or get_default_checkpoint_dir(), {
+            'account': getattr(client, 'account_name', None),
+            'container': container_name,
+            'path': self.directory_path,
+            'owner': owner,
+            'group': group,
+            'permissions': permissions,
+            'acl': acl
+        })
+        self._lock = threading.Lock()
+
+    def _apply(self, path, is_directory):
+        try:
+            self.client.set_path_access_control(
+                self.container_name, path, owner=self.owner, group=self.group, permissions=self.permissions,
+                acl=self.acl if is_directory else strip_default_entries(self.acl), timeout=self.timeout)
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.debug('Failed to set the access control of %s: %s', path, ex)
+            with self._lock:
+                self.checkpoint.counters['failureCount'] += 1
+                self.failures.append((path, is_directory))
+                if len(self.failures) <= MAX_RECORDED_FAILURES:
+                    logger.warning('Failed to set the access control of %s: %s', path, ex)
+            return
+        counter = 'directoriesSuccessful' if is_directory else 'filesSuccessful'
+        with self._lock:
+            self.checkpoint.counters[counter] += 1
+
+    def _apply_batch(self, executor, paths):
+        list(executor.map(lambda entry: self._apply(*entry), paths))
+        if self.progress_callback:
+            self.progress_callback(dict(self.checkpoint.counters))
+
+    def run(self):
+        """ applies the access control, returns the counts of paths that succeeded and failed """
+        from .util import iter_blob_pages
+        checkpoint = self.checkpoint
+        if checkpoint.exists:
+            logger.warning('Resuming an interrupted run, %d paths were already done.',
+                           checkpoint.counters['directoriesSuccessful'] + checkpoint.counters['filesSuccessful'])
+        retries = [tuple(entry) for entry in checkpoint.failed_paths]
+        checkpoint.failed_paths = []
+        checkpoint.counters['failureCount'] = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            if retries:
+                self._apply_batch(executor, retries)
+            if not checkpoint.exists:
+                # the directory itself, before what it contains
+                self._apply_batch(executor, [(self.directory_path, True)])
+            if checkpoint.marker != '':
+                pages = iter_blob_pages(self.client, self.container_name, prefix=self.directory_path + '/',
+                                        include='metadata', marker=checkpoint.marker, timeout=self.timeout,
+                                        prefetch=True)
+                for items, next_marker in pages:
+                    self._apply_batch(executor, [(item.name, _is_directory(item)) for item in items])
+                    # '' marks a listing that is done, only failures remain
+                    checkpoint.marker = next_marker or ''
+                    checkpoint.failed_paths = [list(entry) for entry in self.failures]
+                    checkpoint.save()
+
+        if self.failures:
+            checkpoint.failed_paths = [list(entry) for entry in self.failures]
+            checkpoint.save()
+        else:
+            checkpoint.remove()
+        result = dict(checkpoint.counters)
+        result['failedEntries'] = [{'name': path, 'isDirectory': is_directory}
+                                   for path, is_directory in self.failures[:MAX_RECORDED_FAILURES]]
+        return result
+
+
+def _is_directory(blob):
+    return (getattr(blob, 'metadata', None) or {}).get('hdi_isfolder') == 'true'
@@ -0,0 +1,152 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+Deletes the content of a directory without a hierarchical namespace in bulk: the directory is listed once, its
+blobs are deleted in batch requests sent in parallel, and the directory markers are removed last, the deepest
+first, so that an interrupted delete leaves every remaining blob under a directory that is still listed.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 8
+# the most sub-requests the service accepts in a batch
+MAX_BATCH_SIZE = 256
+
+
+class BulkDeleteResult(object):  # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.deleted = 0
+        self.failed = []
+        self.seconds = 0
+
+    @property
+    def blobs_per_second(self):
+        return self.deleted / self.seconds if self.seconds else 0
+
+
+class BulkDirectoryDelete(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Deletes a directory, everything below it first.
+
+    Blobs are sent in batches of up to batch_size, at most max_connections batches at once. Without batch
+    support, e.g. for a SAS that cannot delete through the batch endpoint, the blobs of a batch are deleted
+    one at a time instead.
+    """
+
+    def __init__(self, client, container_name, directory_path, batch_request_type,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, batch_size=MAX_BATCH_SIZE, progress_callback=None,
+                 timeout=None):
+        self.client = client
+        self.container_name = container_name
+        self.directory_path = directory_path.strip('/')
+        self.batch_request_type = batch_request_type
+        self.max_connections = max_connections
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+        self.timeout = timeout
+        self.result = BulkDeleteResult()
+        self._use_batches = True
+        self._lock = threading.Lock()
+        self._started = None
+
+    def _report(self, deleted, failed):
+        with self._lock:
+            self.result.deleted += deleted
+            self.result.failed.extend(failed)
+            self.result.seconds = time.time() - self._started
+        if self.progress_callback:
+            self.progress_callback(self.result)
+
+    def _delete_one(self, name):
+        """ True once deleted, None if there was nothing to delete, False on failure """
+        from azure.common import AzureMissingResourceHttpError
+        try:
+            self.client.delete_blob(self.container_name, name, timeout=self.timeout)
+        except AzureMissingResourceHttpError:
+            # deleted by an earlier, interrupted run, or a virtual directory without marker
+            return None
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.debug('Failed to delete %s: %s', name, ex)
+            return False
+        return True
+
+    def _delete_batch(self, names):
+        if self._use_batches and len(names) > 1:
+            try:
+                responses = self.client.batch_delete_blobs(
+                    [self.batch_request_type(self.container_name, name) for name in names], timeout=self.timeout)
+            except Exception as ex:  # pylint: disable=broad-except
+                logger.warning('Batch delete is not available (%s), deleting the blobs one at a time.', ex)
+                self._use_batches = False
+            else:
+                missing = [response for response in responses
+                           if getattr(response.http_response, 'status', None) == 404]
+                failed = [response.batch_sub_request.blob_name for response in responses
+                          if not response.is_successful and response not in missing]
+                self._report(len(names) - len(failed) - len(missing), failed)
+                return
+        outcomes = [(name, self._delete_one(name)) for name in names]
+        self._report(sum(1 for _, outcome in outcomes if outcome),
+                     [name for name, outcome in outcomes if outcome is False])
+
+    def _delete_all(self, executor, batches):
+        # bounds the batches waiting in the pool while the listing goes on
+        slots = threading.BoundedSemaphore(self.max_connections * 2)
+        futures = []
+
+        def _release(_):
+            slots.release()
+
+        for names in batches:
+            slots.acquire()
+            future = executor.submit(self._delete_batch, names)
+            future.add_done_callback(_release)
+            futures.append(future)
+        for future in futures:
+            future.result()
+
+    def _leaf_batches(self, directories):
+        """ yields the blobs to delete in batches, collects the directory markers """
+        from .util import iter_blob_pages
+        batch = []
+        for items, _ in iter_blob_pages(self.client, self.container_name, prefix=self.directory_path + '/',
+                                        include='metadata', timeout=self.timeout, prefetch=True):
+            for blob in items:
+                if (blob.metadata or {}).get('hdi_isfolder') == 'true':
+                    directories.append(blob.name)
+                    continue
+                batch.append(blob.name)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def run(self):
+        """ deletes the directory, the failed blobs and the directories above them are left in place """
+        self._started = time.time()
+        directories = []
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            self._delete_all(executor, self._leaf_batches(directories))
+
+            failed = set(self.result.failed)
+            directories.append(self.directory_path)
+            # markers of the same depth are independent, the levels above wait for them
+            levels = {}
+            for name in directories:
+                if not any(path.startswith(name + '/') for path in failed):
+                    levels.setdefault(name.count('/'), []).append(name)
+            for depth in sorted(levels, reverse=True):
+                names = levels[depth]
+                self._delete_all(executor, (names[index:index + self.batch_size]
+                                            for index in range(0, len(names), self.batch_size)))
+        return self.result
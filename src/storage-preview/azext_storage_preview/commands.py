@@ -144,7 +144,7 @@ The secondary cluster will become the primary cluster after failover. Please und
         from ._format import transform_blob_output
         from ._transformers import (transform_storage_list_output, create_boolean_result_output_transformer)
         g.storage_command_oauth('create', 'create_directory')
-        g.storage_command_oauth('delete', 'delete_directory')
+        g.storage_custom_command_oauth('delete', 'delete_directory')
         g.storage_custom_command_oauth('move', 'rename_directory')
         g.storage_custom_command_oauth('show', 'show_directory', table_transformer=transform_blob_output,
                                        exception_handler=show_exception_handler)
@@ -165,6 +165,6 @@ The secondary cluster will become the primary cluster after failover. Please und
                             custom_command_type=get_custom_sdk('blob', adls_blob_data_service_factory,
                                                                CUSTOM_DATA_STORAGE_ADLS),
                             resource_type=CUSTOM_DATA_STORAGE_ADLS) as g:
-        g.storage_command_oauth('set', 'set_path_access_control')
-        g.storage_command_oauth('update', 'set_path_access_control')
+        g.storage_custom_command_oauth('set', 'set_directory_access_control')
+        g.storage_custom_command_oauth('update', 'set_directory_access_control')
         g.storage_command_oauth('show', 'get_path_access_control')
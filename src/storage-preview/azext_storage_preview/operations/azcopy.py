@@ -4,7 +4,7 @@
 # --------------------------------------------------------------------------------------------
 
 from __future__ import print_function
-# from knack.util import CLIError
+from knack.util import CLIError
 from ..azcopy.util import AzCopy, blob_client_auth_for_azcopy, login_auth_for_azcopy
 
 
@@ -15,14 +15,24 @@ def storage_blob_copy(azcopy, source, destination, recursive=None):
     azcopy.copy(source, destination, flags=flags)
 
 
-def storage_blob_upload(cmd, client, source, destination, recursive=None):
+def storage_blob_upload(cmd, client, source, destination, recursive=None, engine=None, max_connections=None):
+    if engine == 'native':
+        from .transfer import native_blob_upload
+        return native_blob_upload(cmd, client, source, destination, recursive=recursive,
+                                  max_connections=max_connections)
     azcopy = _azcopy_blob_client(cmd, client)
     storage_blob_copy(azcopy, source, _add_url_sas(destination, azcopy.creds.sas_token), recursive=recursive)
+    return None
 
 
-def storage_blob_download(cmd, client, source, destination, recursive=None):
+def storage_blob_download(cmd, client, source, destination, recursive=None, engine=None, max_connections=None):
+    if engine == 'native':
+        from .transfer import native_blob_download
+        return native_blob_download(cmd, client, source, destination, recursive=recursive,
+                                    max_connections=max_connections)
     azcopy = _azcopy_blob_client(cmd, client)
     storage_blob_copy(azcopy, _add_url_sas(source, azcopy.creds.sas_token), destination, recursive=recursive)
+    return None
 
 
 # def storage_blob_upload_batch(cmd, client, source, destination):
@@ -43,9 +53,16 @@ def storage_blob_remove(cmd, client, target, recursive=None):
     azcopy.remove(_add_url_sas(target, azcopy.creds.sas_token), flags=flags)
 
 
-def storage_blob_sync(cmd, client, source, destination):
+def storage_blob_sync(cmd, client, source, destination, engine=None, max_connections=None, dry_run=None):
+    if engine == 'native':
+        from .transfer import native_blob_sync
+        return native_blob_sync(cmd, client, source, destination, max_connections=max_connections,
+                                dry_run=dry_run)
+    if dry_run:
+        raise CLIError('usage error: --dry-run is only supported with --engine native.')
     azcopy = _azcopy_blob_client(cmd, client)
     azcopy.sync(source, _add_url_sas(destination, azcopy.creds.sas_token), flags=['--delete-destination=true'])
+    return None
 
 
 def storage_run_command(cmd, command_args):
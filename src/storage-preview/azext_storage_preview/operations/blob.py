@@ -73,10 +73,31 @@ def show_blob(cmd, client, container_name, blob_name, snapshot=None, lease_id=No
     return blob
 
 
-# pylint: disable=unused-variable,logging-format-interpolation
-def delete_directory(client, container_name, directory_name):
+# pylint: disable=unused-variable,logging-format-interpolation,too-many-locals
+def delete_directory(cmd, client, container_name, directory_path, fail_not_exist=False, recursive=False,
+                     marker=None, lease_id=None, if_modified_since=None, if_unmodified_since=None, if_match=None,
+                     if_none_match=None, timeout=None, bulk=None, max_connections=None):
+    '''
+    :param str lease_id:
+        Required if the directory has an active lease.
+    :param str if_match:
+        An ETag value, or the wildcard character (*). Specify this header to perform
+        the operation only if the resource's ETag matches the value specified.
+    :param str if_none_match:
+        An ETag value, or the wildcard character (*). Specify this header
+        to perform the operation only if the resource's ETag does not match
+        the value specified.
+    '''
+    if bulk:
+        return _bulk_delete_directory(cmd, client, container_name, directory_path, lease_id=lease_id,
+                                      if_modified_since=if_modified_since, if_unmodified_since=if_unmodified_since,
+                                      if_match=if_match, if_none_match=if_none_match, timeout=timeout,
+                                      max_connections=max_connections)
 
-    deleted, marker = client.delete_directory(container_name, directory_name, recursive=True)
+    kwargs = {'fail_not_exist': fail_not_exist, 'recursive': recursive, 'lease_id': lease_id,
+              'if_modified_since': if_modified_since, 'if_unmodified_since': if_unmodified_since,
+              'if_match': if_match, 'if_none_match': if_none_match, 'timeout': timeout}
+    deleted, marker = client.delete_directory(container_name, directory_path, marker=marker, **kwargs)
 
     # if HNS is enabled, the delete operation is atomic and no marker is returned
     # if HNS is not enabled, and there are too more files/subdirectories in the directories to be deleted
@@ -84,19 +105,98 @@ def delete_directory(client, container_name, directory_name):
     # the rest of the files/subdirectories
     count = 1
     while marker is not None:
-        deleted, marker = client.delete_directory(container_name, directory_name, marker=marker, recursive=True)
+        deleted, marker = client.delete_directory(container_name, directory_path, marker=marker, **kwargs)
         count += 1
-    logger.info("Took {} call(s) to finish moving.".format(count))
+    logger.info("Took {} call(s) to finish deleting.".format(count))
+    return deleted
+
+
+def _bulk_delete_directory(cmd, client, container_name, directory_path, lease_id=None, if_modified_since=None,
+                           if_unmodified_since=None, if_match=None, if_none_match=None, timeout=None,
+                           max_connections=None):
+    if any([lease_id, if_modified_since, if_unmodified_since, if_match, if_none_match]):
+        raise CLIError('usage error: the lease and conditions of the directory cannot be used with --bulk.')
+
+    from ..bulk_delete import BulkDirectoryDelete, DEFAULT_MAX_CONNECTIONS
+    controller = cmd.cli_ctx.get_progress_controller()
+
+    def _progress(result):
+        controller.add(message='{} blobs deleted, {:.0f} blobs/s'.format(result.deleted, result.blobs_per_second))
+
+    job = BulkDirectoryDelete(client, container_name, directory_path,
+                              cmd.get_models('blob.models#BatchDeleteSubRequest'),
+                              max_connections=max_connections or DEFAULT_MAX_CONNECTIONS,
+                              progress_callback=_progress, timeout=timeout)
+    try:
+        result = job.run()
+    except KeyboardInterrupt:
+        raise CLIError('Interrupted, the directory and the blobs left in it are still listed. Run the same command '
+                       'again to finish deleting it.')
+    finally:
+        controller.end()
+    if result.failed:
+        raise CLIError('{} blobs could not be deleted, e.g. "{}". The directories above them were kept, run the '
+                       'same command again to retry them.'.format(len(result.failed), result.failed[0]))
+    logger.warning('Deleted %d blobs in %.1fs, %.0f blobs/s.', result.deleted, result.seconds,
+                   result.blobs_per_second)
+    return None
+
+
+def set_directory_access_control(cmd, client, container_name, path, owner=None, group=None, permissions=None,
+                                 acl=None, lease_id=None, if_modified_since=None, if_unmodified_since=None,
+                                 if_match=None, if_none_match=None, timeout=None, recursive=None,
+                                 max_connections=None):
+    '''
+    :param str lease_id:
+        Required if the path has an active lease.
+    :param str if_match:
+        An ETag value. Specify this header to perform the operation
+        only if the resource's ETag matches the value specified. The ETag must be specified in quotes.
+    :param str if_none_match:
+        An ETag value or the special wildcard ("*") value.
+        Specify this header to perform the operation only if the resource's ETag
+        does not match the value specified. The ETag must be specified in quotes.
+    '''
+    if not recursive:
+        return client.set_path_access_control(
+            container_name, path, owner=owner, group=group, permissions=permissions, acl=acl, lease_id=lease_id,
+            if_modified_since=if_modified_since, if_unmodified_since=if_unmodified_since, if_match=if_match,
+            if_none_match=if_none_match, timeout=timeout)
+
+    if any([lease_id, if_modified_since, if_unmodified_since, if_match, if_none_match]):
+        raise CLIError('usage error: the lease and conditions of a single path cannot be used with --recursive.')
+
+    from ..access_control import RecursiveAccessControlJob, DEFAULT_MAX_CONNECTIONS
+    controller = cmd.cli_ctx.get_progress_controller()
+
+    def _progress(counters):
+        controller.add(message='{} directories and {} files done, {} failed'.format(
+            counters['directoriesSuccessful'], counters['filesSuccessful'], counters['failureCount']))
+
+    job = RecursiveAccessControlJob(client, container_name, path, owner=owner, group=group,
+                                    permissions=permissions, acl=acl,
+                                    max_connections=max_connections or DEFAULT_MAX_CONNECTIONS,
+                                    progress_callback=_progress, timeout=timeout)
+    try:
+        result = job.run()
+    except KeyboardInterrupt:
+        raise CLIError('Interrupted, run the same command again to continue from the last batch that was done.')
+    finally:
+        controller.end()
+    if result['failureCount']:
+        logger.warning('The access control of %d paths could not be set, run the same command again to retry '
+                       'them.', result['failureCount'])
+    return result
 
 
 def list_blobs(client, container_name, prefix=None, num_results=None, include='mc',
                delimiter=None, marker=None, timeout=None):
-    client.list_blobs(container_name, prefix, num_results, include,
-                      delimiter, marker, timeout)
+    return client.list_blobs(container_name, prefix, num_results, include,
+                             delimiter, marker, timeout)
 
 
-def list_directory(client, container_name, directory_path, prefix=None, num_results=None, include='mc',
-                   delimiter=None, marker=None, timeout=None):
+def list_directory(cmd, client, container_name, directory_path, prefix=None, num_results=None, include='mc',
+                   delimiter=None, marker=None, timeout=None, max_depth=None, stream=None, prefetch=None):
     '''
     :param str container_name:
         Name of existing container.
@@ -125,10 +225,44 @@ def list_directory(client, container_name, directory_path, prefix=None, num_resu
         where the previous generator stopped.
     :param int timeout:
         The timeout parameter is expressed in seconds.
+    :param int max_depth:
+        Lists the directory one level at a time, down to max_depth levels. The subdirectories found at the
+        last level are returned as :class:`BlobPrefix` elements in place of their contents.
+    :param bool stream:
+        Prints the blobs page by page while following the continuation markers, and returns nothing.
+    :param bool prefetch:
+        With stream, requests the next page while the current one is printed.
     '''
     directory_prefix = directory_path + '/' + prefix if prefix else directory_path + '/'
-    return client.list_blobs(container_name, directory_prefix, num_results, include,
-                             delimiter, marker, timeout)
+    if max_depth is None and not stream:
+        return client.list_blobs(container_name, directory_prefix, num_results, include,
+                                 delimiter, marker, timeout)
+
+    if max_depth is not None and delimiter:
+        raise CLIError('usage error: --max-depth lists the directory with the "/" delimiter, '
+                       'it cannot be used with --delimiter.')
+    from itertools import islice
+    from ..util import walk_blobs
+    # a delimiter alone lists a single level
+    blobs = walk_blobs(client, container_name, prefix=directory_prefix, include=include,
+                       max_depth=1 if delimiter else max_depth, marker=marker, timeout=timeout,
+                       prefetch=bool(stream and prefetch), delimiter=delimiter or '/')
+    if not stream:
+        return list(islice(blobs, num_results))
+
+    from knack.util import todict
+    from .._format import transform_blob_output
+    from .._stream import StreamingOutput
+    output = StreamingOutput(cmd.cli_ctx, table_transformer=transform_blob_output)
+    try:
+        for blob in islice(blobs, num_results):
+            if not output.write(todict(blob)):
+                break
+    finally:
+        blobs.close()
+        output.close()
+    logger.info('Listed %d blobs.', output.count)
+    return None
 
 
 def rename_directory(client, container_name, new_path, source_path,
@@ -0,0 +1,184 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+
+from knack.util import CLIError
+from knack.log import get_logger
+
+from ..storage_url_helpers import StorageResourceIdentifier
+from ..transfer import BlobTransferEngine, DEFAULT_MAX_CONNECTIONS
+
+logger = get_logger(__name__)
+
+
+def _parse_blob_url(cmd, url):
+    identifier = StorageResourceIdentifier(cmd.cli_ctx.cloud, url)
+    if not identifier.container:
+        raise CLIError('usage error: unable to find the container in {}'.format(url))
+    return identifier.container, identifier.blob or ''
+
+
+def _iter_local_files(source, recursive):
+    """ yields the files to upload with their path relative to the destination, like azcopy names them """
+    import glob
+    if '*' in source:
+        # "dir/*" uploads the contents of dir, "dir/file*" the matching files and directories
+        paths = glob.glob(source)
+    elif os.path.exists(source):
+        paths = [source]
+    else:
+        raise CLIError('usage error: {} does not exist'.format(source))
+
+    for path in paths:
+        if os.path.isfile(path):
+            yield path, os.path.basename(path)
+            continue
+        if not recursive:
+            if '*' not in source:
+                raise CLIError('usage error: {} is a directory, use --recursive to upload it'.format(path))
+            continue
+        base = os.path.dirname(os.path.normpath(path))
+        for root, _, files in os.walk(path):
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+                yield file_path, os.path.relpath(file_path, base).replace(os.sep, '/')
+
+
+def _is_directory(blob):
+    return (blob.metadata or {}).get('hdi_isfolder') == 'true'
+
+
+def _iter_remote_blobs(client, container_name, source, destination, recursive):
+    """ yields the blobs to download with their local path, like azcopy names them """
+    source = source.rstrip('*')
+    if source and not source.endswith('/'):
+        try:
+            blob = client.get_blob_properties(container_name, source)
+            if not _is_directory(blob):
+                target = destination
+                if os.path.isdir(destination):
+                    target = os.path.join(destination, os.path.basename(source))
+                yield source, target, blob.properties
+                return
+        except Exception:  # pylint: disable=broad-except
+            # not a blob, a virtual directory
+            pass
+    if not recursive:
+        raise CLIError('usage error: {} is a directory, use --recursive to download it'.format(source or '*'))
+    prefix = source if not source or source.endswith('/') else source + '/'
+    # a named directory is created in the destination, the contents of a container are not nested
+    base = os.path.dirname(source.rstrip('/')) if source else ''
+    for blob in client.list_blobs(container_name, prefix=prefix or None, include='metadata'):
+        if _is_directory(blob):
+            continue
+        relative = blob.name[len(base):].lstrip('/') if base else blob.name
+        yield blob.name, os.path.join(destination, *relative.split('/')), blob.properties
+
+
+def _run(cmd, engine, start_transfers):
+    import threading
+    controller = cmd.cli_ctx.get_progress_controller(det=True)
+    lock = threading.Lock()
+
+    def _progress(current, total):
+        # reported from the transfer threads
+        with lock:
+            controller.add(message='Transferring', value=current, total_val=max(total, 1))
+
+    engine.progress_callback = _progress
+    try:
+        start_transfers()
+        results = engine.wait()
+    except KeyboardInterrupt:
+        engine.cancel()
+        engine.wait()
+        raise CLIError('The transfer was interrupted, run the same command again to resume it.')
+    except Exception:
+        engine.cancel()
+        raise
+    finally:
+        engine.close()
+        controller.end()
+
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        logger.warning('Failed to transfer %s: %s', result.source, result.error)
+    if failed:
+        raise CLIError('{} of {} transfers failed, run the same command again to resume them.'
+                       .format(len(failed), len(results)))
+    resumed = sum(result.resumed_bytes for result in results)
+    if resumed:
+        logger.info('Resumed %d bytes transferred by an earlier attempt.', resumed)
+    return [{'source': result.source, 'destination': result.destination, 'size': result.size}
+            for result in results]
+
+
+def _get_engine(cmd, client, container_name, max_connections):
+    t_blob_block, t_content_settings = cmd.get_models('blob.models#BlobBlock', 'blob.models#ContentSettings')
+    return BlobTransferEngine(client, container_name, t_blob_block, content_settings_type=t_content_settings,
+                              max_connections=max_connections or DEFAULT_MAX_CONNECTIONS)
+
+
+def native_blob_upload(cmd, client, source, destination, recursive=None, max_connections=None):
+    container_name, destination_path = _parse_blob_url(cmd, destination)
+    engine = _get_engine(cmd, client, container_name, max_connections)
+
+    def _start():
+        files = _iter_local_files(source, recursive)
+        if destination_path and not destination_path.endswith('/') and os.path.isfile(source):
+            # a single file is uploaded under the given blob name
+            engine.upload(source, destination_path)
+            return
+        prefix = destination_path if not destination_path or destination_path.endswith('/') \
+            else destination_path + '/'
+        for local_path, relative in files:
+            engine.upload(local_path, prefix + relative)
+
+    return _run(cmd, engine, _start)
+
+
+def native_blob_download(cmd, client, source, destination, recursive=None, max_connections=None):
+    container_name, source_path = _parse_blob_url(cmd, source)
+    engine = _get_engine(cmd, client, container_name, max_connections)
+
+    def _start():
+        for blob_name, local_path, properties in _iter_remote_blobs(client, container_name, source_path,
+                                                                    destination, recursive):
+            engine.download(blob_name, local_path, size=properties.content_length, etag=properties.etag)
+
+    return _run(cmd, engine, _start)
+
+
+def native_blob_sync(cmd, client, source, destination, max_connections=None, dry_run=None):
+    from ..sync import BlobSync
+    if not os.path.exists(source):
+        raise CLIError('usage error: {} does not exist'.format(source))
+    container_name, destination_path = _parse_blob_url(cmd, destination)
+    sync = BlobSync(client, container_name, source, destination_path,
+                    max_connections=max_connections or DEFAULT_MAX_CONNECTIONS)
+    plan = sync.plan()
+    logger.info('%d files unchanged, %d hashed since they were modified.', len(plan.unchanged), plan.hashed)
+    if dry_run:
+        return plan.to_list()
+
+    engine = _get_engine(cmd, client, container_name, max_connections)
+    results = {}
+
+    def _start():
+        for entry in plan.uploads:
+            results[entry] = engine.upload(entry.local_path, entry.blob_name, content_md5=entry.content_md5)
+
+    try:
+        _run(cmd, engine, _start)
+    finally:
+        # the files uploaded so far are not hashed again by the next run, even if this one fails
+        sync.save_manifest(plan, [entry for entry, result in results.items() if result.error is None])
+
+    failed = sync.delete(plan)
+    if failed:
+        raise CLIError('{} of {} blobs without a local file could not be deleted, run the same command again to '
+                       'retry them.'.format(len(failed), len(plan.deletes)))
+    return {'uploaded': len(plan.uploads), 'deleted': len(plan.deletes), 'unchanged': len(plan.unchanged)}
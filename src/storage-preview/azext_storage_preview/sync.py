@@ -0,0 +1,202 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+Incremental sync of local files to a container. A manifest of the size, modification time and MD5 of the files
+synced before lets a run hash only the files that changed since, and the hashes are compared with the
+content MD5 of the blobs, listed a page at a time, to find what to upload and what to delete.
+"""
+
+import os
+import json
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 8
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+MANIFEST_DIR_NAME = os.path.join('storage-preview', 'sync')
+
+
+def get_default_manifest_dir():
+    from azure.cli.core._environment import get_config_dir
+    return os.path.join(get_config_dir(), MANIFEST_DIR_NAME)
+
+
+def compute_md5(path):
+    """ the base64 encoded MD5 of a file, as the service reports the content MD5 of a blob """
+    md5 = hashlib.md5()
+    with open(path, 'rb') as local_file:
+        for chunk in iter(lambda: local_file.read(HASH_CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode('utf-8')
+
+
+class SyncManifest(object):
+    """ The size, modification time and MD5 of the files of a source, as they were when last synced. """
+
+    def __init__(self, manifest_dir, source, destination):
+        key = json.dumps([source, destination]).encode('utf-8')
+        self.path = os.path.join(manifest_dir, hashlib.sha1(key).hexdigest() + '.json')
+        self.source = source
+        self.destination = destination
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as manifest_file:
+                data = json.load(manifest_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if data.get('source') != self.source or data.get('destination') != self.destination:
+            return {}
+        return data.get('files', {})
+
+    def lookup(self, relative, stat):
+        """ the MD5 recorded for the file, if it has not been modified since """
+        entry = self.entries.get(relative)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def save(self, entries):
+        self.entries = entries
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as manifest_file:
+            json.dump({'source': self.source, 'destination': self.destination, 'files': entries}, manifest_file)
+        os.replace(temp_path, self.path)
+
+
+class SyncEntry(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, local_path, relative, blob_name, stat, content_md5):
+        self.local_path = local_path
+        self.relative = relative
+        self.blob_name = blob_name
+        self.stat = stat
+        self.content_md5 = content_md5
+
+
+class SyncPlan(object):
+    def __init__(self):
+        self.uploads = []
+        self.deletes = []
+        self.unchanged = []
+        self.hashed = 0
+
+    def to_list(self):
+        return [{'action': 'upload', 'source': entry.local_path, 'destination': entry.blob_name}
+                for entry in self.uploads] + \
+               [{'action': 'delete', 'source': None, 'destination': blob_name} for blob_name in self.deletes]
+
+
+class BlobSync(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Compares a local file or directory with a blob or a virtual directory of a container.
+
+    A directory is synced with the blobs below destination_path, which are deleted when they have no local
+    file and delete_destination is set. Files are hashed with at most max_connections threads.
+    """
+
+    def __init__(self, client, container_name, source, destination_path, delete_destination=True,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, manifest_dir=None, timeout=None):
+        self.client = client
+        self.container_name = container_name
+        self.source = os.path.abspath(source)
+        self.destination_path = destination_path or ''
+        self.delete_destination = delete_destination
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.manifest = SyncManifest(manifest_dir or get_default_manifest_dir(), self.source, '{}/{}/{}'.format(
+            getattr(client, 'account_name', None), container_name, self.destination_path))
+
+    def _prefix(self):
+        if os.path.isfile(self.source):
+            return None
+        return self.destination_path if not self.destination_path or self.destination_path.endswith('/') \
+            else self.destination_path + '/'
+
+    def _iter_local_files(self):
+        """ yields the local files with their path relative to the source and their blob name """
+        prefix = self._prefix()
+        if prefix is None:
+            name = self.destination_path or os.path.basename(self.source)
+            yield self.source, name, name
+            return
+        for root, _, files in os.walk(self.source):
+            for file_name in files:
+                local_path = os.path.join(root, file_name)
+                relative = os.path.relpath(local_path, self.source).replace(os.sep, '/')
+                yield local_path, relative, prefix + relative
+
+    def _iter_remote_blobs(self):
+        """ yields the name and the content MD5 of the blobs to compare with """
+        from .util import iter_blob_pages
+        prefix = self._prefix()
+        single_blob = None if prefix is not None else self.destination_path or os.path.basename(self.source)
+        for items, _ in iter_blob_pages(self.client, self.container_name, prefix=single_blob or prefix or None,
+                                        include='metadata', timeout=self.timeout, prefetch=True):
+            for blob in items:
+                if (blob.metadata or {}).get('hdi_isfolder') == 'true':
+                    continue
+                if single_blob and blob.name != single_blob:
+                    continue
+                yield blob.name, blob.properties.content_settings.content_md5
+
+    def plan(self):
+        """ finds the files to upload and the blobs to delete, hashing only the files modified since the last run """
+        remote = dict(self._iter_remote_blobs())
+        plan = SyncPlan()
+        to_hash = []
+        for local_path, relative, blob_name in self._iter_local_files():
+            stat = os.stat(local_path)
+            entry = SyncEntry(local_path, relative, blob_name, stat, self.manifest.lookup(relative, stat))
+            if entry.content_md5 is None:
+                to_hash.append(entry)
+            else:
+                self._compare(plan, entry, remote)
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            for entry, content_md5 in zip(to_hash, executor.map(compute_md5, (e.local_path for e in to_hash))):
+                entry.content_md5 = content_md5
+                self._compare(plan, entry, remote)
+        plan.hashed = len(to_hash)
+        if self.delete_destination and self._prefix() is not None:
+            plan.deletes = sorted(remote)
+        return plan
+
+    @staticmethod
+    def _compare(plan, entry, remote):
+        if remote.pop(entry.blob_name, None) == entry.content_md5:
+            plan.unchanged.append(entry)
+        else:
+            plan.uploads.append(entry)
+
+    def delete(self, plan):
+        """ deletes the blobs without a local file, returns the names that could not be deleted """
+        from azure.common import AzureMissingResourceHttpError
+
+        def _delete(blob_name):
+            try:
+                self.client.delete_blob(self.container_name, blob_name, timeout=self.timeout)
+            except AzureMissingResourceHttpError:
+                pass
+            except Exception as ex:  # pylint: disable=broad-except
+                logger.warning('Failed to delete %s: %s', blob_name, ex)
+                return blob_name
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            return [blob_name for blob_name in executor.map(_delete, plan.deletes) if blob_name]
+
+    def save_manifest(self, plan, uploaded):
+        """ records the unchanged files and the uploaded ones, the others are hashed again by the next run """
+        uploaded = set(uploaded)
+        synced = plan.unchanged + [entry for entry in plan.uploads if entry in uploaded]
+        self.manifest.save({entry.relative: [entry.stat.st_size, entry.stat.st_mtime_ns, entry.content_md5]
+                            for entry in synced})
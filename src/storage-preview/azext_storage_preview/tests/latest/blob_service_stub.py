@@ -0,0 +1,329 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+In-memory stand-ins for the blob and file services of the storage SDK, with the same method signatures, so
+that transfers and listings can be tested and timed without an account. An optional latency is added to every
+request to behave like a remote service.
+"""
+
+import os
+import time
+import uuid
+import base64
+import hashlib
+import threading
+import unittest
+
+from azure.common import AzureMissingResourceHttpError
+
+# the benchmarks time the stubs with their latency, so they only run when asked for
+benchmark = unittest.skipUnless(  # pylint: disable=invalid-name
+    os.environ.get('AZURE_STORAGE_PREVIEW_BENCHMARKS', '').lower() in ('1', 'true', 'yes'),
+    'set AZURE_STORAGE_PREVIEW_BENCHMARKS=1 to run the benchmarks')
+
+
+class ContentSettings(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, content_type=None, content_md5=None, **_):
+        self.content_type = content_type
+        self.content_md5 = content_md5
+
+
+class BlobProperties(object):  # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.content_length = 0
+        self.etag = None
+        self.last_modified = None
+        self.content_settings = ContentSettings()
+
+
+class Blob(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, name=None, props=None, metadata=None):
+        self.name = name
+        self.properties = props or BlobProperties()
+        self.metadata = metadata
+
+
+class BlobPrefix(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, name=None):
+        self.name = name
+
+
+class BlobBlock(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, id=None, state=None):  # pylint: disable=redefined-builtin
+        self.id = id
+        self.state = state
+
+
+class BlobBlockList(object):  # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.committed_blocks = []
+        self.uncommitted_blocks = []
+
+
+class HTTPResponse(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, status):
+        self.status = status
+
+
+class BatchDeleteSubRequest(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, container_name, blob_name, **_):
+        self.container_name = container_name
+        self.blob_name = blob_name
+
+
+class BatchSubResponse(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, is_successful, http_response, batch_sub_request):
+        self.is_successful = is_successful
+        self.http_response = http_response
+        self.batch_sub_request = batch_sub_request
+
+
+class ListPage(list):
+    next_marker = None
+
+
+class ListGenerator(object):
+    """ follows next_marker like the SDK's generator """
+
+    def __init__(self, page, list_method, kwargs):
+        self.items = page
+        self.next_marker = page.next_marker
+        self._list_method = list_method
+        self._kwargs = kwargs
+
+    def __iter__(self):
+        for item in self.items:
+            yield item
+        while self.next_marker:
+            max_results = self._kwargs.get('num_results')
+            if max_results is not None:
+                max_results -= len(self.items)
+                if max_results <= 0:
+                    break
+                self._kwargs['num_results'] = max_results
+            self._kwargs['marker'] = self.next_marker
+            self.items = self._list_method(**self._kwargs)
+            self.next_marker = self.items.next_marker
+            for item in self.items:
+                yield item
+
+
+class BlobServiceStub(object):  # pylint: disable=too-many-public-methods
+    """
+    A block blob service whose containers are dictionaries of blob name to content.
+
+    latency is the time in seconds every request takes, requests counts them by method name.
+    """
+
+    PAGE_SIZE = 5000
+
+    def __init__(self, latency=0, page_size=PAGE_SIZE):
+        self.latency = latency
+        self.page_size = page_size
+        self.containers = {}
+        self.metadata = {}
+        self.acls = {}
+        # the content MD5 of blobs committed from blocks, the service computes it only for single requests
+        self.block_blob_md5 = {}
+        self.requests = {}
+        self.request_session = None
+        self._uncommitted = {}
+        self._lock = threading.Lock()
+
+    def _request(self, method):
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _blobs(self, container_name):
+        return self.containers.setdefault(container_name, {})
+
+    def _missing(self, name):
+        return AzureMissingResourceHttpError('The specified blob does not exist: {}'.format(name), 404)
+
+    def put(self, container_name, blob_name, content, metadata=None):
+        """ adds a blob without counting a request, for test setup """
+        self._blobs(container_name)[blob_name] = (bytes(content), self._new_etag())
+        self.block_blob_md5.pop((container_name, blob_name), None)
+        if metadata:
+            self.metadata[(container_name, blob_name)] = dict(metadata)
+
+    def content(self, container_name, blob_name):
+        return self._blobs(container_name)[blob_name][0]
+
+    @staticmethod
+    def _new_etag():
+        return '"{}"'.format(uuid.uuid4())
+
+    def _make_blob(self, container_name, blob_name):
+        content, etag = self._blobs(container_name)[blob_name]
+        blob = Blob(blob_name, metadata=self.metadata.get((container_name, blob_name)))
+        blob.properties.content_length = len(content)
+        blob.properties.etag = etag
+        if (container_name, blob_name) in self.block_blob_md5:
+            blob.properties.content_settings.content_md5 = self.block_blob_md5[(container_name, blob_name)]
+        else:
+            blob.properties.content_settings.content_md5 = base64.b64encode(hashlib.md5(content).digest()).decode()
+        return blob
+
+    # block blobs
+
+    def create_blob_from_path(self, container_name, blob_name, file_path, content_settings=None, **_):
+        self._request('create_blob_from_path')
+        with open(file_path, 'rb') as blob_file:
+            content = blob_file.read()
+        with self._lock:
+            self._blobs(container_name)[blob_name] = (content, self._new_etag())
+            self._uncommitted.pop((container_name, blob_name), None)
+            self.block_blob_md5.pop((container_name, blob_name), None)
+
+    def put_block(self, container_name, blob_name, block, block_id, **_):
+        self._request('put_block')
+        with self._lock:
+            self._uncommitted.setdefault((container_name, blob_name), {})[block_id] = bytes(block)
+
+    def put_block_list(self, container_name, blob_name, block_list, content_settings=None, **_):
+        self._request('put_block_list')
+        with self._lock:
+            blocks = self._uncommitted.pop((container_name, blob_name), {})
+            content = b''.join(blocks[block.id] for block in block_list)
+            self._blobs(container_name)[blob_name] = (content, self._new_etag())
+            self.block_blob_md5[(container_name, blob_name)] = getattr(content_settings, 'content_md5', None)
+
+    def get_block_list(self, container_name, blob_name, block_list_type=None, **_):
+        self._request('get_block_list')
+        block_list = BlobBlockList()
+        with self._lock:
+            for block_id in self._uncommitted.get((container_name, blob_name), {}):
+                block_list.uncommitted_blocks.append(BlobBlock(id=block_id))
+        return block_list
+
+    # reading
+
+    def get_blob_properties(self, container_name, blob_name, **_):
+        self._request('get_blob_properties')
+        if blob_name not in self._blobs(container_name):
+            raise self._missing(blob_name)
+        return self._make_blob(container_name, blob_name)
+
+    def exists(self, container_name, blob_name=None, **_):
+        self._request('exists')
+        return blob_name in self._blobs(container_name)
+
+    def get_blob_to_stream(self, container_name, blob_name, stream, start_range=None, end_range=None,
+                           if_match=None, **_):
+        self._request('get_blob_to_stream')
+        if blob_name not in self._blobs(container_name):
+            raise self._missing(blob_name)
+        content, etag = self._blobs(container_name)[blob_name]
+        if if_match and if_match != etag:
+            raise AzureMissingResourceHttpError('The condition specified using HTTP conditional header(s) '
+                                                'is not met.', 412)
+        start = start_range or 0
+        end = len(content) - 1 if end_range is None else end_range
+        stream.write(content[start:end + 1])
+        return self._make_blob(container_name, blob_name)
+
+    def get_blob_to_path(self, container_name, blob_name, file_path, **kwargs):
+        with open(file_path, 'wb') as blob_file:
+            return self.get_blob_to_stream(container_name, blob_name, blob_file, **kwargs)
+
+    def list_blobs(self, container_name, prefix=None, num_results=None, include=None, delimiter=None,
+                   marker=None, timeout=None):
+        kwargs = {'container_name': container_name, 'prefix': prefix, 'num_results': num_results,
+                  'include': include, 'delimiter': delimiter, 'marker': marker, 'timeout': timeout}
+        return ListGenerator(self._list_page(**kwargs), self._list_page, kwargs)
+
+    def _list_page(self, container_name, prefix=None, num_results=None, include=None, delimiter=None,
+                   marker=None, timeout=None):  # pylint: disable=unused-argument
+        self._request('list_blobs')
+        prefix = prefix or ''
+        page_size = min(num_results or self.page_size, self.page_size)
+        with self._lock:
+            names = sorted(name for name in self._blobs(container_name) if name.startswith(prefix))
+        entries = []
+        for name in names:
+            position = name.find(delimiter, len(prefix)) if delimiter else -1
+            if position == -1:
+                entries.append((name, None))
+            elif not entries or entries[-1][0] != name[:position + len(delimiter)]:
+                entries.append((name[:position + len(delimiter)], BlobPrefix))
+        entries = [entry for entry in entries if not marker or entry[0] > marker]
+
+        page = ListPage()
+        for name, prefix_type in entries[:page_size]:
+            page.append(prefix_type(name) if prefix_type else self._make_blob(container_name, name))
+        if len(entries) > page_size:
+            page.next_marker = entries[page_size - 1][0]
+        return page
+
+    # deleting
+
+    def delete_blob(self, container_name, blob_name, **_):
+        self._request('delete_blob')
+        with self._lock:
+            if self._blobs(container_name).pop(blob_name, None) is None:
+                raise self._missing(blob_name)
+
+    def batch_delete_blobs(self, batch_delete_sub_requests, **_):
+        self._request('batch_delete_blobs')
+        if len(batch_delete_sub_requests) > 256:
+            raise ValueError('a batch holds at most 256 requests')
+        responses = []
+        with self._lock:
+            for sub_request in batch_delete_sub_requests:
+                deleted = self._blobs(sub_request.container_name).pop(sub_request.blob_name, None) is not None
+                responses.append(BatchSubResponse(deleted, HTTPResponse(202 if deleted else 404), sub_request))
+        return responses
+
+    # data lake
+
+    def set_path_access_control(self, container_name, path, owner=None, group=None, permissions=None, acl=None,
+                                **_):
+        self._request('set_path_access_control')
+        with self._lock:
+            self.acls[(container_name, path)] = {'owner': owner, 'group': group, 'permissions': permissions,
+                                                 'acl': acl}
+        return {'etag': self._new_etag()}
+
+
+class File(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, name=None):
+        self.name = name
+
+
+class Directory(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, name=None):
+        self.name = name
+
+
+class FileServiceStub(object):
+    """ A file service whose shares are sets of file paths, the directories are the parents of the files. """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.shares = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def put(self, share_name, path):
+        self.shares.setdefault(share_name, set()).add(path)
+
+    def list_directories_and_files(self, share_name, directory_name=None, **_):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        prefix = directory_name + '/' if directory_name else ''
+        paths = [path for path in self.shares.get(share_name, ()) if path.startswith(prefix)]
+        if prefix and not paths:
+            raise AzureMissingResourceHttpError('The specified resource does not exist.', 404)
+        files, directories = set(), set()
+        for path in paths:
+            name, separator, _ = path[len(prefix):].partition('/')
+            (directories if separator else files).add(name)
+        return [Directory(name) for name in sorted(directories)] + [File(name) for name in sorted(files)]
@@ -0,0 +1,108 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ...access_control import RecursiveAccessControlJob, strip_default_entries
+from .blob_service_stub import BlobServiceStub
+
+ACL = 'user::rwx,group::r-x,other::---,default:user::rwx'
+DIRECTORIES = ['dir', 'dir/a', 'dir/b']
+FILES = ['dir/1.txt', 'dir/a/2.txt', 'dir/a/3.txt', 'dir/b/4.txt', 'dir/b/5.txt']
+
+
+class FlakyBlobServiceStub(BlobServiceStub):
+    """ fails to set the access control of the given paths once """
+
+    def __init__(self, failing_paths, **kwargs):
+        super(FlakyBlobServiceStub, self).__init__(**kwargs)
+        self.failing_paths = set(failing_paths)
+
+    def set_path_access_control(self, container_name, path, **kwargs):
+        if path in self.failing_paths:
+            self.failing_paths.discard(path)
+            raise IOError('connection reset')
+        return super(FlakyBlobServiceStub, self).set_path_access_control(container_name, path, **kwargs)
+
+
+class TestRecursiveAccessControl(unittest.TestCase):
+    def setUp(self):
+        self.checkpoint_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+    def _make_client(self, client):
+        for name in DIRECTORIES:
+            client.put('container', name, b'', metadata={'hdi_isfolder': 'true'})
+        for name in FILES:
+            client.put('container', name, b'x')
+        client.put('container', 'other.txt', b'x')
+        return client
+
+    def _run(self, client, progress_callback=None):
+        job = RecursiveAccessControlJob(client, 'container', 'dir/', acl=ACL, max_connections=4,
+                                        checkpoint_dir=self.checkpoint_dir, progress_callback=progress_callback)
+        return job.run()
+
+    def test_strip_default_entries(self):
+        self.assertEqual(strip_default_entries(ACL), 'user::rwx,group::r-x,other::---')
+        self.assertIsNone(strip_default_entries(None))
+
+    def test_apply_recursively(self):
+        client = self._make_client(BlobServiceStub(page_size=3))
+        batches = []
+
+        result = self._run(client, progress_callback=batches.append)
+
+        self.assertEqual(result['directoriesSuccessful'], 3)
+        self.assertEqual(result['filesSuccessful'], 5)
+        self.assertEqual(result['failureCount'], 0)
+        self.assertEqual(sorted(path for _, path in client.acls), sorted(DIRECTORIES + FILES))
+        self.assertEqual(client.acls[('container', 'dir/a')]['acl'], ACL)
+        self.assertEqual(client.acls[('container', 'dir/a/2.txt')]['acl'], 'user::rwx,group::r-x,other::---')
+        # the directory itself, then 3 pages
+        self.assertEqual(len(batches), 4)
+        self.assertEqual(os.listdir(self.checkpoint_dir), [])
+
+    def test_failures_are_retried_by_the_next_run(self):
+        client = self._make_client(FlakyBlobServiceStub(['dir/a/3.txt'], page_size=3))
+
+        result = self._run(client)
+        self.assertEqual(result['failureCount'], 1)
+        self.assertEqual(result['failedEntries'], [{'name': 'dir/a/3.txt', 'isDirectory': False}])
+
+        client.requests.clear()
+        result = self._run(client)
+        self.assertEqual(result['failureCount'], 0)
+        self.assertEqual(result['filesSuccessful'], 5)
+        # only the failed path is applied again, nothing is listed
+        self.assertEqual(client.requests, {'set_path_access_control': 1})
+        self.assertEqual(os.listdir(self.checkpoint_dir), [])
+
+    def test_interrupted_run_resumes_after_the_last_batch(self):
+        client = self._make_client(BlobServiceStub(page_size=3))
+        batches = []
+
+        def _interrupt(counters):
+            batches.append(counters)
+            if len(batches) == 3:
+                raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            self._run(client, progress_callback=_interrupt)
+
+        client.requests.clear()
+        result = self._run(client)
+        self.assertEqual(result['directoriesSuccessful'] + result['filesSuccessful'], 8)
+        # the second page, interrupted before its checkpoint, and the last one
+        self.assertEqual(client.requests['set_path_access_control'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+import unittest
+from argparse import Namespace
+from six import StringIO
+
+from knack.util import CLIError
+
+from ...util import iter_blob_pages, walk_blobs
+from ...operations.blob import list_blobs, list_directory
+from .blob_service_stub import BlobServiceStub, benchmark
+
+BLOB_NAMES = ['dir/a.txt', 'dir/b.txt', 'dir/sub/c.txt', 'dir/sub/deep/d.txt', 'dir/sub/deep/e.txt',
+              'dir/zsub/f.txt', 'other/g.txt']
+
+
+def _make_cmd(output_format, query_active=False):
+    invocation = Namespace(data={'output': output_format, 'query_active': query_active})
+    return Namespace(cli_ctx=Namespace(invocation=invocation))
+
+
+class TestBlobListing(unittest.TestCase):
+    def setUp(self):
+        self.client = BlobServiceStub(page_size=2)
+        for name in BLOB_NAMES:
+            self.client.put('container', name, b'x')
+
+    def _names(self, items):
+        return [item.name for item in items]
+
+    def test_iter_blob_pages_follows_markers(self):
+        for prefetch in (False, True):
+            pages = list(iter_blob_pages(self.client, 'container', prefix='dir/', prefetch=prefetch))
+            self.assertEqual([len(items) for items, _ in pages], [2, 2, 2])
+            self.assertIsNone(pages[-1][1])
+            self.assertEqual(self._names(item for items, _ in pages for item in items), BLOB_NAMES[:-1])
+
+    def test_walk_blobs_max_depth(self):
+        names = self._names(walk_blobs(self.client, 'container', prefix='dir/', max_depth=1))
+        self.assertEqual(names, ['dir/a.txt', 'dir/b.txt', 'dir/sub/', 'dir/zsub/'])
+
+        names = self._names(walk_blobs(self.client, 'container', prefix='dir/', max_depth=2, prefetch=True))
+        self.assertEqual(names, ['dir/a.txt', 'dir/b.txt', 'dir/sub/c.txt', 'dir/sub/deep/', 'dir/zsub/f.txt'])
+
+        names = self._names(walk_blobs(self.client, 'container', prefix='dir/', max_depth=10))
+        self.assertEqual(sorted(names), BLOB_NAMES[:-1])
+
+    def test_list_blobs_returns_the_blobs(self):
+        self.assertEqual(self._names(list_blobs(self.client, 'container', prefix='other/')), ['other/g.txt'])
+
+    def test_list_directory_max_depth(self):
+        result = list_directory(_make_cmd('json'), self.client, 'container', 'dir', max_depth=1, num_results=3)
+        self.assertEqual(self._names(result), ['dir/a.txt', 'dir/b.txt', 'dir/sub/'])
+
+        with self.assertRaises(CLIError):
+            list_directory(_make_cmd('json'), self.client, 'container', 'dir', max_depth=1, delimiter='/')
+
+    def _stream(self, output_format, **kwargs):
+        import sys
+        out, sys.stdout = sys.stdout, StringIO()
+        try:
+            result = list_directory(_make_cmd(output_format), self.client, 'container', 'dir', stream=True,
+                                    prefetch=True, **kwargs)
+            return result, sys.stdout.getvalue()
+        finally:
+            sys.stdout = out
+
+    def test_list_directory_stream(self):
+        from ... import _stream
+        batch_size, _stream.STREAM_BATCH_SIZE = _stream.STREAM_BATCH_SIZE, 2
+        try:
+            result, output = self._stream('json')
+            self.assertIsNone(result)
+            self.assertEqual([row['name'] for row in json.loads(output)], BLOB_NAMES[:-1])
+
+            _, output = self._stream('json', num_results=0)
+            self.assertEqual(json.loads(output), [])
+
+            _, output = self._stream('tsv', num_results=3)
+            self.assertEqual(len(output.splitlines()), 3)
+            self.assertIn('dir/sub/c.txt', output.splitlines()[2].split('\t'))
+
+            _, output = self._stream('table', delimiter='/')
+            lines = output.splitlines()
+            self.assertTrue(lines[0].startswith('Name'))
+            self.assertEqual([line.split()[0] for line in lines[2:]],
+                             ['dir/a.txt', 'dir/b.txt', 'dir/sub/', 'dir/zsub/'])
+
+            _, output = self._stream('yaml', num_results=3)
+            self.assertEqual(output.count('\n- '), 2)
+        finally:
+            _stream.STREAM_BATCH_SIZE = batch_size
+
+    def test_stream_table_keeps_the_columns_of_the_first_batch(self):
+        from ... import _stream
+        batch_size, _stream.STREAM_BATCH_SIZE = _stream.STREAM_BATCH_SIZE, 2
+        try:
+            out = StringIO()
+            output = _stream.StreamingOutput(_make_cmd('table').cli_ctx, out_file=out)
+            names = ['dir/a long name.txt', 'dir/b.txt', 'c', 'dir/d e', 'f', 'dir/a name longer than the header.txt']
+            for name in names:
+                output.write({'name': name, 'size': len(name)})
+            output.close()
+            lines = out.getvalue().splitlines()
+            self.assertEqual(len(lines), 8)
+            offset = lines[0].index('Size')
+            for line in lines[2:-1]:
+                self.assertEqual(line[offset - 2:offset], '  ')
+                self.assertNotEqual(line[offset], ' ')
+            self.assertEqual(lines[4], 'c'.ljust(offset) + '1')
+            self.assertEqual(lines[5], 'dir/d e'.ljust(offset) + '7')
+            self.assertTrue(lines[-1].startswith('dir/a name longer than the header.txt  '))
+        finally:
+            _stream.STREAM_BATCH_SIZE = batch_size
+
+    def test_list_directory_stream_rejects_query(self):
+        with self.assertRaises(CLIError):
+            list_directory(_make_cmd('json', query_active=True), self.client, 'container', 'dir', stream=True)
+
+
+@benchmark
+class ListingMemoryBenchmark(unittest.TestCase):
+    """ peak memory of listing 50000 blobs, collected or streamed """
+
+    def test_stream_memory(self):
+        import sys
+        import tracemalloc
+        client = BlobServiceStub()
+        for index in range(50000):
+            client.put('container', 'dir/{:08d}.txt'.format(index), b'')
+
+        def _peak(func):
+            out, sys.stdout = sys.stdout, open(os.devnull, 'w')
+            tracemalloc.start()
+            try:
+                func()
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+                sys.stdout.close()
+                sys.stdout = out
+
+        collected = _peak(lambda: list_directory(_make_cmd('json'), client, 'container', 'dir', max_depth=1))
+        streamed = _peak(lambda: list_directory(_make_cmd('json'), client, 'container', 'dir', stream=True))
+        self.assertLess(streamed * 2, collected, 'peak memory listing 50000 blobs: {:.1f} MB collected, {:.1f} MB '
+                        'streamed'.format(collected / 1e6, streamed / 1e6))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from ... import sync
+from ...sync import BlobSync
+from ...transfer import BlobTransferEngine
+from .blob_service_stub import BlobServiceStub, BlobBlock, ContentSettings, benchmark
+
+FILES = ['index.html', 'css/site.css', 'js/app.js', 'js/vendor/lib.js']
+
+
+class TestBlobSync(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, 'site')
+        self.manifest_dir = os.path.join(self.temp_dir, 'manifests')
+        self.client = BlobServiceStub(page_size=2)
+        for name in FILES:
+            self.write(name, name.encode('utf-8'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.source, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as local_file:
+            local_file.write(content)
+        return path
+
+    def get_sync(self, source=None, destination_path='www'):
+        return BlobSync(self.client, 'container', source or self.source, destination_path, max_connections=4,
+                        manifest_dir=self.manifest_dir)
+
+    def run_sync(self, **kwargs):
+        """ uploads and deletes like the command does, returns the plan """
+        blob_sync = self.get_sync(**kwargs)
+        plan = blob_sync.plan()
+        engine = BlobTransferEngine(self.client, 'container', BlobBlock, content_settings_type=ContentSettings,
+                                    max_connections=4, block_size=8, journal_dir=self.manifest_dir)
+        for entry in plan.uploads:
+            engine.upload(entry.local_path, entry.blob_name, content_md5=entry.content_md5)
+        results = engine.wait()
+        engine.close()
+        self.assertFalse([result for result in results if result.error])
+        blob_sync.save_manifest(plan, plan.uploads)
+        self.assertEqual(blob_sync.delete(plan), [])
+        return plan
+
+    def test_first_sync_uploads_everything(self):
+        self.client.put('container', 'www/old.html', b'old')
+        self.client.put('container', 'other/keep.txt', b'keep')
+
+        plan = self.run_sync()
+
+        self.assertEqual(sorted(entry.blob_name for entry in plan.uploads), sorted('www/' + name for name in FILES))
+        self.assertEqual(plan.deletes, ['www/old.html'])
+        self.assertEqual(sorted(self.client.containers['container']),
+                         sorted(['other/keep.txt'] + ['www/' + name for name in FILES]))
+        self.assertEqual(self.client.content('container', 'www/js/vendor/lib.js'), b'js/vendor/lib.js')
+
+    def test_unchanged_files_are_not_read_again(self):
+        self.run_sync()
+        self.write('css/site.css', b'body {}')
+
+        with mock.patch.object(sync, 'compute_md5', wraps=sync.compute_md5) as compute_md5:
+            plan = self.run_sync()
+
+        compute_md5.assert_called_once_with(os.path.join(self.source, 'css', 'site.css'))
+        self.assertEqual([entry.blob_name for entry in plan.uploads], ['www/css/site.css'])
+        self.assertEqual(len(plan.unchanged), 3)
+        self.assertEqual(plan.deletes, [])
+
+    def test_touched_files_with_the_same_content_are_not_uploaded(self):
+        self.run_sync()
+        path = os.path.join(self.source, 'index.html')
+        os.utime(path, (time.time() + 10, time.time() + 10))
+
+        plan = self.run_sync()
+
+        self.assertEqual(plan.hashed, 1)
+        self.assertEqual(plan.uploads, [])
+        # the new modification time is recorded
+        self.assertEqual(self.get_sync().plan().hashed, 0)
+
+    def test_blobs_changed_remotely_are_uploaded_again(self):
+        self.run_sync()
+        self.client.put('container', 'www/js/app.js', b'changed')
+        self.client.delete_blob('container', 'www/index.html')
+
+        plan = self.get_sync().plan()
+
+        self.assertEqual(sorted(entry.blob_name for entry in plan.uploads), ['www/index.html', 'www/js/app.js'])
+        self.assertEqual(plan.to_list()[0]['action'], 'upload')
+
+    def test_deleted_files_delete_their_blobs(self):
+        self.run_sync()
+        os.remove(os.path.join(self.source, 'js', 'app.js'))
+
+        plan = self.get_sync().plan()
+
+        self.assertEqual(plan.uploads, [])
+        self.assertEqual(plan.to_list(), [{'action': 'delete', 'source': None, 'destination': 'www/js/app.js'}])
+
+    def test_sync_a_single_file(self):
+        self.client.put('container', 'index.html.bak', b'x')
+        path = os.path.join(self.source, 'index.html')
+
+        plan = self.run_sync(source=path, destination_path=None)
+        self.assertEqual([entry.blob_name for entry in plan.uploads], ['index.html'])
+        self.assertEqual(plan.deletes, [])
+
+        self.assertEqual(self.get_sync(source=path, destination_path=None).plan().uploads, [])
+
+
+@benchmark
+class BlobSyncBenchmark(unittest.TestCase):
+    """ a second sync of 2000 files of 64KB of which 10 changed """
+
+    def test_sync_with_manifest(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            source = os.path.join(temp_dir, 'source')
+            client = BlobServiceStub()
+            for index in range(2000):
+                path = os.path.join(source, '{:02d}'.format(index // 100), '{:04d}.bin'.format(index))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                content = os.urandom(64 * 1024)
+                with open(path, 'wb') as local_file:
+                    local_file.write(content)
+                client.put('container', os.path.relpath(path, source).replace(os.sep, '/'), content)
+
+            def _plan(manifest_dir):
+                start = time.time()
+                plan = BlobSync(client, 'container', source, None, manifest_dir=manifest_dir).plan()
+                return plan, time.time() - start
+
+            manifest_dir = os.path.join(temp_dir, 'manifest')
+            plan, _ = _plan(manifest_dir)
+            BlobSync(client, 'container', source, None, manifest_dir=manifest_dir).save_manifest(plan, [])
+            for index in range(0, 2000, 200):
+                path = os.path.join(source, '{:02d}'.format(index // 100), '{:04d}.bin'.format(index))
+                with open(path, 'ab') as local_file:
+                    local_file.write(b'changed')
+
+            _, without_manifest = _plan(os.path.join(temp_dir, 'empty'))
+            plan, with_manifest = _plan(manifest_dir)
+            self.assertEqual(len(plan.uploads), 10)
+            self.assertLess(with_manifest * 2, without_manifest, 'plan of a sync of 2000 files: {:.2f}s hashing every '
+                            'file, {:.2f}s with the manifest'.format(without_manifest, with_manifest))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from ...transfer import BlobTransferEngine, PARTIAL_DOWNLOAD_SUFFIX
+from ...operations.transfer import _iter_local_files, _iter_remote_blobs
+from .blob_service_stub import BlobServiceStub, BlobBlock, ContentSettings, benchmark
+
+BLOCK_SIZE = 1024
+
+
+class FailingBlobServiceStub(BlobServiceStub):
+    """ fails every request of a method after the first `succeed` ones """
+
+    def __init__(self, method, succeed, **kwargs):
+        super(FailingBlobServiceStub, self).__init__(**kwargs)
+        self.method = method
+        self.succeed = succeed
+
+    def _request(self, method):
+        super(FailingBlobServiceStub, self)._request(method)
+        if method == self.method:
+            with self._lock:
+                self.succeed -= 1
+                if self.succeed < 0:
+                    raise IOError('connection reset')
+
+
+class TransferTestBase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.journal_dir = os.path.join(self.temp_dir, 'journals')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def make_file(self, name, size):
+        path = os.path.join(self.temp_dir, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as local_file:
+            local_file.write(os.urandom(size))
+        return path
+
+    def read(self, path):
+        with open(path, 'rb') as local_file:
+            return local_file.read()
+
+    def get_engine(self, client, max_connections=4):
+        return BlobTransferEngine(client, 'container', BlobBlock, content_settings_type=ContentSettings,
+                                  max_connections=max_connections, block_size=BLOCK_SIZE,
+                                  journal_dir=self.journal_dir)
+
+    def transfer(self, client, start):
+        engine = self.get_engine(client)
+        try:
+            start(engine)
+            return engine.wait()
+        finally:
+            engine.close()
+
+
+class TestBlobTransferEngine(TransferTestBase):
+
+    def test_upload_small_file_in_one_request(self):
+        client = BlobServiceStub()
+        path = self.make_file('small.txt', BLOCK_SIZE - 1)
+
+        results = self.transfer(client, lambda engine: engine.upload(path, 'dir/small.txt'))
+
+        self.assertIsNone(results[0].error)
+        self.assertEqual(client.content('container', 'dir/small.txt'), self.read(path))
+        self.assertEqual(client.requests, {'create_blob_from_path': 1})
+
+    def test_upload_and_download_in_blocks(self):
+        client = BlobServiceStub()
+        path = self.make_file('large.bin', BLOCK_SIZE * 10 + 7)
+        progress = []
+
+        engine = self.get_engine(client)
+        engine.progress_callback = lambda current, total: progress.append((current, total))
+        engine.upload(path, 'large.bin')
+        engine.wait()
+        engine.close()
+
+        self.assertEqual(client.content('container', 'large.bin'), self.read(path))
+        self.assertEqual(client.requests['put_block'], 11)
+        self.assertEqual(client.requests['put_block_list'], 1)
+        self.assertEqual(progress[-1], (BLOCK_SIZE * 10 + 7, BLOCK_SIZE * 10 + 7))
+
+        target = os.path.join(self.temp_dir, 'out', 'large.bin')
+        results = self.transfer(client, lambda engine: engine.download('large.bin', target))
+
+        self.assertIsNone(results[0].error)
+        self.assertEqual(self.read(target), self.read(path))
+        self.assertEqual(client.requests['get_blob_to_stream'], 11)
+        self.assertFalse(os.path.exists(target + PARTIAL_DOWNLOAD_SUFFIX))
+        self.assertEqual(os.listdir(self.journal_dir), [])
+
+    def test_resume_interrupted_upload(self):
+        path = self.make_file('large.bin', BLOCK_SIZE * 10)
+        client = FailingBlobServiceStub('put_block', 4)
+
+        results = self.transfer(client, lambda engine: engine.upload(path, 'large.bin'))
+
+        self.assertIsNotNone(results[0].error)
+        self.assertNotIn('large.bin', client.containers.get('container', {}))
+
+        # the same transfer picks up the blocks that made it
+        client.succeed = float('inf')
+        results = self.transfer(client, lambda engine: engine.upload(path, 'large.bin'))
+
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[0].resumed_bytes, BLOCK_SIZE * 4)
+        self.assertEqual(client.requests['put_block'], 10 + 6)
+        self.assertEqual(client.content('container', 'large.bin'), self.read(path))
+
+    def test_resume_skips_blocks_the_service_dropped(self):
+        path = self.make_file('large.bin', BLOCK_SIZE * 4)
+        client = FailingBlobServiceStub('put_block', 2)
+        self.transfer(client, lambda engine: engine.upload(path, 'large.bin'))
+
+        client.succeed = float('inf')
+        client._uncommitted.clear()  # pylint: disable=protected-access
+        results = self.transfer(client, lambda engine: engine.upload(path, 'large.bin'))
+
+        self.assertEqual(results[0].resumed_bytes, 0)
+        self.assertEqual(client.content('container', 'large.bin'), self.read(path))
+
+    def test_resume_interrupted_download(self):
+        client = FailingBlobServiceStub('get_blob_to_stream', 3)
+        client.put('container', 'large.bin', os.urandom(BLOCK_SIZE * 8))
+        target = os.path.join(self.temp_dir, 'large.bin')
+
+        results = self.transfer(client, lambda engine: engine.download('large.bin', target))
+
+        self.assertIsNotNone(results[0].error)
+        self.assertFalse(os.path.exists(target))
+        self.assertTrue(os.path.exists(target + PARTIAL_DOWNLOAD_SUFFIX))
+
+        client.succeed = float('inf')
+        results = self.transfer(client, lambda engine: engine.download('large.bin', target))
+
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[0].resumed_bytes, BLOCK_SIZE * 3)
+        self.assertEqual(self.read(target), client.content('container', 'large.bin'))
+
+    def test_changed_blob_is_downloaded_again(self):
+        client = FailingBlobServiceStub('get_blob_to_stream', 3)
+        client.put('container', 'large.bin', os.urandom(BLOCK_SIZE * 8))
+        target = os.path.join(self.temp_dir, 'large.bin')
+        self.transfer(client, lambda engine: engine.download('large.bin', target))
+
+        client.succeed = float('inf')
+        client.put('container', 'large.bin', os.urandom(BLOCK_SIZE * 8))
+        results = self.transfer(client, lambda engine: engine.download('large.bin', target))
+
+        self.assertEqual(results[0].resumed_bytes, 0)
+        self.assertEqual(self.read(target), client.content('container', 'large.bin'))
+
+
+class TestTransferEnumeration(TransferTestBase):
+
+    def test_iter_local_files(self):
+        self.make_file('data/a.txt', 1)
+        self.make_file('data/sub/b.txt', 1)
+        source = os.path.join(self.temp_dir, 'data')
+
+        names = sorted(name for _, name in _iter_local_files(source, recursive=True))
+        self.assertEqual(names, ['data/a.txt', 'data/sub/b.txt'])
+
+        names = sorted(name for _, name in _iter_local_files(os.path.join(source, '*'), recursive=True))
+        self.assertEqual(names, ['a.txt', 'sub/b.txt'])
+
+        names = sorted(name for _, name in _iter_local_files(os.path.join(source, '*'), recursive=False))
+        self.assertEqual(names, ['a.txt'])
+
+    def test_iter_remote_blobs(self):
+        client = BlobServiceStub()
+        for name in ['data/a.txt', 'data/sub/b.txt', 'other.txt']:
+            client.put('container', name, b'x')
+        client.put('container', 'data/sub', b'', metadata={'hdi_isfolder': 'true'})
+
+        def _targets(source):
+            return sorted(os.path.relpath(target, self.temp_dir).replace(os.sep, '/') for _, target, _ in
+                          _iter_remote_blobs(client, 'container', source, self.temp_dir, recursive=True))
+
+        self.assertEqual(_targets('data'), ['data/a.txt', 'data/sub/b.txt'])
+        self.assertEqual(_targets('data/sub'), ['sub/b.txt'])
+        self.assertEqual(_targets(''), ['data/a.txt', 'data/sub/b.txt', 'other.txt'])
+        self.assertEqual(_targets('other.txt'), ['other.txt'])
+
+
+@benchmark
+class TransferThroughputBenchmark(TransferTestBase):
+    """ 64 blocks against a service answering every request in 20ms """
+
+    def _time_upload(self, path, max_connections):
+        client = BlobServiceStub(latency=0.02)
+        engine = self.get_engine(client, max_connections=max_connections)
+        start = time.time()
+        engine.upload(path, 'large.bin')
+        engine.wait()
+        engine.close()
+        return time.time() - start
+
+    def test_parallel_upload_throughput(self):
+        path = self.make_file('large.bin', BLOCK_SIZE * 64)
+        sequential = self._time_upload(path, 1)
+        parallel = self._time_upload(path, 8)
+        self.assertLess(parallel * 4, sequential,
+                        'upload of 64 blocks: {:.2f}s with 1 connection, {:.2f}s with 8'.format(sequential, parallel))
+
+
+if __name__ == '__main__':
+    unittest.main()
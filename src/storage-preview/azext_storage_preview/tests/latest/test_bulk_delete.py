@@ -0,0 +1,128 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import time
+import unittest
+
+from ...bulk_delete import BulkDirectoryDelete
+from .blob_service_stub import BlobServiceStub, BatchDeleteSubRequest, benchmark
+
+DIRECTORIES = ['dir', 'dir/a', 'dir/a/b', 'dir/c']
+FILES = ['dir/1.txt', 'dir/a/2.txt', 'dir/a/b/3.txt', 'dir/a/b/4.txt', 'dir/c/5.txt']
+
+
+class RecordingBlobServiceStub(BlobServiceStub):
+    """ records the deleted blobs in order, can fail the given blobs or every batch """
+
+    def __init__(self, failing_blobs=(), batches=True, **kwargs):
+        super(RecordingBlobServiceStub, self).__init__(**kwargs)
+        self.failing_blobs = set(failing_blobs)
+        self.batches = batches
+        self.deleted = []
+
+    def delete_blob(self, container_name, blob_name, **kwargs):
+        if blob_name in self.failing_blobs:
+            raise IOError('connection reset')
+        super(RecordingBlobServiceStub, self).delete_blob(container_name, blob_name, **kwargs)
+        self.deleted.append(blob_name)
+
+    def batch_delete_blobs(self, batch_delete_sub_requests, **kwargs):
+        if not self.batches:
+            raise IOError('This request is not authorized to perform this operation.')
+        responses = super(RecordingBlobServiceStub, self).batch_delete_blobs(batch_delete_sub_requests, **kwargs)
+        self.deleted.extend(response.batch_sub_request.blob_name for response in responses)
+        return responses
+
+
+class TestBulkDirectoryDelete(unittest.TestCase):
+    def _make_client(self, client):
+        for name in DIRECTORIES:
+            client.put('container', name, b'', metadata={'hdi_isfolder': 'true'})
+        for name in FILES:
+            client.put('container', name, b'x')
+        client.put('container', 'dir2/6.txt', b'x')
+        return client
+
+    def _run(self, client, **kwargs):
+        return BulkDirectoryDelete(client, 'container', 'dir/', BatchDeleteSubRequest, max_connections=4,
+                                   **kwargs).run()
+
+    def test_delete_in_batches(self):
+        client = self._make_client(RecordingBlobServiceStub(page_size=3))
+        progress = []
+
+        result = self._run(client, batch_size=2, progress_callback=progress.append)
+
+        self.assertEqual(result.deleted, 9)
+        self.assertEqual(result.failed, [])
+        self.assertEqual(sorted(client.containers['container']), ['dir2/6.txt'])
+        self.assertEqual(client.requests['list_blobs'], 3)
+        # a batch of a single blob is a plain delete: the last file, dir/a/b and dir
+        self.assertEqual(client.requests['delete_blob'], 3)
+        # the markers go last, the deepest first
+        self.assertEqual(sorted(client.deleted[:5]), FILES)
+        self.assertEqual(client.deleted[5], 'dir/a/b')
+        self.assertEqual(sorted(client.deleted[6:8]), ['dir/a', 'dir/c'])
+        self.assertEqual(client.deleted[8], 'dir')
+        self.assertTrue(progress)
+
+    def test_delete_one_at_a_time_without_batches(self):
+        client = self._make_client(RecordingBlobServiceStub(batches=False))
+
+        result = self._run(client)
+
+        self.assertEqual(result.deleted, 9)
+        self.assertEqual(sorted(client.containers['container']), ['dir2/6.txt'])
+        self.assertEqual(client.requests['delete_blob'], 9)
+
+    def test_failures_keep_the_directories_above(self):
+        client = self._make_client(RecordingBlobServiceStub(failing_blobs=['dir/a/b/3.txt'], batches=False))
+
+        result = self._run(client)
+
+        self.assertEqual(result.failed, ['dir/a/b/3.txt'])
+        self.assertEqual(sorted(client.containers['container']),
+                         ['dir', 'dir/a', 'dir/a/b', 'dir/a/b/3.txt', 'dir2/6.txt'])
+
+    def test_missing_blobs_are_not_counted(self):
+        client = BlobServiceStub()
+        # a virtual directory without a marker
+        for name in ['dir/1.txt', 'dir/2.txt']:
+            client.put('container', name, b'x')
+
+        result = self._run(client)
+
+        self.assertEqual(result.deleted, 2)
+        self.assertEqual(result.failed, [])
+        self.assertEqual(client.containers.get('container'), {})
+
+
+@benchmark
+class BulkDeleteBenchmark(unittest.TestCase):
+    """ 2000 blobs in 20 directories, against a service answering every request in 5ms """
+
+    def _make_client(self):
+        client = BlobServiceStub(latency=0.005)
+        for directory in range(20):
+            client.put('container', 'data/{:02d}'.format(directory), b'', metadata={'hdi_isfolder': 'true'})
+            for index in range(100):
+                client.put('container', 'data/{:02d}/{:03d}.csv'.format(directory, index), b'')
+        return client
+
+    def test_bulk_delete(self):
+        client = self._make_client()
+        start = time.time()
+        for blob in list(client.list_blobs('container', prefix='data/')):
+            client.delete_blob('container', blob.name)
+        sequential = time.time() - start
+
+        client = self._make_client()
+        result = BulkDirectoryDelete(client, 'container', 'data', BatchDeleteSubRequest).run()
+        self.assertLess(result.seconds * 10, sequential, 'delete of 2020 blobs: {:.2f}s one at a time, {:.2f}s in bulk '
+                        '({:.0f} blobs/s)'.format(sequential, result.seconds, result.blobs_per_second))
+
+
+if __name__ == '__main__':
+    unittest.main()
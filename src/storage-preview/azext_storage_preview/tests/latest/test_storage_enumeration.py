@@ -0,0 +1,113 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import time
+import unittest
+from argparse import Namespace
+from fnmatch import fnmatch
+
+from ...util import collect_blobs, glob_files_remotely
+from .blob_service_stub import BlobServiceStub, FileServiceStub, File, Directory, benchmark
+
+PATHS = ['readme.md', 'logs/2019/01.log', 'logs/2020/01.log', 'logs/2020/02.txt', 'logs/2020/03/04.log',
+         'logs/2021/01.log', 'src/main.py', 'src/util/helpers.py']
+
+
+def _file_models_cmd():
+    return Namespace(get_models=lambda *_: (Directory, File))
+
+
+class TestCollectBlobs(unittest.TestCase):
+    def setUp(self):
+        self.client = BlobServiceStub(page_size=2)
+        for path in PATHS:
+            self.client.put('container', path, b'x')
+
+    def test_collect_blobs_matches_a_single_listing(self):
+        for pattern in ['*', '*.log', 'logs/2020/*', 'logs/202?/*.log', 'src/*/*.py', 'nothing/*']:
+            expected = [path for path in sorted(PATHS) if fnmatch(path, pattern)]
+            self.assertEqual(collect_blobs(self.client, 'container', pattern), expected, pattern)
+
+    def test_collect_blobs_without_pattern(self):
+        self.assertEqual(collect_blobs(self.client, 'container'), sorted(PATHS))
+
+    def test_collect_blobs_lists_below_the_literal_prefix(self):
+        collect_blobs(self.client, 'container', 'src/*.py')
+        # the "src/" level, then its "src/util/" partition
+        self.assertEqual(self.client.requests['list_blobs'], 2)
+
+    def test_collect_blobs_without_wildcards(self):
+        self.assertEqual(collect_blobs(self.client, 'container', 'src/main.py'), ['src/main.py'])
+        self.assertEqual(collect_blobs(self.client, 'container', 'src/missing.py'), [])
+
+
+class TestGlobFilesRemotely(unittest.TestCase):
+    def setUp(self):
+        self.client = FileServiceStub()
+        for path in PATHS:
+            self.client.put('share', path)
+
+    def _glob(self, pattern):
+        return sorted('/'.join(filter(None, entry))
+                      for entry in glob_files_remotely(_file_models_cmd(), self.client, 'share', pattern))
+
+    def test_glob_files_remotely(self):
+        for pattern in [None, '*.log', 'logs/2020/*', 'src/*/*.py', 'nothing/*']:
+            expected = [path for path in sorted(PATHS) if not pattern or fnmatch(path, pattern)]
+            self.assertEqual(self._glob(pattern), expected, pattern)
+
+    def test_glob_starts_at_the_literal_directory(self):
+        self.assertEqual(self._glob('logs/2020/*'), ['logs/2020/01.log', 'logs/2020/02.txt', 'logs/2020/03/04.log'])
+        # logs/2020 and logs/2020/03
+        self.assertEqual(self.client.requests, 2)
+
+    def test_glob_without_star_stops_at_the_pattern_depth(self):
+        self.assertEqual(self._glob('logs/202?/0?.log'), ['logs/2020/01.log', 'logs/2021/01.log'])
+        # logs, then its three subdirectories, but not logs/2020/03
+        self.assertEqual(self.client.requests, 4)
+
+    def test_glob_under_a_missing_directory(self):
+        self.assertEqual(self._glob('missing/dir/*.log'), [])
+        self.assertEqual(self._glob('logs/2022/*.log'), [])
+
+
+@benchmark
+class EnumerationBenchmark(unittest.TestCase):
+    """ 20 directories of 10 pages each, against services answering every request in 20ms """
+
+    def _time(self, func):
+        start = time.time()
+        func()
+        return time.time() - start
+
+    def test_collect_blobs(self):
+        client = BlobServiceStub(latency=0.02, page_size=10)
+        for directory in range(20):
+            for index in range(100):
+                client.put('container', 'data/{:02d}/{:03d}.csv'.format(directory, index), b'')
+
+        sequential = self._time(lambda: collect_blobs(client, 'container', 'data/*.csv', max_workers=1))
+        parallel = self._time(lambda: collect_blobs(client, 'container', 'data/*.csv', max_workers=8))
+        self.assertLess(parallel * 3, sequential, 'collect_blobs of 2000 blobs: {:.2f}s with 1 worker, {:.2f}s with 8'
+                        .format(sequential, parallel))
+
+    def test_glob_files_remotely(self):
+        client = FileServiceStub(latency=0.02)
+        for top in range(10):
+            for sub in range(10):
+                client.put('share', 'data/{}/{}/file.csv'.format(top, sub))
+
+        def _glob(max_workers):
+            return list(glob_files_remotely(_file_models_cmd(), client, 'share', 'data/*.csv',
+                                            max_workers=max_workers))
+
+        sequential = self._time(lambda: _glob(1))
+        parallel = self._time(lambda: _glob(8))
+        self.assertLess(parallel * 3, sequential, 'glob_files_remotely of 111 directories: {:.2f}s with 1 worker, '
+                        '{:.2f}s with 8'.format(sequential, parallel))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,347 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+In-process blob transfers on top of the block blob service: files and the blocks of large files are moved
+through one bounded pool of connections, and a journal of the blocks that are done lets an interrupted
+transfer restart where it left off.
+"""
+
+import os
+import io
+import json
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_CONNECTIONS = 8
+JOURNAL_DIR_NAME = os.path.join('storage-preview', 'transfers')
+PARTIAL_DOWNLOAD_SUFFIX = '.partial'
+
+
+def get_default_journal_dir():
+    from azure.cli.core._environment import get_config_dir
+    return os.path.join(get_config_dir(), JOURNAL_DIR_NAME)
+
+
+class TransferJournal(object):
+    """
+    Append-only record of the parts of one transfer that are done. The first line describes the transfer,
+    a journal left by a different transfer, or by another version of the same file, is discarded.
+    """
+
+    def __init__(self, journal_dir, header):
+        self.header = header
+        key = json.dumps([header['source'], header['destination']]).encode('utf-8')
+        self.path = os.path.join(journal_dir, hashlib.sha1(key).hexdigest() + '.journal')
+        self.done = self._load()
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as journal_file:
+                if json.loads(journal_file.readline()) != self.header:
+                    return set()
+                # a line cut short by an interruption is simply redone
+                return {line.strip() for line in journal_file if line.endswith('\n')}
+        except (IOError, OSError, ValueError):
+            return set()
+
+    def discard(self):
+        self.done = set()
+        self.remove()
+
+    def record(self, part):
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                resume = bool(self.done) and os.path.exists(self.path)
+                self._file = open(self.path, 'a' if resume else 'w')
+                if not resume:
+                    self._file.write(json.dumps(self.header) + '\n')
+            self._file.write('{}\n'.format(part))
+            self._file.flush()
+            self.done.add(str(part))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class TransferResult(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, source, destination, size):
+        self.source = source
+        self.destination = destination
+        self.size = size
+        self.resumed_bytes = 0
+        self.error = None
+
+
+class BlobTransferEngine(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Uploads files to and downloads blobs from one container.
+
+    Small files take a single request, larger ones are split in blocks of block_size that are transferred
+    in parallel. At most max_connections requests run at once, and as many connections are kept open on the
+    client's session to be reused by them.
+    """
+
+    def __init__(self, client, container_name, blob_block_type, content_settings_type=None,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, block_size=DEFAULT_BLOCK_SIZE, journal_dir=None,
+                 progress_callback=None):
+        self.client = client
+        self.container_name = container_name
+        self.blob_block_type = blob_block_type
+        self.content_settings_type = content_settings_type
+        self.max_connections = max_connections
+        self.block_size = block_size
+        self.journal_dir = journal_dir or get_default_journal_dir()
+        self.progress_callback = progress_callback
+        self.results = []
+        self.transferred = 0
+        self.total = 0
+
+        self._lock = threading.Lock()
+        # bounds the parts waiting in the pool, so enumerating millions of files doesn't queue them all
+        self._slots = threading.BoundedSemaphore(max_connections * 2)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections)
+        self._futures = set()
+        self._pending = []
+        self._uncommitted = {}
+        self._mount_connection_pool()
+
+    def _mount_connection_pool(self):
+        session = getattr(self.client, 'request_session', None)
+        if session is None:
+            return
+        from requests.adapters import HTTPAdapter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    def _submit(self, func, *args):
+        self._slots.acquire()
+        future = self._executor.submit(func, *args)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._futures.discard(future)
+        self._slots.release()
+
+    def _report(self, num_bytes, total=0):
+        with self._lock:
+            self.transferred += num_bytes
+            self.total += total
+            transferred, total = self.transferred, self.total
+        if self.progress_callback:
+            self.progress_callback(transferred, total)
+
+    def _track(self, result, parts, on_parts_done):
+        """ runs on_parts_done once all the futures of parts succeeded, records the error of a part otherwise """
+        remaining = [len(parts)]
+        done = threading.Event()
+        self._pending.append(done)
+
+        def _part_done(future):
+            error = CancelledError() if future.cancelled() else future.exception()
+            with self._lock:
+                if error is not None and result.error is None:
+                    result.error = error
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if not last:
+                return
+            if result.error is None:
+                try:
+                    on_parts_done()
+                except Exception as ex:  # pylint: disable=broad-except
+                    result.error = ex
+            done.set()
+
+        if not parts:
+            # every part was done by an earlier, interrupted transfer
+            try:
+                on_parts_done()
+            except Exception as ex:  # pylint: disable=broad-except
+                result.error = ex
+            done.set()
+        for future in parts:
+            future.add_done_callback(_part_done)
+
+    def _block_id(self, fingerprint, index):
+        # ids have to be the same length for all the blocks of a blob
+        return base64.b64encode('{}{:08d}'.format(fingerprint[:16], index).encode('utf-8')).decode('utf-8')
+
+    def upload(self, local_path, blob_name, content_md5=None):
+        """
+        starts uploading a file, wait() returns once it and every other transfer is done. The base64 encoded
+        content_md5 of the file, if known, is stored with the blob.
+        """
+        size = os.path.getsize(local_path)
+        result = TransferResult(local_path, blob_name, size)
+        self.results.append(result)
+        self._report(0, size)
+
+        content_settings = None
+        if self.content_settings_type is not None:
+            import mimetypes
+            content_settings = self.content_settings_type(content_type=mimetypes.guess_type(local_path)[0],
+                                                          content_md5=content_md5)
+
+        if size <= self.block_size:
+            def _put_blob():
+                self.client.create_blob_from_path(self.container_name, blob_name, local_path,
+                                                  content_settings=content_settings, max_connections=1)
+                self._report(size)
+            self._track(result, [self._submit(_put_blob)], lambda: None)
+            return result
+
+        stat = os.stat(local_path)
+        fingerprint = hashlib.sha1('{}:{}:{}'.format(size, stat.st_mtime, self.block_size)
+                                   .encode('utf-8')).hexdigest()
+        journal = TransferJournal(self.journal_dir, {
+            'source': os.path.abspath(local_path),
+            'destination': '{}/{}'.format(self.container_name, blob_name),
+            'fingerprint': fingerprint
+        })
+        block_count = (size + self.block_size - 1) // self.block_size
+        block_ids = [self._block_id(fingerprint, index) for index in range(block_count)]
+        if journal.done:
+            # the service drops uncommitted blocks after a week, only trust the ones it still has
+            uncommitted = self._get_uncommitted_block_ids(blob_name)
+            journal.done &= {str(index) for index in range(block_count) if block_ids[index] in uncommitted}
+
+        def _put_block(index):
+            with open(local_path, 'rb') as source_file:
+                source_file.seek(index * self.block_size)
+                data = source_file.read(self.block_size)
+            self.client.put_block(self.container_name, blob_name, data, block_ids[index])
+            journal.record(index)
+            self._report(len(data))
+
+        def _put_block_list():
+            self.client.put_block_list(self.container_name, blob_name,
+                                       [self.blob_block_type(id=block_id) for block_id in block_ids],
+                                       content_settings=content_settings)
+            journal.remove()
+
+        parts = []
+        for index in range(block_count):
+            if str(index) in journal.done:
+                skipped = min(self.block_size, size - index * self.block_size)
+                result.resumed_bytes += skipped
+                self._report(skipped)
+            else:
+                parts.append(self._submit(_put_block, index))
+        self._track(result, parts, _put_block_list)
+        return result
+
+    def _get_uncommitted_block_ids(self, blob_name):
+        if blob_name not in self._uncommitted:
+            try:
+                block_list = self.client.get_block_list(self.container_name, blob_name,
+                                                        block_list_type='uncommitted')
+                self._uncommitted[blob_name] = {block.id for block in block_list.uncommitted_blocks}
+            except Exception as ex:  # pylint: disable=broad-except
+                logger.debug('Unable to list the uncommitted blocks of %s: %s', blob_name, ex)
+                self._uncommitted[blob_name] = set()
+        return self._uncommitted[blob_name]
+
+    def download(self, blob_name, local_path, size=None, etag=None):
+        """ starts downloading a blob, wait() returns once it and every other transfer is done """
+        if size is None or etag is None:
+            properties = self.client.get_blob_properties(self.container_name, blob_name).properties
+            size, etag = properties.content_length, properties.etag
+        result = TransferResult(blob_name, local_path, size)
+        self.results.append(result)
+        self._report(0, size)
+
+        directory = os.path.dirname(local_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if size <= self.block_size:
+            def _get_blob():
+                self.client.get_blob_to_path(self.container_name, blob_name, local_path, if_match=etag,
+                                             max_connections=1)
+                self._report(size)
+            self._track(result, [self._submit(_get_blob)], lambda: None)
+            return result
+
+        partial_path = local_path + PARTIAL_DOWNLOAD_SUFFIX
+        journal = TransferJournal(self.journal_dir, {
+            'source': '{}/{}'.format(self.container_name, blob_name),
+            'destination': os.path.abspath(local_path),
+            'etag': etag,
+            'block_size': self.block_size
+        })
+        if not os.path.exists(partial_path) or os.path.getsize(partial_path) != size:
+            journal.discard()
+            with open(partial_path, 'wb') as partial_file:
+                partial_file.truncate(size)
+
+        def _get_range(index):
+            start = index * self.block_size
+            end = min(start + self.block_size, size) - 1
+            stream = io.BytesIO()
+            self.client.get_blob_to_stream(self.container_name, blob_name, stream, start_range=start,
+                                           end_range=end, if_match=etag, max_connections=1)
+            with open(partial_path, 'r+b') as partial_file:
+                partial_file.seek(start)
+                partial_file.write(stream.getvalue())
+            journal.record(index)
+            self._report(end - start + 1)
+
+        def _complete():
+            os.replace(partial_path, local_path)
+            journal.remove()
+
+        parts = []
+        for index in range((size + self.block_size - 1) // self.block_size):
+            if str(index) in journal.done:
+                skipped = min(self.block_size, size - index * self.block_size)
+                result.resumed_bytes += skipped
+                self._report(skipped)
+            else:
+                parts.append(self._submit(_get_range, index))
+        self._track(result, parts, _complete)
+        return result
+
+    def wait(self):
+        """ waits for every transfer started so far, returns their results """
+        for done in self._pending:
+            done.wait()
+        self._pending = []
+        return self.results
+
+    def cancel(self):
+        """ cancels the parts that have not started, the journals keep what is done for the next attempt """
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -7,9 +7,15 @@
 import os
 
 
-def collect_blobs(blob_service, container, pattern=None):
+DEFAULT_LIST_WORKERS = 8
+
+
+def collect_blobs(blob_service, container, pattern=None, max_workers=DEFAULT_LIST_WORKERS):
     """
     List the blobs in the given blob container, filter the blob by comparing their path to the given pattern.
+
+    Only the blobs starting with the literal part of the pattern are listed. The virtual directories right
+    below it are listed in parallel, and the names are returned sorted like a single listing returns them.
     """
     if not blob_service:
         raise ValueError('missing parameter blob_service')
@@ -20,18 +26,26 @@ def collect_blobs(blob_service, container, pattern=None):
     if not _pattern_has_wildcards(pattern):
         return [pattern] if blob_service.exists(container, pattern) else []
 
+    def _filter(blobs):
+        return [blob.name for blob in blobs if not pattern or _match_path(blob.name, pattern)]
+
+    prefix = _literal_prefix(pattern or '') or None
     results = []
-    for blob in blob_service.list_blobs(container):
-        try:
-            blob_name = blob.name.encode(
-                'utf-8') if isinstance(blob.name, unicode) else blob.name
-        except NameError:
-            blob_name = blob.name
+    partitions = []
+    for blob in blob_service.list_blobs(container, prefix=prefix, delimiter='/'):
+        # virtual directories come back as prefixes, without properties
+        if getattr(blob, 'properties', None) is None:
+            partitions.append(blob.name)
+        elif not pattern or _match_path(blob.name, pattern):
+            results.append(blob.name)
 
-        if not pattern or _match_path(blob_name, pattern):
-            results.append(blob_name)
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for names in executor.map(lambda partition: _filter(blob_service.list_blobs(container, prefix=partition)),
+                                  partitions):
+            results.extend(names)
 
-    return results
+    return sorted(results)
 
 
 def collect_files(cmd, file_service, share, pattern=None):
@@ -83,20 +97,118 @@ def glob_files_locally(folder_path, pattern):
                 yield (full_path, full_path[len_folder_path:])
 
 
-def glob_files_remotely(cmd, client, share_name, pattern):
-    """glob the files in remote file share based on the given pattern"""
-    from collections import deque
+def glob_files_remotely(cmd, client, share_name, pattern, max_workers=DEFAULT_LIST_WORKERS):
+    """
+    glob the files in remote file share based on the given pattern
+
+    The directories are listed in parallel, starting from the deepest one named literally by the pattern. The
+    files are yielded as their directory is listed, not in the order of a depth-first walk.
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
     t_dir, t_file = cmd.get_models('file.models#Directory', 'file.models#File')
 
-    queue = deque([""])
-    while queue:
-        current_dir = queue.pop()
-        for f in client.list_directories_and_files(share_name, current_dir):
+    start_dir = ''
+    max_depth = None
+    if pattern:
+        literal = _literal_prefix(pattern)
+        start_dir = literal[:literal.rfind('/') + 1].rstrip('/')
+        if '*' not in pattern[len(start_dir):]:
+            # without a "*" to match across directories, the matches are as deep as the pattern
+            max_depth = pattern[len(start_dir):].strip('/').count('/')
+
+    def _list_directory(directory, depth):
+        from azure.common import AzureMissingResourceHttpError
+        files, directories = [], []
+        try:
+            entries = client.list_directories_and_files(share_name, directory)
+        except AzureMissingResourceHttpError:
+            # the directory named by the pattern does not exist, nothing matches
+            return directory, depth, files, directories
+        for f in entries:
             if isinstance(f, t_file):
-                if not pattern or _match_path(os.path.join(current_dir, f.name), pattern):
-                    yield current_dir, f.name
-            elif isinstance(f, t_dir):
-                queue.appendleft(os.path.join(current_dir, f.name))
+                if not pattern or _match_path(os.path.join(directory, f.name), pattern):
+                    files.append(f.name)
+            elif isinstance(f, t_dir) and (max_depth is None or depth < max_depth):
+                directories.append(os.path.join(directory, f.name))
+        return directory, depth, files, directories
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_list_directory, start_dir, 0)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                directory, depth, files, directories = future.result()
+                pending.update(executor.submit(_list_directory, subdirectory, depth + 1)
+                               for subdirectory in directories)
+                for file_name in files:
+                    yield directory, file_name
+
+
+LIST_PAGE_SIZE = 5000
+
+
+def iter_blob_pages(client, container_name, prefix=None, include=None, delimiter=None, marker=None, timeout=None,
+                    prefetch=False):
+    """
+    Lists blobs a page at a time by following the continuation markers, yielding (items, next_marker) tuples.
+    With prefetch, the next page is requested while the caller handles the current one, so at most two pages
+    are held at once.
+    """
+    def _list_page(page_marker):
+        # only the first page of the generator is fetched, the markers are followed here
+        generator = client.list_blobs(container_name, prefix=prefix, num_results=LIST_PAGE_SIZE, include=include,
+                                      delimiter=delimiter, marker=page_marker, timeout=timeout)
+        return generator.items, generator.next_marker
+
+    if not prefetch:
+        while True:
+            items, marker = _list_page(marker)
+            yield items, marker
+            if not marker:
+                return
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        page = executor.submit(_list_page, marker)
+        while page is not None:
+            items, marker = page.result()
+            page = executor.submit(_list_page, marker) if marker else None
+            try:
+                yield items, marker
+            except GeneratorExit:
+                if page is not None:
+                    page.cancel()
+                raise
+
+
+def walk_blobs(client, container_name, prefix='', include=None, max_depth=None, marker=None, timeout=None,
+               prefetch=False, delimiter='/'):
+    """
+    Yields the blobs under prefix without holding more than a couple of pages in memory. With max_depth, the
+    tree is listed one level at a time with a delimiter, and the prefixes found max_depth levels down are
+    yielded in place of their contents.
+    """
+    if max_depth is None:
+        for items, _ in iter_blob_pages(client, container_name, prefix=prefix or None, include=include,
+                                        marker=marker, timeout=timeout, prefetch=prefetch):
+            for item in items:
+                yield item
+        return
+
+    # depth-first, so only the prefixes of the levels above the current one are pending
+    pending = [(prefix or '', 1, marker)]
+    while pending:
+        level_prefix, depth, level_marker = pending.pop()
+        subdirectories = []
+        for items, _ in iter_blob_pages(client, container_name, prefix=level_prefix or None, include=include,
+                                        delimiter=delimiter, marker=level_marker, timeout=timeout,
+                                        prefetch=prefetch):
+            for item in items:
+                if depth < max_depth and not hasattr(item, 'properties'):
+                    subdirectories.append(item.name)
+                else:
+                    yield item
+        pending.extend((name, depth + 1, None) for name in reversed(subdirectories))
 
 
 def create_short_lived_blob_sas(cmd, account_name, account_key, container, blob):
@@ -173,6 +285,12 @@ def _pattern_has_wildcards(p):
     return not p or p.find('*') != -1 or p.find('?') != -1 or p.find('[') != -1
 
 
+def _literal_prefix(pattern):
+    """ the part of a pattern before its first wildcard """
+    positions = [position for position in (pattern.find(char) for char in '*?[') if position != -1]
+    return pattern[:min(positions)] if positions else pattern
+
+
 def _match_path(path, pattern):
     from fnmatch import fnmatch
     return fnmatch(path, pattern)
@@ -0,0 +1,40 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import threading
+
+CLIENTS_KEY = 'vm_repair_clients'
+
+
+class RepairClients(object):
+    """ The management clients of the current subscription, created once per command """
+
+    def __init__(self, cli_ctx):
+        self.cli_ctx = cli_ctx
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get_client(self, resource_type):
+        from azure.cli.core.commands.client_factory import get_mgmt_service_client
+        with self._lock:
+            if resource_type not in self._clients:
+                self._clients[resource_type] = get_mgmt_service_client(self.cli_ctx, resource_type)
+            return self._clients[resource_type]
+
+    def compute(self):
+        from azure.cli.core.profiles import ResourceType
+        return self._get_client(ResourceType.MGMT_COMPUTE)
+
+    def resource(self):
+        from azure.cli.core.profiles import ResourceType
+        return self._get_client(ResourceType.MGMT_RESOURCE_RESOURCES)
+
+
+def get_repair_clients(cli_ctx):
+    """ Returns the clients of the command, creating them at the first call """
+    clients = cli_ctx.data.get(CLIENTS_KEY)
+    if clients is None:
+        clients = cli_ctx.data[CLIENTS_KEY] = RepairClients(cli_ctx)
+    return clients
@@ -4,7 +4,6 @@
 # --------------------------------------------------------------------------------------------
 
 from datetime import datetime
-from json import loads
 from re import match, search, findall
 from knack.log import get_logger
 from knack.util import CLIError
@@ -14,10 +13,9 @@ from azure.cli.command_modules.resource._client_factory import _resource_client_
 from msrestazure.azure_exceptions import CloudError
 from msrestazure.tools import parse_resource_id, is_valid_resource_id
 
+from ._client_factory import get_repair_clients
 from .encryption_types import Encryption
-from .exceptions import AzCommandError
 from .repair_utils import (
-    _call_az_command,
     _get_repair_resource_tag,
     _fetch_encryption_settings,
     _resolve_api_version,
@@ -54,12 +52,12 @@ def validate_create(cmd, namespace):
     if namespace.repair_group_name:
         if namespace.repair_group_name == namespace.resource_group_name:
             raise CLIError('The repair resource group name cannot be the same as the source VM resource group.')
-        _validate_resource_group_name(namespace.repair_group_name)
+        _validate_resource_group_name(cmd, namespace.repair_group_name)
     else:
         namespace.repair_group_name = 'repair-' + namespace.vm_name + '-' + timestamp
 
     # Check encrypted disk
-    encryption_type, _, _ = _fetch_encryption_settings(source_vm)
+    encryption_type, _, _ = _fetch_encryption_settings(get_repair_clients(cmd.cli_ctx), source_vm)
     # Currently only supporting single pass
     if encryption_type in (Encryption.SINGLE_WITH_KEK, Encryption.SINGLE_WITHOUT_KEK):
         if not namespace.unlock_encrypted_vm:
@@ -91,7 +89,7 @@ def validate_restore(cmd, namespace):
 
     # No repair param given, find repair vm using tags
     if not namespace.repair_vm_id:
-        fetch_repair_vm(namespace)
+        fetch_repair_vm(cmd, namespace)
 
     if not is_valid_resource_id(namespace.repair_vm_id):
         raise CLIError('Repair resource id is not valid.')
@@ -156,7 +154,7 @@ def validate_run(cmd, namespace):
 
     # Fetch repair vm
     if namespace.run_on_repair and not namespace.repair_vm_id:
-        fetch_repair_vm(namespace)
+        fetch_repair_vm(cmd, namespace)
 
     # If not run_on_repair, repair_vm = source_vm. Scripts directly run on source VM.
     if not namespace.run_on_repair:
@@ -252,7 +250,7 @@ def _validate_disk_name(disk_name):
         raise CLIError('Disk name only allow up to 80 characters.')
 
 
-def _validate_resource_group_name(rg_name):
+def _validate_resource_group_name(cmd, rg_name):
     rg_pattern = r'[0-9a-zA-Z._\-()]+$'
     # if match is null or ends in period, then raise error
     if not match(rg_pattern, rg_name) or rg_name[-1] == '.':
@@ -263,30 +261,26 @@ def _validate_resource_group_name(rg_name):
 
     # Check for existing dup name
     try:
-        list_rg_command = 'az group list --query "[].name" -o json'
         logger.info('Checking for existing resource groups with identical name within subscription...')
-        output = _call_az_command(list_rg_command)
-    except AzCommandError as azCommandError:
-        logger.error(azCommandError)
+        rg_exists = get_repair_clients(cmd.cli_ctx).resource().resource_groups.check_existence(rg_name)
+    except CloudError as cloudError:
+        logger.error(cloudError)
         raise CLIError('Unexpected error occured while fetching existing resource groups.')
-    rg_list = loads(output)
 
-    if rg_name in [rg.lower() for rg in rg_list]:
+    if rg_exists:
         raise CLIError('Resource group with name \'{}\' already exists within subscription.'.format(rg_name))
 
 
-def fetch_repair_vm(namespace):
+def fetch_repair_vm(cmd, namespace):
     # Find repair VM
-    tag = _get_repair_resource_tag(namespace.resource_group_name, namespace.vm_name)
+    tag_name, tag_value = _get_repair_resource_tag(namespace.resource_group_name, namespace.vm_name).split('=', 1)
     try:
-        find_repair_command = 'az resource list --tag {tag} --query "[?type==\'Microsoft.Compute/virtualMachines\']" -o json' \
-                              .format(tag=tag)
         logger.info('Searching for repair-vm within subscription...')
-        output = _call_az_command(find_repair_command)
-    except AzCommandError as azCommandError:
-        logger.error(azCommandError)
+        resources = get_repair_clients(cmd.cli_ctx).resource().resources.list(filter="tagName eq '{}' and tagValue eq '{}'".format(tag_name, tag_value))
+        repair_list = [resource.id for resource in resources if resource.type == 'Microsoft.Compute/virtualMachines']
+    except CloudError as cloudError:
+        logger.error(cloudError)
         raise CLIError('Unexpected error occured while locating repair VM.')
-    repair_list = loads(output)
 
     # No repair VM found
     if not repair_list:
@@ -296,13 +290,13 @@ def fetch_repair_vm(namespace):
     # More than one repair VM found
     if len(repair_list) > 1:
         message = 'More than one repair VM found:\n'
-        for vm in repair_list:
-            message += vm['id'] + '\n'
+        for vm_id in repair_list:
+            message += vm_id + '\n'
         message += '\nPlease specify the repair VM id using the parameter --repair-vm-id'
         raise CLIError(message)
 
     # One repair VM found
-    namespace.repair_vm_id = repair_list[0]['id']
+    namespace.repair_vm_id = repair_list[0]
 
     logger.info('Found repair VM: %s\n', namespace.repair_vm_id)
 
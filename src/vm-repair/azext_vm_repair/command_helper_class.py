@@ -8,6 +8,8 @@
 import logging
 import timeit
 import inspect
+import threading
+from contextlib import contextmanager
 from knack.log import get_logger
 
 from azure.cli.core.commands.client_factory import get_subscription_id
@@ -67,6 +69,10 @@ class command_helper(object):
         # Return dict
         self.return_dict = {}
 
+        # Time spent in each stage of the command as (stage, seconds), the stages may run concurrently
+        self.stage_times = []
+        self._stage_lock = threading.Lock()
+
         # Verbose flag for command
         self.is_verbose = any(handler.level == logging.INFO for handler in get_logger().handlers)
 
@@ -102,8 +108,27 @@ class command_helper(object):
     def is_status_success(self):
         return self.status == STATUS_SUCCESS
 
+    @contextmanager
+    def timed_stage(self, stage):
+        """ Records the time spent in the block as a stage of the command """
+        start_time = timeit.default_timer()
+        try:
+            yield
+        finally:
+            with self._stage_lock:
+                self.stage_times.append((stage, timeit.default_timer() - start_time))
+
+    def log_stage_times(self):
+        """ Logs the time spent in each stage, shown with --verbose """
+        if not self.stage_times:
+            return
+        width = max(len(stage) for stage, _ in self.stage_times)
+        breakdown = '\n'.join('  {}  {:.1f}s'.format(stage.ljust(width), seconds) for stage, seconds in self.stage_times)
+        self.logger.info('Time spent per stage:\n%s\n  %s  %.1fs\n', breakdown, 'Total'.ljust(width), timeit.default_timer() - self.start_time)
+
     def init_return_dict(self):
         """ Returns the command return dictionary """
+        self.log_stage_times()
         self.return_dict = {}
         self.return_dict["status"] = self.status
         self.return_dict["message"] = self.message
@@ -14,13 +14,19 @@ from knack.log import get_logger
 
 from azure.cli.command_modules.vm.custom import get_vm, _is_linux_os
 from azure.cli.command_modules.storage.storage_url_helpers import StorageResourceIdentifier
+from msrestazure.azure_exceptions import CloudError
 from msrestazure.tools import parse_resource_id
 
+from ._client_factory import get_repair_clients
 from .command_helper_class import command_helper
 from .repair_utils import (
     _uses_managed_disk,
     _call_az_command,
     _clean_up_resources,
+    _run_concurrently,
+    _create_resource_group,
+    _copy_managed_disk,
+    _attach_managed_disk,
     _fetch_compatible_sku,
     _list_resource_ids_in_rg,
     _get_repair_resource_tag,
@@ -45,8 +51,12 @@ def create(cmd, vm_name, resource_group_name, repair_password=None, repair_usern
 
     # Main command calling block
     try:
+        # The clients are shared by the validators, the lookups and the clean-up
+        clients = get_repair_clients(cmd.cli_ctx)
+
         # Fetch source VM data
-        source_vm = get_vm(cmd, resource_group_name, vm_name)
+        with command.timed_stage('Fetch source VM'):
+            source_vm = get_vm(cmd, resource_group_name, vm_name)
         is_linux = _is_linux_os(source_vm)
         target_disk_name = source_vm.storage_profile.os_disk.name
         is_managed = _uses_managed_disk(source_vm)
@@ -54,59 +64,55 @@ def create(cmd, vm_name, resource_group_name, repair_password=None, repair_usern
         resource_tag = _get_repair_resource_tag(resource_group_name, vm_name)
         created_resources = []
 
-        # Fetch OS image urn and set OS type for disk create
-        if is_linux:
-            os_image_urn = "UbuntuLTS"
-            os_type = 'Linux'
-        else:
-            os_image_urn = _fetch_compatible_windows_os_urn(source_vm)
-            os_type = 'Windows'
+        # The lookups and the resource group don't depend on each other, they are run concurrently
+        lookups = {
+            'Fetch VM size': (_fetch_compatible_sku, (clients, source_vm)),
+            'Create resource group': (_create_resource_group, (clients, repair_group_name, source_vm.location))
+        }
+        # Fetch OS image urn
+        if not is_linux:
+            lookups['Fetch Windows image'] = (_fetch_compatible_windows_os_urn, (clients, source_vm))
+        if is_managed:
+            lookups['Fetch disk info'] = (_fetch_disk_info, (clients, resource_group_name, target_disk_name))
+        logger.info('Fetching VM size, OS image and disk info, and creating resource group for repair VM and its resources...')
+        results = _run_concurrently(command, lookups)
+        os_image_urn = "UbuntuLTS" if is_linux else results['Fetch Windows image']
 
         # Set up base create vm command
         create_repair_vm_command = 'az vm create -g {g} -n {n} --tag {tag} --image {image} --admin-username {username} --admin-password {password}' \
                                    .format(g=repair_group_name, n=repair_vm_name, tag=resource_tag, image=os_image_urn, username=repair_username, password=repair_password)
         # Fetch VM size of repair VM
-        sku = _fetch_compatible_sku(source_vm)
+        sku = results['Fetch VM size']
         if not sku:
             raise SkuNotAvailableError('Failed to find compatible VM size for source VM\'s OS disk within given region and subscription.')
         create_repair_vm_command += ' --size {sku}'.format(sku=sku)
 
-        # Create new resource group
-        create_resource_group_command = 'az group create -l {loc} -n {group_name}' \
-                                        .format(loc=source_vm.location, group_name=repair_group_name)
-        logger.info('Creating resource group for repair VM and its resources...')
-        _call_az_command(create_resource_group_command)
-
         # MANAGED DISK
         if is_managed:
             logger.info('Source VM uses managed disks. Creating repair VM with managed disks.\n')
 
-            # Copy OS disk command
-            disk_sku, location, os_type, hyperV_generation = _fetch_disk_info(resource_group_name, target_disk_name)
-            copy_disk_command = 'az disk create -g {g} -n {n} --source {s} --sku {sku} --location {loc} --os-type {os_type} --query id -o tsv' \
-                                .format(g=resource_group_name, n=copy_disk_name, s=target_disk_name, sku=disk_sku, loc=location, os_type=os_type)
-            # Only add hyperV variable when available
-            if hyperV_generation:
-                copy_disk_command += ' --hyper-v-generation {hyperV}'.format(hyperV=hyperV_generation)
             # Validate create vm create command to validate parameters before runnning copy disk command
             validate_create_vm_command = create_repair_vm_command + ' --validate'
 
             logger.info('Validating VM template before continuing...')
-            _call_az_command(validate_create_vm_command, secure_params=[repair_password, repair_username])
-            logger.info('Copying OS disk of source VM...')
-            copy_disk_id = _call_az_command(copy_disk_command).strip('\n')
+            with command.timed_stage('Validate VM template'):
+                _call_az_command(validate_create_vm_command, secure_params=[repair_password, repair_username])
 
-            attach_disk_command = 'az vm disk attach -g {g} --vm-name {repair} --name {id}' \
-                                  .format(g=repair_group_name, repair=repair_vm_name, id=copy_disk_id)
+            # The copy of the OS disk and the repair VM don't depend on each other, they are created concurrently
+            logger.info('Copying OS disk of source VM and creating repair VM...')
+            copy_disk_id = _run_concurrently(command, {
+                'Copy OS disk': (_copy_managed_disk, (cmd, clients, resource_group_name, copy_disk_name, source_vm.storage_profile.os_disk.managed_disk.id, results['Fetch disk info'])),
+                'Create repair VM': (_call_az_command, (create_repair_vm_command, False, [repair_password, repair_username]))
+            })['Copy OS disk']
 
-            logger.info('Creating repair VM...')
-            _call_az_command(create_repair_vm_command, secure_params=[repair_password, repair_username])
             logger.info('Attaching copied disk to repair VM...')
-            _call_az_command(attach_disk_command)
+            with command.timed_stage('Attach copied disk'):
+                _attach_managed_disk(cmd, clients, repair_group_name, repair_vm_name, copy_disk_id)
 
             # Handle encrypted VM cases
             if unlock_encrypted_vm:
-                _unlock_singlepass_encrypted_disk(source_vm, is_linux, repair_group_name, repair_vm_name)
+                with command.timed_stage('Unlock encrypted disk'):
+                    _unlock_singlepass_encrypted_disk(clients, source_vm, is_linux, repair_group_name, repair_vm_name)
 
         # UNMANAGED DISK
         else:
@@ -117,7 +123,8 @@ def create(cmd, vm_name, resource_group_name, repair_password=None, repair_usern
             # Validate create vm create command to validate parameters before runnning copy disk commands
             validate_create_vm_command = create_repair_vm_command + ' --validate'
             logger.info('Validating VM template before continuing...')
-            _call_az_command(validate_create_vm_command, secure_params=[repair_password, repair_username])
+            with command.timed_stage('Validate VM template'):
+                _call_az_command(validate_create_vm_command, secure_params=[repair_password, repair_username])
 
             # get storage account connection string
             get_connection_string_command = 'az storage account show-connection-string -g {g} -n {n} --query connectionString -o tsv' \
@@ -143,7 +150,8 @@ def create(cmd, vm_name, resource_group_name, repair_password=None, repair_usern
             # Create new repair VM with copied ummanaged disk command
             create_repair_vm_command = create_repair_vm_command + ' --use-unmanaged-disk'
             logger.info('Creating repair VM while disk copy is in progress...')
-            _call_az_command(create_repair_vm_command, secure_params=[repair_password, repair_username])
+            with command.timed_stage('Create repair VM'):
+                _call_az_command(create_repair_vm_command, secure_params=[repair_password, repair_username])
 
             logger.info('Checking if disk copy is done...')
             copy_check_command = 'az storage blob show -c {c} -n {name} --connection-string "{con_string}" --query properties.copy.status -o tsv' \
@@ -156,9 +164,10 @@ def create(cmd, vm_name, resource_group_name, repair_password=None, repair_usern
             logger.info('Attaching copied disk to repair VM as data disk...')
             attach_disk_command = "az vm unmanaged-disk attach -g {g} -n {disk_name} --vm-name {vm_name} --vhd-uri {uri}" \
                                   .format(g=repair_group_name, disk_name=copy_disk_name, vm_name=repair_vm_name, uri=copy_disk_id)
-            _call_az_command(attach_disk_command)
+            with command.timed_stage('Attach copied disk'):
+                _call_az_command(attach_disk_command)
 
-        created_resources = _list_resource_ids_in_rg(repair_group_name)
+        created_resources = _list_resource_ids_in_rg(clients, repair_group_name)
         command.set_status_success()
 
     # Some error happened. Stop command and clean-up resources.
@@ -166,7 +175,7 @@ def create(cmd, vm_name, resource_group_name, repair_password=None, repair_usern
         command.error_stack_trace = traceback.format_exc()
         command.error_message = "Command interrupted by user input."
         command.message = "Command interrupted by user input. Cleaning up resources."
-    except AzCommandError as azCommandError:
+    except (AzCommandError, CloudError) as azCommandError:
         command.error_stack_trace = traceback.format_exc()
         command.error_message = str(azCommandError)
         command.message = "Repair create failed. Cleaning up created resources."
@@ -194,7 +203,7 @@ def create(cmd, vm_name, resource_group_name, repair_password=None, repair_usern
     if not command.is_status_success():
         command.set_status_error()
         return_dict = command.init_return_dict()
-        _clean_up_resources(repair_group_name, confirm=False)
+        _clean_up_resources(get_repair_clients(cmd.cli_ctx), repair_group_name, confirm=False)
     else:
         created_resources.append(copy_disk_id)
         command.message = 'Your repair VM \'{n}\' has been created in the resource group \'{repair_rg}\' with disk \'{d}\' attached as data disk. ' \
@@ -264,7 +273,7 @@ def restore(cmd, vm_name, resource_group_name, disk_name=None, repair_vm_id=None
             logger.info('Attaching repaired data disk to source VM as an OS disk...')
             _call_az_command(attach_unmanaged_command)
         # Clean
-        _clean_up_resources(repair_resource_group, confirm=not yes)
+        _clean_up_resources(get_repair_clients(cmd.cli_ctx), repair_resource_group, confirm=not yes)
         command.set_status_success()
     except KeyboardInterrupt:
         command.error_stack_trace = traceback.format_exc()
@@ -376,32 +385,34 @@ def run(cmd, vm_name, resource_group_name, run_id=None, repair_vm_id=None, custo
 
         # Parse through stdout to populate log properties: 'level', 'message'
         run_script_succeeded = _check_script_succeeded(stdout)
-        logs = _parse_run_script_raw_logs(stdout)
+        # Output 'output' or 'error' level logs depending on status
+        output_level = 'output' if run_script_succeeded else 'error'
 
-        # Process log-start and log-end
+        # Process log-start and log-end, and collect the output while the logs are parsed
         # Log is cutoff at the start if over 4k bytes
         log_cutoff = True
         log_fullpath = ''
-        for log in logs:
+        output = []
+        for log in _parse_run_script_raw_logs(stdout):
             if log['level'] == 'Log-Start':
                 log_cutoff = False
             if log['level'] == 'Log-End':
                 split_log = log['message'].split(']')
                 if len(split_log) == 2:
                     log_fullpath = split_log[1]
+            if log['level'].lower() == output_level:
+                output.append(log['message'])
         if log_cutoff:
             logger.warning('Log file is too large and has been cutoff at the start of file. Please locate the log file within the %s using the logFullpath to check full logs.', vm_string)
 
-        # Output 'output' or 'error' level logs depending on status
+        command.script.output = '\n'.join(output)
         if run_script_succeeded:
             command.script.set_status_success()
             command.message = 'Script completed succesfully.'
-            command.script.output = '\n'.join([log['message'] for log in logs if log['level'].lower() == 'output'])
             logger.info('\nScript returned with output:\n%s\n', command.script.output)
         else:
             command.script.set_status_error()
             command.message = 'Script completed with errors.'
-            command.script.output = '\n'.join([log['message'] for log in logs if log['level'].lower() == 'error'])
             logger.error('\nScript returned with error:\n%s\n', command.script.output)
 
         command.set_status_success()
@@ -7,12 +7,15 @@ import subprocess
 import shlex
 import os
 import re
-from json import loads
+import json
 import pkgutil
+from concurrent.futures import ThreadPoolExecutor
 import requests
 
 from knack.log import get_logger
 from knack.prompting import prompt_y_n, NoTTYException
+from msrestazure.azure_exceptions import CloudError
+from msrestazure.tools import parse_resource_id
 
 from .encryption_types import Encryption
 
@@ -20,6 +23,16 @@ from .exceptions import AzCommandError, WindowsOsNotAvailableError, RunScriptNot
 # pylint: disable=line-too-long, deprecated-method
 
 REPAIR_MAP_URL = 'https://raw.githubusercontent.com/Azure/repair-script-library/master/map.json'
+# Seconds to wait for GitHub before falling back to the cached map
+REPAIR_MAP_TIMEOUT = 10
+REPAIR_MAP_CACHE_DIR_NAME = 'vm-repair'
+REPAIR_MAP_CACHE_FILE_NAME = 'run-script-map.json'
+# The start of each log entry of the run scripts
+LOG_ENTRY_START = re.compile(r'\[(?:(?:Log-Start|Log-End|Output|Info|Warning|Error|Debug) '
+                             r'[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]\]|STATUS\])')
+WINDOWS_IMAGE_PUBLISHER = 'MicrosoftWindowsServer'
+WINDOWS_IMAGE_OFFER = 'WindowsServer'
+WINDOWS_IMAGE_SKU = '2016-Datacenter'
 
 logger = get_logger(__name__)
 
@@ -67,6 +80,20 @@ def _call_az_command(command_string, run_async=False, secure_params=None):
     return None
 
 
+def _run_concurrently(command, lookups):
+    """
+    Runs independent lookups on threads. lookups maps the stage name of each lookup to its (function, args),
+    the time of each is recorded as a stage of the command. Returns the results by stage name.
+    """
+    def _timed(stage, function, args):
+        with command.timed_stage(stage):
+            return function(*args)
+
+    with ThreadPoolExecutor(max_workers=len(lookups)) as executor:
+        futures = {stage: executor.submit(_timed, stage, function, args) for stage, (function, args) in lookups.items()}
+        return {stage: future.result() for stage, future in futures.items()}
+
+
 def _get_current_vmrepair_version():
     from azure.cli.core.extension.operations import list_extensions
     version = [ext['version'] for ext in list_extensions() if ext['name'] == 'vm-repair']
@@ -95,47 +122,69 @@ def check_extension_version(extension_name):
     logger.debug('The extension with name %s does not exist within available extensions.', extension_name)
 
 
-def _clean_up_resources(resource_group_name, confirm):
+def _clean_up_resources(clients, resource_group_name, confirm):
 
     try:
         if confirm:
             message = 'The clean-up will remove the resource group \'{rg}\' and all repair resources within:\n\n{r}' \
-                      .format(rg=resource_group_name, r='\n'.join(_list_resource_ids_in_rg(resource_group_name)))
+                      .format(rg=resource_group_name, r='\n'.join(_list_resource_ids_in_rg(clients, resource_group_name)))
             logger.warning(message)
             if not prompt_y_n('Continue with clean-up and delete resources?'):
                 logger.warning('Skipping clean-up')
                 return
 
-        delete_resource_group_command = 'az group delete --name {name} --yes --no-wait'.format(name=resource_group_name)
         logger.info('Cleaning up resources by deleting repair resource group \'%s\'...', resource_group_name)
-        _call_az_command(delete_resource_group_command)
+        # The deletion is started without waiting for it to end
+        clients.resource().resource_groups.delete(resource_group_name)
     # NoTTYException exception only thrown from confirm block
     except NoTTYException:
         logger.warning('Cannot confirm clean-up resouce in non-interactive mode.')
         logger.warning('Skipping clean-up')
         return
-    except AzCommandError as azCommandError:
-        # Only way to distinguish errors
-        resource_not_found_error_string = 'could not be found'
-        if resource_not_found_error_string in str(azCommandError):
+    except CloudError as cloudError:
+        if cloudError.status_code == 404:
             logger.info('Resource group not found. Skipping clean up.')
             return
-        logger.error(azCommandError)
+        logger.error(cloudError)
         logger.error("Clean up failed.")
 
 
-def _fetch_compatible_sku(source_vm):
+def _list_available_skus(clients, location):
+    """ Returns the VM sizes of the location which are available to the subscription, as 'az vm list-skus' does """
+    skus = clients.compute().resource_skus.list(filter="location eq '{}'".format(location))
+    return [sku for sku in skus if sku.resource_type == 'virtualMachines' and
+            not [r for r in (sku.restrictions or []) if r.reason_code == 'NotAvailableForSubscription']]
+
+
+def _get_sku_capability(sku, name):
+    return next((c.value for c in (sku.capabilities or []) if c.name == name), None)
+
+
+def _is_compatible_sku(sku):
+    """ A standard D size of 2 to 8 vCPUs, 8 to 32 GB of memory, data disks and premium IO """
+    def _number(name):
+        value = _get_sku_capability(sku, name)
+        return float(value) if value is not None else None
+
+    vcpus, memory, max_data_disks = _number('vCPUs'), _number('MemoryGB'), _number('MaxDataDiskCount')
+    return 'standard_d' in sku.name.lower() and \
+        vcpus is not None and 2 <= vcpus <= 8 and \
+        memory is not None and 8 <= memory <= 32 and \
+        max_data_disks is not None and max_data_disks > 0 and \
+        _get_sku_capability(sku, 'PremiumIO') == 'True'
+
+
+def _fetch_compatible_sku(clients, source_vm):
 
     location = source_vm.location
     source_vm_sku = source_vm.hardware_profile.vm_size
 
-    # First get the source_vm sku, if its available go with it
-    check_sku_command = 'az vm list-skus -s {sku} -l {loc} --query [].name -o tsv'.format(sku=source_vm_sku, loc=location)
-
+    # The sizes of the location are listed once, for the source VM size and the fallback sizes
     logger.info('Checking if source VM size is available...')
-    sku_check = _call_az_command(check_sku_command).strip('\n')
+    skus = _list_available_skus(clients, location)
 
-    if sku_check:
+    # First get the source_vm sku, if its available go with it
+    if [sku for sku in skus if sku.name.lower() == source_vm_sku.lower()]:
         logger.info('Source VM size \'%s\' is available. Using it to create repair VM.\n', source_vm_sku)
         return source_vm_sku
 
@@ -143,17 +192,8 @@ def _fetch_compatible_sku(source_vm):
 
     # List available standard SKUs
     # TODO, premium IO only when needed
-    list_sku_command = 'az vm list-skus -s standard_d -l {loc} --query ' \
-                       '"[?capabilities[?name==\'vCPUs\' && to_number(value)>= to_number(\'2\')] && ' \
-                       'capabilities[?name==\'vCPUs\' && to_number(value)<= to_number(\'8\')] && ' \
-                       'capabilities[?name==\'MemoryGB\' && to_number(value)>=to_number(\'8\')] && ' \
-                       'capabilities[?name==\'MemoryGB\' && to_number(value)<=to_number(\'32\')] && ' \
-                       'capabilities[?name==\'MaxDataDiskCount\' && to_number(value)>to_number(\'0\')] && ' \
-                       'capabilities[?name==\'PremiumIO\' && value==\'True\']].name" -o json'\
-                       .format(loc=location)
-
     logger.info('Fetching available VM sizes for repair VM...')
-    sku_list = loads(_call_az_command(list_sku_command).strip('\n'))
+    sku_list = [sku.name for sku in skus if _is_compatible_sku(sku)]
 
     if sku_list:
         logger.info('VM size \'%s\' is available. Using it to create repair VM.\n', sku_list[0])
@@ -162,28 +202,55 @@ def _fetch_compatible_sku(source_vm):
     return None
 
 
-def _fetch_disk_info(resource_group_name, disk_name):
+def _fetch_disk_info(clients, resource_group_name, disk_name):
     """ Returns sku, location, os_type, hyperVgeneration as tuples """
-    show_disk_command = 'az disk show -g {g} -n {name} --query [sku.name,location,osType,hyperVgeneration] -o json'.format(g=resource_group_name, name=disk_name)
-    disk_info = loads(_call_az_command(show_disk_command))
-    # Note that disk_info will always have 4 elements if the command succeeded, if it fails it will cause an exception
-    sku, location, os_type, hyper_v_version = disk_info[0], disk_info[1], disk_info[2], disk_info[3]
-    return (sku, location, os_type, hyper_v_version)
+    disk = clients.compute().disks.get(resource_group_name, disk_name)
+    sku = disk.sku.name if disk.sku else None
+    return (sku, disk.location, disk.os_type, disk.hyper_v_generation)
 
 
 def _get_repair_resource_tag(resource_group_name, source_vm_name):
     return 'repair_source={rg}/{vm_name}'.format(rg=resource_group_name, vm_name=source_vm_name)
 
 
-def _list_resource_ids_in_rg(resource_group_name):
-    get_resources_command = 'az resource list --resource-group {rg} --query [].id -o json' \
-                            .format(rg=resource_group_name)
+def _create_resource_group(clients, resource_group_name, location):
+    clients.resource().resource_groups.create_or_update(resource_group_name, {'location': location})
+
+
+def _copy_managed_disk(cmd, clients, resource_group_name, copy_disk_name, source_disk_id, disk_info):
+    """ Copies the managed disk with the sku, location, os_type and hyperVgeneration of disk_info, returns the id of the copy """
+    from azure.cli.core.profiles import ResourceType
+    Disk, DiskSku, CreationData = cmd.get_models('Disk', 'DiskSku', 'CreationData', resource_type=ResourceType.MGMT_COMPUTE, operation_group='disks')
+    sku, location, os_type, hyper_v_generation = disk_info
+    disk = Disk(location=location, sku=DiskSku(name=sku) if sku else None, os_type=os_type,
+                creation_data=CreationData(create_option='Copy', source_resource_id=source_disk_id))
+    # Only add hyperV variable when available
+    if hyper_v_generation:
+        disk.hyper_v_generation = hyper_v_generation
+    return clients.compute().disks.create_or_update(resource_group_name, copy_disk_name, disk).result().id
+
+
+def _attach_managed_disk(cmd, clients, resource_group_name, vm_name, disk_id):
+    """ Attaches the managed disk to the VM as a data disk at the first free lun """
+    from azure.cli.core.profiles import ResourceType
+    DataDisk, ManagedDiskParameters = cmd.get_models('DataDisk', 'ManagedDiskParameters', resource_type=ResourceType.MGMT_COMPUTE, operation_group='virtual_machines')
+    compute_client = clients.compute()
+    vm = compute_client.virtual_machines.get(resource_group_name, vm_name)
+    luns = [data_disk.lun for data_disk in vm.storage_profile.data_disks]
+    lun = next(lun for lun in range(len(luns) + 1) if lun not in luns)
+    vm.storage_profile.data_disks.append(DataDisk(lun=lun, name=parse_resource_id(disk_id)['name'], create_option='Attach',
+                                                  managed_disk=ManagedDiskParameters(id=disk_id)))
+    # The extensions of the VM can't be sent back with it
+    vm.resources = None
+    compute_client.virtual_machines.create_or_update(resource_group_name, vm_name, vm).result()
+
+
+def _list_resource_ids_in_rg(clients, resource_group_name):
     logger.debug('Fetching resources in resource group...')
-    ids = loads(_call_az_command(get_resources_command))
-    return ids
+    return [resource.id for resource in clients.resource().resources.list_by_resource_group(resource_group_name)]
 
 
-def _fetch_encryption_settings(source_vm):
+def _fetch_encryption_settings(clients, source_vm):
     key_vault = None
     kekurl = None
     if source_vm.storage_profile.os_disk.encryption_settings is not None:
@@ -192,21 +259,26 @@ def _fetch_encryption_settings(source_vm):
     if not _uses_managed_disk(source_vm):
         return Encryption.NONE, key_vault, kekurl
 
-    disk_id = source_vm.storage_profile.os_disk.managed_disk.id
-    show_disk_command = 'az disk show --id {i} --query [encryptionSettingsCollection,encryptionSettingsCollection.encryptionSettings[].diskEncryptionKey.sourceVault.id,encryptionSettingsCollection.encryptionSettings[].keyEncryptionKey.keyUrl] -o json'.format(i=disk_id)
-    encryption_type, key_vault, kekurl = loads(_call_az_command(show_disk_command))
-    if [encryption_type, key_vault, kekurl] == [None, None, None]:
+    disk_id = parse_resource_id(source_vm.storage_profile.os_disk.managed_disk.id)
+    disk = clients.compute().disks.get(disk_id['resource_group'], disk_id['name'])
+    encryption_settings = (disk.encryption_settings_collection.encryption_settings or []) \
+        if disk.encryption_settings_collection else []
+    key_vaults = [settings.disk_encryption_key.source_vault.id for settings in encryption_settings
+                  if settings.disk_encryption_key]
+    kekurls = [settings.key_encryption_key.key_url for settings in encryption_settings
+               if settings.key_encryption_key]
+    if not key_vaults:
         return Encryption.NONE, key_vault, kekurl
-    if kekurl == []:
-        key_vault = key_vault[0]
+    if not kekurls:
+        key_vault = key_vaults[0]
         return Encryption.SINGLE_WITHOUT_KEK, key_vault, kekurl
-    key_vault, kekurl = key_vault[0], kekurl[0]
+    key_vault, kekurl = key_vaults[0], kekurls[0]
     return Encryption.SINGLE_WITH_KEK, key_vault, kekurl
 
 
-def _unlock_singlepass_encrypted_disk(source_vm, is_linux, repair_group_name, repair_vm_name):
+def _unlock_singlepass_encrypted_disk(clients, source_vm, is_linux, repair_group_name, repair_vm_name):
     # Installs the extension on repair VM and mounts the disk after unlocking.
-    encryption_type, key_vault, kekurl = _fetch_encryption_settings(source_vm)
+    encryption_type, key_vault, kekurl = _fetch_encryption_settings(clients, source_vm)
     if is_linux:
         volume_type = 'DATA'
     else:
@@ -251,11 +323,12 @@ def _manually_unlock_mount_encrypted_disk(repair_group_name, repair_vm_name):
     _call_az_command(mount_disk_command)
 
 
-def _fetch_compatible_windows_os_urn(source_vm):
+def _fetch_compatible_windows_os_urn(clients, source_vm):
     location = source_vm.location
-    fetch_urn_command = 'az vm image list -s "2016-Datacenter" -f WindowsServer -p MicrosoftWindowsServer -l {loc} --verbose --all --query "[?sku==\'2016-Datacenter\'].urn | reverse(sort(@))" -o json'.format(loc=location)
     logger.info('Fetching compatible Windows OS images from gallery...')
-    urns = loads(_call_az_command(fetch_urn_command))
+    images = clients.compute().virtual_machine_images.list(location, WINDOWS_IMAGE_PUBLISHER, WINDOWS_IMAGE_OFFER, WINDOWS_IMAGE_SKU)
+    urns = sorted(('{p}:{o}:{s}:{v}'.format(p=WINDOWS_IMAGE_PUBLISHER, o=WINDOWS_IMAGE_OFFER, s=WINDOWS_IMAGE_SKU, v=image.name)
+                   for image in images), reverse=True)
 
     # No OS images available for Windows2016
     if not urns:
@@ -291,14 +364,57 @@ def _resolve_api_version(rcf, resource_provider_namespace, parent_resource_path,
         .format(resource_type))
 
 
+def _get_run_script_map_cache_path():
+    from azure.cli.core._environment import get_config_dir
+    return os.path.join(get_config_dir(), REPAIR_MAP_CACHE_DIR_NAME, REPAIR_MAP_CACHE_FILE_NAME)
+
+
+def _load_run_script_map_cache(cache_path):
+    """ Returns the cached map as {'etag': etag, 'map': map_json}, None if there is none """
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        return cache if 'map' in cache else None
+    except (IOError, OSError, ValueError, TypeError):
+        return None
+
+
+def _save_run_script_map_cache(cache_path, etag, map_json):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump({'etag': etag, 'map': map_json}, f)
+    except (IOError, OSError) as exception:
+        logger.debug('Failed to cache the run script map: %s', exception)
+
+
 def _fetch_run_script_map():
+    """
+    Returns map.json of the repair script library. The map is cached with its ETag, GitHub only sends it again when it
+    changed. When GitHub can't be reached, the cached map is used.
+    """
+    cache_path = _get_run_script_map_cache_path()
+    cache = _load_run_script_map_cache(cache_path)
+    headers = {'If-None-Match': cache['etag']} if cache and cache.get('etag') else {}
 
-    # Fetch map.json from GitHub
-    response = requests.get(url=REPAIR_MAP_URL)
-    # Raise exception when request fails
-    response.raise_for_status()
+    try:
+        # Fetch map.json from GitHub
+        response = requests.get(url=REPAIR_MAP_URL, headers=headers, timeout=REPAIR_MAP_TIMEOUT)
+        if response.status_code == 304 and cache:
+            logger.debug('The run script map has not changed since it was cached.')
+            return cache['map']
+        # Raise exception when request fails
+        response.raise_for_status()
+        map_json = response.json()
+    except (requests.exceptions.RequestException, ValueError) as exception:
+        if not cache:
+            raise
+        logger.warning('Failed to fetch the run script map from GitHub, using the cached map.')
+        logger.debug(exception)
+        return cache['map']
 
-    return response.json()
+    _save_run_script_map_cache(cache_path, response.headers.get('ETag'), map_json)
+    return map_json
 
 
 def _fetch_run_script_path(run_id):
@@ -343,36 +459,30 @@ def _process_bash_parameters(parameters):
 
 def _parse_run_script_raw_logs(log_string):
     """
-    Splits one aggregate log string into a list of each log entry.
+    Splits one aggregate log string into each log entry, yielded as they are parsed in a single pass.
     """
-    pattern = r'((?=\[(?:Log-Start|Log-End|Output|Info|Warning|Error|Debug) ' \
-              r'[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]\])|(?=\[STATUS\]))'
-    log_list = _regex_split(pattern, log_string)
-    # Remove empty strings in logs
-    log_list = list(filter(None, log_list))
-    # Format them in dictionary to parse out level
-    logs_dict_list = []
-    for log in log_list:
-        log_dict = {}
-        log_dict['message'] = log.strip('\n')
-        # Set log level property
-        if '[STATUS]::' in log_dict['message']:
-            log_dict['level'] = 'STATUS'
-        else:
-            log_dict['level'] = log_dict['message'].split(' ', 1)[0][1:]
-        logs_dict_list.append(log_dict)
+    start = 0
+    for match in LOG_ENTRY_START.finditer(log_string):
+        if match.start() > start:
+            yield _parse_log_entry(log_string[start:match.start()])
+            start = match.start()
+    # The rest of the string is the last entry, empty entries are skipped
+    if start < len(log_string):
+        yield _parse_log_entry(log_string[start:])
 
-    return logs_dict_list
 
-
-def _regex_split(pattern, string):
+def _parse_log_entry(log):
     """
-    Custom split function for zero width split fix.
+    Formats a log entry in dictionary to parse out level.
     """
-    splits = list((m.start(), m.end()) for m in re.finditer(pattern, string))
-    starts = [0] + [i[1] for i in splits]
-    ends = [i[0] for i in splits] + [len(string)]
-    return [string[start:end] for start, end in zip(starts, ends)]
+    log_dict = {}
+    log_dict['message'] = log.strip('\n')
+    # Set log level property
+    if '[STATUS]::' in log_dict['message']:
+        log_dict['level'] = 'STATUS'
+    else:
+        log_dict['level'] = log_dict['message'].split(' ', 1)[0][1:]
+    return log_dict
 
 
 def _check_script_succeeded(log_string):
@@ -0,0 +1,252 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+from msrestazure.azure_exceptions import CloudError
+
+from azext_vm_repair._client_factory import get_repair_clients
+from azext_vm_repair.encryption_types import Encryption
+from azext_vm_repair.exceptions import WindowsOsNotAvailableError
+from azext_vm_repair.repair_utils import (
+    _clean_up_resources,
+    _fetch_compatible_sku,
+    _fetch_compatible_windows_os_urn,
+    _fetch_encryption_settings,
+    _fetch_run_script_map,
+    _list_resource_ids_in_rg,
+    _parse_run_script_raw_logs,
+    _run_concurrently
+)
+
+RUN_BENCHMARKS = os.environ.get('AZURE_VM_REPAIR_BENCHMARKS', '').lower() in ('1', 'true', 'yes')
+
+
+def _sku(name, vcpus='4', memory='16', max_data_disks='8', premium_io='True', restrictions=None):
+    capabilities = [SimpleNamespace(name='vCPUs', value=vcpus), SimpleNamespace(name='MemoryGB', value=memory),
+                    SimpleNamespace(name='MaxDataDiskCount', value=max_data_disks),
+                    SimpleNamespace(name='PremiumIO', value=premium_io)]
+    return SimpleNamespace(name=name, resource_type='virtualMachines', capabilities=capabilities, restrictions=restrictions)
+
+
+def _source_vm(vm_size='Standard_E64_v3', image_version=None):
+    vm = mock.MagicMock(location='westus2')
+    vm.hardware_profile.vm_size = vm_size
+    vm.storage_profile.os_disk.encryption_settings = None
+    vm.storage_profile.os_disk.managed_disk.id = '/subscriptions/sub/resourceGroups/rg/providers/Microsoft.Compute/disks/osdisk'
+    vm.storage_profile.image_reference.version = image_version
+    return vm
+
+
+class RepairClientsStub(object):
+    def __init__(self):
+        self.compute_client = mock.MagicMock()
+        self.resource_client = mock.MagicMock()
+
+    def compute(self):
+        return self.compute_client
+
+    def resource(self):
+        return self.resource_client
+
+
+class CommandStub(object):
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def timed_stage(self, stage):
+        yield
+        self.stages.append(stage)
+
+
+class TestRepairUtils(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch('subprocess.Popen', side_effect=AssertionError('no process is started'))
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.clients = RepairClientsStub()
+
+    def test_source_vm_size_is_used_when_available(self):
+        self.clients.compute_client.resource_skus.list.return_value = [_sku('Standard_D2s_v3'), _sku('standard_e64_v3')]
+
+        self.assertEqual(_fetch_compatible_sku(self.clients, _source_vm()), 'Standard_E64_v3')
+        # the sizes are listed once
+        self.clients.compute_client.resource_skus.list.assert_called_once_with(filter="location eq 'westus2'")
+
+    def test_compatible_vm_size_is_used_otherwise(self):
+        restricted = [SimpleNamespace(reason_code='NotAvailableForSubscription')]
+        self.clients.compute_client.resource_skus.list.return_value = [
+            _sku('Standard_E64_v3', restrictions=restricted), _sku('Standard_D16s_v3', vcpus='16', memory='64'),
+            _sku('Standard_D2_v3', premium_io='False'), _sku('Standard_D4s_v3', restrictions=restricted),
+            _sku('Standard_D2s_v3'), _sku('Standard_D4s_v3')]
+
+        self.assertEqual(_fetch_compatible_sku(self.clients, _source_vm()), 'Standard_D2s_v3')
+
+        self.clients.compute_client.resource_skus.list.return_value = [_sku('Standard_D2_v3', premium_io='False')]
+        self.assertIsNone(_fetch_compatible_sku(self.clients, _source_vm()))
+
+    def test_latest_windows_image_is_used(self):
+        self.clients.compute_client.virtual_machine_images.list.return_value = [
+            SimpleNamespace(name='14393.3630.2004101604'), SimpleNamespace(name='14393.3808.2007101707')]
+
+        self.assertEqual(_fetch_compatible_windows_os_urn(self.clients, _source_vm()),
+                         'MicrosoftWindowsServer:WindowsServer:2016-Datacenter:14393.3808.2007101707')
+        self.clients.compute_client.virtual_machine_images.list.assert_called_once_with(
+            'westus2', 'MicrosoftWindowsServer', 'WindowsServer', '2016-Datacenter')
+        # the image of the source VM is avoided for the disk signature collision
+        self.assertEqual(_fetch_compatible_windows_os_urn(self.clients, _source_vm(image_version='14393.3808.2007101707')),
+                         'MicrosoftWindowsServer:WindowsServer:2016-Datacenter:14393.3630.2004101604')
+
+        self.clients.compute_client.virtual_machine_images.list.return_value = []
+        with self.assertRaises(WindowsOsNotAvailableError):
+            _fetch_compatible_windows_os_urn(self.clients, _source_vm())
+
+    def test_encryption_settings(self):
+        disk = self.clients.compute_client.disks.get.return_value
+        disk.encryption_settings_collection = None
+        self.assertEqual(_fetch_encryption_settings(self.clients, _source_vm()), (Encryption.NONE, None, None))
+        self.clients.compute_client.disks.get.assert_called_once_with('rg', 'osdisk')
+
+        settings = mock.MagicMock()
+        settings.disk_encryption_key.source_vault.id = 'vault'
+        settings.key_encryption_key = None
+        disk.encryption_settings_collection = SimpleNamespace(encryption_settings=[settings])
+        self.assertEqual(_fetch_encryption_settings(self.clients, _source_vm()), (Encryption.SINGLE_WITHOUT_KEK, 'vault', None))
+
+        settings.key_encryption_key = SimpleNamespace(key_url='https://vault/keys/kek')
+        self.assertEqual(_fetch_encryption_settings(self.clients, _source_vm()),
+                         (Encryption.SINGLE_WITH_KEK, 'vault', 'https://vault/keys/kek'))
+
+    def test_clean_up_resources(self):
+        self.clients.resource_client.resources.list_by_resource_group.return_value = [
+            SimpleNamespace(id='/vm'), SimpleNamespace(id='/nic')]
+        self.assertEqual(_list_resource_ids_in_rg(self.clients, 'repair-rg'), ['/vm', '/nic'])
+
+        _clean_up_resources(self.clients, 'repair-rg', confirm=False)
+        self.clients.resource_client.resource_groups.delete.assert_called_once_with('repair-rg')
+
+        error = CloudError.__new__(CloudError)
+        error.status_code = 404
+        self.clients.resource_client.resource_groups.delete.side_effect = error
+        _clean_up_resources(self.clients, 'repair-rg', confirm=False)
+
+    def test_lookups_run_concurrently(self):
+        command = CommandStub()
+        # each lookup waits for the others, it would time out if they were run one after the other
+        barrier = threading.Barrier(3, timeout=10)
+
+        def _lookup(value):
+            barrier.wait()
+            return value
+
+        results = _run_concurrently(command, {'Fetch VM size': (_lookup, ('Standard_D2s_v3',)),
+                                              'Fetch Windows image': (_lookup, ('urn',)),
+                                              'Fetch disk info': (_lookup, (('Premium_LRS', 'westus2', 'Windows', 'V1'),))})
+
+        self.assertEqual(results, {'Fetch VM size': 'Standard_D2s_v3', 'Fetch Windows image': 'urn',
+                                   'Fetch disk info': ('Premium_LRS', 'westus2', 'Windows', 'V1')})
+        self.assertEqual(sorted(command.stages), ['Fetch VM size', 'Fetch Windows image', 'Fetch disk info'])
+
+    def test_clients_are_shared_by_the_command(self):
+        cli_ctx = SimpleNamespace(data={})
+        with mock.patch('azure.cli.core.commands.client_factory.get_mgmt_service_client') as get_client:
+            clients = get_repair_clients(cli_ctx)
+            self.assertIs(get_repair_clients(cli_ctx), clients)
+            self.assertIs(clients.compute(), clients.compute())
+            self.assertEqual(get_client.call_count, 1)
+
+
+def _response(status_code, map_json=None, etag=None):
+    response = mock.MagicMock(status_code=status_code, headers={'ETag': etag} if etag else {})
+    response.json.return_value = map_json
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(str(status_code))
+    return response
+
+
+class TestRunScriptMap(unittest.TestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        patch = mock.patch('azext_vm_repair.repair_utils._get_run_script_map_cache_path',
+                           return_value=os.path.join(cache_dir, 'vm-repair', 'run-script-map.json'))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def fetch(self, response):
+        with mock.patch('requests.get', side_effect=[response] if not isinstance(response, Exception) else response) as get:
+            return _fetch_run_script_map(), get.call_args[1]['headers']
+
+    def test_map_is_revalidated_with_its_etag(self):
+        map_json = [{'id': 'win-hello-world', 'path': 'src/windows/win-hello-world.ps1'}]
+
+        self.assertEqual(self.fetch(_response(200, map_json, etag='"v1"')), (map_json, {}))
+        # the map didn't change
+        self.assertEqual(self.fetch(_response(304)), (map_json, {'If-None-Match': '"v1"'}))
+
+        new_map_json = map_json + [{'id': 'linux-hello-world', 'path': 'src/linux/linux-hello-world.sh'}]
+        self.assertEqual(self.fetch(_response(200, new_map_json, etag='"v2"')), (new_map_json, {'If-None-Match': '"v1"'}))
+        self.assertEqual(self.fetch(_response(304)), (new_map_json, {'If-None-Match': '"v2"'}))
+
+    def test_cached_map_is_used_offline(self):
+        map_json = [{'id': 'win-hello-world', 'path': 'src/windows/win-hello-world.ps1'}]
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.fetch(requests.exceptions.ConnectionError('offline'))
+
+        self.fetch(_response(200, map_json, etag='"v1"'))
+
+        self.assertEqual(self.fetch(requests.exceptions.ConnectionError('offline'))[0], map_json)
+        self.assertEqual(self.fetch(_response(503))[0], map_json)
+
+
+class TestRunScriptLogs(unittest.TestCase):
+    def test_logs_are_split_in_entries(self):
+        logs = '[Log-Start 08/17/2020 10:00:00]\n[Info 08/17/2020 10:00:01] Checking [disk] 1\n' \
+               '[Output 08/17/2020 10:00:02] Hello\nWorld\n[Error 08/17/2020 10:00:03] Failed\n' \
+               '[STATUS]::SUCCESS\n[Log-End 08/17/2020 10:00:09] C:\\log.txt\n'
+
+        self.assertEqual(list(_parse_run_script_raw_logs(logs)), [
+            {'message': '[Log-Start 08/17/2020 10:00:00]', 'level': 'Log-Start'},
+            {'message': '[Info 08/17/2020 10:00:01] Checking [disk] 1', 'level': 'Info'},
+            {'message': '[Output 08/17/2020 10:00:02] Hello\nWorld', 'level': 'Output'},
+            {'message': '[Error 08/17/2020 10:00:03] Failed', 'level': 'Error'},
+            {'message': '[STATUS]::SUCCESS', 'level': 'STATUS'},
+            {'message': '[Log-End 08/17/2020 10:00:09] C:\\log.txt', 'level': 'Log-End'}])
+
+    def test_text_before_the_first_entry_is_kept(self):
+        self.assertEqual([log['message'] for log in _parse_run_script_raw_logs('cut off line\n[STATUS]::ERROR')],
+                         ['cut off line', '[STATUS]::ERROR'])
+        self.assertEqual(list(_parse_run_script_raw_logs('')), [])
+
+    def test_entries_are_yielded_as_they_are_parsed(self):
+        logs = _parse_run_script_raw_logs('[Info 08/17/2020 10:00:01] a\n' * 3)
+        self.assertEqual(next(logs)['message'], '[Info 08/17/2020 10:00:01] a')
+        self.assertEqual(len(list(logs)), 2)
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'set AZURE_VM_REPAIR_BENCHMARKS=1 to run the benchmarks')
+class RunScriptLogsBenchmark(unittest.TestCase):
+    def test_parse_logs_throughput(self):
+        entry = '[Info 08/17/2020 10:00:01] Checking the boot configuration data of the attached disk\n'
+        logs = entry * (64 * 1024 * 1024 // len(entry))
+        start = time.time()
+        count = sum(1 for _ in _parse_run_script_raw_logs(logs))
+        seconds = time.time() - start
+        self.assertEqual(count, len(logs) // len(entry), 'parse of {} MB of logs: {:.0f} MB/s'
+                         .format(len(logs) // (1024 * 1024), len(logs) / (1024 * 1024) / seconds))
+
+
+if __name__ == '__main__':
+    unittest.main()
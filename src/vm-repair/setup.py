@@ -8,7 +8,7 @@
 from codecs import open
 from setuptools import setup, find_packages
 
-VERSION = "0.3.2"
+VERSION = "0.3.3"
 
 CLASSIFIERS = [
     'Development Status :: 4 - Beta',